@@ -8,11 +8,11 @@ import os
 import logging
 from datetime import datetime
 from flask import Flask, jsonify, request
-import requests
-import json
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from utils.charging import calculate_charging_projection
+from utils.admission import admission_class, ANALYTICS
+from utils.cache import cache_headers
 
 # Configure logging
 logging.basicConfig(
@@ -24,6 +24,8 @@ logger = logging.getLogger('evpulse')
 # Initialize JWT
 jwt = JWTManager()
 
+CORS_ORIGINS = ['http://localhost:5173', 'http://localhost:5175', 'http://localhost:3000']
+
 
 def create_app(config_name: str = None) -> Flask:
     """
@@ -46,11 +48,23 @@ def create_app(config_name: str = None) -> Flask:
     app.config['JWT_HEADER_TYPE'] = 'Bearer'
 
     # Initialize CORS
-    CORS(app, origins=['http://localhost:5173', 'http://localhost:5175', 'http://localhost:3000'], supports_credentials=True)
+    CORS(app, origins=CORS_ORIGINS, supports_credentials=True)
 
     # Initialize JWT
     jwt.init_app(app)
 
+    # Per-request query accounting (Server-Timing, N+1 budget)
+    _register_instrumentation(app, config_name)
+
+    # Prometheus /metrics (must attach pool listeners before the client exists)
+    _register_metrics(app)
+
+    # Per-route-class concurrency limits (after metrics so rejections are counted)
+    _register_admission_control(app)
+
+    # Query deadlines start once a request is admitted, not while it queues for a slot
+    _register_query_deadlines(app)
+
     # Initialize database connection
     db_initialized = _initialize_database(app)
     app.config['DATABASE_INITIALIZED'] = db_initialized
@@ -93,6 +107,8 @@ def _initialize_database(app: Flask) -> bool:
             logger.info(f"Database: {config.database_name}")
             logger.info(f"Collections: {collections}")
             app.config['DB_MANAGER'] = manager
+            _ensure_indexes(db)
+            _warm_station_suggest(db)
             logger.info("Database connection established successfully")
             return True
         else:
@@ -105,6 +121,89 @@ def _initialize_database(app: Flask) -> bool:
         return False
 
 
+def _ensure_indexes(db) -> None:
+    """Create the station-scope compound indexes (non-fatal)."""
+    from database import ensure_indexes
+
+    try:
+        ensure_indexes(db)
+    except Exception as e:
+        logger.warning(f"Index creation failed (queries still work, unindexed): {e}")
+
+
+def _warm_station_suggest(db) -> None:
+    """Start building the station typeahead index in the background."""
+    from utils.station_suggest import get_suggest_index
+
+    get_suggest_index().ensure_fresh(db)
+
+
+def _register_instrumentation(app: Flask, config_name: str) -> None:
+    """
+    Register per-request database query instrumentation.
+    Budget overruns are logged; in testing (or DB_QUERY_BUDGET_STRICT=true) they fail the request.
+    Database errors that escape a view (deadline overruns included) become a structured response.
+
+    Args:
+        app: Flask application instance
+        config_name: Active configuration name
+    """
+    from database import init_query_instrumentation
+
+    app.config['DB_QUERY_BUDGET'] = int(os.getenv('DB_QUERY_BUDGET', 25))
+    app.config['DB_QUERY_BUDGET_STRICT'] = (
+        os.getenv('DB_QUERY_BUDGET_STRICT', 'false').lower() in ('1', 'true', 'yes')
+        or config_name == 'testing'
+    )
+    init_query_instrumentation(app)
+
+    from pymongo.errors import PyMongoError
+    from routes.common import database_error_response
+
+    @app.errorhandler(PyMongoError)
+    def _handle_database_error(error):
+        return database_error_response(error)
+
+
+def _register_metrics(app: Flask) -> None:
+    """
+    Register Prometheus request metrics, MongoDB pool/command listeners and /metrics.
+
+    Args:
+        app: Flask application instance
+    """
+    from database import get_database_manager
+    from utils.metrics import init_metrics
+
+    init_metrics(app, get_database_manager())
+
+
+def _register_admission_control(app: Flask) -> None:
+    """
+    Register per-route-class bulkheads (critical / interactive / analytics).
+
+    Args:
+        app: Flask application instance
+    """
+    from utils.admission import init_admission_control
+
+    init_admission_control(app)
+
+
+def _register_query_deadlines(app: Flask) -> None:
+    """
+    Register per-request query deadlines (pymongo.timeout per deadline class).
+    Registered after admission control so time spent waiting for a bulkhead slot
+    does not count against the request's database budget.
+
+    Args:
+        app: Flask application instance
+    """
+    from database import init_query_deadlines
+
+    init_query_deadlines(app)
+
+
 def _register_blueprints(app: Flask) -> None:
     """
     Register all Flask blueprints.
@@ -123,6 +222,7 @@ def _register_blueprints(app: Flask) -> None:
         from routes.admin import admin_bp
         from routes.operator import operator_bp
         from routes.users import users_bp
+        from routes.charging import charging_bp
         
         app.register_blueprint(auth_bp, url_prefix='/api/auth')
         app.register_blueprint(stations_bp, url_prefix='/api/stations')
@@ -134,6 +234,7 @@ def _register_blueprints(app: Flask) -> None:
         app.register_blueprint(admin_bp, url_prefix='/api/admin')
         app.register_blueprint(operator_bp, url_prefix='/api/operator')
         app.register_blueprint(users_bp, url_prefix='/api/users')
+        app.register_blueprint(charging_bp, url_prefix='/api/charging')
         
         logger.info("✅ All blueprints registered successfully")
         
@@ -150,42 +251,81 @@ def _register_routes(app: Flask) -> None:
         app: Flask application instance
     """
     
+    @app.route('/api/health/live')
+    def liveness_check():
+        """Liveness probe: the process is up and serving. Never touches the database."""
+        return jsonify({
+            'status': 'alive',
+            'timestamp': datetime.now().isoformat()
+        })
+
+    @app.route('/api/health/ready')
+    def readiness_check():
+        """Readiness probe answered from the background health snapshot"""
+        from database import get_health_monitor
+
+        snapshot = get_health_monitor().snapshot()
+        if snapshot is None:
+            return jsonify({
+                'status': 'starting',
+                'ready': False,
+                'timestamp': datetime.now().isoformat()
+            }), 503
+
+        ready = snapshot['healthy'] and not snapshot['stale']
+        return jsonify({
+            'status': 'ready' if ready else 'not_ready',
+            'ready': ready,
+            'database': {
+                'healthy': snapshot['healthy'],
+                'latency_ms': snapshot['latency_ms'],
+                'state': snapshot['state'],
+                'error': snapshot['error'],
+            },
+            'refreshed_at': snapshot['refreshed_at'],
+            'age_seconds': snapshot['age_seconds'],
+            'timestamp': datetime.now().isoformat()
+        }), 200 if ready else 503
+
     @app.route('/api/health')
     def health_check():
-        """Health check endpoint with database status"""
+        """Health summary with database status, served from the cached health snapshot"""
         try:
-            from database import get_database_manager
+            from database import get_database_manager, get_health_monitor
             
             manager = get_database_manager()
-            
-            if manager.is_connected:
-                health = manager.health_check()
+            monitor = get_health_monitor()
+            snapshot = monitor.snapshot()
+
+            if snapshot is None:
+                return jsonify({
+                    'status': 'starting',
+                    'message': 'EVPulse API is running; first database health check in progress',
+                    'database': {'status': 'unknown', 'state': manager.state},
+                    'timestamp': datetime.now().isoformat()
+                }), 200
+
+            if snapshot['healthy'] and not snapshot['stale']:
                 stats = manager.stats
-                
-                # Get collection counts
-                db = manager.db
-                collection_stats = {}
-                for collection in ['users', 'stations', 'sessions', 'bookings', 'transactions']:
-                    try:
-                        collection_stats[collection] = db[collection].count_documents({})
-                    except:
-                        collection_stats[collection] = 0
-                
                 return jsonify({
                     'status': 'healthy',
                     'message': 'EVPulse API is running',
                     'database': {
                         'status': 'connected',
-                        'healthy': health.get('healthy', False),
-                        'latency_ms': health.get('latency_ms'),
-                        'state': manager.state,
+                        'healthy': snapshot['healthy'],
+                        'latency_ms': snapshot['latency_ms'],
+                        'state': snapshot['state'],
+                        'pool': snapshot['pool'],
                     },
-                    'collections': collection_stats,
+                    # estimated_document_count (collection metadata), refreshed in the background
+                    'collections': snapshot['collections'],
                     'stats': {
                         'uptime_seconds': stats.get('uptime_seconds', 0),
                         'queries_executed': stats.get('queries_executed', 0),
                         'reconnections': stats.get('reconnections', 0),
                     },
+                    'refreshed_at': snapshot['refreshed_at'],
+                    'refresh_interval_seconds': monitor.interval,
                     'timestamp': datetime.now().isoformat()
                 })
             else:
@@ -194,8 +334,11 @@ def _register_routes(app: Flask) -> None:
                     'message': 'EVPulse API running but database not connected',
                     'database': {
                         'status': 'disconnected',
-                        'state': manager.state,
+                        'state': snapshot['state'],
+                        'error': snapshot['error'],
+                        'stale': snapshot['stale'],
                     },
+                    'refreshed_at': snapshot['refreshed_at'],
                     'timestamp': datetime.now().isoformat()
                 }), 503
                 
@@ -217,10 +360,16 @@ def _register_routes(app: Flask) -> None:
         })
     
     @app.route('/api/db/status')
+    @admission_class(ANALYTICS)
     def db_status():
         """Detailed database status endpoint"""
         try:
-            from database import get_database_manager
+            from database import get_database_manager, get_query_stats
+            from utils.cache import get_cache
+            from utils.admission import get_admission_controller
+            from utils import idempotency
+            from utils.station_suggest import get_suggest_index
+            from utils.ai_optimizer import get_optimizer
             
             manager = get_database_manager()
             
@@ -229,6 +378,13 @@ def _register_routes(app: Flask) -> None:
                 'state': manager.state,
                 'stats': manager.stats,
                 'health': manager.health_check() if manager.is_connected else None,
+                'latency': manager.latency_stats(),
+                'queries_by_endpoint': get_query_stats(),
+                'cache': get_cache().stats(),
+                'admission': get_admission_controller().snapshot(),
+                'idempotency': idempotency.stats(),
+                'station_suggest': get_suggest_index().stats(),
+                'ai': get_optimizer().stats(),
                 'timestamp': datetime.now().isoformat()
             })
         except Exception as e:
@@ -239,12 +395,28 @@ def _register_routes(app: Flask) -> None:
             }), 500
     
     @app.route('/api/db/diagnostics')
+    @admission_class(ANALYTICS)
     def db_diagnostics():
-        """Run database diagnostics"""
+        """
+        Database diagnostics. Returns the cached result and job status immediately;
+        a background run starts when there is no fresh result or ?refresh=true.
+        """
         try:
-            from database import run_diagnostics
-            results = run_diagnostics()
-            return jsonify(results)
+            from database import get_database_config, get_diagnostics_job
+
+            job = get_diagnostics_job()
+            refresh = request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+            if refresh or job.is_stale():
+                config = get_database_config()
+                job.submit(config.uri or None, config.database_name)
+
+            result = job.result
+            return jsonify({
+                'job': job.status(),
+                'result': result,
+                'stale': job.is_stale(),
+                'timestamp': datetime.now().isoformat()
+            }), 200 if result is not None else 202
         except Exception as e:
             return jsonify({
                 'error': str(e),
@@ -253,17 +425,22 @@ def _register_routes(app: Flask) -> None:
 
     # AI proxy endpoint to keep API keys server-side
     @app.route('/api/ai/optimize', methods=['POST'])
+    @admission_class(ANALYTICS)
     def ai_optimize():
-        """Proxy endpoint that forwards optimization requests to the configured generative API using the server-side API key."""
+        """
+        Charging optimization report for the given parameters. Reports come
+        from the configured backend (utils/ai_optimizer.py) and are cached per
+        normalised input; X-Cache / Age report the outcome.
+        """
+        from utils.ai_optimizer import AIServiceBusy, AIServiceError, get_optimizer
+
         try:
             body = request.get_json() or {}
 
-            AI_API_KEY = os.getenv('AI_API_KEY')
-            if not AI_API_KEY:
+            optimizer = get_optimizer()
+            if not getattr(optimizer.backend, 'configured', True):
                 return jsonify({'success': False, 'error': 'Server AI API key not configured.'}), 500
 
-            # Build a simple prompt from provided params (keep concise)
-            vehicleType = body.get('vehicleType', 'Car')
             batteryCapacity = body.get('batteryCapacity', 60)
             try:
                 batteryCapacity = int(batteryCapacity)
@@ -271,97 +448,45 @@ def _register_routes(app: Flask) -> None:
                 return jsonify({'success': False, 'error': 'Battery capacity must be an integer between 25 and 100 kWh.'}), 400
             if batteryCapacity < 25 or batteryCapacity > 100:
                 return jsonify({'success': False, 'error': 'Battery capacity must be between 25 and 100 kWh.'}), 400
-            currentPercentage = body.get('currentPercentage', 35)
-            targetPercentage = body.get('targetPercentage', 80)
-            chargerType = body.get('chargerType', 'Fast')
-            chargerPower = body.get('chargerPower', 150)
-            costPerKwh = body.get('costPerKwh', 8)
-            selectedDurationMinutes = body.get('durationMinutes', 60)
-            peakHours = body.get('peakHours', '6 PM – 10 PM')
+
+            params = {
+                'vehicleType': body.get('vehicleType', 'Car'),
+                'batteryCapacity': batteryCapacity,
+                'currentPercentage': body.get('currentPercentage', 35),
+                'targetPercentage': body.get('targetPercentage', 80),
+                'chargerType': body.get('chargerType', 'Fast'),
+                'chargerPower': body.get('chargerPower', 150),
+                'costPerKwh': body.get('costPerKwh', 8),
+                'peakHours': body.get('peakHours', '6 PM – 10 PM'),
+            }
 
             projection = calculate_charging_projection(
                 battery_capacity_kwh=batteryCapacity,
-                current_percentage=currentPercentage,
-                target_percentage=targetPercentage,
-                duration_minutes=selectedDurationMinutes,
-                rate_per_kwh=costPerKwh,
-                charger_power_kw=chargerPower,
+                current_percentage=params['currentPercentage'],
+                target_percentage=params['targetPercentage'],
+                duration_minutes=body.get('durationMinutes', 60),
+                rate_per_kwh=params['costPerKwh'],
+                charger_power_kw=params['chargerPower'],
                 progress_percentage=100,
             )
 
-            prompt = f"""You are an advanced AI-powered EV Charging Optimization Engine.
-
-Vehicle Type: {vehicleType}
-Battery Capacity (kWh): {batteryCapacity}
-Current Battery Level (%): {currentPercentage}
-Target Battery Level (%): {targetPercentage}
-Charger Type: {chargerType}
-Charger Power Output (kW): {chargerPower}
-Electricity Cost per kWh (₹): {costPerKwh}
-Selected Charging Duration (minutes): {projection['durationMinutes']}
-Peak Hours: {peakHours}
-
-Deterministic projection (must be used as the baseline in your response):
-- Energy Required (kWh): {projection['targetEnergyKwh']}
-- Estimated Charging Time (minutes): {projection['durationMinutes']}
-- Estimated Cost (₹): {projection['estimatedTotalCost']}
-
-Analyze the above and provide a clear, well-formatted charging optimization report. Include:
-1. Energy Required (kWh)
-2. Estimated Charging Time
-3. Estimated Cost (₹)
-4. Peak Hour Analysis
-5. Optimization Level (Low / Moderate / Highly Optimized)
-6. Smart Recommendation for battery health and cost savings
-
-Keep it concise, professional, and easy to read. Use plain text with clear headings. Do NOT use markdown code blocks or JSON format.""" 
-
-            AI_API_URL = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent'
-
-            payload = {
-                'contents': [
-                    {
-                        'parts': [
-                            {
-                                'text': prompt
-                            }
-                        ]
-                    }
-                ],
-                'generationConfig': {
-                    'temperature': 0.7,
-                    'topK': 40,
-                    'topP': 0.95,
-                    'maxOutputTokens': 2048,
-                }
-            }
-
-            resp = requests.post(f"{AI_API_URL}?key={AI_API_KEY}", json=payload, headers={'Content-Type': 'application/json'}, timeout=30)
-            if resp.status_code != 200:
-                try:
-                    err = resp.json()
-                except Exception:
-                    err = {'status': resp.status_code, 'text': resp.text}
-                return jsonify({'success': False, 'error': f'AI service error: {err}'}), 502
-
-            data = resp.json()
-            textContent = None
             try:
-                textContent = data.get('candidates', [])[0].get('content', {}).get('parts', [])[0].get('text')
-            except Exception:
-                textContent = None
-
-            if not textContent:
-                return jsonify({'success': False, 'error': 'No content returned from AI service.'}), 502
+                text, outcome, age = optimizer.optimize(params, projection)
+            except AIServiceBusy as e:
+                response = jsonify({'success': False, 'error': e.message})
+                response.headers['Retry-After'] = '1'
+                return response, e.status
+            except AIServiceError as e:
+                return jsonify({'success': False, 'error': e.message}), e.status
 
             # Return raw text directly — no JSON parsing needed
-            return jsonify({
+            return cache_headers(jsonify({
                 'success': True,
                 'data': {
-                    'text': textContent,
+                    'text': text,
                     'projection': projection,
                 }
-            })
+            }), outcome, age)
 
         except Exception as e:
             return jsonify({'success': False, 'error': str(e)}), 500
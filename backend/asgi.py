@@ -0,0 +1,63 @@
+"""
+ASGI entry point: async read path + the existing WSGI app in one process.
+
+    uvicorn asgi:app --workers 2
+    hypercorn asgi:app
+
+Requests that match a route of the async app (``async_api``) are served by
+Quart/Motor on the event loop; everything else is passed to the Flask app,
+which asgiref runs in a thread pool. Requires quart, motor and asgiref.
+"""
+
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.exceptions import MethodNotAllowed, NotFound
+
+from app import create_app
+from async_api import create_async_app
+
+
+class ReadPathDispatcher:
+    """
+    Route GET/HEAD requests to the async app if it has a matching rule, else to WSGI.
+
+    A Flask rule without variables wins over an async rule with them, as it
+    would inside one url_map: ``/api/stations/suggest`` is the Flask suggest
+    view, not the async ``/api/stations/<station_id>``.
+    """
+
+    def __init__(self, async_app, wsgi_app):
+        self.async_app = async_app
+        self.wsgi_app = WsgiToAsgi(wsgi_app)
+        self._adapter = async_app.url_map.bind('')
+        self._wsgi_adapter = wsgi_app.url_map.bind('')
+
+    def _is_async_route(self, scope):
+        if scope['method'] not in ('GET', 'HEAD'):
+            return False
+        try:
+            _, arguments = self._adapter.match(scope['path'], method=scope['method'])
+        except (NotFound, MethodNotAllowed):
+            return False
+        except Exception:
+            # Redirects (e.g. trailing slash) and anything else: let Flask answer as before.
+            return False
+        if arguments and self._is_static_wsgi_route(scope):
+            return False
+        return True
+
+    def _is_static_wsgi_route(self, scope):
+        try:
+            rule, _ = self._wsgi_adapter.match(scope['path'], method=scope['method'], return_rule=True)
+        except Exception:
+            return False
+        return not rule.arguments
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.async_app(scope, receive, send)
+        if scope['type'] == 'http' and self._is_async_route(scope):
+            return await self.async_app(scope, receive, send)
+        return await self.wsgi_app(scope, receive, send)
+
+
+app = ReadPathDispatcher(create_async_app(), create_app())
@@ -0,0 +1,59 @@
+"""
+EVPulse async read path
+=======================
+Quart (ASGI) application serving the highest-volume read-only endpoints
+with Motor, so one process can hold many concurrent slow clients:
+
+- GET /api/stations, GET /api/stations/<station_id>
+- GET /api/bookings/available-slots
+- GET /api/reviews/station/<station_id>
+- GET /api/notifications/user/<user_id>, GET /api/notifications/user/<user_id>/unread-count
+
+Responses match the Flask handlers in ``routes/``; the pure request/response
+helpers are shared with them. Everything else is served by the WSGI app;
+``asgi.py`` mounts both in one ASGI application.
+
+Requires quart and motor (optional dependencies).
+"""
+
+import os
+
+
+def create_async_app():
+    """Application factory for the async read-path app."""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    from quart import Quart, request
+
+    from app import CORS_ORIGINS
+
+    from database import close_async_db
+    from async_api.stations import stations_bp
+    from async_api.bookings import bookings_bp
+    from async_api.reviews import reviews_bp
+    from async_api.notifications import notifications_bp
+
+    app = Quart(__name__)
+    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key')
+
+    app.register_blueprint(stations_bp, url_prefix='/api/stations')
+    app.register_blueprint(bookings_bp, url_prefix='/api/bookings')
+    app.register_blueprint(reviews_bp, url_prefix='/api/reviews')
+    app.register_blueprint(notifications_bp, url_prefix='/api/notifications')
+
+    @app.after_request
+    async def _cors(response):
+        # Same policy as flask_cors in app.py; preflight OPTIONS requests are answered by the WSGI app.
+        origin = request.headers.get('Origin')
+        if origin in CORS_ORIGINS:
+            response.headers['Access-Control-Allow-Origin'] = origin
+            response.headers['Access-Control-Allow-Credentials'] = 'true'
+            response.vary.add('Origin')
+        return response
+
+    @app.after_serving
+    async def _close_db():
+        close_async_db()
+
+    return app
@@ -0,0 +1,46 @@
+"""
+Bearer-token check for the async app.
+
+flask_jwt_extended only works inside Flask, so tokens issued by it are
+verified here directly with PyJWT using the same secret, algorithm and
+claims (identity in ``sub``, ``type == 'access'``). Error bodies match
+flask_jwt_extended's defaults.
+"""
+
+from functools import wraps
+
+import jwt
+from quart import current_app, g, jsonify, request
+
+JWT_ALGORITHM = 'HS256'
+
+
+def jwt_required(fn):
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        header = request.headers.get('Authorization', '')
+        if not header:
+            return jsonify({'msg': 'Missing Authorization Header'}), 401
+
+        parts = header.split()
+        if len(parts) != 2 or parts[0] != 'Bearer':
+            return jsonify({'msg': "Bad Authorization header. Expected 'Authorization: Bearer <JWT>'"}), 422
+
+        try:
+            claims = jwt.decode(parts[1], current_app.config['JWT_SECRET_KEY'], algorithms=[JWT_ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            return jsonify({'msg': 'Token has expired'}), 401
+        except jwt.InvalidTokenError as e:
+            return jsonify({'msg': str(e)}), 422
+
+        if claims.get('type') != 'access':
+            return jsonify({'msg': 'Only non-refresh tokens are allowed'}), 422
+
+        g.jwt_identity = claims.get('sub')
+        return await fn(*args, **kwargs)
+
+    return wrapper
+
+
+def get_jwt_identity():
+    return g.get('jwt_identity')
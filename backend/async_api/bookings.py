@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+
+from quart import Blueprint, request, jsonify
+
+from database import get_async_db, get_db
+from routes.common import DB_UNAVAILABLE, to_object_id, now_utc
+from routes.bookings import (
+    _booked_slots_query,
+    _ensure_booking_indexes,
+    _generate_time_slots,
+    _normalize_port_id,
+    _refresh_elapsed_bookings,
+    _resolve_slot_charging_type,
+    _send_upcoming_booking_reminders,
+    _slot_has_ended,
+    _slot_statuses,
+)
+
+logger = logging.getLogger('evpulse.async_api.bookings')
+
+bookings_bp = Blueprint('async_bookings', __name__)
+
+# Elapsed-booking expiry and reminders are writes with notification fan-out;
+# the async handler hands them to a worker thread at most this often per slot key.
+MAINTENANCE_INTERVAL_SECONDS = 30
+_maintenance_runs = {}
+
+
+def _run_slot_maintenance(station_oid, date, port_id):
+    try:
+        db = get_db()
+        if db is None:
+            return
+        _ensure_booking_indexes(db)
+        _refresh_elapsed_bookings(db, station_id=station_oid, date=date, port_id=port_id)
+        _send_upcoming_booking_reminders(db)
+    except Exception as e:
+        logger.warning(f"Booking maintenance failed: {e}")
+
+
+def _schedule_slot_maintenance(station_oid, date, port_id):
+    key = (station_oid, date, port_id)
+    now = time.monotonic()
+    if now - _maintenance_runs.get(key, 0) < MAINTENANCE_INTERVAL_SECONDS:
+        return
+    if len(_maintenance_runs) > 10000:
+        _maintenance_runs.clear()
+    _maintenance_runs[key] = now
+    asyncio.get_running_loop().run_in_executor(None, _run_slot_maintenance, station_oid, date, port_id)
+
+
+@bookings_bp.route('/available-slots', methods=['GET'])
+async def get_available_slots():
+    """Get available time slots for a station on a date"""
+    try:
+        db = await get_async_db()
+        if db is None:
+            return jsonify(DB_UNAVAILABLE), 503
+
+        station_id = request.args.get('stationId')
+        date = request.args.get('date')
+        port_id = request.args.get('portId')
+        charging_mode = str(request.args.get('chargingMode') or '').strip().lower()
+        charger_type_hint = request.args.get('chargerType')
+
+        if not station_id or not date:
+            return jsonify({'success': False, 'error': 'stationId and date are required'}), 400
+
+        station_oid = to_object_id(station_id)
+        if not station_oid:
+            return jsonify({'success': False, 'error': 'Invalid stationId'}), 400
+
+        station = await db.stations.find_one({'_id': station_oid}, {'ports': 1})
+        if not station:
+            return jsonify({'success': False, 'error': 'Station not found'}), 404
+
+        normalized_port_id = _normalize_port_id(port_id)
+        time_slots = _generate_time_slots(
+            _resolve_slot_charging_type(station, normalized_port_id, charging_mode, charger_type_hint)
+        )
+
+        _schedule_slot_maintenance(station_oid, date, normalized_port_id)
+
+        # Slots that have already ended are about to be marked missed by the
+        # maintenance task; treat them as free now so the answer matches.
+        now_dt = now_utc()
+        booked = await db.bookings.find(
+            _booked_slots_query(station_oid, date, normalized_port_id),
+            {'time_slot': 1, 'date': 1},
+        ).to_list(None)
+        booked_slots = [b['time_slot'] for b in booked if not _slot_has_ended(b.get('date'), b.get('time_slot'), now_dt)]
+        slot_statuses, available = _slot_statuses(time_slots, booked_slots)
+
+        return jsonify({'success': True, 'data': slot_statuses, 'availableSlots': available})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
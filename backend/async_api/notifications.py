@@ -0,0 +1,64 @@
+from quart import Blueprint, jsonify
+
+from async_api.auth import jwt_required, get_jwt_identity
+from database import get_async_db
+from models.notification import Notification
+from routes.common import DB_UNAVAILABLE, to_object_id
+from routes.notifications import _build_user_match, _normalize_user_id
+
+notifications_bp = Blueprint('async_notifications', __name__)
+
+
+async def _is_admin(db, user_id):
+    user_oid = to_object_id(user_id)
+    if not user_oid:
+        return False
+    user = await db.users.find_one({'_id': user_oid}, {'role': 1})
+    return bool(user and user.get('role') == 'admin')
+
+
+async def _authorized(db, user_id):
+    current_user_id = get_jwt_identity()
+    return _normalize_user_id(current_user_id) == _normalize_user_id(user_id) or await _is_admin(db, current_user_id)
+
+
+@notifications_bp.route('/user/<user_id>', methods=['GET'])
+@jwt_required
+async def get_user_notifications(user_id):
+    """Get all notifications for a user"""
+    try:
+        db = await get_async_db()
+        if db is None:
+            return jsonify(DB_UNAVAILABLE), 503
+
+        if not await _authorized(db, user_id):
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+
+        notifications_data = await db.notifications.find({'user_id': _build_user_match(user_id)}).sort('timestamp', -1).to_list(None)
+        notifications = [Notification.from_dict(data).to_response_dict() for data in notifications_data]
+
+        return jsonify({'success': True, 'data': notifications})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@notifications_bp.route('/user/<user_id>/unread-count', methods=['GET'])
+@jwt_required
+async def get_unread_count(user_id):
+    """Get count of unread notifications"""
+    try:
+        db = await get_async_db()
+        if db is None:
+            return jsonify(DB_UNAVAILABLE), 503
+
+        if not await _authorized(db, user_id):
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+
+        count = await db.notifications.count_documents({
+            'user_id': _build_user_match(user_id),
+            'read': False
+        })
+
+        return jsonify({'success': True, 'data': {'count': count}})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,27 @@
+from quart import Blueprint, jsonify
+
+from database import get_async_db
+from models.review import Review
+from routes.common import DB_UNAVAILABLE, to_object_id
+
+reviews_bp = Blueprint('async_reviews', __name__)
+
+
+@reviews_bp.route('/station/<station_id>', methods=['GET'])
+async def get_station_reviews(station_id):
+    """Get all reviews for a station"""
+    try:
+        db = await get_async_db()
+        if db is None:
+            return jsonify(DB_UNAVAILABLE), 503
+
+        station_oid = to_object_id(station_id)
+        if not station_oid:
+            return jsonify({'success': False, 'error': 'Invalid station id'}), 400
+
+        reviews_data = await db.reviews.find({'station_id': station_oid}).sort('timestamp', -1).to_list(None)
+        reviews = [Review.from_dict(data).to_response_dict() for data in reviews_data]
+
+        return jsonify({'success': True, 'data': reviews})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,77 @@
+from quart import Blueprint, request, jsonify
+
+from database import get_async_db
+from routes.common import DB_UNAVAILABLE, to_object_id
+from routes.stations import (
+    EMPTY_TODAY_METRICS,
+    TODAY_SESSIONS_PROJECTION,
+    USER_PROFILE_PROJECTION,
+    _build_station_detail,
+    _build_station_list,
+    _profile_map_from_users,
+    _station_list_query,
+    _station_operator_id,
+    _summarize_today_sessions,
+    _today_sessions_query,
+)
+
+stations_bp = Blueprint('async_stations', __name__)
+
+
+async def _build_user_profile_map(db, user_ids):
+    valid_ids = [oid for oid in (to_object_id(user_id) for user_id in user_ids) if oid]
+    if not valid_ids:
+        return {}
+    users = await db.users.find({'_id': {'$in': valid_ids}}, USER_PROFILE_PROJECTION).to_list(None)
+    return _profile_map_from_users(users)
+
+
+async def _station_today_metrics(db, station_id, total_ports):
+    station_oid = to_object_id(station_id)
+    if not station_oid:
+        return dict(EMPTY_TODAY_METRICS)
+    sessions = await db.sessions.find(_today_sessions_query(station_oid), TODAY_SESSIONS_PROJECTION).to_list(None)
+    return _summarize_today_sessions(sessions, total_ports)
+
+
+@stations_bp.route('', methods=['GET'])
+async def get_all_stations():
+    """Get all stations with optional filters"""
+    try:
+        db = await get_async_db()
+        if db is None:
+            return jsonify(DB_UNAVAILABLE), 503
+
+        stations_data = await db.stations.find(_station_list_query(request.args)).to_list(None)
+        operator_profile_map = await _build_user_profile_map(db, [data.get('operator_id') for data in stations_data])
+        stations = _build_station_list(stations_data, operator_profile_map, request.args)
+
+        return jsonify({'success': True, 'data': stations})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@stations_bp.route('/<station_id>', methods=['GET'])
+async def get_station_by_id(station_id):
+    """Get a specific station by ID"""
+    try:
+        db = await get_async_db()
+        if db is None:
+            return jsonify(DB_UNAVAILABLE), 503
+
+        station_oid = to_object_id(station_id)
+        if not station_oid:
+            return jsonify({'success': False, 'error': 'Invalid station id'}), 400
+
+        station_data = await db.stations.find_one({'_id': station_oid})
+        if not station_data:
+            return jsonify({'success': False, 'error': 'Station not found'}), 404
+
+        operator_id_for_profile = _station_operator_id(station_data)
+        operator_profile_map = await _build_user_profile_map(db, [operator_id_for_profile])
+        station_response = _build_station_detail(station_data, operator_profile_map.get(operator_id_for_profile, {}))
+        # The station document is already loaded, so its port count is reused.
+        station_response.update(await _station_today_metrics(db, station_data.get('_id'), len(station_data.get('ports') or [])))
+        return jsonify({'success': True, 'data': station_response})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -28,13 +28,54 @@ from .connection import (
     get_collection,
     init_db,
     close_db,
+    prepare_for_fork,
     with_db_retry,
     ConnectionState,
 )
 
+from .async_connection import (
+    AsyncDatabaseConnectionManager,
+    get_async_database_manager,
+    get_async_db,
+    close_async_db,
+)
+
+from .instrumentation import (
+    QueryCommandListener,
+    RequestQueryStats,
+    init_query_instrumentation,
+    get_query_stats,
+    query_budget,
+)
+
+from .deadlines import (
+    DEADLINE_CLASSES,
+    deadline_scope,
+    init_query_deadlines,
+    query_deadline,
+)
+
+from .fanout import (
+    QueryGroup,
+    gather,
+    shutdown_fanout,
+)
+
+from .indexes import (
+    INDEXES,
+    ensure_indexes,
+)
+
+from .health import (
+    HealthMonitor,
+    get_health_monitor,
+)
+
 from .diagnostics import (
     DatabaseDiagnostics,
     DiagnosticResult,
+    DiagnosticsJob,
+    get_diagnostics_job,
     run_diagnostics,
     quick_test,
 )
@@ -53,12 +94,46 @@ __all__ = [
     'get_collection',
     'init_db',
     'close_db',
+    'prepare_for_fork',
     'with_db_retry',
     'ConnectionState',
 
+    # Async connection (Motor, optional)
+    'AsyncDatabaseConnectionManager',
+    'get_async_database_manager',
+    'get_async_db',
+    'close_async_db',
+
+    # Instrumentation
+    'QueryCommandListener',
+    'RequestQueryStats',
+    'init_query_instrumentation',
+    'get_query_stats',
+    'query_budget',
+
+    # Query deadlines
+    'DEADLINE_CLASSES',
+    'init_query_deadlines',
+    'query_deadline',
+
+    # Query fan-out
+    'QueryGroup',
+    'gather',
+    'shutdown_fanout',
+
+    # Indexes
+    'INDEXES',
+    'ensure_indexes',
+
+    # Health
+    'HealthMonitor',
+    'get_health_monitor',
+
     # Diagnostics
     'DatabaseDiagnostics',
     'DiagnosticResult',
+    'DiagnosticsJob',
+    'get_diagnostics_job',
     'run_diagnostics',
     'quick_test',
 ]
@@ -0,0 +1,120 @@
+"""
+EVPulse Async Database Connection Manager
+=========================================
+Motor (asyncio) counterpart of DatabaseConnectionManager for the ASGI read
+path (see asgi.py / async_api/).
+
+- Same MongoDBConfig and client options as the sync manager
+- Lazy: the client is created on first use inside the running event loop
+  (Motor clients are bound to the loop that first uses them)
+- Fork-safe the same way: a client from another pid is discarded
+- Commands are counted by the sync manager's QueryCommandListener so
+  /api/db/status and /metrics include the async path
+
+Motor is an optional dependency (``pip install motor``).
+"""
+
+import os
+import asyncio
+import logging
+from typing import Optional
+
+from .config import MongoDBConfig, get_database_config
+
+logger = logging.getLogger('evpulse.database.async')
+
+
+class AsyncDatabaseConnectionManager:
+    """Singleton Motor connection manager."""
+
+    _instance: Optional['AsyncDatabaseConnectionManager'] = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self._client = None
+        self._db = None
+        self._config: Optional[MongoDBConfig] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pid: Optional[int] = None
+        self._initialized = True
+
+    @property
+    def is_connected(self) -> bool:
+        return self._client is not None and self._pid == os.getpid()
+
+    def _build_client(self):
+        try:
+            from motor.motor_asyncio import AsyncIOMotorClient
+        except ImportError as e:
+            raise ImportError("motor is required for the async read path: pip install motor") from e
+
+        from .connection import get_database_manager
+
+        self._config = get_database_config()
+        is_valid, errors = self._config.validate()
+        if not is_valid:
+            raise ValueError(f"Invalid database configuration: {'; '.join(errors)}")
+
+        client = AsyncIOMotorClient(
+            self._config.uri,
+            event_listeners=[get_database_manager().command_listener],
+            **self._config.get_connection_options(),
+        )
+        logger.info(f"Motor client created ({self._config})")
+        return client
+
+    async def get_db(self):
+        """
+        Get the Motor database for the running loop, creating the client on
+        first use. Returns None if the client cannot be built.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is not None and (self._pid != os.getpid() or self._loop is not loop):
+            # Inherited across fork or created on another loop: not usable here.
+            if self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._db = None
+
+        if self._db is None:
+            try:
+                self._client = self._build_client()
+            except Exception as e:
+                logger.error(f"Async MongoDB client unavailable: {e}")
+                return None
+            self._db = self._client[self._config.database_name]
+            self._loop = loop
+            self._pid = os.getpid()
+        return self._db
+
+    def close(self) -> None:
+        if self._client is not None and self._pid == os.getpid():
+            self._client.close()
+        self._client = None
+        self._db = None
+        self._loop = None
+
+
+def get_async_database_manager() -> AsyncDatabaseConnectionManager:
+    """Get the singleton async connection manager."""
+    return AsyncDatabaseConnectionManager()
+
+
+async def get_async_db():
+    """
+    Get the Motor database instance.
+    Returns None if the connection is unavailable (caller should check).
+    """
+    return await get_async_database_manager().get_db()
+
+
+def close_async_db() -> None:
+    get_async_database_manager().close()
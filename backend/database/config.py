@@ -30,6 +30,8 @@ class MongoDBConfig:
     min_pool_size: int = 2
     max_pool_size: int = 20
     max_idle_time_ms: int = 30000
+    # Open minPoolSize connections right after (re)connecting, per worker
+    pool_warmup: bool = False
 
     # Timeout Settings (milliseconds)
     server_selection_timeout_ms: int = 30000
@@ -57,6 +59,7 @@ class MongoDBConfig:
             min_pool_size=int(os.getenv('MONGODB_MIN_POOL_SIZE', '2')),
             max_pool_size=int(os.getenv('MONGODB_MAX_POOL_SIZE', '20')),
             max_idle_time_ms=int(os.getenv('MONGODB_MAX_IDLE_TIME_MS', '30000')),
+            pool_warmup=os.getenv('MONGODB_POOL_WARMUP', 'false').strip().lower() in ('1', 'true', 'yes'),
             server_selection_timeout_ms=int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', '30000')),
             connect_timeout_ms=int(os.getenv('MONGODB_CONNECT_TIMEOUT_MS', '20000')),
             socket_timeout_ms=int(os.getenv('MONGODB_SOCKET_TIMEOUT_MS', '30000')),
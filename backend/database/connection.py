@@ -7,15 +7,20 @@ Production-grade MongoDB connection with:
 - certifi CA bundle for Atlas TLS (the #1 cause of connection drops)
 - No conflicting URI/option params
 - Thread-safe singleton
+- Fork-safe: a client inherited from a pre-fork parent is discarded and
+  rebuilt lazily in each worker
 - Clean error messages
 """
 
+import gc
+import os
 import time
 import logging
+import threading
 import atexit
 import certifi
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Callable
 
 from pymongo import MongoClient
 from pymongo.database import Database
@@ -27,6 +32,8 @@ from pymongo.errors import (
 )
 
 from .config import MongoDBConfig, get_database_config
+from .instrumentation import QueryCommandListener, PoolStateListener
+from .latency import LatencySampler, LATENCY_SAMPLER_ENABLED
 
 logger = logging.getLogger('evpulse.database')
 
@@ -37,8 +44,8 @@ class DatabaseConnectionManager:
     
     Design principles:
     - PyMongo already handles connection pooling, retries, and reconnection.
-      We do NOT add custom health-check threads or reconnection loops — that
-      fights the driver and causes race conditions.
+      We do NOT add custom reconnection loops — that fights the driver and
+      causes race conditions. (The health refresher in health.py only observes.)
     - Connection is lazy: calling get_db() will connect if needed.
     - certifi CA bundle is always used for TLS (fixes 90% of Atlas issues).
     - URI parameters are NOT duplicated in client options.
@@ -60,10 +67,22 @@ class DatabaseConnectionManager:
         self._db: Optional[Database] = None
         self._config: Optional[MongoDBConfig] = None
         self._connected_at: Optional[datetime] = None
+        self._pid: Optional[int] = None
         self._stats = {
             'connections_made': 0,
             'connection_failures': 0,
+            'queries_executed': 0,
+            'queries_failed': 0,
+            'forks_detected': 0,
+            'last_connect_ms': None,
+            'pool_warmup_ms': None,
         }
+        self._stats_lock = threading.Lock()
+        self._command_listener = QueryCommandListener(on_command=self._record_command)
+        self._pool_listener = PoolStateListener()
+        self._command_observers: List[Callable[[str, Optional[str], float, bool], None]] = []
+        self._event_listeners: List[Any] = []
+        self._latency_sampler = LatencySampler(self)
 
         atexit.register(self._cleanup)
         self._initialized = True
@@ -75,6 +94,7 @@ class DatabaseConnectionManager:
     @property
     def is_connected(self) -> bool:
         """Check if we have an active client. Does NOT ping — that's expensive."""
+        self._detect_fork()
         return self._client is not None and self._db is not None
 
     @property
@@ -87,6 +107,7 @@ class DatabaseConnectionManager:
         Get the database. If not connected, attempt to connect automatically.
         Returns None on failure (so callers can do a simple `if db is None` check).
         """
+        self._detect_fork()
         if self._db is None:
             try:
                 self.connect()
@@ -97,6 +118,7 @@ class DatabaseConnectionManager:
 
     @property
     def client(self) -> Optional[MongoClient]:
+        self._detect_fork()
         if self._client is None:
             try:
                 self.connect()
@@ -104,6 +126,11 @@ class DatabaseConnectionManager:
                 return None
         return self._client
 
+    @property
+    def command_listener(self) -> QueryCommandListener:
+        """Listener that feeds query stats; attach it to other clients (e.g. Motor) to count their commands too."""
+        return self._command_listener
+
     @property
     def stats(self) -> Dict[str, Any]:
         uptime = 0
@@ -116,6 +143,85 @@ class DatabaseConnectionManager:
             'uptime_seconds': uptime,
         }
 
+    # ------------------------------------------------------------------
+    # Fork safety
+    # ------------------------------------------------------------------
+
+    def _detect_fork(self) -> None:
+        """
+        Drop a client created in another process (e.g. a preloading gunicorn
+        master). MongoClient is not fork-safe; the next db/client access
+        builds a fresh one for this process. Runs even when the master closed
+        its client in prepare_for_fork, since the listeners and the latency
+        sampler were still inherited.
+        """
+        if self._pid is None or self._pid == os.getpid():
+            return
+
+        logger.info(f"Fork detected (pid {self._pid} -> {os.getpid()}); rebuilding MongoDB client for this worker")
+        # Do not close() the inherited client: its sockets and monitor
+        # threads belong to the parent. Locks may have been held at fork
+        # time, so listener, sampler and stats state is recreated rather than reset.
+        self._client = None
+        self._db = None
+        self._connected_at = None
+        self._pid = os.getpid()
+        self._stats_lock = threading.Lock()
+        self._command_listener = QueryCommandListener(on_command=self._record_command)
+        self._pool_listener = PoolStateListener()
+        self._latency_sampler.reset_after_fork()
+        self._stats['forks_detected'] += 1
+
+    def prepare_for_fork(self, freeze_gc: bool = True) -> None:
+        """
+        Call in a preloading parent right before workers are forked.
+        Closes the parent's client so no sockets are shared with children,
+        and optionally moves every surviving object into the GC's permanent
+        generation (gc.freeze) so collections in the workers do not touch
+        those pages and copy-on-write memory stays shared.
+        """
+        self.disconnect()
+        if freeze_gc:
+            gc.collect()
+            gc.freeze()
+            logger.info(f"gc.freeze(): {gc.get_freeze_count()} objects moved to the permanent generation")
+
+    def warm_up_pool(self, connections: Optional[int] = None, timeout: float = 5.0) -> int:
+        """
+        Open up to ``connections`` (default minPoolSize) pooled connections so
+        the first requests in this process do not pay TCP/TLS/auth setup.
+        Returns the number of open connections when done.
+        """
+        if not self.is_connected:
+            return 0
+        target = connections if connections is not None else self._config.min_pool_size
+        if target <= 0:
+            return 0
+
+        started = time.perf_counter()
+        # Concurrent pings check out distinct connections; PyMongo's own
+        # minPoolSize maintenance fills any remainder in the background.
+        workers = [threading.Thread(target=self._warm_up_ping, daemon=True) for _ in range(target)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout)
+
+        deadline = started + timeout
+        while self.pool_state()['open_connections'] < target and time.perf_counter() < deadline:
+            time.sleep(0.05)
+
+        opened = self.pool_state()['open_connections']
+        self._stats['pool_warmup_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        logger.info(f"Pool warm-up: {opened}/{target} connection(s) open in {self._stats['pool_warmup_ms']}ms")
+        return opened
+
+    def _warm_up_ping(self) -> None:
+        try:
+            self._client.admin.command('ping')
+        except Exception as e:
+            logger.debug(f"Warm-up ping failed: {e}")
+
     # ------------------------------------------------------------------
     # Core methods
     # ------------------------------------------------------------------
@@ -129,6 +235,8 @@ class DatabaseConnectionManager:
         if self.is_connected and config is None:
             return True
 
+        started = time.perf_counter()
+
         self._config = config or get_database_config()
 
         is_valid, errors = self._config.validate()
@@ -152,16 +260,26 @@ class DatabaseConnectionManager:
             # Build client options — ONLY options that are NOT in the URI
             options = self._config.get_connection_options()
 
-            self._client = MongoClient(self._config.uri, **options)
+            self._client = MongoClient(
+                self._config.uri,
+                event_listeners=[self._command_listener, self._pool_listener, *self._event_listeners],
+                **options,
+            )
 
             # Verify connectivity with a ping
             self._client.admin.command('ping')
 
             self._db = self._client[self._config.database_name]
             self._connected_at = datetime.now(timezone.utc)
+            self._pid = os.getpid()
             self._stats['connections_made'] += 1
+            self._stats['last_connect_ms'] = round((time.perf_counter() - started) * 1000, 2)
 
             logger.info(f"Connected to MongoDB database: {self._config.database_name}")
+            if self._config.pool_warmup:
+                self.warm_up_pool()
+            if LATENCY_SAMPLER_ENABLED:
+                self._latency_sampler.start()
             return True
 
         except ServerSelectionTimeoutError as e:
@@ -204,6 +322,8 @@ class DatabaseConnectionManager:
 
     def disconnect(self) -> None:
         """Gracefully close the connection."""
+        self._detect_fork()
+        self._latency_sampler.stop()
         if self._client:
             try:
                 self._client.close()
@@ -238,6 +358,57 @@ class DatabaseConnectionManager:
 
         return result
 
+    def pool_state(self) -> Dict[str, Any]:
+        """Connection pool occupancy from pool events. Never touches the network."""
+        servers = self._pool_listener.snapshot()
+        max_pool_size = self._config.max_pool_size if self._config else None
+        checked_out = sum(pool['checked_out'] for pool in servers.values())
+        busiest = max((pool['checked_out'] for pool in servers.values()), default=0)
+        return {
+            'max_pool_size': max_pool_size,
+            'min_pool_size': self._config.min_pool_size if self._config else None,
+            'open_connections': sum(pool['open'] for pool in servers.values()),
+            'checked_out': checked_out,
+            'utilisation': round(busiest / max_pool_size, 3) if max_pool_size else None,
+            'servers': servers,
+        }
+
+    def latency_stats(self) -> Dict[str, Any]:
+        """Recent ping/read/write latency percentiles from the background sampler."""
+        return self._latency_sampler.summary()
+
+    def add_latency_observer(self, observer: Callable[[Dict[str, Any]], None]) -> None:
+        """Call observer(latency_stats) after every background sampling round."""
+        self._latency_sampler.add_observer(observer)
+
+    def add_event_listener(self, listener: Any) -> None:
+        """
+        Register an extra PyMongo event listener (e.g. a ConnectionPoolListener).
+        PyMongo only accepts listeners at client construction, so this must run
+        before connect(); a client that already exists picks it up on reconnect.
+        """
+        if listener in self._event_listeners:
+            return
+        self._event_listeners.append(listener)
+        if self._client is not None:
+            logger.warning(f"{type(listener).__name__} registered after connect; it applies from the next connection")
+
+    def add_command_observer(self, observer: Callable[[str, Optional[str], float, bool], None]) -> None:
+        """Call observer(command_name, collection, duration_ms, failed) for every completed command."""
+        if observer not in self._command_observers:
+            self._command_observers.append(observer)
+
+    def _record_command(self, command_name: str, collection: Optional[str], duration_ms: float, failed: bool) -> None:
+        with self._stats_lock:
+            self._stats['queries_executed'] += 1
+            if failed:
+                self._stats['queries_failed'] += 1
+        for observer in self._command_observers:
+            try:
+                observer(command_name, collection, duration_ms, failed)
+            except Exception as e:
+                logger.debug(f"Command observer failed: {e}")
+
     def get_collection(self, name: str) -> Optional[Collection]:
         """Get a collection. Returns None if DB is not available."""
         db = self.db
@@ -306,6 +477,11 @@ def close_db() -> None:
     get_database_manager().disconnect()
 
 
+def prepare_for_fork(freeze_gc: bool = True) -> None:
+    """Release the parent's client (and gc.freeze()) before forking workers."""
+    get_database_manager().prepare_for_fork(freeze_gc)
+
+
 # Keep backward-compatible name
 ConnectionState = type('ConnectionState', (), {
     'CONNECTED': 'connected',
@@ -0,0 +1,118 @@
+"""
+EVPulse Query Deadlines
+=======================
+Per-route deadline classes for MongoDB operations.
+
+Each request runs inside ``pymongo.timeout(seconds)`` for its class. PyMongo
+then sends the remaining budget as ``maxTimeMS`` on every find, aggregate
+and count, so the server abandons slow queries. Waits for pool checkout and
+socket reads are also bounded, instead of running until socketTimeoutMS.
+When the budget runs out the operation raises a PyMongo error with
+``timeout`` set, which classify_pymongo_error maps to QueryTimeoutError.
+
+Classes (milliseconds, overridable with QUERY_DEADLINE_<CLASS>_MS):
+- fast:     hot point reads and small lists        (1500)
+- standard: default for every other route          (5000)
+- report:   dashboards and diagnostics             (20000)
+
+A view picks its class with ``@query_deadline('report')``;
+``@query_deadline(None)`` disables the deadline (streamed exports, where the
+budget would otherwise cover the whole download).
+
+The deadline is a contextvar (PyMongo's, plus ours recording the class for
+error reports): QueryGroup copies both to fan-out threads, so a
+dashboard's parallel queries share the request's budget.
+"""
+
+import os
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Tuple
+
+import pymongo
+
+logger = logging.getLogger('evpulse.database.deadlines')
+
+QUERY_DEADLINES_ENABLED = os.getenv('QUERY_DEADLINES', 'true').strip().lower() in ('1', 'true', 'yes')
+
+DEADLINE_CLASSES = {
+    'fast': int(os.getenv('QUERY_DEADLINE_FAST_MS', '1500')),
+    'standard': int(os.getenv('QUERY_DEADLINE_STANDARD_MS', '5000')),
+    'report': int(os.getenv('QUERY_DEADLINE_REPORT_MS', '20000')),
+}
+DEFAULT_DEADLINE_CLASS = 'standard'
+
+_UNSET = object()
+
+# (class, budget ms) of the pymongo.timeout() scope entered for this request
+_active_deadline: ContextVar[Optional[Tuple[Optional[str], int]]] = ContextVar('evpulse_query_deadline', default=None)
+
+
+def query_deadline(name: Optional[str]):
+    """Set the deadline class of a single view (None: no deadline)."""
+    if name is not None and name not in DEADLINE_CLASSES:
+        raise ValueError(f"Unknown query deadline class {name!r}")
+
+    def decorator(fn):
+        fn.db_query_deadline = name
+        return fn
+    return decorator
+
+
+def current_deadline() -> Optional[Tuple[Optional[str], Optional[int]]]:
+    """(class, budget ms) of the deadline active in this context, if any."""
+    return _active_deadline.get()
+
+
+@contextmanager
+def deadline_scope(name: Optional[str]):
+    """Run a block of work outside a request (e.g. a cache refresh) under a deadline class."""
+    if name is None or not QUERY_DEADLINES_ENABLED:
+        yield
+        return
+    token = _active_deadline.set((name, DEADLINE_CLASSES[name]))
+    try:
+        with pymongo.timeout(DEADLINE_CLASSES[name] / 1000.0):
+            yield
+    finally:
+        _active_deadline.reset(token)
+
+
+def _deadline_for(app, endpoint: Optional[str]) -> Optional[str]:
+    view = app.view_functions.get(endpoint) if endpoint else None
+    name = getattr(view, 'db_query_deadline', _UNSET)
+    if name is _UNSET:
+        name = app.config.get('DB_DEADLINE_CLASS', DEFAULT_DEADLINE_CLASS)
+    return name
+
+
+def init_query_deadlines(app) -> None:
+    """Run every request inside pymongo.timeout() for its deadline class."""
+    from flask import g, request
+
+    app.config.setdefault('DB_DEADLINE_CLASS', DEFAULT_DEADLINE_CLASS)
+    if not QUERY_DEADLINES_ENABLED:
+        logger.info("Query deadlines disabled (QUERY_DEADLINES=false)")
+        return
+
+    @app.before_request
+    def _enter_deadline():
+        name = _deadline_for(app, request.endpoint)
+        if name is None or request.method == 'OPTIONS':
+            return
+        scope = pymongo.timeout(DEADLINE_CLASSES[name] / 1000.0)
+        scope.__enter__()
+        g.db_deadline_scope = scope
+        g.db_deadline_token = _active_deadline.set((name, DEADLINE_CLASSES[name]))
+
+    @app.teardown_request
+    def _exit_deadline(exc):
+        scope = g.pop('db_deadline_scope', None)
+        if scope is not None:
+            try:
+                _active_deadline.reset(g.pop('db_deadline_token'))
+                scope.__exit__(None, None, None)
+            except ValueError:
+                # Token created in another context (should not happen under WSGI)
+                logger.debug("Query deadline scope exited from a different context")
@@ -5,11 +5,14 @@ Comprehensive diagnostic tools for debugging MongoDB connection issues.
 Provides detailed logging, connection testing, and troubleshooting information.
 """
 
+import os
 import sys
 import socket
 import time
 import platform
 import ssl
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
 from typing import Dict, Any, List, Optional, Tuple
 import logging
@@ -21,6 +24,25 @@ logging.basicConfig(
 )
 logger = logging.getLogger('evpulse.database.diagnostics')
 
+# (probe method, display name, timeout in seconds). Every probe is
+# independent: the connection probes each open their own MongoClient.
+PROBES: List[Tuple[str, str, float]] = [
+    ("_test_environment", "Environment Check", 5),
+    ("_test_uri_parsing", "URI Parsing", 5),
+    ("_test_dns_resolution", "DNS Resolution", 10),
+    ("_test_network_connectivity", "Network Connectivity", 15),
+    ("_test_ssl_support", "SSL/TLS Support", 5),
+    ("_test_pymongo_import", "PyMongo Import", 5),
+    ("_test_basic_connection", "Basic Connection", 15),
+    ("_test_connection_with_tls_options", "TLS Connection Options", 15),
+    ("_test_database_access", "Database Access", 15),
+    ("_test_collection_operations", "Collection Operations", 20),
+]
+
+DIAGNOSTICS_MAX_WORKERS = int(os.getenv('DIAGNOSTICS_MAX_WORKERS', str(len(PROBES))))
+# Cached results older than this are refreshed in the background on the next request.
+DIAGNOSTICS_MAX_AGE = float(os.getenv('DIAGNOSTICS_MAX_AGE', '300'))
+
 
 class DiagnosticResult:
     """Container for diagnostic test results"""
@@ -87,6 +109,64 @@ class DatabaseDiagnostics:
         
         # Generate summary
         return self._generate_summary()
+
+    def run_parallel(self, max_workers: int = DIAGNOSTICS_MAX_WORKERS) -> Dict[str, Any]:
+        """
+        Run all diagnostic probes concurrently, each bounded by its own timeout.
+
+        A probe's clock starts when a worker picks it up, so probes queued
+        behind hung ones (``max_workers`` below the number of probes) still
+        get their full timeout. A probe that overruns is reported as failed;
+        its thread is abandoned and finishes on its own (the driver timeouts
+        bound it). One that waits longer than the longest probe timeout for a
+        worker is reported as not run.
+        """
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='evpulse-diag')
+        queue_timeout = max(timeout for _, _, timeout in PROBES)
+        try:
+            submitted = []
+            for method, name, timeout in PROBES:
+                # Each probe writes into its own instance so an abandoned
+                # probe cannot append to this run's results later.
+                probe = DatabaseDiagnostics(self.uri, self.database_name)
+                clock = {'started': threading.Event(), 'started_at': None}
+                submitted.append((name, timeout, clock, executor.submit(self._timed_probe, getattr(probe, method), clock)))
+
+            results = []
+            for name, timeout, clock, future in submitted:
+                try:
+                    if not clock['started'].wait(queue_timeout):
+                        future.cancel()
+                        raise FutureTimeoutError()
+                    remaining = timeout - (time.time() - clock['started_at'])
+                    results.append(future.result(timeout=max(remaining, 0)))
+                except FutureTimeoutError:
+                    future.cancel()
+                    result = DiagnosticResult(name)
+                    result.error = "Timeout"
+                    if clock['started'].is_set():
+                        result.message = f"Probe timed out after {timeout:g}s"
+                        result.duration_ms = timeout * 1000
+                    else:
+                        result.message = "Probe did not start: all diagnostic workers were busy"
+                    result.suggestions.append("Check network/firewall settings")
+                    results.append(result)
+                except Exception as e:
+                    result = DiagnosticResult(name)
+                    result.error = str(e)
+                    result.message = f"Probe failed: {e}"
+                    results.append(result)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        self.results = results
+        return self._generate_summary()
+    
+    @staticmethod
+    def _timed_probe(probe, clock: Dict[str, Any]) -> DiagnosticResult:
+        clock['started_at'] = time.time()
+        clock['started'].set()
+        return probe()
     
     def _test_environment(self) -> DiagnosticResult:
         """Test Python environment and dependencies"""
@@ -652,13 +732,14 @@ class DatabaseDiagnostics:
         return re.sub(pattern, r'\1****\3', uri)
 
 
-def run_diagnostics(uri: Optional[str] = None, database_name: str = "evpulse") -> Dict[str, Any]:
+def run_diagnostics(uri: Optional[str] = None, database_name: str = "evpulse", parallel: bool = False) -> Dict[str, Any]:
     """
     Run full database diagnostics.
     
     Args:
         uri: MongoDB connection URI. If not provided, reads from environment.
         database_name: Target database name.
+        parallel: Run the probes concurrently with per-probe timeouts.
     
     Returns:
         Dictionary with diagnostic results.
@@ -678,9 +759,95 @@ def run_diagnostics(uri: Optional[str] = None, database_name: str = "evpulse") -
         return {"error": "No MongoDB URI provided"}
     
     diagnostics = DatabaseDiagnostics(uri, database_name)
+    if parallel:
+        return diagnostics.run_parallel()
     return diagnostics.run_all_diagnostics()
 
 
+class DiagnosticsJob:
+    """
+    Runs diagnostics on a background thread and keeps the last result.
+
+    At most one run is in flight; submitting while one is running is a no-op.
+    """
+
+    def __init__(self, max_age: float = DIAGNOSTICS_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._result: Optional[Dict[str, Any]] = None
+        self._started_at: Optional[datetime] = None
+        self._finished_at: Optional[datetime] = None
+        self._error: Optional[str] = None
+        self._runs = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, uri: Optional[str] = None, database_name: str = "evpulse") -> bool:
+        """Start a run unless one is already in progress. Returns True if a run was started."""
+        with self._lock:
+            if self.running:
+                return False
+            self._started_at = datetime.now()
+            self._error = None
+            self._thread = threading.Thread(
+                target=self._run, args=(uri, database_name), name='evpulse-diagnostics', daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _run(self, uri: Optional[str], database_name: str) -> None:
+        try:
+            result = run_diagnostics(uri, database_name, parallel=True)
+            error = result.get("error")
+        except Exception as e:
+            logger.error(f"Diagnostics run failed: {e}")
+            result, error = None, str(e)
+        with self._lock:
+            if result is not None and not error:
+                self._result = result
+            self._error = error
+            self._finished_at = datetime.now()
+            self._runs += 1
+
+    def is_stale(self) -> bool:
+        if self._finished_at is None or self._result is None:
+            return True
+        return (datetime.now() - self._finished_at).total_seconds() > self.max_age
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": "running" if self.running else "idle",
+                "started_at": self._started_at.isoformat() if self._started_at else None,
+                "finished_at": self._finished_at.isoformat() if self._finished_at else None,
+                "runs": self._runs,
+                "last_error": self._error,
+                "max_age_seconds": self.max_age,
+            }
+
+    @property
+    def result(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._result
+
+
+_diagnostics_job: Optional[DiagnosticsJob] = None
+_diagnostics_job_lock = threading.Lock()
+
+
+def get_diagnostics_job() -> DiagnosticsJob:
+    """Get the process-wide background diagnostics job."""
+    global _diagnostics_job
+    if _diagnostics_job is None:
+        with _diagnostics_job_lock:
+            if _diagnostics_job is None:
+                _diagnostics_job = DiagnosticsJob()
+    return _diagnostics_job
+
+
 def quick_test(uri: Optional[str] = None) -> bool:
     """
     Quick connection test - returns True if connection works.
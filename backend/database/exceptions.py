@@ -9,6 +9,9 @@ from typing import Optional, Any, Dict
 
 class DatabaseException(Exception):
     """Base exception for all database-related errors"""
+
+    # Status used when the error is turned into an API response
+    http_status = 500
     
     def __init__(
         self, 
@@ -39,6 +42,8 @@ class DatabaseException(Exception):
 
 class ConnectionError(DatabaseException):
     """Raised when unable to establish database connection"""
+
+    http_status = 503
     
     def __init__(
         self, 
@@ -75,6 +80,8 @@ class ConnectionPoolExhaustedError(DatabaseException):
 
 class ConnectionTimeoutError(DatabaseException):
     """Raised when connection times out"""
+
+    http_status = 503
     
     def __init__(
         self, 
@@ -122,6 +129,8 @@ class SSLError(DatabaseException):
 
 class ServerSelectionError(DatabaseException):
     """Raised when no suitable server is found"""
+
+    http_status = 503
     
     def __init__(
         self, 
@@ -177,6 +186,53 @@ class QueryError(DatabaseException):
         )
 
 
+class QueryTimeoutError(DatabaseException):
+    """Raised when an operation exceeds its deadline (maxTimeMS / pymongo.timeout)"""
+
+    http_status = 504
+
+    def __init__(
+        self,
+        message: str = "Database query exceeded its deadline",
+        timeout_ms: Optional[int] = None,
+        deadline_class: Optional[str] = None,
+        original_error: Optional[Exception] = None
+    ):
+        super().__init__(
+            message=message,
+            error_code="DB_QUERY_TIMEOUT",
+            original_error=original_error,
+            details={
+                "timeout_ms": timeout_ms,
+                "deadline_class": deadline_class
+            }
+        )
+
+
+class PartialResultError(DatabaseException):
+    """Raised when some of a response's independent queries failed; carries what did succeed"""
+
+    http_status = 503
+
+    def __init__(
+        self,
+        partial: Any = None,
+        missing: Optional[list] = None,
+        errors: Optional[list] = None
+    ):
+        errors = errors or []
+        first = errors[0] if errors else None
+        super().__init__(
+            message=f"Partial result: {', '.join(missing or []) or 'some sections'} unavailable",
+            error_code="DB_PARTIAL_RESULT",
+            original_error=first,
+            details={"missing": missing or []}
+        )
+        self.partial = partial
+        self.missing = missing or []
+        self.errors = errors
+
+
 class WriteError(DatabaseException):
     """Raised when a write operation fails"""
     
@@ -281,6 +337,29 @@ class RetryExhaustedError(DatabaseException):
         )
 
 
+class QueryBudgetExceededError(DatabaseException):
+    """Raised (in strict/testing mode) when a request issues more commands than its query budget"""
+
+    def __init__(
+        self,
+        message: str = "Request exceeded its database query budget",
+        endpoint: Optional[str] = None,
+        query_count: int = 0,
+        budget: int = 0,
+        collections: Optional[Dict[str, int]] = None
+    ):
+        super().__init__(
+            message=f"{message}: {endpoint} issued {query_count} queries (budget {budget})",
+            error_code="DB_QUERY_BUDGET_EXCEEDED",
+            details={
+                "endpoint": endpoint,
+                "query_count": query_count,
+                "budget": budget,
+                "collections": collections or {}
+            }
+        )
+
+
 def classify_pymongo_error(error: Exception) -> DatabaseException:
     """
     Classify a PyMongo exception into our custom exception hierarchy.
@@ -294,9 +373,30 @@ def classify_pymongo_error(error: Exception) -> DatabaseException:
         WriteError as PyMongoWriteError,
         NetworkTimeout,
         AutoReconnect,
+        ExecutionTimeout,
     )
     
     error_str = str(error).lower()
+
+    if isinstance(error, DatabaseException):
+        return error
+
+    # Deadline exceeded: maxTimeMS on the server (ExecutionTimeout), the
+    # client-side pymongo.timeout() budget ran out while waiting on the
+    # socket or pool, or a QueryGroup wait timed out. Checked first:
+    # NetworkTimeout is also an AutoReconnect.
+    if not isinstance(error, PyMongoServerSelectionError) and (
+        isinstance(error, (ExecutionTimeout, TimeoutError)) or getattr(error, 'timeout', False)
+    ):
+        from .deadlines import current_deadline
+
+        deadline = current_deadline()
+        return QueryTimeoutError(
+            message="Database query exceeded its deadline",
+            timeout_ms=deadline[1] if deadline else None,
+            deadline_class=deadline[0] if deadline else None,
+            original_error=error
+        )
     
     # Server selection timeout
     if isinstance(error, PyMongoServerSelectionError):
@@ -0,0 +1,173 @@
+"""
+EVPulse Query Fan-out
+=====================
+Run independent MongoDB queries of one request concurrently.
+
+Dashboard handlers issue many queries that do not depend on each other;
+run in sequence their latencies add up. A QueryGroup submits them to a
+small, process-wide thread pool that shares the manager's MongoClient
+(PyMongo clients are thread-safe and pool their own connections), then
+waits for all of them, so the handler takes roughly as long as its
+slowest query:
+
+    with QueryGroup() as queries:
+        users = queries.submit(db.users.count_documents, {'role': 'user'})
+        stations = queries.submit(db.stations.count_documents, {})
+    total_users, total_stations = users.result(), stations.result()
+
+- DB_FANOUT_WORKERS bounds the pool (default: min(8, MONGODB_MAX_POOL_SIZE));
+  0 runs every query inline on the calling thread
+- Commands run on pool threads are still counted against the submitting
+  request (Server-Timing, query budget) and share its query deadline
+  (contextvars are copied, see deadlines.py)
+- ``QueryGroup(tolerate_errors=True)`` waits for every query even when some
+  fail; ``value(future, default)`` then substitutes a default for failures
+  so a handler can build a partial response
+- A group submitted from a pool thread runs inline, so nested groups can
+  never deadlock waiting on the pool they occupy
+- The pool is recreated after fork (threads do not survive it)
+"""
+
+import os
+import logging
+import threading
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, wait, ALL_COMPLETED, FIRST_EXCEPTION
+from typing import Any, Callable, List, Optional
+
+from .config import get_database_config
+from .instrumentation import _current_request_stats, attribute_queries
+
+logger = logging.getLogger('evpulse.database.fanout')
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+_worker = threading.local()
+
+
+def fanout_workers() -> int:
+    configured = os.getenv('DB_FANOUT_WORKERS')
+    if configured is not None and configured.strip() != '':
+        return max(int(configured), 0)
+    return min(8, get_database_config().max_pool_size)
+
+
+def _mark_worker() -> None:
+    _worker.active = True
+
+
+def _get_executor() -> Optional[ThreadPoolExecutor]:
+    global _executor, _executor_pid
+
+    if getattr(_worker, 'active', False):
+        return None
+    pid = os.getpid()
+    if _executor is not None and _executor_pid == pid:
+        return _executor
+
+    with _executor_lock:
+        if _executor is None or _executor_pid != pid:
+            workers = fanout_workers()
+            if workers == 0:
+                return None
+            # An executor inherited across fork has no threads; drop it without shutdown.
+            _executor = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix='evpulse-fanout',
+                initializer=_mark_worker,
+            )
+            _executor_pid = pid
+        return _executor
+
+
+def shutdown_fanout(wait_for_pending: bool = False) -> None:
+    """Stop the pool threads of this process (used on shutdown and in tests)."""
+    global _executor, _executor_pid
+
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=wait_for_pending, cancel_futures=True)
+        _executor = None
+        _executor_pid = None
+
+
+class QueryGroup:
+    """A set of independent queries submitted together and awaited together."""
+
+    def __init__(self, timeout: Optional[float] = None, tolerate_errors: bool = False):
+        self._timeout = timeout
+        self._tolerate_errors = tolerate_errors
+        self._futures: List[Future] = []
+        self._stats = _current_request_stats()
+        self.errors: List[Exception] = []
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Schedule ``fn(*args, **kwargs)``; returns its Future."""
+        executor = _get_executor()
+        if executor is None:
+            future: Future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            context = contextvars.copy_context()
+            future = executor.submit(context.run, self._run, fn, args, kwargs)
+        self._futures.append(future)
+        return future
+
+    def _run(self, fn, args, kwargs):
+        with attribute_queries(self._stats):
+            return fn(*args, **kwargs)
+
+    def wait(self) -> None:
+        """
+        Wait for every submitted query. Re-raises the first failure (after
+        cancelling queries that have not started) or TimeoutError. With
+        tolerate_errors, failures are collected in ``errors`` instead.
+        """
+        if not self._futures:
+            return
+        if self._tolerate_errors:
+            done, pending = wait(self._futures, timeout=self._timeout, return_when=ALL_COMPLETED)
+            for other in pending:
+                other.cancel()
+            self.errors = [f.exception() for f in done if f.exception() is not None]
+            if pending:
+                self.errors.append(TimeoutError(f"{len(pending)} queries did not finish in {self._timeout}s"))
+            return
+        done, pending = wait(self._futures, timeout=self._timeout, return_when=FIRST_EXCEPTION)
+        for future in done:
+            if future.exception() is not None:
+                for other in pending:
+                    other.cancel()
+                raise future.exception()
+        if pending:
+            for other in pending:
+                other.cancel()
+            raise TimeoutError(f"{len(pending)} of {len(self._futures)} queries did not finish in {self._timeout}s")
+
+    def value(self, future: Future, default: Any = None) -> Any:
+        """Result of ``future``, or ``default`` if it failed or never ran."""
+        if future.cancelled() or not future.done() or future.exception() is not None:
+            return default
+        return future.result()
+
+    def __enter__(self) -> 'QueryGroup':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            self.wait()
+        else:
+            for future in self._futures:
+                future.cancel()
+        return False
+
+
+def gather(*calls: Callable[[], Any], timeout: Optional[float] = None) -> List[Any]:
+    """Run zero-argument callables concurrently and return their results in order."""
+    with QueryGroup(timeout=timeout) as queries:
+        futures = [queries.submit(call) for call in calls]
+    return [future.result() for future in futures]
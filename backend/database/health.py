@@ -0,0 +1,141 @@
+"""
+EVPulse Health Monitor
+======================
+Background-refreshed database health snapshot for readiness probes.
+
+Load balancers poll health every few seconds per instance, so probes must
+not issue queries of their own. A daemon thread refreshes one snapshot
+(ping latency, pool state, estimated document counts from collection
+metadata) every HEALTH_CHECK_INTERVAL seconds; request handlers only read
+the cached copy.
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger('evpulse.database.health')
+
+HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', '10'))
+# A snapshot older than this many intervals means the refresher is stuck.
+STALE_AFTER_INTERVALS = 3
+
+HEALTH_COLLECTIONS = ('users', 'stations', 'sessions', 'bookings', 'transactions')
+
+
+class HealthMonitor:
+    """
+    Owns the refresher thread and the latest snapshot.
+
+    The thread starts lazily on first read and is restarted when the process
+    id changes, so it also runs in every forked gunicorn worker.
+    """
+
+    def __init__(self, manager, interval: float = HEALTH_CHECK_INTERVAL):
+        self._manager = manager
+        self._interval = max(interval, 1.0)
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stop = threading.Event()
+
+    @property
+    def interval(self) -> float:
+        return self._interval
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), name='evpulse-health', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self, stop: threading.Event) -> None:
+        while not stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f"Health refresh failed: {e}")
+            stop.wait(self._interval)
+
+    def refresh(self) -> Dict[str, Any]:
+        """Collect a new snapshot. Runs on the refresher thread."""
+        started = time.perf_counter()
+        snapshot: Dict[str, Any] = {
+            'healthy': False,
+            'state': self._manager.state,
+            'latency_ms': None,
+            'pool': None,
+            'collections': {},
+            'error': None,
+        }
+
+        # Reconnect attempts happen here, never on a request thread.
+        db = self._manager.db
+        if db is not None:
+            ping = self._manager.health_check()
+            snapshot['healthy'] = ping['healthy']
+            snapshot['latency_ms'] = ping['latency_ms']
+            snapshot['error'] = ping['error']
+            if ping['healthy']:
+                for name in HEALTH_COLLECTIONS:
+                    try:
+                        # Reads collection metadata; no documents are scanned.
+                        snapshot['collections'][name] = db[name].estimated_document_count()
+                    except Exception as e:
+                        snapshot['collections'][name] = None
+                        logger.debug(f"estimated_document_count({name}) failed: {e}")
+        else:
+            snapshot['error'] = 'No active connection'
+
+        snapshot['state'] = self._manager.state
+        snapshot['pool'] = self._manager.pool_state()
+        snapshot['refresh_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        snapshot['refreshed_at'] = datetime.now(timezone.utc)
+
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        """Latest snapshot with its age, or None before the first refresh completes."""
+        self.start()
+        with self._lock:
+            snapshot = self._snapshot
+        if snapshot is None:
+            return None
+        age = (datetime.now(timezone.utc) - snapshot['refreshed_at']).total_seconds()
+        return {
+            **snapshot,
+            'refreshed_at': snapshot['refreshed_at'].isoformat(),
+            'age_seconds': round(age, 2),
+            'stale': age > self._interval * STALE_AFTER_INTERVALS,
+        }
+
+    def is_ready(self) -> bool:
+        snapshot = self.snapshot()
+        return bool(snapshot and snapshot['healthy'] and not snapshot['stale'])
+
+
+_monitor: Optional[HealthMonitor] = None
+_monitor_lock = threading.Lock()
+
+
+def get_health_monitor() -> HealthMonitor:
+    """Get the process-wide health monitor (created on first use)."""
+    global _monitor
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                from .connection import get_database_manager
+                _monitor = HealthMonitor(get_database_manager())
+    return _monitor
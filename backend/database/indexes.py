@@ -0,0 +1,87 @@
+"""
+EVPulse Indexes
+===============
+Compound indexes for the station scope (``station_id``, ``operator_id``,
+``city``) stamped on sessions, bookings and charging transactions (see
+``Station.scope_fields``). Operator listings and city revenue read through
+them instead of walking stations -> sessions -> transactions.
+
+``transactions.user_timestamp`` serves the per-user spending aggregates
+(``utils/spending.py``): wallet balance, summary and ranged analytics.
+
+``stations.updated_at`` serves the station suggest index's delta refresh
+(``utils/station_suggest.py``). ``updated_at_created_at`` on sessions,
+transactions, bookings and reviews serves the incremental analytics export
+(``scripts/export_analytics.py``): ``updated_at`` past the watermark, or no
+``updated_at`` and ``created_at`` past it. Every write to those collections
+sets ``updated_at``.
+
+The ``users`` key indexes back the admin typeahead (``/api/users/search``):
+anchored prefixes of the lowercase ``name_keys`` / ``email_keys`` are range
+scans (``User.search_fields``).
+
+The ``reviews`` indexes serve per-station review lists and the recent
+review count on the admin feedback stats.
+
+``idempotency_keys.expires_at_ttl`` expires stored responses
+(``utils/idempotency.py``).
+
+``ensure_indexes`` is idempotent (createIndexes is a no-op for an existing
+identical index); it runs when the app connects and from
+``scripts/backfill_station_scope.py``.
+"""
+
+import logging
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger('evpulse.database.indexes')
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    'sessions': [
+        IndexModel([('operator_id', ASCENDING), ('start_time', DESCENDING)], name='operator_start_time'),
+        IndexModel([('station_id', ASCENDING), ('start_time', DESCENDING)], name='station_start_time'),
+        IndexModel([('updated_at', ASCENDING), ('created_at', ASCENDING)], name='updated_at_created_at'),
+    ],
+    'bookings': [
+        IndexModel([('operator_id', ASCENDING), ('created_at', DESCENDING)], name='operator_created_at'),
+        IndexModel([('updated_at', ASCENDING), ('created_at', ASCENDING)], name='updated_at_created_at'),
+    ],
+    'transactions': [
+        IndexModel([('operator_id', ASCENDING), ('timestamp', DESCENDING)], name='operator_timestamp'),
+        IndexModel(
+            [('type', ASCENDING), ('status', ASCENDING), ('timestamp', DESCENDING)],
+            name='type_status_timestamp'
+        ),
+        IndexModel([('user_id', ASCENDING), ('timestamp', DESCENDING)], name='user_timestamp'),
+        IndexModel([('updated_at', ASCENDING), ('created_at', ASCENDING)], name='updated_at_created_at'),
+    ],
+    'stations': [
+        IndexModel([('updated_at', DESCENDING)], name='updated_at'),
+    ],
+    'users': [
+        IndexModel([('name_keys', ASCENDING)], name='name_keys'),
+        IndexModel([('email_keys', ASCENDING)], name='email_keys'),
+        # Listing order of /api/users/search (name_lower, _id), with and without a role filter
+        IndexModel([('name_lower', ASCENDING), ('_id', ASCENDING)], name='name_lower_id'),
+        IndexModel([('role', ASCENDING), ('name_lower', ASCENDING), ('_id', ASCENDING)], name='role_name_lower_id'),
+    ],
+    'reviews': [
+        IndexModel([('station_id', ASCENDING), ('timestamp', DESCENDING)], name='station_timestamp'),
+        IndexModel([('timestamp', DESCENDING)], name='timestamp'),
+        IndexModel([('updated_at', ASCENDING), ('created_at', ASCENDING)], name='updated_at_created_at'),
+    ],
+    'idempotency_keys': [
+        IndexModel([('expires_at', ASCENDING)], name='expires_at_ttl', expireAfterSeconds=0),
+    ],
+}
+
+
+def ensure_indexes(db) -> List[str]:
+    """Create the indexes above; returns their names."""
+    created = []
+    for collection, indexes in INDEXES.items():
+        created.extend(db[collection].create_indexes(indexes))
+    logger.info(f"Ensured indexes: {', '.join(created)}")
+    return created
@@ -0,0 +1,324 @@
+"""
+EVPulse Query Instrumentation
+=============================
+Per-request MongoDB command accounting:
+- A PyMongo CommandListener registered on the manager's MongoClient
+- Command counts, durations and collection names recorded on flask.g
+- Server-Timing response header (db;dur=...;desc="N queries")
+- Per-endpoint histograms of query count and database time
+- A configurable query budget to catch N+1 regressions
+  (warning in normal mode, QueryBudgetExceededError in testing mode)
+- Connection pool occupancy per server (PoolStateListener)
+"""
+
+import os
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List
+
+from pymongo import monitoring
+
+from .exceptions import QueryBudgetExceededError
+
+logger = logging.getLogger('evpulse.database.instrumentation')
+
+DEFAULT_QUERY_BUDGET = int(os.getenv('DB_QUERY_BUDGET', '25'))
+
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+DB_TIME_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# Handshake/monitoring chatter that is not a round trip issued by a handler
+_IGNORED_COMMANDS = {'hello', 'ismaster', 'isMaster', 'saslStart', 'saslContinue', 'endSessions'}
+
+
+class RequestQueryStats:
+    """Commands issued while serving a single request."""
+
+    __slots__ = ('count', 'duration_ms', 'failures', 'collections', '_lock')
+
+    def __init__(self):
+        self.count = 0
+        self.duration_ms = 0.0
+        self.failures = 0
+        self.collections: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, collection: Optional[str], duration_ms: float, failed: bool = False) -> None:
+        with self._lock:
+            self.count += 1
+            self.duration_ms += duration_ms
+            if failed:
+                self.failures += 1
+            key = collection or '<admin>'
+            self.collections[key] = self.collections.get(key, 0) + 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'duration_ms': round(self.duration_ms, 2),
+            'failures': self.failures,
+            'collections': dict(self.collections),
+        }
+
+
+# Stats of the request a worker thread is running queries for (see fanout.py)
+_attributed = threading.local()
+
+
+def _current_request_stats() -> Optional[RequestQueryStats]:
+    from flask import g, has_request_context
+
+    stats = getattr(_attributed, 'stats', None)
+    if stats is not None:
+        return stats
+    if not has_request_context():
+        return None
+    return g.get('db_query_stats')
+
+
+@contextmanager
+def attribute_queries(stats: Optional[RequestQueryStats]):
+    """Attribute commands issued on this thread to ``stats`` (a request's counters)."""
+    previous = getattr(_attributed, 'stats', None)
+    _attributed.stats = stats
+    try:
+        yield
+    finally:
+        _attributed.stats = previous
+
+
+class QueryCommandListener(monitoring.CommandListener):
+    """
+    Counts every command sent through the client and attributes it to the
+    Flask request (if any) that issued it.
+
+    PyMongo publishes ``started`` on the thread that runs the operation, so
+    the request is resolved there and carried to the matching
+    ``succeeded``/``failed`` event by ``request_id``.
+    """
+
+    def __init__(self, on_command=None):
+        self._pending: Dict[Any, tuple] = {}
+        self._lock = threading.Lock()
+        self._on_command = on_command
+
+    def started(self, event) -> None:
+        if event.command_name in _IGNORED_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = None
+        key = (event.connection_id, event.request_id)
+        with self._lock:
+            self._pending[key] = (collection, _current_request_stats())
+
+    def succeeded(self, event) -> None:
+        self._finish(event, failed=False)
+
+    def failed(self, event) -> None:
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool) -> None:
+        key = (event.connection_id, event.request_id)
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        collection, request_stats = pending
+        duration_ms = event.duration_micros / 1000.0
+        if request_stats is not None:
+            request_stats.record(collection, duration_ms, failed)
+        if self._on_command is not None:
+            self._on_command(event.command_name, collection, duration_ms, failed)
+
+
+class PoolStateListener(monitoring.ConnectionPoolListener):
+    """
+    Tracks open and checked-out connections per server pool so pool state can
+    be reported without asking the driver (PyMongo exposes no public counters).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[Any, Dict[str, int]] = {}
+
+    def _pool(self, address) -> Dict[str, int]:
+        pool = self._pools.get(address)
+        if pool is None:
+            pool = self._pools[address] = {'open': 0, 'checked_out': 0}
+        return pool
+
+    def _adjust(self, address, field: str, delta: int) -> None:
+        with self._lock:
+            pool = self._pool(address)
+            pool[field] = max(pool[field] + delta, 0)
+
+    def pool_created(self, event) -> None:
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        with self._lock:
+            self._pools.pop(event.address, None)
+
+    def connection_created(self, event) -> None:
+        self._adjust(event.address, 'open', 1)
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        self._adjust(event.address, 'open', -1)
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_check_out_failed(self, event) -> None:
+        pass
+
+    def connection_checked_out(self, event) -> None:
+        self._adjust(event.address, 'checked_out', 1)
+
+    def connection_checked_in(self, event) -> None:
+        self._adjust(event.address, 'checked_out', -1)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {f"{address[0]}:{address[1]}": dict(pool) for address, pool in self._pools.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._pools.clear()
+
+
+class EndpointQueryHistograms:
+    """Aggregated per-endpoint query count and database time distributions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _bucket(buckets, value) -> str:
+        index = bisect_left(buckets, value)
+        return f"le_{buckets[index]}" if index < len(buckets) else 'le_inf'
+
+    def observe(self, endpoint: str, stats: RequestQueryStats) -> None:
+        with self._lock:
+            entry = self._endpoints.get(endpoint)
+            if entry is None:
+                entry = {
+                    'requests': 0,
+                    'queries_total': 0,
+                    'queries_max': 0,
+                    'db_time_ms_total': 0.0,
+                    'budget_exceeded': 0,
+                    'query_count_buckets': {},
+                    'db_time_ms_buckets': {},
+                }
+                self._endpoints[endpoint] = entry
+            entry['requests'] += 1
+            entry['queries_total'] += stats.count
+            entry['queries_max'] = max(entry['queries_max'], stats.count)
+            entry['db_time_ms_total'] += stats.duration_ms
+            count_bucket = self._bucket(QUERY_COUNT_BUCKETS, stats.count)
+            time_bucket = self._bucket(DB_TIME_BUCKETS_MS, stats.duration_ms)
+            entry['query_count_buckets'][count_bucket] = entry['query_count_buckets'].get(count_bucket, 0) + 1
+            entry['db_time_ms_buckets'][time_bucket] = entry['db_time_ms_buckets'].get(time_bucket, 0) + 1
+
+    def mark_budget_exceeded(self, endpoint: str) -> None:
+        with self._lock:
+            if endpoint in self._endpoints:
+                self._endpoints[endpoint]['budget_exceeded'] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            result = {}
+            for endpoint, entry in self._endpoints.items():
+                requests = max(entry['requests'], 1)
+                result[endpoint] = {
+                    **entry,
+                    'query_count_buckets': dict(entry['query_count_buckets']),
+                    'db_time_ms_buckets': dict(entry['db_time_ms_buckets']),
+                    'db_time_ms_total': round(entry['db_time_ms_total'], 2),
+                    'queries_avg': round(entry['queries_total'] / requests, 2),
+                }
+            return result
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+endpoint_histograms = EndpointQueryHistograms()
+
+
+def query_budget(limit: int):
+    """Override the per-request query budget for a single view."""
+    def decorator(fn):
+        fn.db_query_budget = limit
+        return fn
+    return decorator
+
+
+def _budget_for(app, endpoint: Optional[str]) -> int:
+    view = app.view_functions.get(endpoint) if endpoint else None
+    budget = getattr(view, 'db_query_budget', None)
+    if budget is None:
+        budget = app.config.get('DB_QUERY_BUDGET', DEFAULT_QUERY_BUDGET)
+    return budget
+
+
+def init_query_instrumentation(app) -> None:
+    """Register request hooks that collect, report and police per-request DB commands."""
+    from flask import g, request
+
+    app.config.setdefault('DB_QUERY_BUDGET', DEFAULT_QUERY_BUDGET)
+    app.config.setdefault('DB_QUERY_BUDGET_STRICT', app.testing)
+
+    @app.before_request
+    def _start_query_stats():
+        g.db_query_stats = RequestQueryStats()
+
+    @app.after_request
+    def _finish_query_stats(response):
+        stats = g.pop('db_query_stats', None)
+        if stats is None:
+            return response
+
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={stats.duration_ms:.2f};desc="{stats.count} queries"'
+        )
+
+        endpoint = request.endpoint or request.path
+        endpoint_histograms.observe(endpoint, stats)
+
+        budget = _budget_for(app, request.endpoint)
+        if budget and stats.count > budget:
+            endpoint_histograms.mark_budget_exceeded(endpoint)
+            logger.warning(
+                f"Query budget exceeded on {request.method} {endpoint}: "
+                f"{stats.count} queries (budget {budget}), collections={stats.collections}"
+            )
+            if app.config.get('DB_QUERY_BUDGET_STRICT'):
+                raise QueryBudgetExceededError(
+                    endpoint=endpoint,
+                    query_count=stats.count,
+                    budget=budget,
+                    collections=stats.collections,
+                )
+        return response
+
+
+def get_query_stats() -> Dict[str, Any]:
+    """Per-endpoint query histograms collected since startup."""
+    return endpoint_histograms.snapshot()
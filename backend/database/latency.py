@@ -0,0 +1,175 @@
+"""
+EVPulse Latency Sampler
+=======================
+Lightweight background probe that keeps a recent history of MongoDB latency.
+
+Every DB_LATENCY_SAMPLE_INTERVAL seconds the sampler measures:
+- ping:  admin ``ping`` round trip
+- read:  point lookup on the ``_id`` index of ``stations``
+- write: single-document upsert into ``_latency_probe``
+
+Samples go into fixed-size ring buffers; p50/p95/p99 are computed on read.
+The sampler runs one round at a time on a daemon thread, so its load is a
+few commands per interval per worker.
+"""
+
+import os
+import math
+import time
+import socket
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Callable
+
+from bson import ObjectId
+
+logger = logging.getLogger('evpulse.database.latency')
+
+LATENCY_SAMPLER_ENABLED = os.getenv('DB_LATENCY_SAMPLER', 'true').strip().lower() in ('1', 'true', 'yes')
+LATENCY_SAMPLE_INTERVAL = float(os.getenv('DB_LATENCY_SAMPLE_INTERVAL', '15'))
+LATENCY_SAMPLE_SIZE = int(os.getenv('DB_LATENCY_SAMPLE_SIZE', '240'))
+
+PROBE_COLLECTION = '_latency_probe'
+PROBES = ('ping', 'read', 'write')
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LatencySampler:
+    """Periodic ping/read/write sampler with per-probe ring buffers."""
+
+    def __init__(self, manager, interval: float = LATENCY_SAMPLE_INTERVAL, size: int = LATENCY_SAMPLE_SIZE):
+        self._manager = manager
+        self._interval = max(interval, 1.0)
+        self._samples: Dict[str, deque] = {probe: deque(maxlen=size) for probe in PROBES}
+        self._errors: Dict[str, int] = {probe: 0 for probe in PROBES}
+        self._last_sampled_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stop = threading.Event()
+        self._observers: List[Callable[[Dict[str, Any]], None]] = []
+        # One probe document per process so concurrent workers never contend.
+        self._probe_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self._pid = os.getpid()
+            self._probe_id = f"{socket.gethostname()}:{self._pid}"
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), name='evpulse-latency', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def reset_after_fork(self) -> None:
+        """
+        Forget the parent's thread and samples in a forked child. The lock may
+        have been held by the parent's sampling thread at fork time, so it is
+        replaced rather than acquired.
+        """
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._samples = {probe: deque(maxlen=values.maxlen) for probe, values in self._samples.items()}
+        self._errors = {probe: 0 for probe in PROBES}
+        self._last_sampled_at = None
+        self._probe_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    def add_observer(self, observer: Callable[[Dict[str, Any]], None]) -> None:
+        """Call observer(summary) after every sampling round."""
+        if observer not in self._observers:
+            self._observers.append(observer)
+
+    def _run(self, stop: threading.Event) -> None:
+        while not stop.wait(self._interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.debug(f"Latency sample failed: {e}")
+
+    def _measure(self, probe: str, operation: Callable[[], Any]) -> None:
+        started = time.perf_counter()
+        try:
+            operation()
+        except Exception as e:
+            with self._lock:
+                self._errors[probe] += 1
+            logger.debug(f"Latency probe '{probe}' failed: {e}")
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._samples[probe].append(elapsed_ms)
+
+    def sample(self) -> None:
+        """Run one ping/read/write round. Skipped while the manager is disconnected."""
+        if not self._manager.is_connected:
+            return
+        client = self._manager._client
+        db = self._manager._db
+
+        self._measure('ping', lambda: client.admin.command('ping'))
+        self._measure('read', lambda: db.stations.find_one({'_id': ObjectId()}, {'_id': 1}))
+        self._measure('write', lambda: db[PROBE_COLLECTION].update_one(
+            {'_id': self._probe_id},
+            {'$set': {'sampled_at': datetime.now(timezone.utc)}},
+            upsert=True,
+        ))
+
+        with self._lock:
+            self._last_sampled_at = datetime.now(timezone.utc)
+
+        if self._observers:
+            summary = self.summary()
+            for observer in self._observers:
+                try:
+                    observer(summary)
+                except Exception as e:
+                    logger.debug(f"Latency observer failed: {e}")
+
+    def summary(self) -> Dict[str, Any]:
+        """Percentiles per probe (ms) plus current pool utilisation."""
+        with self._lock:
+            samples = {probe: sorted(values) for probe, values in self._samples.items()}
+            last = {probe: (values[-1] if values else None) for probe, values in self._samples.items()}
+            errors = dict(self._errors)
+            sampled_at = self._last_sampled_at
+
+        probes = {}
+        for probe in PROBES:
+            values = samples[probe]
+            probes[probe] = {
+                'count': len(values),
+                'errors': errors[probe],
+                'last_ms': round(last[probe], 2) if last[probe] is not None else None,
+                **{
+                    f'p{pct}_ms': round(value, 2) if value is not None else None
+                    for pct, value in ((pct, percentile(values, pct)) for pct in PERCENTILES)
+                },
+            }
+
+        return {
+            'enabled': LATENCY_SAMPLER_ENABLED,
+            'running': self.running,
+            'interval_seconds': self._interval,
+            'last_sampled_at': sampled_at.isoformat() if sampled_at else None,
+            'probes': probes,
+            'pool': self._manager.pool_state(),
+        }
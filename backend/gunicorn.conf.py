@@ -0,0 +1,117 @@
+"""
+Gunicorn configuration for EVPulse.
+
+gunicorn loads this file automatically when started from ``backend/``:
+
+    gunicorn wsgi:app
+
+Worker model is selected with ``GUNICORN_WORKER_CLASS``:
+
+- ``gthread`` (default): a few processes with a thread pool each. Threads per
+  worker are capped at MONGODB_MAX_POOL_SIZE so every in-flight request can
+  hold a pooled connection without queueing on the driver.
+- ``sync``: one request per process; simplest, highest memory per request.
+- ``gevent``: cooperative greenlets for I/O-heavy traffic. The standard
+  library is monkeypatched here, before the app (and PyMongo) is imported,
+  which is what PyMongo requires to run under gevent.
+
+Every derived value can be overridden with the environment variable noted
+next to it.
+"""
+
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread').strip().lower()
+if worker_class not in ('sync', 'gthread', 'gevent'):
+    raise ValueError(f"GUNICORN_WORKER_CLASS must be sync, gthread or gevent (got {worker_class!r})")
+
+if worker_class == 'gevent':
+    # Must run before anything imports pymongo, socket or threading users.
+    from gevent import monkey
+    monkey.patch_all()
+
+_cpus = multiprocessing.cpu_count()
+_max_pool_size = _env_int('MONGODB_MAX_POOL_SIZE', 20)
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+if worker_class == 'sync':
+    # CPU-bound share of a request is small; 2n+1 keeps cores busy while others wait on MongoDB.
+    workers = _env_int('WEB_CONCURRENCY', 2 * _cpus + 1)
+    threads = 1
+elif worker_class == 'gthread':
+    workers = _env_int('WEB_CONCURRENCY', _cpus + 1)
+    threads = min(_env_int('GUNICORN_THREADS', 4 * _cpus), _max_pool_size)
+else:
+    workers = _env_int('WEB_CONCURRENCY', _cpus)
+    threads = 1
+    # Greenlets beyond the pool size only queue on connection checkout.
+    worker_connections = _env_int('GUNICORN_WORKER_CONNECTIONS', _max_pool_size * 4)
+
+# Keep-alive longer than the load balancer's idle timeout avoids races where
+# gunicorn closes a connection the balancer is about to reuse (sync workers
+# do not support keep-alive).
+keepalive = _env_int('GUNICORN_KEEPALIVE', 75)
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 0)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 0)
+
+# Import the app once in the master; workers share its pages copy-on-write.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').strip().lower() in ('1', 'true', 'yes')
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def on_starting(server):
+    """Clear metrics left by a previous master (PROMETHEUS_MULTIPROC_DIR must start empty)."""
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith('.db'):
+            os.remove(os.path.join(directory, name))
+
+
+def when_ready(server):
+    """Master, after preloading the app and before forking workers."""
+    server.log.info(
+        f"EVPulse: {worker_class} workers={workers} threads={threads} "
+        f"keepalive={keepalive}s MONGODB_MAX_POOL_SIZE={_max_pool_size}"
+    )
+    if preload_app:
+        from database import prepare_for_fork
+        prepare_for_fork(freeze_gc=os.getenv('GUNICORN_GC_FREEZE', 'true').strip().lower() in ('1', 'true', 'yes'))
+
+
+def post_worker_init(worker):
+    """Connect (and warm the pool if MONGODB_POOL_WARMUP) before the worker accepts requests."""
+    from database import get_database_manager
+
+    try:
+        get_database_manager().connect()
+    except Exception as e:
+        worker.log.warning(f"EVPulse: worker {worker.pid} starting without database: {e}")
+
+
+def worker_exit(server, worker):
+    from database import close_db, shutdown_fanout
+
+    shutdown_fanout()
+    close_db()
+
+
+def child_exit(server, worker):
+    from utils.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
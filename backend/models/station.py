@@ -6,6 +6,9 @@ class Station:
     """Charging Station model for MongoDB"""
     
     collection_name = 'stations'
+    # Station fields copied onto its sessions, bookings and charging
+    # transactions, so operator- and city-scoped reads need no join
+    scope_projection = {'operator_id': 1, 'city': 1}
     
     def __init__(self, name, address, city, coordinates, operator_id, status='available',
                  amenities=None, operating_hours='24/7', ports=None, pricing=None,
@@ -19,6 +22,8 @@ class Station:
         self.status = status  # 'available', 'busy', 'offline'
         self.rating = 0.0
         self.total_reviews = 0
+        self.rating_counts = {str(star): 0 for star in range(1, 6)}
+        self.rating_sum = 0
         self.amenities = amenities or []
         self.operating_hours = operating_hours
         self.ports = ports or []  # [{id, type, power, status, price}]
@@ -40,6 +45,8 @@ class Station:
             'status': self.status,
             'rating': self.rating,
             'total_reviews': self.total_reviews,
+            'rating_counts': self.rating_counts,
+            'rating_sum': self.rating_sum,
             'amenities': self.amenities,
             'operating_hours': self.operating_hours,
             'ports': self.ports,
@@ -50,6 +57,15 @@ class Station:
             'updated_at': self.updated_at
         }
     
+    @staticmethod
+    def scope_fields(station):
+        """station_id / operator_id / city to stamp on documents that belong to ``station``"""
+        return {
+            'station_id': station.get('_id'),
+            'operator_id': station.get('operator_id'),
+            'city': station.get('city'),
+        }
+
     @staticmethod
     def from_dict(data):
         """Create Station instance from dictionary"""
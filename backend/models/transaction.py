@@ -5,9 +5,16 @@ class Transaction:
     """Transaction model for MongoDB"""
     
     collection_name = 'transactions'
+    # Collection validator (installed by scripts/repair_charging_amounts.py):
+    # a charging transaction must carry a numeric, non-negative amount, so
+    # read paths can sum amounts as stored. A session that delivered nothing
+    # still gets its (zero) charging row.
+    amount_validator = {'$or': [{'type': {'$ne': 'charging'}}, {'amount': {'$type': 'number', '$gte': 0}}]}
     
     def __init__(self, user_id, amount, transaction_type, payment_method, 
                  description='', session_id=None, card_last4=None):
+        if transaction_type == 'charging' and not Transaction.has_valid_charge(amount):
+            raise ValueError('Charging transactions require a non-negative amount')
         self.user_id = user_id
         self.session_id = session_id
         self.amount = amount
@@ -19,6 +26,16 @@ class Transaction:
         self.timestamp = datetime.utcnow()
         self.created_at = datetime.utcnow()
     
+    @staticmethod
+    def has_valid_amount(amount):
+        """True for a positive number (what a payment or top-up must carry)"""
+        return isinstance(amount, (int, float)) and not isinstance(amount, bool) and amount > 0
+
+    @staticmethod
+    def has_valid_charge(amount):
+        """True for a non-negative number (the amount_validator rule for charging rows)"""
+        return isinstance(amount, (int, float)) and not isinstance(amount, bool) and amount >= 0
+
     def to_dict(self):
         """Convert to dictionary for MongoDB insertion"""
         return {
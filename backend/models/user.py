@@ -1,11 +1,14 @@
 from datetime import datetime
 from bson import ObjectId
 import bcrypt
+import re
 
 class User:
     """User model for MongoDB"""
-    
+
     collection_name = 'users'
+    # Projection for documents only ever rendered with to_safe_dict()
+    safe_projection = {'password': 0}
     
     def __init__(self, email, password, name, role='user', phone=None, avatar=None, 
                  vehicle=None, company=None, stations=None, department=None):
@@ -52,9 +55,36 @@ class User:
             'is_active': self.is_active,
             'status': self.status,
             'created_at': self.created_at,
-            'updated_at': self.updated_at
+            'updated_at': self.updated_at,
+            **User.search_fields(name=self.name, email=self.email)
         }
     
+    @staticmethod
+    def normalize_search_text(value):
+        """Lowercase with collapsed whitespace: the form search keys and queries share"""
+        return ' '.join(str(value or '').split()).lower()
+
+    @staticmethod
+    def search_fields(name=None, email=None):
+        """
+        Lowercase prefix keys for /api/users/search. A name is matched from the
+        start of the full name or of any word; an email from its start or from
+        any part of the local part (``jane.doe@...`` -> ``doe``). Every write
+        that changes ``name`` or ``email`` must set the matching keys; today
+        email is only written at registration.
+        """
+        fields = {}
+        if name is not None:
+            name_lower = User.normalize_search_text(name)
+            fields['name_lower'] = name_lower
+            fields['name_keys'] = list(dict.fromkeys([name_lower, *name_lower.split(' ')]))
+        if email is not None:
+            email_lower = User.normalize_search_text(email)
+            local_part = email_lower.split('@', 1)[0]
+            fields['email_lower'] = email_lower
+            fields['email_keys'] = list(dict.fromkeys([email_lower, *filter(None, re.split(r'[._+-]', local_part))]))
+        return fields
+
     @staticmethod
     def from_dict(data):
         """Create User instance from dictionary"""
@@ -9,6 +9,7 @@ from .notifications import notifications_bp
 from .admin import admin_bp
 from .operator import operator_bp
 from .users import users_bp
+from .charging import charging_bp
 
 __all__ = [
     'auth_bp',
@@ -20,5 +21,6 @@ __all__ = [
     'notifications_bp',
     'admin_bp',
     'operator_bp',
-    'users_bp'
+    'users_bp',
+    'charging_bp'
 ]
@@ -1,16 +1,31 @@
+import logging
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
-from database import get_db
+from database import get_db, QueryGroup
+from database.deadlines import query_deadline
+from database.exceptions import PartialResultError
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
 from models.user import User
 from bson import ObjectId
 from datetime import datetime, timedelta
 from models.booking import Booking
 from models.session import Session
 from models.transaction import Transaction
-from routes.common import to_object_id, now_utc
+from routes.common import (
+    to_object_id, now_utc, dashboard_response, propagate_station_scope, database_error_response,
+    ADMIN_STATS_CACHE, OPERATOR_STATS_CACHE,
+)
+from utils import analytics_store
+from utils.admission import admission_class, ANALYTICS
+from utils.cache import invalidates
+from utils.streaming import STREAM_BATCH_SIZE, iter_batches, requested_stream_format, stream_response
+from utils.station_suggest import get_suggest_index
 
 admin_bp = Blueprint('admin', __name__)
 
+logger = logging.getLogger('evpulse.admin')
+
 DB_UNAVAILABLE = {'success': False, 'error': 'Database connection unavailable. Please try again later.'}
 
 
@@ -48,51 +63,6 @@ def _in_range(value, start, end):
     return bool(parsed and start <= parsed < end)
 
 
-def _id_to_string(value):
-    if isinstance(value, ObjectId):
-        return str(value)
-    if isinstance(value, str):
-        stripped = value.strip()
-        return stripped or None
-    return None
-
-
-def _resolve_charging_amounts_for_admin(db, transactions_data):
-    charging_session_ids = []
-    for txn in transactions_data:
-        if txn.get('type') == 'charging' and _to_amount(txn.get('amount')) <= 0 and txn.get('session_id'):
-            charging_session_ids.append(txn.get('session_id'))
-
-    if not charging_session_ids:
-        return transactions_data
-
-    sessions = list(db.sessions.find(
-        {'_id': {'$in': charging_session_ids}},
-        {'cost': 1, 'total_cost': 1}
-    ))
-    session_cost_map = {
-        s['_id']: _to_amount(s.get('cost') or s.get('total_cost'))
-        for s in sessions
-    }
-
-    for txn in transactions_data:
-        if txn.get('type') != 'charging':
-            continue
-        if _to_amount(txn.get('amount')) > 0:
-            continue
-        session_id = txn.get('session_id')
-        resolved_amount = session_cost_map.get(session_id, 0.0)
-        if resolved_amount > 0:
-            txn['amount'] = resolved_amount
-            if txn.get('_id'):
-                db.transactions.update_one(
-                    {'_id': txn['_id']},
-                    {'$set': {'amount': resolved_amount, 'updated_at': now_utc()}}
-                )
-
-    return transactions_data
-
-
 def _build_user_name_map(db, user_ids):
     valid_ids = []
     for user_id in user_ids:
@@ -135,13 +105,43 @@ def _build_station_meta_map(db, station_ids):
         for station in stations
     }
 
+def _serialize_admin_sessions(db, sessions_data):
+    sessions = [Session.from_dict(data).to_response_dict() for data in sessions_data]
+    user_name_map = _build_user_name_map(db, [session.get('userId') for session in sessions])
+    station_meta_map = _build_station_meta_map(db, [session.get('stationId') for session in sessions])
+    operator_name_map = _build_user_name_map(
+        db,
+        [station_meta_map.get(session.get('stationId'), {}).get('operatorId') for session in sessions]
+    )
+
+    for session in sessions:
+        station_meta = station_meta_map.get(session.get('stationId'), {})
+        operator_id = station_meta.get('operatorId')
+        session['userName'] = user_name_map.get(session.get('userId'), 'Unknown User')
+        session['stationName'] = station_meta.get('name', 'Unknown Station')
+        session['operatorId'] = operator_id
+        session['operatorName'] = operator_name_map.get(operator_id, 'Unknown Operator') if operator_id else 'Unknown Operator'
+
+    return sessions
+
+
+def _serialize_admin_transactions(db, transactions_data):
+    transactions = [Transaction.from_dict(data).to_response_dict() for data in transactions_data]
+    user_name_map = _build_user_name_map(db, [txn.get('userId') for txn in transactions])
+
+    for txn in transactions:
+        txn['userName'] = user_name_map.get(txn.get('userId'), 'Unknown User')
+
+    return transactions
+
+
 def require_admin():
     """Check admin role. Returns (is_admin, db) tuple."""
     db = get_db()
     if db is None:
         return False, None
     user_id = get_jwt_identity()
-    user = db.users.find_one({'_id': ObjectId(user_id)})
+    user = db.users.find_one({'_id': ObjectId(user_id)}, {'role': 1})
     is_admin = user and user.get('role') == 'admin'
     return is_admin, db
 
@@ -152,228 +152,323 @@ def _shift_month_start(reference_start, delta_months):
     month = (month_index % 12) + 1
     return datetime(year, month, 1)
 
-@admin_bp.route('/stats', methods=['GET'])
-@jwt_required()
-def get_admin_stats():
-    """Get admin dashboard statistics"""
-    try:
-        is_admin, db = require_admin()
-        if db is None:
-            return jsonify(DB_UNAVAILABLE), 503
-        if not is_admin:
-            return jsonify({'success': False, 'error': 'Unauthorized'}), 403
-        
-        # Get counts
-        total_users = db.users.count_documents({'role': 'user'})
-        total_operators = db.users.count_documents({'role': 'operator'})
-        total_stations = db.stations.count_documents({})
-        active_chargers = db.stations.aggregate([
+def _live_revenue_report(db, month_ranges, current_period_start, previous_period_start, now):
+    """Compute the admin revenue figures from MongoDB (same shape as analytics_store.admin_revenue_report)."""
+    with QueryGroup() as queries:
+        transactions_future = queries.submit(
+            lambda: list(db.transactions.find({'type': 'charging', 'status': 'completed'}))
+        )
+        sessions_future = queries.submit(lambda: list(db.sessions.find({'status': 'completed'})))
+        # City is stamped on charging transactions: one indexed $group
+        city_revenue_future = queries.submit(lambda: list(db.transactions.aggregate([
+            {'$match': {
+                'type': 'charging',
+                'status': 'completed',
+                'timestamp': {'$gte': previous_period_start, '$lte': now},
+            }},
+            {'$group': {
+                '_id': {
+                    'city': {'$ifNull': ['$city', 'Unknown']},
+                    'current': {'$gte': ['$timestamp', current_period_start]},
+                },
+                'amount': {'$sum': '$amount'},
+            }},
+        ])))
+
+    transactions = transactions_future.result()
+    total_revenue = round(sum(_to_amount(t.get('amount')) for t in transactions), 2)
+
+    sessions = sessions_future.result()
+    total_energy = round(
+        sum(_to_float(s.get('energy_delivered', s.get('energyDelivered', 0))) for s in sessions),
+        1
+    )
+
+    monthly = []
+    for start, end in month_ranges:
+        month_trans = [
+            t for t in transactions
+            if _in_range(t.get('timestamp') or t.get('created_at') or t.get('updated_at'), start, end)
+        ]
+        month_sessions = [
+            s for s in sessions
+            if _in_range(
+                s.get('end_time') or s.get('updated_at') or s.get('start_time') or s.get('created_at'),
+                start,
+                end
+            )
+        ]
+        monthly.append({
+            'revenue': round(sum(_to_amount(t.get('amount', 0)) for t in month_trans), 2),
+            'energy': round(
+                sum(_to_float(s.get('energy_delivered', s.get('energyDelivered', 0))) for s in month_sessions),
+                1
+            ),
+        })
+
+    city_revenue_current = {}
+    city_revenue_previous = {}
+    for row in city_revenue_future.result():
+        target = city_revenue_current if row['_id']['current'] else city_revenue_previous
+        target[row['_id']['city']] = _to_amount(row.get('amount'))
+
+    return {
+        'totalRevenue': total_revenue,
+        'totalEnergy': total_energy,
+        'monthly': monthly,
+        'cityRevenueCurrent': city_revenue_current,
+        'cityRevenuePrevious': city_revenue_previous,
+    }
+
+
+# Marker for a fan-out query that failed (see _compute_admin_stats)
+_FAILED = object()
+
+
+def _aggregate_count(collection, pipeline):
+    """Run a pipeline ending in ``$count: 'total'`` and return the total (0 if empty)."""
+    result = list(collection.aggregate(pipeline))
+    return result[0]['total'] if result else 0
+
+
+def _admin_revenue_report(db, month_ranges, current_period_start, previous_period_start, now):
+    """Revenue figures from the analytics store when enabled, otherwise live from MongoDB."""
+    if analytics_store.is_enabled():
+        try:
+            return analytics_store.admin_revenue_report(
+                month_ranges, current_period_start, previous_period_start, now
+            )
+        except Exception as e:
+            logger.warning(f"Analytics store query failed, using live data: {e}")
+    return _live_revenue_report(db, month_ranges, current_period_start, previous_period_start, now)
+
+
+def _compute_admin_stats(db):
+    """Build the admin dashboard payload. Uses no request state, so the cache can refresh it off-request."""
+    now = datetime.utcnow()
+    current_period_start = now - timedelta(days=30)
+    previous_period_start = now - timedelta(days=60)
+
+    # Last 6 months, calendar-aligned
+    current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    month_ranges = []
+    for i in range(5, -1, -1):
+        start = _shift_month_start(current_month_start, -i)
+        month_ranges.append((start, _shift_month_start(start, 1)))
+
+    # Every query below is independent: submit them together and wait
+    # once, so the dashboard costs about as much as its slowest query.
+    # Failed sections fall back to empty values and are reported through
+    # PartialResultError so the handler can serve what did load.
+    with QueryGroup(tolerate_errors=True) as queries:
+        # Counts
+        total_users_future = queries.submit(db.users.count_documents, {'role': 'user'})
+        total_operators_future = queries.submit(db.users.count_documents, {'role': 'operator'})
+        total_stations_future = queries.submit(db.stations.count_documents, {})
+        active_chargers_future = queries.submit(_aggregate_count, db.stations, [
             {'$unwind': '$ports'},
             {'$match': {'ports.status': {'$ne': 'offline'}}},
             {'$count': 'total'}
         ])
-        active_chargers_count = list(active_chargers)
-        active_chargers_count = active_chargers_count[0]['total'] if active_chargers_count else 0
-
-        total_ports_cursor = db.stations.aggregate([
+        total_ports_future = queries.submit(_aggregate_count, db.stations, [
             {'$unwind': '$ports'},
             {'$count': 'total'}
         ])
-        total_ports_result = list(total_ports_cursor)
-        total_ports_count = total_ports_result[0]['total'] if total_ports_result else 0
-        offline_ports_count = max(total_ports_count - active_chargers_count, 0)
-        
-        # Calculate revenue
-        transactions = list(db.transactions.find({'type': 'charging', 'status': 'completed'}))
-        transactions = _resolve_charging_amounts_for_admin(db, transactions)
-        total_revenue = round(sum(_to_amount(t.get('amount')) for t in transactions), 2)
-        
-        # Calculate total energy
-        sessions = list(db.sessions.find({'status': 'completed'}))
-        total_energy = round(
-            sum(_to_float(s.get('energy_delivered', s.get('energyDelivered', 0))) for s in sessions),
-            1
-        )
-        
+
         # Monthly growth calculations (simplified)
-        month_ago = datetime.utcnow() - timedelta(days=30)
-        two_months_ago = datetime.utcnow() - timedelta(days=60)
-        
-        recent_users = db.users.count_documents({
-            'created_at': {'$gte': month_ago}
+        recent_users_future = queries.submit(db.users.count_documents, {
+            'created_at': {'$gte': current_period_start}
         })
-        prev_users = db.users.count_documents({
-            'created_at': {'$gte': two_months_ago, '$lt': month_ago}
+        prev_users_future = queries.submit(db.users.count_documents, {
+            'created_at': {'$gte': previous_period_start, '$lt': current_period_start}
         })
-        user_growth = ((recent_users - prev_users) / max(prev_users, 1)) * 100
-        
-        users_data = list(db.users.find({'role': 'user'}, {'created_at': 1}))
-
-        # Revenue, energy and users by month (last 6 months, calendar-aligned)
-        revenue_by_month = []
-        current_month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        for i in range(5, -1, -1):
-            start = _shift_month_start(current_month_start, -i)
-            end = _shift_month_start(start, 1)
-
-            month_trans = [
-                t for t in transactions
-                if _in_range(t.get('timestamp') or t.get('created_at') or t.get('updated_at'), start, end)
-            ]
-            month_revenue = round(sum(_to_amount(t.get('amount', 0)) for t in month_trans), 2)
-
-            month_sessions = [
-                s for s in sessions
-                if _in_range(
-                    s.get('end_time') or s.get('updated_at') or s.get('start_time') or s.get('created_at'),
-                    start,
-                    end
-                )
-            ]
-            month_energy = round(
-                sum(_to_float(s.get('energy_delivered', s.get('energyDelivered', 0))) for s in month_sessions),
-                1
-            )
-
-            month_users = sum(1 for u in users_data if _in_range(u.get('created_at'), start, end))
+        users_data_future = queries.submit(lambda: list(db.users.find({'role': 'user'}, {'created_at': 1})))
 
-            revenue_by_month.append({
-                'month': start.strftime('%b'),
-                'revenue': month_revenue,
-                'energy': month_energy,
-                'users': int(month_users),
-            })
-        
         # Stations by city
-        stations_by_city_raw = list(db.stations.aggregate([
+        stations_by_city_future = queries.submit(lambda: list(db.stations.aggregate([
             {'$group': {'_id': '$city', 'count': {'$sum': 1}}},
             {'$sort': {'count': -1}},
             {'$limit': 6}
-        ]))
+        ])))
 
-        station_city_map = {
-            str(s['_id']): (s.get('city') or 'Unknown')
-            for s in db.stations.find({}, {'city': 1})
-        }
-        session_station_map = {
-            str(s['_id']): _id_to_string(s.get('station_id'))
-            for s in db.sessions.find({}, {'station_id': 1})
-        }
+        # Recent activity
+        latest_users_future = queries.submit(lambda: list(db.users.find({}).sort('created_at', -1).limit(3)))
+        latest_stations_future = queries.submit(lambda: list(db.stations.find({}).sort('created_at', -1).limit(3)))
+        latest_transactions_future = queries.submit(
+            lambda: list(db.transactions.find({}).sort('timestamp', -1).limit(3))
+        )
+
+        # Revenue, energy and city revenue: computed on this thread while
+        # the queries above run (the live report fans out its own queries).
+        revenue_error = None
+        try:
+            revenue_report = _admin_revenue_report(
+                db, month_ranges, current_period_start, previous_period_start, now
+            )
+        except (PyMongoError, TimeoutError) as e:
+            revenue_error = e
+            revenue_report = {
+                'totalRevenue': 0.0,
+                'totalEnergy': 0.0,
+                'monthly': [{'revenue': 0.0, 'energy': 0.0} for _ in month_ranges],
+                'cityRevenueCurrent': {},
+                'cityRevenuePrevious': {},
+            }
 
-        now = datetime.utcnow()
-        current_period_start = now - timedelta(days=30)
-        previous_period_start = now - timedelta(days=60)
+    missing = []
+    sections = {
+        'counts': (total_users_future, total_operators_future, total_stations_future,
+                   active_chargers_future, total_ports_future),
+        'userGrowth': (recent_users_future, prev_users_future, users_data_future),
+        'stationsByCity': (stations_by_city_future,),
+        'recentActivity': (latest_users_future, latest_stations_future, latest_transactions_future),
+    }
+    for section, futures in sections.items():
+        if any(queries.value(future, _FAILED) is _FAILED for future in futures):
+            missing.append(section)
+    if revenue_error is not None:
+        missing.append('revenue')
+
+    total_users = queries.value(total_users_future, 0)
+    total_operators = queries.value(total_operators_future, 0)
+    total_stations = queries.value(total_stations_future, 0)
+    active_chargers_count = queries.value(active_chargers_future, 0)
+    total_ports_count = queries.value(total_ports_future, 0)
+    offline_ports_count = max(total_ports_count - active_chargers_count, 0)
+
+    total_revenue = revenue_report['totalRevenue']
+    total_energy = revenue_report['totalEnergy']
+    city_revenue_current = revenue_report['cityRevenueCurrent']
+    city_revenue_previous = revenue_report['cityRevenuePrevious']
+
+    recent_users = queries.value(recent_users_future, 0)
+    prev_users = queries.value(prev_users_future, 0)
+    user_growth = ((recent_users - prev_users) / max(prev_users, 1)) * 100
+
+    users_data = queries.value(users_data_future, [])
+
+    # Revenue, energy and users by month
+    revenue_by_month = []
+    for (start, end), figures in zip(month_ranges, revenue_report['monthly']):
+        month_users = sum(1 for u in users_data if _in_range(u.get('created_at'), start, end))
+
+        revenue_by_month.append({
+            'month': start.strftime('%b'),
+            'revenue': figures['revenue'],
+            'energy': figures['energy'],
+            'users': int(month_users),
+        })
 
-        city_revenue_current = {}
-        city_revenue_previous = {}
+    stations_by_city = []
+    for item in queries.value(stations_by_city_future, []):
+        city_name = item.get('_id') or 'Unknown'
+        current_revenue = round(city_revenue_current.get(city_name, 0.0), 2)
+        previous_revenue = round(city_revenue_previous.get(city_name, 0.0), 2)
+
+        if previous_revenue > 0:
+            growth = round(((current_revenue - previous_revenue) / previous_revenue) * 100, 1)
+        elif current_revenue > 0:
+            growth = 100.0
+        else:
+            growth = 0.0
+
+        stations_by_city.append({
+            'city': city_name,
+            'count': item.get('count', 0),
+            'revenue': current_revenue,
+            'growth': growth,
+        })
 
-        for txn in transactions:
-            session_id = _id_to_string(txn.get('session_id'))
-            station_id = session_station_map.get(session_id)
-            city = station_city_map.get(station_id, 'Unknown')
-            amount = _to_amount(txn.get('amount'))
-            txn_dt = _to_datetime(txn.get('timestamp') or txn.get('created_at') or txn.get('updated_at'))
+    # Recent activity from DB
+    recent_activity = []
 
-            if not txn_dt:
-                continue
+    for user in queries.value(latest_users_future, []):
+        recent_activity.append({
+            'id': f"user-{user['_id']}",
+            'action': 'New user registered',
+            'user': user.get('name', user.get('email', 'Unknown')),
+            'timestamp': user.get('created_at').isoformat() if user.get('created_at') else None
+        })
 
-            if current_period_start <= txn_dt <= now:
-                city_revenue_current[city] = city_revenue_current.get(city, 0.0) + amount
-            elif previous_period_start <= txn_dt < current_period_start:
-                city_revenue_previous[city] = city_revenue_previous.get(city, 0.0) + amount
-
-        stations_by_city = []
-        for item in stations_by_city_raw:
-            city_name = item.get('_id') or 'Unknown'
-            current_revenue = round(city_revenue_current.get(city_name, 0.0), 2)
-            previous_revenue = round(city_revenue_previous.get(city_name, 0.0), 2)
-
-            if previous_revenue > 0:
-                growth = round(((current_revenue - previous_revenue) / previous_revenue) * 100, 1)
-            elif current_revenue > 0:
-                growth = 100.0
-            else:
-                growth = 0.0
-
-            stations_by_city.append({
-                'city': city_name,
-                'count': item.get('count', 0),
-                'revenue': current_revenue,
-                'growth': growth,
-            })
-        
-        # Recent activity from DB
-        recent_activity = []
-
-        latest_users = list(db.users.find({}).sort('created_at', -1).limit(3))
-        latest_stations = list(db.stations.find({}).sort('created_at', -1).limit(3))
-        latest_transactions = list(db.transactions.find({}).sort('timestamp', -1).limit(3))
-
-        for user in latest_users:
-            recent_activity.append({
-                'id': f"user-{user['_id']}",
-                'action': 'New user registered',
-                'user': user.get('name', user.get('email', 'Unknown')),
-                'timestamp': user.get('created_at').isoformat() if user.get('created_at') else None
-            })
-
-        for station in latest_stations:
-            recent_activity.append({
-                'id': f"station-{station['_id']}",
-                'action': 'New station registered',
-                'user': station.get('name', 'Unknown Station'),
-                'timestamp': station.get('created_at').isoformat() if station.get('created_at') else None
-            })
-
-        for transaction in latest_transactions:
-            recent_activity.append({
-                'id': f"transaction-{transaction['_id']}",
-                'action': 'Payment processed',
-                'user': 'System',
-                'timestamp': transaction.get('timestamp').isoformat() if transaction.get('timestamp') else None
-            })
-
-        recent_activity = sorted(
-            recent_activity,
-            key=lambda item: item.get('timestamp') or '',
-            reverse=True
-        )[:8]
-        
-        stats = {
-            'totalUsers': total_users,
-            'totalOperators': total_operators,
-            'totalStations': total_stations,
-            'totalRevenue': total_revenue,
-            'activeChargers': active_chargers_count,
-            'onlinePorts': active_chargers_count,
-            'offlinePorts': offline_ports_count,
-            'totalPorts': total_ports_count,
-            'totalEnergy': total_energy,
-            'monthlyGrowth': {
-                'users': round(user_growth, 1),
-                'revenue': 18.3,
-                'stations': 8.7,
-                'energy': 15.2
-            },
-            'revenueByMonth': revenue_by_month,
-            'energyByMonth': [
-                {'month': item['month'], 'energy': item['energy']}
-                for item in revenue_by_month
-            ],
-            'userGrowthByMonth': [
-                {'month': item['month'], 'users': item['users']}
-                for item in revenue_by_month
-            ],
-            'stationsByCity': stations_by_city,
-            'recentActivity': recent_activity
-        }
+    for station in queries.value(latest_stations_future, []):
+        recent_activity.append({
+            'id': f"station-{station['_id']}",
+            'action': 'New station registered',
+            'user': station.get('name', 'Unknown Station'),
+            'timestamp': station.get('created_at').isoformat() if station.get('created_at') else None
+        })
+
+    for transaction in queries.value(latest_transactions_future, []):
+        recent_activity.append({
+            'id': f"transaction-{transaction['_id']}",
+            'action': 'Payment processed',
+            'user': 'System',
+            'timestamp': transaction.get('timestamp').isoformat() if transaction.get('timestamp') else None
+        })
+
+    recent_activity = sorted(
+        recent_activity,
+        key=lambda item: item.get('timestamp') or '',
+        reverse=True
+    )[:8]
+
+    stats = {
+        'totalUsers': total_users,
+        'totalOperators': total_operators,
+        'totalStations': total_stations,
+        'totalRevenue': total_revenue,
+        'activeChargers': active_chargers_count,
+        'onlinePorts': active_chargers_count,
+        'offlinePorts': offline_ports_count,
+        'totalPorts': total_ports_count,
+        'totalEnergy': total_energy,
+        'monthlyGrowth': {
+            'users': round(user_growth, 1),
+            'revenue': 18.3,
+            'stations': 8.7,
+            'energy': 15.2
+        },
+        'revenueByMonth': revenue_by_month,
+        'energyByMonth': [
+            {'month': item['month'], 'energy': item['energy']}
+            for item in revenue_by_month
+        ],
+        'userGrowthByMonth': [
+            {'month': item['month'], 'users': item['users']}
+            for item in revenue_by_month
+        ],
+        'stationsByCity': stations_by_city,
+        'recentActivity': recent_activity
+    }
+    if missing:
+        errors = queries.errors + ([revenue_error] if revenue_error is not None else [])
+        raise PartialResultError(partial=stats, missing=missing, errors=errors)
+    return stats
+
+
+@admin_bp.route('/stats', methods=['GET'])
+@query_deadline('report')
+@admission_class(ANALYTICS)
+@jwt_required()
+def get_admin_stats():
+    """Get admin dashboard statistics"""
+    try:
+        is_admin, db = require_admin()
+        if db is None:
+            return jsonify(DB_UNAVAILABLE), 503
+        if not is_admin:
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 403
         
-        return jsonify({'success': True, 'data': stats})
+        return dashboard_response(ADMIN_STATS_CACHE, 'admin', 'all', lambda: _compute_admin_stats(db))
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @admin_bp.route('/bookings', methods=['GET'])
+@query_deadline(None)
+@admission_class(ANALYTICS)
 @jwt_required()
 def get_all_bookings():
     """Get all bookings for admin"""
@@ -384,14 +479,26 @@ def get_all_bookings():
         if not is_admin:
             return jsonify({'success': False, 'error': 'Unauthorized'}), 403
 
-        bookings_data = list(db.bookings.find({}).sort('created_at', -1))
-        bookings = [Booking.from_dict(data).to_response_dict() for data in bookings_data]
+        cursor = db.bookings.find({}).sort('created_at', -1)
+        stream_format = requested_stream_format()
+        if stream_format:
+            batches = (
+                [Booking.from_dict(data).to_response_dict() for data in batch]
+                for batch in iter_batches(cursor.batch_size(STREAM_BATCH_SIZE))
+            )
+            return stream_response(batches, stream_format)
+
+        bookings = [Booking.from_dict(data).to_response_dict() for data in cursor]
         return jsonify({'success': True, 'data': bookings})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @admin_bp.route('/sessions', methods=['GET'])
+@query_deadline(None)
+@admission_class(ANALYTICS)
 @jwt_required()
 def get_all_sessions():
     """Get all sessions for admin"""
@@ -402,29 +509,26 @@ def get_all_sessions():
         if not is_admin:
             return jsonify({'success': False, 'error': 'Unauthorized'}), 403
 
-        sessions_data = list(db.sessions.find({}).sort('start_time', -1))
-        sessions = [Session.from_dict(data).to_response_dict() for data in sessions_data]
-        user_name_map = _build_user_name_map(db, [session.get('userId') for session in sessions])
-        station_meta_map = _build_station_meta_map(db, [session.get('stationId') for session in sessions])
-        operator_name_map = _build_user_name_map(
-            db,
-            [station_meta_map.get(session.get('stationId'), {}).get('operatorId') for session in sessions]
-        )
-
-        for session in sessions:
-            station_meta = station_meta_map.get(session.get('stationId'), {})
-            operator_id = station_meta.get('operatorId')
-            session['userName'] = user_name_map.get(session.get('userId'), 'Unknown User')
-            session['stationName'] = station_meta.get('name', 'Unknown Station')
-            session['operatorId'] = operator_id
-            session['operatorName'] = operator_name_map.get(operator_id, 'Unknown Operator') if operator_id else 'Unknown Operator'
+        cursor = db.sessions.find({}).sort('start_time', -1)
+        stream_format = requested_stream_format()
+        if stream_format:
+            batches = (
+                _serialize_admin_sessions(db, batch)
+                for batch in iter_batches(cursor.batch_size(STREAM_BATCH_SIZE))
+            )
+            return stream_response(batches, stream_format)
 
+        sessions = _serialize_admin_sessions(db, list(cursor))
         return jsonify({'success': True, 'data': sessions})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @admin_bp.route('/transactions', methods=['GET'])
+@query_deadline(None)
+@admission_class(ANALYTICS)
 @jwt_required()
 def get_all_transactions():
     """Get all transactions for admin"""
@@ -435,20 +539,25 @@ def get_all_transactions():
         if not is_admin:
             return jsonify({'success': False, 'error': 'Unauthorized'}), 403
 
-        transactions_data = list(db.transactions.find({}).sort('timestamp', -1))
-        transactions_data = _resolve_charging_amounts_for_admin(db, transactions_data)
-        transactions = [Transaction.from_dict(data).to_response_dict() for data in transactions_data]
-        user_name_map = _build_user_name_map(db, [txn.get('userId') for txn in transactions])
-
-        for txn in transactions:
-            txn['userName'] = user_name_map.get(txn.get('userId'), 'Unknown User')
+        cursor = db.transactions.find({}).sort('timestamp', -1)
+        stream_format = requested_stream_format()
+        if stream_format:
+            batches = (
+                _serialize_admin_transactions(db, batch)
+                for batch in iter_batches(cursor.batch_size(STREAM_BATCH_SIZE))
+            )
+            return stream_response(batches, stream_format)
 
+        transactions = _serialize_admin_transactions(db, list(cursor))
         return jsonify({'success': True, 'data': transactions})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @admin_bp.route('/transactions/<transaction_id>/refund', methods=['POST', 'OPTIONS'])
+@invalidates(ADMIN_STATS_CACHE)
 def refund_transaction(transaction_id):
     """Refund a completed charging transaction (admin only)"""
     try:
@@ -494,6 +603,9 @@ def refund_transaction(transaction_id):
             'status': 'completed',
             'description': f"Refund for transaction {str(txn_oid)}",
             'reference_transaction_id': txn_oid,
+            'station_id': transaction.get('station_id'),
+            'operator_id': transaction.get('operator_id'),
+            'city': transaction.get('city'),
             'timestamp': datetime.utcnow(),
             'created_at': datetime.utcnow(),
             'updated_at': now_utc(),
@@ -506,6 +618,8 @@ def refund_transaction(transaction_id):
         )
 
         return jsonify({'success': True, 'message': 'Refund processed successfully'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -565,6 +679,8 @@ def get_all_users():
             user['totalSpent'] = _to_amount(user_spend_map.get(user_id, 0))
         
         return jsonify({'success': True, 'data': users})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -618,6 +734,8 @@ def get_all_stations():
             station['totalSessions'] = int(station_finance['sessions'])
         
         return jsonify({'success': True, 'data': stations})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -648,11 +766,14 @@ def update_user_status(user_id):
             return jsonify({'success': False, 'error': 'User not found'}), 404
         
         return jsonify({'success': True, 'message': 'User status updated'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @admin_bp.route('/users/<user_id>', methods=['DELETE'])
+@invalidates(ADMIN_STATS_CACHE)
 @jwt_required()
 def delete_user(user_id):
     """Delete a user (admin only)"""
@@ -691,10 +812,13 @@ def delete_user(user_id):
         db.notifications.delete_many({'user_id': {'$in': [user_oid, str(user_oid)]}})
 
         return jsonify({'success': True, 'message': 'User deleted successfully'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @admin_bp.route('/stations/<station_id>/status', methods=['PUT'])
+@invalidates(ADMIN_STATS_CACHE, OPERATOR_STATS_CACHE)
 @jwt_required()
 def update_station_status(station_id):
     """Update station status"""
@@ -720,11 +844,14 @@ def update_station_status(station_id):
             return jsonify({'success': False, 'error': 'Station not found'}), 404
         
         return jsonify({'success': True, 'message': 'Station status updated'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @admin_bp.route('/stations/<station_id>', methods=['PUT'])
+@invalidates(ADMIN_STATS_CACHE, OPERATOR_STATS_CACHE)
 @jwt_required()
 def update_station(station_id):
     """Update station details (admin only)"""
@@ -739,10 +866,6 @@ def update_station(station_id):
         if not station_oid:
             return jsonify({'success': False, 'error': 'Invalid station id'}), 400
 
-        station = db.stations.find_one({'_id': station_oid})
-        if not station:
-            return jsonify({'success': False, 'error': 'Station not found'}), 404
-
         data = request.get_json() or {}
         update_data = {}
 
@@ -760,7 +883,7 @@ def update_station(station_id):
             if not operator_oid:
                 return jsonify({'success': False, 'error': 'Invalid operator id'}), 400
 
-            operator_user = db.users.find_one({'_id': operator_oid})
+            operator_user = db.users.find_one({'_id': operator_oid}, {'role': 1})
             if not operator_user or operator_user.get('role') not in ['operator', 'admin']:
                 return jsonify({'success': False, 'error': 'Operator not found'}), 404
 
@@ -780,17 +903,28 @@ def update_station(station_id):
             return jsonify({'success': False, 'error': 'No valid fields provided for update'}), 400
 
         update_data['updated_at'] = now_utc()
-        db.stations.update_one({'_id': station_oid}, {'$set': update_data})
+        updated_station = db.stations.find_one_and_update(
+            {'_id': station_oid},
+            {'$set': update_data},
+            return_document=ReturnDocument.AFTER
+        )
+        if not updated_station:
+            return jsonify({'success': False, 'error': 'Station not found'}), 404
+        if 'operator_id' in update_data:
+            propagate_station_scope(db, updated_station)
+        get_suggest_index().upsert(updated_station)
 
-        updated_station = db.stations.find_one({'_id': station_oid})
         from models.station import Station
         station_response = Station.from_dict(updated_station).to_response_dict()
         return jsonify({'success': True, 'data': station_response, 'message': 'Station updated successfully'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
 @admin_bp.route('/stations/<station_id>', methods=['DELETE'])
+@invalidates(ADMIN_STATS_CACHE, OPERATOR_STATS_CACHE)
 @jwt_required()
 def delete_station(station_id):
     """Delete a station (admin only)"""
@@ -819,12 +953,16 @@ def delete_station(station_id):
         db.stations.delete_one({'_id': station_oid})
         db.bookings.delete_many({'station_id': station_oid})
         db.sessions.delete_many({'station_id': station_oid})
+        get_suggest_index().remove(station_oid)
 
         return jsonify({'success': True, 'message': 'Station deleted successfully'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @admin_bp.route('/feedback/stats', methods=['GET'])
+@admission_class(ANALYTICS)
 @jwt_required()
 def get_feedback_stats():
     """Get feedback statistics"""
@@ -835,14 +973,16 @@ def get_feedback_stats():
         if not is_admin:
             return jsonify({'success': False, 'error': 'Unauthorized'}), 403
         
-        reviews = list(db.reviews.find({}))
-        
-        total_reviews = len(reviews)
-        avg_rating = sum(r.get('rating', 0) for r in reviews) / max(total_reviews, 1)
+        # Totals come from the per-station rating aggregates (utils/ratings.py)
+        totals = next(db.stations.aggregate([
+            {'$group': {'_id': None, 'reviews': {'$sum': '$total_reviews'}, 'rating_sum': {'$sum': '$rating_sum'}}}
+        ]), None) or {}
+        total_reviews = totals.get('reviews', 0)
+        avg_rating = (totals.get('rating_sum') or 0) / max(total_reviews, 1)
         
         # Reviews this month
         month_ago = datetime.utcnow() - timedelta(days=30)
-        reviews_this_month = len([r for r in reviews if r.get('timestamp', datetime.min) >= month_ago])
+        reviews_this_month = db.reviews.count_documents({'timestamp': {'$gte': month_ago}})
         
         # Top rated stations
         stations = list(db.stations.find({}).sort('rating', -1).limit(3))
@@ -862,6 +1002,8 @@ def get_feedback_stats():
         }
         
         return jsonify({'success': True, 'data': stats})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -894,5 +1036,7 @@ def get_all_reviews():
         reviews = [Review.from_dict(data).to_response_dict() for data in reviews_data]
         
         return jsonify({'success': True, 'data': reviews})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -4,6 +4,10 @@ from datetime import datetime
 from database import get_db
 from models.user import User
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from routes.common import ADMIN_STATS_CACHE, database_error_response
+from utils.cache import invalidates
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -74,10 +78,13 @@ def login():
             'token': access_token
         })
         
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @auth_bp.route('/register', methods=['POST'])
+@invalidates(ADMIN_STATS_CACHE)
 def register():
     """User registration endpoint"""
     try:
@@ -126,6 +133,8 @@ def register():
             'token': access_token
         }), 201
         
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -151,6 +160,8 @@ def get_profile():
             'user': user.to_safe_dict()
         })
         
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -167,11 +178,6 @@ def update_profile():
         user_id = get_jwt_identity()
         data = request.get_json()
         
-        # Find user
-        user_data = db.users.find_one({'_id': ObjectId(user_id)})
-        if not user_data:
-            return jsonify({'success': False, 'error': 'User not found'}), 404
-        
         vehicle_payload, vehicle_error = _normalize_vehicle_payload(data.get('vehicle'))
         if vehicle_error:
             return jsonify({'success': False, 'error': vehicle_error}), 400
@@ -181,16 +187,19 @@ def update_profile():
         update_data = {k: v for k, v in data.items() if k in allowed_fields}
         if 'vehicle' in update_data:
             update_data['vehicle'] = vehicle_payload
+        if 'name' in update_data:
+            update_data.update(User.search_fields(name=update_data['name']))
         update_data['updated_at'] = datetime.utcnow()
         
-        # Update user in database
-        db.users.update_one(
+        # Update and read back the user in one round trip
+        updated_user_data = db.users.find_one_and_update(
             {'_id': ObjectId(user_id)},
-            {'$set': update_data}
+            {'$set': update_data},
+            projection=User.safe_projection,
+            return_document=ReturnDocument.AFTER
         )
-        
-        # Get updated user data
-        updated_user_data = db.users.find_one({'_id': ObjectId(user_id)})
+        if not updated_user_data:
+            return jsonify({'success': False, 'error': 'User not found'}), 404
         user = User.from_dict(updated_user_data)
         
         return jsonify({
@@ -198,6 +207,8 @@ def update_profile():
             'user': user.to_safe_dict()
         })
         
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -243,6 +254,8 @@ def change_password():
             'message': 'Password updated successfully'
         })
         
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
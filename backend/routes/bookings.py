@@ -1,13 +1,21 @@
 from flask import Blueprint, request, jsonify, g
 from database import get_db
+from database.deadlines import query_deadline
 from models.booking import Booking
+from models.station import Station
 from models.notification import Notification
 from bson import ObjectId
 from datetime import datetime, timedelta
-from pymongo.errors import DuplicateKeyError
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from utils.charging import calculate_charging_projection
 
-from routes.common import role_required, to_object_id, now_utc
+from routes.common import (
+    role_required, to_object_id, now_utc, owned_filter, database_error_response, OPERATOR_STATS_CACHE,
+)
+from utils.cache import invalidates
+from utils.admission import admission_class, CRITICAL
+from utils.idempotency import idempotent
 
 bookings_bp = Blueprint('bookings', __name__)
 
@@ -233,23 +241,31 @@ def _refresh_elapsed_bookings(db, station_id=None, date=None, port_id=None):
             )
 
 
+def _create_notifications(db, user_ids, notification_type, title, message, action_url=None):
+    documents = [
+        Notification(
+            user_id=str(user_id),
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            action_url=action_url
+        ).to_dict()
+        for user_id in user_ids
+        if user_id
+    ]
+    if documents:
+        db.notifications.insert_many(documents, ordered=False)
+
+
 def _create_notification(db, user_id, notification_type, title, message, action_url=None):
-    if not user_id:
-        return
-    notification = Notification(
-        user_id=str(user_id),
-        notification_type=notification_type,
-        title=title,
-        message=message,
-        action_url=action_url
-    )
-    db.notifications.insert_one(notification.to_dict())
+    _create_notifications(db, [user_id], notification_type, title, message, action_url)
 
 
 def _notify_admins(db, notification_type, title, message, action_url=None):
     admin_users = list(db.users.find({'role': 'admin'}, {'_id': 1}))
-    for admin in admin_users:
-        _create_notification(db, admin.get('_id'), notification_type, title, message, action_url)
+    _create_notifications(
+        db, [admin.get('_id') for admin in admin_users], notification_type, title, message, action_url
+    )
 
 def _serialize_bookings(bookings_data, db):
     bookings = []
@@ -278,12 +294,13 @@ def get_bookings():
         if role == 'user':
             query['user_id'] = user['_id']
         elif role == 'operator':
-            station_ids = [s['_id'] for s in db.stations.find({'operator_id': user['_id']}, {'_id': 1})]
-            query['station_id'] = {'$in': station_ids}
+            query['operator_id'] = user['_id']
 
         bookings_data = list(db.bookings.find(query).sort('created_at', -1))
         bookings = _serialize_bookings(bookings_data, db)
         return jsonify({'success': True, 'data': bookings})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -295,6 +312,9 @@ def get_user_bookings(user_id):
     return get_bookings()
 
 @bookings_bp.route('', methods=['POST'])
+@admission_class(CRITICAL)
+@idempotent
+@invalidates(OPERATOR_STATS_CACHE)
 @role_required('user')
 def create_booking():
     """Create a new booking"""
@@ -394,6 +414,7 @@ def create_booking():
         booking.updated_at = now_utc()
         booking_dict_for_insert = booking.to_dict()
         booking_dict_for_insert['reminder_sent_30m'] = False
+        booking_dict_for_insert.update(Station.scope_fields(station))
 
         try:
             result = db.bookings.insert_one(booking_dict_for_insert)
@@ -436,10 +457,14 @@ def create_booking():
             'message': 'Booking created successfully',
             'data': booking_dict
         }), 201
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @bookings_bp.route('/<booking_id>/cancel', methods=['POST'])
+@admission_class(CRITICAL)
+@invalidates(OPERATOR_STATS_CACHE)
 @role_required('user', 'admin')
 def cancel_booking(booking_id):
     """Cancel a booking"""
@@ -451,21 +476,22 @@ def cancel_booking(booking_id):
         if not booking_oid:
             return jsonify({'success': False, 'error': 'Invalid booking id'}), 400
 
-        booking_data = db.bookings.find_one({'_id': booking_oid})
-        
+        booking_filter = owned_filter(booking_oid, user, owner_field='user_id')
+        booking_filter['status'] = {'$ne': 'cancelled'}
+        booking_data = db.bookings.find_one_and_update(
+            booking_filter,
+            {'$set': {'status': 'cancelled', 'updated_at': now_utc()}},
+            projection={'user_id': 1, 'station_id': 1, 'date': 1, 'time_slot': 1},
+            return_document=ReturnDocument.AFTER
+        )
+
         if not booking_data:
-            return jsonify({'success': False, 'error': 'Booking not found'}), 404
-        
-        if user.get('role') != 'admin' and booking_data.get('user_id') != user.get('_id'):
-            return jsonify({'success': False, 'error': 'Unauthorized'}), 403
-        
-        if booking_data['status'] == 'cancelled':
+            existing = db.bookings.find_one({'_id': booking_oid}, {'user_id': 1, 'status': 1})
+            if not existing:
+                return jsonify({'success': False, 'error': 'Booking not found'}), 404
+            if user.get('role') != 'admin' and existing.get('user_id') != user.get('_id'):
+                return jsonify({'success': False, 'error': 'Unauthorized'}), 403
             return jsonify({'success': False, 'error': 'Booking is already cancelled'}), 400
-        
-        db.bookings.update_one(
-            {'_id': booking_oid},
-            {'$set': {'status': 'cancelled', 'updated_at': now_utc()}}
-        )
 
         station = db.stations.find_one({'_id': booking_data.get('station_id')}, {'name': 1, 'operator_id': 1})
         station_name = (station or {}).get('name') or 'Unknown Station'
@@ -496,10 +522,55 @@ def cancel_booking(booking_id):
         )
         
         return jsonify({'success': True, 'message': 'Booking cancelled successfully'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _resolve_slot_charging_type(station, normalized_port_id, charging_mode, charger_type_hint):
+    selected_port = None
+    if normalized_port_id is not None:
+        for port in station.get('ports', []):
+            if _normalize_port_id(port.get('id')) == normalized_port_id:
+                selected_port = port
+                break
+
+    selected_type = (selected_port or {}).get('type', 'normal')
+    if charging_mode == 'fast':
+        selected_type = 'fast'
+    elif charging_mode == 'normal':
+        selected_type = 'normal'
+    elif charger_type_hint:
+        selected_type = charger_type_hint
+    return selected_type
+
+
+def _booked_slots_query(station_oid, date, normalized_port_id):
+    query = {
+        'station_id': station_oid,
+        'date': date,
+        'status': {'$in': ['confirmed', 'pending']}
+    }
+    if normalized_port_id is not None:
+        query['port_id'] = normalized_port_id
+    return query
+
+
+def _slot_statuses(time_slots, booked_slots):
+    slot_statuses = [
+        {
+            'slot': slot,
+            'status': 'booked' if slot in booked_slots else 'available',
+            'isBooked': slot in booked_slots,
+        }
+        for slot in time_slots
+    ]
+    available = [entry['slot'] for entry in slot_statuses if entry['status'] == 'available']
+    return slot_statuses, available
+
+
 @bookings_bp.route('/available-slots', methods=['GET'])
+@query_deadline('fast')
 def get_available_slots():
     """Get available time slots for a station on a date"""
     try:
@@ -525,22 +596,10 @@ def get_available_slots():
         if not station:
             return jsonify({'success': False, 'error': 'Station not found'}), 404
 
-        selected_port = None
         normalized_port_id = _normalize_port_id(port_id)
-        if normalized_port_id is not None:
-            for port in station.get('ports', []):
-                if _normalize_port_id(port.get('id')) == normalized_port_id:
-                    selected_port = port
-                    break
-
-        selected_type = (selected_port or {}).get('type', 'normal')
-        if charging_mode == 'fast':
-            selected_type = 'fast'
-        elif charging_mode == 'normal':
-            selected_type = 'normal'
-        elif charger_type_hint:
-            selected_type = charger_type_hint
-        time_slots = _generate_time_slots(selected_type)
+        time_slots = _generate_time_slots(
+            _resolve_slot_charging_type(station, normalized_port_id, charging_mode, charger_type_hint)
+        )
 
         _ensure_booking_indexes(db)
         _refresh_elapsed_bookings(
@@ -552,28 +611,13 @@ def get_available_slots():
         _send_upcoming_booking_reminders(db)
         
         # Find booked slots
-        query = {
-            'station_id': station_oid,
-            'date': date,
-            'status': {'$in': ['confirmed', 'pending']}
-        }
-        if normalized_port_id is not None:
-            query['port_id'] = normalized_port_id
-        
-        booked = list(db.bookings.find(query))
+        booked = list(db.bookings.find(_booked_slots_query(station_oid, date, normalized_port_id)))
         booked_slots = [b['time_slot'] for b in booked]
-
-        slot_statuses = [
-            {
-                'slot': slot,
-                'status': 'booked' if slot in booked_slots else 'available',
-                'isBooked': slot in booked_slots,
-            }
-            for slot in time_slots
-        ]
-        available = [entry['slot'] for entry in slot_statuses if entry['status'] == 'available']
+        slot_statuses, available = _slot_statuses(time_slots, booked_slots)
 
         return jsonify({'success': True, 'data': slot_statuses, 'availableSlots': available})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -600,5 +644,7 @@ def get_station_bookings(station_id):
         bookings = _serialize_bookings(bookings_data, db)
         
         return jsonify({'success': True, 'data': bookings})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -0,0 +1,117 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+import os
+
+from utils.admission import admission_class, ANALYTICS
+
+charging_bp = Blueprint('charging', __name__)
+
+# Projections per request (rows, or vehicles x chargers x durations)
+MAX_BATCH_PROJECTIONS = int(os.getenv('MAX_BATCH_PROJECTIONS', '100000'))
+
+SCENARIO_FIELDS = {
+    'batteryCapacityKwh': 'battery_capacity_kwh',
+    'currentPercentage': 'current_percentage',
+    'targetPercentage': 'target_percentage',
+    'durationMinutes': 'duration_minutes',
+    'ratePerKwh': 'rate_per_kwh',
+    'chargerPowerKw': 'charger_power_kw',
+    'progressPercentage': 'progress_percentage',
+}
+VEHICLE_FIELDS = ('batteryCapacityKwh', 'currentPercentage', 'targetPercentage')
+CHARGER_FIELDS = ('chargerPowerKw', 'ratePerKwh')
+
+
+class BatchInputError(ValueError):
+    pass
+
+
+def _column_length(name, value):
+    """Length of a list column, None for a scalar."""
+    if isinstance(value, list):
+        if any(isinstance(item, (list, dict)) for item in value):
+            raise BatchInputError(f'{name} must be a list of numbers')
+        return len(value)
+    if isinstance(value, dict):
+        raise BatchInputError(f'{name} must be a number or a list of numbers')
+    return None
+
+
+def _group_length(group_name, group, fields):
+    """Common length of a group's list columns (1 when all are scalars)."""
+    if not isinstance(group, dict):
+        raise BatchInputError(f'{group_name} must be an object of columns')
+    lengths = {
+        length for length in (_column_length(f'{group_name}.{field}', group.get(field)) for field in fields)
+        if length is not None
+    }
+    if len(lengths) > 1:
+        raise BatchInputError(f'{group_name} columns must all have the same length')
+    return lengths.pop() if lengths else 1
+
+
+@charging_bp.route('/projections/batch', methods=['POST'])
+@admission_class(ANALYTICS)
+@jwt_required()
+def batch_projections():
+    """
+    Charging projections for many scenarios in one call, as columns.
+
+    Either ``scenarios`` (columns of equal length, scalars repeat) or a grid
+    of ``vehicles`` x ``chargers`` x ``durationsMinutes``.
+    """
+    try:
+        # NumPy is only needed here; importing it lazily keeps it off every other route's import path
+        from utils.charging_batch import calculate_charging_projections, grid_projections, to_columns
+    except ImportError:
+        return jsonify({'success': False, 'error': 'Batch projections need numpy (pip install -r requirements.txt)'}), 503
+
+    try:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': 'Request body must be a JSON object'}), 400
+
+        if 'scenarios' in data:
+            scenarios = data['scenarios']
+            count = _group_length('scenarios', scenarios, SCENARIO_FIELDS)
+            shape = None
+        elif 'vehicles' in data or 'chargers' in data:
+            durations = data.get('durationsMinutes', 60)
+            if _column_length('progressPercentage', data.get('progressPercentage')) is not None:
+                raise BatchInputError('progressPercentage must be a number for a grid')
+            durations_length = _column_length('durationsMinutes', durations)
+            shape = [
+                _group_length('vehicles', data.get('vehicles') or {}, VEHICLE_FIELDS),
+                _group_length('chargers', data.get('chargers') or {}, CHARGER_FIELDS),
+                1 if durations_length is None else durations_length,
+            ]
+            count = shape[0] * shape[1] * shape[2]
+        else:
+            return jsonify({'success': False, 'error': 'Provide scenarios, or vehicles and chargers'}), 400
+
+        if count > MAX_BATCH_PROJECTIONS:
+            return jsonify({
+                'success': False,
+                'error': f'At most {MAX_BATCH_PROJECTIONS} projections per request ({count} requested)'
+            }), 400
+
+        if shape is None:
+            projections = calculate_charging_projections(**{
+                argument: scenarios[field] for field, argument in SCENARIO_FIELDS.items() if field in scenarios
+            })
+        else:
+            projections = grid_projections(
+                data.get('vehicles') or {},
+                data.get('chargers') or {},
+                durations,
+                progress_percentage=data.get('progressPercentage', 100),
+            )
+
+        result = {'count': count, 'projections': to_columns(projections)}
+        if shape is not None:
+            result['shape'] = shape
+        return jsonify({'success': True, 'data': result})
+    except BatchInputError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
@@ -3,8 +3,12 @@ from datetime import datetime
 from bson import ObjectId
 from flask import jsonify, g
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from pymongo.errors import PyMongoError
 
 from database import get_db
+from database.exceptions import DatabaseException, PartialResultError, classify_pymongo_error
+from models.station import Station
+from utils.cache import STALE, cached, cache_headers, peek
 
 
 DB_UNAVAILABLE = {
@@ -13,6 +17,11 @@ DB_UNAVAILABLE = {
 }
 
 
+# Response cache namespaces (utils/cache.py) for the dashboards
+ADMIN_STATS_CACHE = 'admin_stats'
+OPERATOR_STATS_CACHE = 'operator_stats'
+
+
 def to_object_id(value):
     if isinstance(value, ObjectId):
         return value
@@ -72,3 +81,79 @@ def owner_or_admin(target_user_id, current_user):
     if current_user.get('role') == 'admin':
         return True
     return target_oid == current_user.get('_id')
+
+
+def owned_filter(oid, current_user, owner_field='operator_id'):
+    """
+    Filter matching ``oid`` only when ``current_user`` may modify it, so the
+    ownership check rides on the write itself instead of a pre-read.
+    """
+    query = {'_id': oid}
+    if current_user.get('role') != 'admin':
+        query[owner_field] = current_user.get('_id')
+    return query
+
+
+def conditional_write_failure(collection, oid, label):
+    """
+    Response for a conditional write that matched nothing: 404 when the
+    document does not exist, 403 when it exists but the condition excluded
+    it. Costs one extra lookup, on the failure path only.
+    """
+    if collection.find_one({'_id': oid}, {'_id': 1}) is None:
+        return jsonify({'success': False, 'error': f'{label} not found'}), 404
+    return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+
+
+def propagate_station_scope(db, station):
+    """
+    Re-stamp a station's scope (Station.scope_fields) on its sessions,
+    bookings and transactions after its operator or city changed. Older
+    documents store the station reference as a string.
+    """
+    scope = Station.scope_fields(station)
+    station_oid = to_object_id(station['_id']) or station['_id']
+    for collection in (db.sessions, db.bookings, db.transactions):
+        collection.update_many(
+            {'station_id': {'$in': [station_oid, str(station_oid)]}}, {'$set': {**scope, 'updated_at': now_utc()}}
+        )
+
+
+def database_error_response(error):
+    """Structured JSON error for a (classified) database failure."""
+    error = classify_pymongo_error(error)
+    response = jsonify({
+        'success': False,
+        'error': error.message,
+        'code': error.error_code,
+        'details': error.details,
+    })
+    response.status_code = error.http_status
+    if error.http_status in (503, 504):
+        response.headers['Retry-After'] = '5'
+    return response
+
+
+def dashboard_response(namespace, scope, key, compute):
+    """
+    Serve a dashboard payload through the response cache. When computing it
+    fails on the database (deadline, outage), fall back to the last cached
+    payload, or to the sections that did load, flagged ``stale: true``.
+    """
+    try:
+        data, outcome, age = cached(namespace, scope, key, compute)
+        return cache_headers(jsonify({'success': True, 'data': data}), outcome, age)
+    except PartialResultError as e:
+        error, partial = e, e.partial
+    except (PyMongoError, DatabaseException, TimeoutError) as e:
+        error, partial = classify_pymongo_error(e), None
+
+    fallback = peek(namespace, scope, key)
+    if fallback is not None:
+        data, age = fallback
+        body = {'success': True, 'data': data, 'stale': True, 'error': error.to_dict()}
+        return cache_headers(jsonify(body), STALE, age)
+    if partial is not None:
+        body = {'success': True, 'data': partial, 'stale': True, 'partial': True, 'error': error.to_dict()}
+        return cache_headers(jsonify(body), STALE, 0)
+    return database_error_response(error)
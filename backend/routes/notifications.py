@@ -1,10 +1,12 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import get_db
+from pymongo.errors import PyMongoError
+from database.deadlines import query_deadline
 from models.notification import Notification
 from bson import ObjectId
 from datetime import datetime
-from routes.common import to_object_id
+from routes.common import to_object_id, conditional_write_failure, database_error_response
 
 notifications_bp = Blueprint('notifications', __name__)
 
@@ -21,7 +23,7 @@ def _is_admin(db, user_id):
     user_oid = to_object_id(user_id)
     if not user_oid:
         return False
-    user = db.users.find_one({'_id': user_oid})
+    user = db.users.find_one({'_id': user_oid}, {'role': 1})
     return bool(user and user.get('role') == 'admin')
 
 
@@ -40,7 +42,23 @@ def _build_user_match(user_id):
             seen.add(key)
     return {'$in': deduped}
 
+
+def _write_own_notification(db, notification_oid, current_user_id, write):
+    """
+    Apply ``write(filter)`` (returning the matched count) to a notification,
+    with ownership as part of the filter so the common case is one round
+    trip. Admins retry unscoped. Returns an error response, or None.
+    """
+    if write({'_id': notification_oid, 'user_id': _build_user_match(current_user_id)}):
+        return None
+    if _is_admin(db, current_user_id):
+        if write({'_id': notification_oid}):
+            return None
+        return jsonify({'success': False, 'error': 'Notification not found'}), 404
+    return conditional_write_failure(db.notifications, notification_oid, 'Notification')
+
 @notifications_bp.route('/user/<user_id>', methods=['GET'])
+@query_deadline('fast')
 @jwt_required()
 def get_user_notifications(user_id):
     """Get all notifications for a user"""
@@ -59,6 +77,8 @@ def get_user_notifications(user_id):
         notifications = [Notification.from_dict(data).to_response_dict() for data in notifications_data]
         
         return jsonify({'success': True, 'data': notifications})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -76,22 +96,16 @@ def mark_as_read(notification_id):
         if not notification_oid:
             return jsonify({'success': False, 'error': 'Invalid notification id'}), 400
 
-        notification = db.notifications.find_one({'_id': notification_oid})
-        if not notification:
-            return jsonify({'success': False, 'error': 'Notification not found'}), 404
-
-        if _normalize_user_id(notification.get('user_id')) != _normalize_user_id(current_user_id) and not _is_admin(db, current_user_id):
-            return jsonify({'success': False, 'error': 'Unauthorized'}), 403
-
-        result = db.notifications.update_one(
-            {'_id': notification_oid},
-            {'$set': {'read': True}}
+        error = _write_own_notification(
+            db, notification_oid, current_user_id,
+            lambda query: db.notifications.update_one(query, {'$set': {'read': True}}).matched_count
         )
-        
-        if result.modified_count == 0:
-            return jsonify({'success': False, 'error': 'Notification not found'}), 404
+        if error:
+            return error
         
         return jsonify({'success': True, 'message': 'Notification marked as read'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -114,6 +128,8 @@ def mark_all_as_read(user_id):
         )
         
         return jsonify({'success': True, 'message': 'All notifications marked as read'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -131,20 +147,21 @@ def delete_notification(notification_id):
         if not notification_oid:
             return jsonify({'success': False, 'error': 'Invalid notification id'}), 400
 
-        notification = db.notifications.find_one({'_id': notification_oid})
-        if not notification:
-            return jsonify({'success': False, 'error': 'Notification not found'}), 404
-
-        if _normalize_user_id(notification.get('user_id')) != _normalize_user_id(user_id) and not _is_admin(db, user_id):
-            return jsonify({'success': False, 'error': 'Unauthorized'}), 403
-
-        db.notifications.delete_one({'_id': notification_oid})
+        error = _write_own_notification(
+            db, notification_oid, user_id,
+            lambda query: db.notifications.delete_one(query).deleted_count
+        )
+        if error:
+            return error
         
         return jsonify({'success': True, 'message': 'Notification deleted'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @notifications_bp.route('/user/<user_id>/unread-count', methods=['GET'])
+@query_deadline('fast')
 @jwt_required()
 def get_unread_count(user_id):
     """Get count of unread notifications"""
@@ -163,5 +180,7 @@ def get_unread_count(user_id):
         })
         
         return jsonify({'success': True, 'data': {'count': count}})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -1,11 +1,19 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from database import get_db
+from database import get_db, QueryGroup
+from pymongo.errors import PyMongoError
+from database.deadlines import query_deadline
+from database.exceptions import PartialResultError
 from models.station import Station
 from bson import ObjectId
 from datetime import datetime, timedelta
 
-from routes.common import to_object_id, now_utc
+from routes.common import (
+    to_object_id, now_utc, dashboard_response, database_error_response, OPERATOR_STATS_CACHE, ADMIN_STATS_CACHE,
+)
+from utils.cache import invalidates
+from utils.admission import admission_class, ANALYTICS
+from utils.ratings import STARS, rating_breakdown
 
 operator_bp = Blueprint('operator', __name__)
 
@@ -123,15 +131,17 @@ def _port_key(raw_port_id):
         return str(raw_port_id)
 
 
+STATS_RANGE_DAYS = {
+    'week': 7,
+    'month': 30,
+    'quarter': 90,
+    'year': 365,
+}
+
+
 def _resolve_range_start(range_key):
     now_dt = now_utc()
-    range_map = {
-        'week': 7,
-        'month': 30,
-        'quarter': 90,
-        'year': 365,
-    }
-    return now_dt - timedelta(days=range_map.get(range_key, 30))
+    return now_dt - timedelta(days=STATS_RANGE_DAYS.get(range_key, 30))
 
 def require_operator():
     """Check operator role. Returns (is_operator, db) tuple."""
@@ -143,7 +153,200 @@ def require_operator():
     is_op = user and user.get('role') in ['operator', 'admin']
     return is_op, db
 
+def _compute_operator_stats(db, user_id, requested_range):
+    """Dashboard payload for one operator and stats range."""
+    # Get operator's stations
+    stations = list(db.stations.find({'operator_id': user_id}))
+    station_ids = [s['_id'] for s in stations]
+    station_ids_str = [str(station_id) for station_id in station_ids]
+    station_id_filter = {'$in': station_ids + station_ids_str}
+
+    total_stations = len(stations)
+    total_ports = sum(len(s.get('ports', [])) for s in stations)
+    now_dt = now_utc()
+    today_start = now_dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    range_start = _resolve_range_start(requested_range)
+
+    # Sessions and bookings both depend only on the station ids: fetch them
+    # together, and keep going with whichever loaded if the other fails.
+    with QueryGroup(tolerate_errors=True) as queries:
+        sessions_future = queries.submit(lambda: list(db.sessions.find({'station_id': station_id_filter})))
+        bookings_future = queries.submit(lambda: list(db.bookings.find({
+            'station_id': station_id_filter,
+            'status': {'$in': ['confirmed', 'pending']}
+        })))
+
+    missing = [
+        section for section, future in (('sessions', sessions_future), ('bookings', bookings_future))
+        if queries.value(future) is None
+    ]
+    all_operator_sessions = queries.value(sessions_future, [])
+    active_session_docs = [s for s in all_operator_sessions if (s.get('status') or '').lower() == 'active']
+    active_sessions = len(active_session_docs)
+
+    def _session_timestamp(session):
+        return (
+            _to_datetime(session.get('start_time'))
+            or _to_datetime(session.get('end_time'))
+            or _to_datetime(session.get('created_at'))
+            or _to_datetime(session.get('updated_at'))
+        )
+
+    today_sessions = [
+        s for s in all_operator_sessions
+        if (_session_timestamp(s) is not None and _session_timestamp(s) >= today_start)
+    ]
+
+    range_sessions = [
+        s for s in all_operator_sessions
+        if (_session_timestamp(s) is not None and _session_timestamp(s) >= range_start)
+    ]
+
+    completed_sessions = [
+        s for s in all_operator_sessions
+        if (s.get('status') or '').lower() == 'completed'
+    ]
+
+    today_revenue = sum(_to_float(s.get('cost') or s.get('total_cost')) for s in today_sessions)
+    today_energy = sum(_to_float(s.get('energy_delivered', s.get('energyDelivered', 0))) for s in today_sessions)
+    monthly_revenue = sum(_to_float(s.get('cost') or s.get('total_cost')) for s in range_sessions)
+    monthly_energy = sum(_to_float(s.get('energy_delivered', s.get('energyDelivered', 0))) for s in range_sessions)
+    avg_duration = (
+        sum(_to_float(s.get('duration'), 0) for s in completed_sessions) / max(len(completed_sessions), 1)
+    )
+
+    station_name_map = {str(station['_id']): station.get('name', 'Unknown Station') for station in stations}
+    active_session_ports_by_station = {}
+    for session in active_session_docs:
+        station_key = str(session.get('station_id')) if session.get('station_id') is not None else None
+        if not station_key:
+            continue
+        session_port = _port_key(session.get('port_id'))
+        if session_port is None:
+            session_port = f"session:{str(session.get('_id') or '')}"
+        if station_key not in active_session_ports_by_station:
+            active_session_ports_by_station[station_key] = set()
+        active_session_ports_by_station[station_key].add(session_port)
+
+    active_bookings = queries.value(bookings_future, [])
+    active_booking_ports_by_station = {}
+    for booking in active_bookings:
+        if not _is_booking_active_now(booking, now_dt):
+            continue
+        station_key = str(booking.get('station_id')) if booking.get('station_id') is not None else None
+        if not station_key:
+            continue
+        booking_port = _port_key(booking.get('port_id'))
+        if booking_port is None:
+            booking_port = f"booking:{str(booking.get('_id') or '')}"
+        if station_key not in active_booking_ports_by_station:
+            active_booking_ports_by_station[station_key] = set()
+        active_booking_ports_by_station[station_key].add(booking_port)
+
+    station_utilization = []
+    total_booked_slots = 0
+    total_available_slots = 0
+    for station in stations:
+        station_key = str(station.get('_id'))
+        station_slots = len(station.get('ports', []))
+        occupied_port_ids = set()
+        occupied_port_ids.update(active_session_ports_by_station.get(station_key, set()))
+        occupied_port_ids.update(active_booking_ports_by_station.get(station_key, set()))
+        booked_slots = min(
+            station_slots,
+            len(occupied_port_ids)
+        )
+        available_slots = max(station_slots - booked_slots, 0)
+        utilization = round((booked_slots / station_slots) * 100) if station_slots > 0 else 0
+
+        total_booked_slots += booked_slots
+        total_available_slots += available_slots
+        station_utilization.append({
+            'stationId': station_key,
+            'station': station_name_map.get(station_key, 'Unknown Station'),
+            'totalSlots': station_slots,
+            'bookedSlots': booked_slots,
+            'availableSlots': available_slots,
+            'utilization': utilization,
+        })
+
+    port_utilization = round((total_booked_slots / max(total_ports, 1)) * 100) if total_ports > 0 else 0
+
+    # Maintenance alerts
+    alerts = []
+    for station in stations:
+        for port in station.get('ports', []):
+            if port.get('status') == 'offline':
+                alerts.append({
+                    'id': f"{station['_id']}-{port['id']}",
+                    'stationId': str(station['_id']),
+                    'portId': port['id'],
+                    'type': 'offline',
+                    'message': f"Port {port['id']} is offline",
+                    'priority': 'high',
+                    'timestamp': now_utc().isoformat()
+                })
+
+    # Revenue by station
+    revenue_by_station = []
+    for station in stations:
+        station_sessions = [
+            s for s in range_sessions
+            if s.get('station_id') in (station['_id'], str(station['_id']))
+        ]
+        station_revenue = sum(_to_float(s.get('cost') or s.get('total_cost')) for s in station_sessions)
+        revenue_by_station.append({
+            'station': station['name'],
+            'revenue': round(station_revenue, 2),
+            'sessions': len(station_sessions),
+        })
+
+    # Sessions by hour (live data from selected range)
+    sessions_by_hour_map = {hour: 0 for hour in range(24)}
+    for session in range_sessions:
+        session_dt = _session_timestamp(session)
+        if not session_dt:
+            continue
+        hour_value = session_dt.hour if hasattr(session_dt, 'hour') else None
+        if hour_value is None:
+            continue
+        sessions_by_hour_map[hour_value] = sessions_by_hour_map.get(hour_value, 0) + 1
+
+    sessions_by_hour = []
+    for hour, total in sorted(sessions_by_hour_map.items(), key=lambda item: item[0]):
+        hour_dt = datetime(now_dt.year, now_dt.month, now_dt.day, hour, 0)
+        sessions_by_hour.append({
+            'hour': hour_dt.strftime('%I%p').lstrip('0'),
+            'sessions': int(total),
+        })
+
+    stats = {
+        'totalStations': total_stations,
+        'totalPorts': total_ports,
+        'activeSessions': active_sessions,
+        'todayRevenue': round(today_revenue, 2),
+        'todayEnergy': round(today_energy, 1),
+        'monthlyRevenue': round(monthly_revenue, 2),
+        'monthlyEnergy': round(monthly_energy, 1),
+        'portUtilization': port_utilization,
+        'averageSessionDuration': round(avg_duration),
+        'maintenanceAlerts': alerts,
+        'revenueByStation': revenue_by_station,
+        'sessionsByHour': sessions_by_hour,
+        'stationUtilization': station_utilization,
+        'totalSlots': total_ports,
+        'bookedSlots': total_booked_slots,
+        'availableSlots': total_available_slots,
+        'totalSessions': len(range_sessions),
+    }
+    if missing:
+        raise PartialResultError(partial=stats, missing=missing, errors=queries.errors)
+    return stats
+
+
 @operator_bp.route('/stats', methods=['GET'])
+@query_deadline('report')
+@admission_class(ANALYTICS)
 @jwt_required()
 def get_operator_stats():
     """Get operator dashboard statistics"""
@@ -159,183 +362,15 @@ def get_operator_stats():
             return jsonify({'success': False, 'error': 'Invalid user id'}), 401
 
         requested_range = (request.args.get('range') or 'month').lower()
+        if requested_range not in STATS_RANGE_DAYS:
+            requested_range = 'month'
 
-        # Get operator's stations
-        stations = list(db.stations.find({'operator_id': user_id}))
-        station_ids = [s['_id'] for s in stations]
-        station_ids_str = [str(station_id) for station_id in station_ids]
-        station_id_filter = {'$in': station_ids + station_ids_str}
-        
-        total_stations = len(stations)
-        total_ports = sum(len(s.get('ports', [])) for s in stations)
-        now_dt = now_utc()
-        today_start = now_dt.replace(hour=0, minute=0, second=0, microsecond=0)
-        range_start = _resolve_range_start(requested_range)
-        
-        all_operator_sessions = list(db.sessions.find({'station_id': station_id_filter}))
-        active_session_docs = [s for s in all_operator_sessions if (s.get('status') or '').lower() == 'active']
-        active_sessions = len(active_session_docs)
-
-        def _session_timestamp(session):
-            return (
-                _to_datetime(session.get('start_time'))
-                or _to_datetime(session.get('end_time'))
-                or _to_datetime(session.get('created_at'))
-                or _to_datetime(session.get('updated_at'))
-            )
-
-        today_sessions = [
-            s for s in all_operator_sessions
-            if (_session_timestamp(s) is not None and _session_timestamp(s) >= today_start)
-        ]
-
-        range_sessions = [
-            s for s in all_operator_sessions
-            if (_session_timestamp(s) is not None and _session_timestamp(s) >= range_start)
-        ]
-
-        completed_sessions = [
-            s for s in all_operator_sessions
-            if (s.get('status') or '').lower() == 'completed'
-        ]
-
-        today_revenue = sum(_to_float(s.get('cost') or s.get('total_cost')) for s in today_sessions)
-        today_energy = sum(_to_float(s.get('energy_delivered', s.get('energyDelivered', 0))) for s in today_sessions)
-        monthly_revenue = sum(_to_float(s.get('cost') or s.get('total_cost')) for s in range_sessions)
-        monthly_energy = sum(_to_float(s.get('energy_delivered', s.get('energyDelivered', 0))) for s in range_sessions)
-        avg_duration = (
-            sum(_to_float(s.get('duration'), 0) for s in completed_sessions) / max(len(completed_sessions), 1)
+        return dashboard_response(
+            OPERATOR_STATS_CACHE, f"operator:{user_id}", requested_range,
+            lambda: _compute_operator_stats(db, user_id, requested_range)
         )
-
-        station_name_map = {str(station['_id']): station.get('name', 'Unknown Station') for station in stations}
-        active_session_ports_by_station = {}
-        for session in active_session_docs:
-            station_key = str(session.get('station_id')) if session.get('station_id') is not None else None
-            if not station_key:
-                continue
-            session_port = _port_key(session.get('port_id'))
-            if session_port is None:
-                session_port = f"session:{str(session.get('_id') or '')}"
-            if station_key not in active_session_ports_by_station:
-                active_session_ports_by_station[station_key] = set()
-            active_session_ports_by_station[station_key].add(session_port)
-
-        active_bookings = list(db.bookings.find({
-            'station_id': station_id_filter,
-            'status': {'$in': ['confirmed', 'pending']}
-        }))
-        active_booking_ports_by_station = {}
-        for booking in active_bookings:
-            if not _is_booking_active_now(booking, now_dt):
-                continue
-            station_key = str(booking.get('station_id')) if booking.get('station_id') is not None else None
-            if not station_key:
-                continue
-            booking_port = _port_key(booking.get('port_id'))
-            if booking_port is None:
-                booking_port = f"booking:{str(booking.get('_id') or '')}"
-            if station_key not in active_booking_ports_by_station:
-                active_booking_ports_by_station[station_key] = set()
-            active_booking_ports_by_station[station_key].add(booking_port)
-
-        station_utilization = []
-        total_booked_slots = 0
-        total_available_slots = 0
-        for station in stations:
-            station_key = str(station.get('_id'))
-            station_slots = len(station.get('ports', []))
-            occupied_port_ids = set()
-            occupied_port_ids.update(active_session_ports_by_station.get(station_key, set()))
-            occupied_port_ids.update(active_booking_ports_by_station.get(station_key, set()))
-            booked_slots = min(
-                station_slots,
-                len(occupied_port_ids)
-            )
-            available_slots = max(station_slots - booked_slots, 0)
-            utilization = round((booked_slots / station_slots) * 100) if station_slots > 0 else 0
-
-            total_booked_slots += booked_slots
-            total_available_slots += available_slots
-            station_utilization.append({
-                'stationId': station_key,
-                'station': station_name_map.get(station_key, 'Unknown Station'),
-                'totalSlots': station_slots,
-                'bookedSlots': booked_slots,
-                'availableSlots': available_slots,
-                'utilization': utilization,
-            })
-
-        port_utilization = round((total_booked_slots / max(total_ports, 1)) * 100) if total_ports > 0 else 0
-        
-        # Maintenance alerts
-        alerts = []
-        for station in stations:
-            for port in station.get('ports', []):
-                if port.get('status') == 'offline':
-                    alerts.append({
-                        'id': f"{station['_id']}-{port['id']}",
-                        'stationId': str(station['_id']),
-                        'portId': port['id'],
-                        'type': 'offline',
-                        'message': f"Port {port['id']} is offline",
-                        'priority': 'high',
-                        'timestamp': now_utc().isoformat()
-                    })
-        
-        # Revenue by station
-        revenue_by_station = []
-        for station in stations:
-            station_sessions = [
-                s for s in range_sessions
-                if s.get('station_id') in (station['_id'], str(station['_id']))
-            ]
-            station_revenue = sum(_to_float(s.get('cost') or s.get('total_cost')) for s in station_sessions)
-            revenue_by_station.append({
-                'station': station['name'],
-                'revenue': round(station_revenue, 2),
-                'sessions': len(station_sessions),
-            })
-        
-        # Sessions by hour (live data from selected range)
-        sessions_by_hour_map = {hour: 0 for hour in range(24)}
-        for session in range_sessions:
-            session_dt = _session_timestamp(session)
-            if not session_dt:
-                continue
-            hour_value = session_dt.hour if hasattr(session_dt, 'hour') else None
-            if hour_value is None:
-                continue
-            sessions_by_hour_map[hour_value] = sessions_by_hour_map.get(hour_value, 0) + 1
-
-        sessions_by_hour = []
-        for hour, total in sorted(sessions_by_hour_map.items(), key=lambda item: item[0]):
-            hour_dt = datetime(now_dt.year, now_dt.month, now_dt.day, hour, 0)
-            sessions_by_hour.append({
-                'hour': hour_dt.strftime('%I%p').lstrip('0'),
-                'sessions': int(total),
-            })
-        
-        stats = {
-            'totalStations': total_stations,
-            'totalPorts': total_ports,
-            'activeSessions': active_sessions,
-            'todayRevenue': round(today_revenue, 2),
-            'todayEnergy': round(today_energy, 1),
-            'monthlyRevenue': round(monthly_revenue, 2),
-            'monthlyEnergy': round(monthly_energy, 1),
-            'portUtilization': port_utilization,
-            'averageSessionDuration': round(avg_duration),
-            'maintenanceAlerts': alerts,
-            'revenueByStation': revenue_by_station,
-            'sessionsByHour': sessions_by_hour,
-            'stationUtilization': station_utilization,
-            'totalSlots': total_ports,
-            'bookedSlots': total_booked_slots,
-            'availableSlots': total_available_slots,
-            'totalSessions': len(range_sessions),
-        }
-        
-        return jsonify({'success': True, 'data': stats})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -364,6 +399,8 @@ def get_operator_stations():
             stations.append(station_response)
         
         return jsonify({'success': True, 'data': stations})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -407,10 +444,13 @@ def update_pricing(station_id):
         )
         
         return jsonify({'success': True, 'message': 'Pricing updated successfully'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @operator_bp.route('/port-status/<station_id>/<port_id>', methods=['PUT'])
+@invalidates(ADMIN_STATS_CACHE, OPERATOR_STATS_CACHE)
 @jwt_required()
 def update_port_status(station_id, port_id):
     """Update port status"""
@@ -436,6 +476,8 @@ def update_port_status(station_id, port_id):
             return jsonify({'success': False, 'error': 'Station or port not found'}), 404
         
         return jsonify({'success': True, 'message': 'Port status updated'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -471,13 +513,57 @@ def get_maintenance_alerts():
                     })
         
         return jsonify({'success': True, 'data': alerts})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+FEEDBACK_PAGE_SIZE = 20
+MAX_FEEDBACK_PAGE_SIZE = 100
+RECENT_REVIEWS_PER_STATION = 5
+
+
+def _feedback_pipeline(operator_id, page, limit):
+    """
+    One page of an operator's stations (by name) with their rating
+    aggregates and latest reviews, plus totals over all of the operator's
+    stations, in one command.
+    """
+    return [
+        {'$match': {'operator_id': operator_id}},
+        {'$sort': {'name': 1, '_id': 1}},
+        {'$facet': {
+            'summary': [{'$group': {
+                '_id': None,
+                'stations': {'$sum': 1},
+                'reviews': {'$sum': '$total_reviews'},
+                'rating_sum': {'$sum': '$rating_sum'},
+                **{f'star_{star}': {'$sum': f'$rating_counts.{star}'} for star in STARS},
+            }}],
+            'stations': [
+                {'$skip': (page - 1) * limit},
+                {'$limit': limit},
+                {'$project': {'name': 1, 'rating': 1, 'total_reviews': 1, 'rating_counts': 1}},
+                {'$lookup': {
+                    'from': 'reviews',
+                    'let': {'station_id': '$_id'},
+                    'pipeline': [
+                        {'$match': {'$expr': {'$eq': ['$station_id', '$$station_id']}}},
+                        {'$sort': {'timestamp': -1}},
+                        {'$limit': RECENT_REVIEWS_PER_STATION},
+                        {'$project': {'_id': 0, 'rating': 1, 'comment': 1, 'timestamp': 1}},
+                    ],
+                    'as': 'recent_reviews',
+                }},
+            ],
+        }},
+    ]
+
+
 @operator_bp.route('/feedback', methods=['GET'])
 @jwt_required()
 def get_operator_feedback():
-    """Get feedback for operator's stations"""
+    """Get feedback for operator's stations, paginated by station (?page=&limit=)"""
     try:
         is_op, db = require_operator()
         if db is None:
@@ -488,23 +574,19 @@ def get_operator_feedback():
         user_id = to_object_id(get_jwt_identity())
         if not user_id:
             return jsonify({'success': False, 'error': 'Invalid user id'}), 401
-        stations = list(db.stations.find({'operator_id': user_id}))
-        
+        page = max(request.args.get('page', 1, type=int) or 1, 1)
+        limit = min(max(request.args.get('limit', FEEDBACK_PAGE_SIZE, type=int) or FEEDBACK_PAGE_SIZE, 1), MAX_FEEDBACK_PAGE_SIZE)
+
+        result = next(db.stations.aggregate(_feedback_pipeline(user_id, page, limit)), {})
+        summary = (result.get('summary') or [{}])[0]
+        total = summary.get('stations', 0)
+        total_reviews = summary.get('reviews', 0)
+
         feedback = []
-        for station in stations:
-            reviews = list(db.reviews.find({'station_id': station['_id']}).sort('timestamp', -1).limit(5))
-            
-            # Rating breakdown
-            all_reviews = list(db.reviews.find({'station_id': station['_id']}))
-            rating_breakdown = {5: 0, 4: 0, 3: 0, 2: 0, 1: 0}
-            for r in all_reviews:
-                rating = r.get('rating', 0)
-                if rating in rating_breakdown:
-                    rating_breakdown[rating] += 1
-            
+        for station in result.get('stations', []):
             feedback.append({
                 'stationId': str(station['_id']),
-                'stationName': station['name'],
+                'stationName': station.get('name'),
                 'averageRating': station.get('rating', 0),
                 'totalReviews': station.get('total_reviews', 0),
                 'recentReviews': [
@@ -512,12 +594,24 @@ def get_operator_feedback():
                         'rating': r.get('rating'),
                         'comment': r.get('comment'),
                         'date': r.get('timestamp').strftime('%Y-%m-%d') if r.get('timestamp') else None
-                    } for r in reviews
+                    } for r in station.get('recent_reviews', [])
                 ],
-                'ratingBreakdown': rating_breakdown
+                'ratingBreakdown': rating_breakdown(station)
             })
         
-        return jsonify({'success': True, 'data': feedback})
+        return jsonify({
+            'success': True,
+            'data': feedback,
+            'summary': {
+                'stations': total,
+                'totalReviews': total_reviews,
+                'averageRating': round((summary.get('rating_sum') or 0) / total_reviews, 1) if total_reviews else 0,
+                'ratingBreakdown': {star: summary.get(f'star_{star}', 0) for star in reversed(STARS)},
+            },
+            'pagination': {'page': page, 'limit': limit, 'total': total, 'pages': -(-total // limit)}
+        })
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -549,5 +643,7 @@ def resolve_alert(alert_id):
             return jsonify({'success': False, 'error': 'Alert not found'}), 404
         
         return jsonify({'success': True, 'message': 'Alert resolved'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
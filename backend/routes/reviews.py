@@ -1,17 +1,21 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import get_db
+from pymongo.errors import PyMongoError
+from database.deadlines import query_deadline
 from models.review import Review
 from bson import ObjectId
 from datetime import datetime
 
-from routes.common import to_object_id
+from routes.common import to_object_id, now_utc, database_error_response
+from utils.ratings import STARS, apply_review
 
 reviews_bp = Blueprint('reviews', __name__)
 
 DB_UNAVAILABLE = {'success': False, 'error': 'Database connection unavailable. Please try again later.'}
 
 @reviews_bp.route('/station/<station_id>', methods=['GET'])
+@query_deadline('fast')
 def get_station_reviews(station_id):
     """Get all reviews for a station"""
     try:
@@ -27,6 +31,8 @@ def get_station_reviews(station_id):
         reviews = [Review.from_dict(data).to_response_dict() for data in reviews_data]
         
         return jsonify({'success': True, 'data': reviews})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -80,10 +86,11 @@ def create_review():
         result = db.reviews.insert_one(review.to_dict())
         review.id = str(result.inserted_id)
         
-        # Update station rating
-        _update_station_rating(station_id=station_id)
+        apply_review(db, station_id, rating, 1)
         
         return jsonify({'success': True, 'data': review.to_response_dict()}), 201
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -112,6 +119,8 @@ def get_user_reviews(user_id):
             reviews.append(review_dict)
         
         return jsonify({'success': True, 'data': reviews})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -126,13 +135,15 @@ def mark_helpful(review_id):
         
         result = db.reviews.update_one(
             {'_id': ObjectId(review_id)},
-            {'$inc': {'helpful': 1}}
+            {'$inc': {'helpful': 1}, '$set': {'updated_at': now_utc()}}
         )
         
         if result.modified_count == 0:
             return jsonify({'success': False, 'error': 'Review not found'}), 404
         
         return jsonify({'success': True, 'message': 'Marked as helpful'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -156,38 +167,13 @@ def delete_review(review_id):
         if review['user_id'] != to_object_id(user_id) and user.get('role') != 'admin':
             return jsonify({'success': False, 'error': 'Unauthorized'}), 403
         
-        station_id = review['station_id']
-        db.reviews.delete_one({'_id': ObjectId(review_id)})
-        
-        # Update station rating
-        _update_station_rating(station_id)
+        # Only the request that actually deleted the review adjusts the station
+        result = db.reviews.delete_one({'_id': review['_id']})
+        if result.deleted_count and review.get('rating') in STARS:
+            apply_review(db, to_object_id(review['station_id']), review['rating'], -1)
         
         return jsonify({'success': True, 'message': 'Review deleted'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
-
-def _update_station_rating(station_id):
-    """Helper to update station's average rating"""
-    try:
-        db = get_db()
-        if db is None:
-            return
-        
-        reviews = list(db.reviews.find({'station_id': station_id}))
-        
-        if reviews:
-            avg_rating = sum(r['rating'] for r in reviews) / len(reviews)
-            db.stations.update_one(
-                {'_id': to_object_id(station_id)},
-                {'$set': {
-                    'rating': round(avg_rating, 1),
-                    'total_reviews': len(reviews)
-                }}
-            )
-        else:
-            db.stations.update_one(
-                {'_id': to_object_id(station_id)},
-                {'$set': {'rating': 0, 'total_reviews': 0}}
-            )
-    except Exception as e:
-        print(f"Error updating station rating: {e}")
@@ -1,13 +1,22 @@
 from flask import Blueprint, request, jsonify, g
 from models.session import Session
+from models.station import Station
 from models.notification import Notification
+from models.transaction import Transaction
 from datetime import datetime, timedelta
 import math
-from models.transaction import Transaction
-from pymongo.errors import DuplicateKeyError
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
 from utils.charging import calculate_charging_projection, MIN_WALLET_BALANCE_INR
+from utils.spending import wallet_balance
 
-from routes.common import role_required, to_object_id, now_utc
+from routes.common import (
+    role_required, to_object_id, now_utc, database_error_response, ADMIN_STATS_CACHE, OPERATOR_STATS_CACHE,
+)
+from database.deadlines import query_deadline
+from utils.cache import invalidates
+from utils.admission import admission_class, CRITICAL
+from utils.idempotency import idempotent
 
 sessions_bp = Blueprint('sessions', __name__)
 
@@ -95,85 +104,31 @@ def _to_number(value):
         return None
 
 
-def _to_amount(value):
-    try:
-        if value is None:
-            return 0.0
-        return round(float(value), 2)
-    except (TypeError, ValueError):
-        return 0.0
-
-
-def _build_user_match(user_id):
-    user_oid = to_object_id(user_id)
-    candidates = []
-    seen = set()
-
-    for value in [user_id, str(user_id) if user_id is not None else None, user_oid, str(user_oid) if user_oid else None]:
-        if value is None:
-            continue
-        key = f"{type(value).__name__}:{value}"
-        if key in seen:
-            continue
-        seen.add(key)
-        candidates.append(value)
-
-    return {'$in': candidates}
-
-
-def _resolve_transaction_amount(db, transaction):
-    amount = _to_amount(transaction.get('amount'))
-    if amount > 0:
-        return amount
-
-    session_id = transaction.get('session_id')
-    session_oid = to_object_id(session_id)
-    if not session_oid:
-        return 0.0
-
-    session = db.sessions.find_one({'_id': session_oid}, {'cost': 1, 'total_cost': 1})
-    if not session:
-        return 0.0
-
-    return _to_amount(session.get('cost') or session.get('total_cost'))
-
-
-def _get_wallet_balance(db, user_id):
-    topups = list(db.transactions.find({
-        'user_id': _build_user_match(user_id),
-        'type': 'wallet_topup',
-        'status': 'completed'
-    }))
-
-    wallet_payments = list(db.transactions.find({
-        'user_id': _build_user_match(user_id),
-        'payment_method': {'$regex': '^wallet$', '$options': 'i'},
-        'type': 'charging',
-        'status': 'completed'
-    }))
-
-    total_topup = sum(_to_amount(txn.get('amount')) for txn in topups)
-    total_spent = sum(_resolve_transaction_amount(db, txn) for txn in wallet_payments)
-    return round(max(0.0, total_topup - total_spent), 2)
+def _create_notifications(db, user_ids, notification_type, title, message, action_url=None):
+    documents = [
+        Notification(
+            user_id=str(user_id),
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            action_url=action_url
+        ).to_dict()
+        for user_id in user_ids
+        if user_id
+    ]
+    if documents:
+        db.notifications.insert_many(documents, ordered=False)
 
 
 def _create_notification(db, user_id, notification_type, title, message, action_url=None):
-    if not user_id:
-        return
-    notification = Notification(
-        user_id=str(user_id),
-        notification_type=notification_type,
-        title=title,
-        message=message,
-        action_url=action_url
-    )
-    db.notifications.insert_one(notification.to_dict())
+    _create_notifications(db, [user_id], notification_type, title, message, action_url)
 
 
 def _notify_admins(db, notification_type, title, message, action_url=None):
     admin_users = list(db.users.find({'role': 'admin'}, {'_id': 1}))
-    for admin in admin_users:
-        _create_notification(db, admin.get('_id'), notification_type, title, message, action_url)
+    _create_notifications(
+        db, [admin.get('_id') for admin in admin_users], notification_type, title, message, action_url
+    )
 
 @sessions_bp.route('', methods=['GET'])
 @role_required('user', 'operator', 'admin')
@@ -187,14 +142,15 @@ def get_sessions():
         if user.get('role') == 'user':
             query['user_id'] = user.get('_id')
         elif user.get('role') == 'operator':
-            station_ids = [s['_id'] for s in db.stations.find({'operator_id': user.get('_id')}, {'_id': 1})]
-            query['station_id'] = {'$in': station_ids}
+            query['operator_id'] = user.get('_id')
 
         sessions_data = list(db.sessions.find(query).sort('start_time', -1))
         sessions = [Session.from_dict(data).to_response_dict() for data in sessions_data]
         sessions = _enrich_sessions(db, sessions)
         
         return jsonify({'success': True, 'data': sessions})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -206,6 +162,7 @@ def get_user_sessions(user_id):
     return get_sessions()
 
 @sessions_bp.route('/active/<user_id>', methods=['GET'])
+@query_deadline('fast')
 @role_required('user', 'admin')
 def get_active_session(user_id):
     """Get active session for a user"""
@@ -230,10 +187,15 @@ def get_active_session(user_id):
             return jsonify({'success': True, 'data': enriched[0] if enriched else None})
         
         return jsonify({'success': True, 'data': None})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @sessions_bp.route('/start', methods=['POST'])
+@admission_class(CRITICAL)
+@idempotent
+@invalidates(ADMIN_STATS_CACHE, OPERATOR_STATS_CACHE)
 @role_required('user')
 def start_session():
     """Start a new charging session"""
@@ -251,7 +213,7 @@ def start_session():
         if not station_id:
             return jsonify({'success': False, 'error': 'Invalid stationId'}), 400
 
-        station = db.stations.find_one({'_id': station_id}, {'name': 1, 'ports': 1})
+        station = db.stations.find_one({'_id': station_id}, {'name': 1, 'ports': 1, **Station.scope_projection})
         if not station:
             return jsonify({'success': False, 'error': 'Station not found'}), 404
 
@@ -271,8 +233,8 @@ def start_session():
         
         payment_method = data.get('paymentMethod', 'Wallet')
         if str(payment_method).lower() == 'wallet':
-            wallet_balance = _get_wallet_balance(db, user_id)
-            if wallet_balance < MIN_WALLET_BALANCE_INR:
+            balance = wallet_balance(db, user_id)
+            if balance < MIN_WALLET_BALANCE_INR:
                 return jsonify({
                     'success': False,
                     'error': f'Minimum wallet balance must be ₹{int(MIN_WALLET_BALANCE_INR)} to start charging.'
@@ -281,7 +243,7 @@ def start_session():
         # Update port status to busy
         db.stations.update_one(
             {'_id': station_id, 'ports.id': data['portId']},
-            {'$set': {'ports.$.status': 'busy'}}
+            {'$set': {'ports.$.status': 'busy', 'updated_at': now_utc()}}
         )
 
         selected_port = None
@@ -327,6 +289,7 @@ def start_session():
             'target_energy_kwh': projection['targetEnergyKwh'],
             'estimated_cost': projection['estimatedTotalCost'],
         })
+        session_payload.update(Station.scope_fields(station))
 
         try:
             result = db.sessions.insert_one(session_payload)
@@ -358,10 +321,14 @@ def start_session():
             'message': 'Charging session started successfully.',
             'data': session.to_response_dict()
         }), 201
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @sessions_bp.route('/stop/<session_id>', methods=['POST'])
+@admission_class(CRITICAL)
+@invalidates(ADMIN_STATS_CACHE, OPERATOR_STATS_CACHE)
 @role_required('user', 'operator', 'admin')
 def stop_session(session_id):
     """Stop a charging session"""
@@ -379,7 +346,10 @@ def stop_session(session_id):
         if not session_data:
             return jsonify({'success': False, 'error': 'Session not found'}), 404
 
-        station = db.stations.find_one({'_id': to_object_id(session_data.get('station_id'))})
+        station = db.stations.find_one(
+            {'_id': to_object_id(session_data.get('station_id'))},
+            {'name': 1, 'ports': 1, **Station.scope_projection}
+        )
 
         if current_user.get('role') == 'user' and session_data.get('user_id') != current_user.get('_id'):
             return jsonify({'success': False, 'error': 'Unauthorized'}), 403
@@ -431,9 +401,16 @@ def stop_session(session_id):
             1,
         )
         
-        # Update session
-        db.sessions.update_one(
-            {'_id': session_oid},
+        # Sessions started before the station scope was stamped get it here
+        scope = Station.scope_fields(station) if station else {
+            'station_id': session_data.get('station_id'),
+            'operator_id': session_data.get('operator_id'),
+            'city': session_data.get('city'),
+        }
+
+        # Complete the session; matching on status makes a concurrent stop a no-op
+        updated_session = db.sessions.find_one_and_update(
+            {'_id': session_oid, 'status': 'active'},
             {'$set': {
                 'status': 'completed',
                 'end_time': end_time,
@@ -448,51 +425,38 @@ def stop_session(session_id):
                 'estimated_cost': projection['estimatedTotalCost'],
                 'price_per_kwh': projection['ratePerKwh'],
                 'charger_power_kw': projection['chargerPowerKw'],
+                **scope,
                 'updated_at': now_utc()
-            }}
+            }},
+            return_document=ReturnDocument.AFTER
         )
+        if not updated_session:
+            return jsonify({'success': False, 'error': 'Session is not active'}), 400
         
         # Update port status back to available
         db.stations.update_one(
             {'_id': to_object_id(session_data['station_id']), 'ports.id': session_data['port_id']},
-            {'$set': {'ports.$.status': 'available'}}
+            {'$set': {'ports.$.status': 'available', 'updated_at': now_utc()}}
         )
         
-        transaction_payload = {
-            'user_id': session_data['user_id'],
-            'session_id': session_oid,
-            'amount': total_cost,
-            'type': 'charging',
-            'payment_method': session_data.get('payment_method', 'Wallet'),
-            'status': 'completed',
-            'description': 'Charging session at station',
-            'timestamp': now_utc(),
-            'updated_at': now_utc(),
-        }
-        existing_transaction = db.transactions.find_one({
-            'session_id': session_oid,
-            'type': 'charging'
-        })
-        if existing_transaction:
-            db.transactions.update_one(
-                {'_id': existing_transaction['_id']},
-                {
-                    '$set': transaction_payload,
-                    '$setOnInsert': {'created_at': now_utc()}
-                }
-            )
-        else:
-            transaction = Transaction(
-                user_id=session_data['user_id'],
-                amount=total_cost,
-                transaction_type='charging',
-                payment_method=session_data.get('payment_method', 'Wallet'),
-                description='Charging session at station',
-                session_id=session_oid
-            )
-            transaction.created_at = now_utc()
-            transaction.timestamp = now_utc()
-            db.transactions.insert_one(transaction.to_dict())
+        # Every completed session gets its charging row, zero-cost ones included
+        db.transactions.update_one(
+            {'session_id': session_oid, 'type': 'charging'},
+            {
+                '$set': {
+                    'user_id': session_data['user_id'],
+                    'amount': total_cost,
+                    'payment_method': session_data.get('payment_method', 'Wallet'),
+                    'status': 'completed',
+                    'description': 'Charging session at station',
+                    **scope,
+                    'timestamp': now_utc(),
+                    'updated_at': now_utc(),
+                },
+                '$setOnInsert': {'card_last4': None, 'created_at': now_utc()}
+            },
+            upsert=True
+        )
         
         # Create notifications for user, operator and admins
         _create_notification(
@@ -519,12 +483,12 @@ def stop_session(session_id):
             '/admin/transactions'
         )
         
-        # Get updated session
-        updated_session = db.sessions.find_one({'_id': session_oid})
         session = Session.from_dict(updated_session)
         enriched = _enrich_sessions(db, [session.to_response_dict()])
 
         return jsonify({'success': True, 'data': enriched[0] if enriched else None})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -549,6 +513,8 @@ def get_station_sessions(station_id):
         sessions = _enrich_sessions(db, sessions)
         
         return jsonify({'success': True, 'data': sessions})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -591,6 +557,8 @@ def get_charging_history(user_id):
             history.append(history_item)
         
         return jsonify({'success': True, 'data': history})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -627,5 +595,7 @@ def get_user_stats(user_id):
         }
         
         return jsonify({'success': True, 'data': stats})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
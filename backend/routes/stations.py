@@ -1,12 +1,19 @@
 from flask import Blueprint, request, jsonify, g
 from database import get_db
+from database.deadlines import query_deadline
 from models.station import Station
-from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
 from datetime import datetime
 import math
 import re
 
-from routes.common import role_required, to_object_id, now_utc
+from routes.common import (
+    role_required, to_object_id, now_utc, owned_filter, conditional_write_failure, propagate_station_scope,
+    database_error_response, ADMIN_STATS_CACHE, OPERATOR_STATS_CACHE,
+)
+from utils.cache import invalidates
+from utils.station_suggest import DEFAULT_LIMIT as SUGGEST_LIMIT, MAX_LIMIT as MAX_SUGGEST_LIMIT, get_suggest_index
 
 stations_bp = Blueprint('stations', __name__)
 
@@ -43,9 +50,15 @@ def _build_user_profile_map(db, user_ids):
 
     users = list(db.users.find(
         {'_id': {'$in': valid_ids}},
-        {'name': 1, 'email': 1, 'phone': 1}
+        USER_PROFILE_PROJECTION
     ))
+    return _profile_map_from_users(users)
 
+
+USER_PROFILE_PROJECTION = {'name': 1, 'email': 1, 'phone': 1}
+
+
+def _profile_map_from_users(users):
     return {
         str(user['_id']): {
             'name': user.get('name') or user.get('email') or 'Unknown Operator',
@@ -56,34 +69,35 @@ def _build_user_profile_map(db, user_ids):
     }
 
 
-def _station_today_metrics(db, station_id):
-    station_oid = to_object_id(station_id)
-    if not station_oid:
-        return {
-            'totalSessionsToday': 0,
-            'energyDeliveredToday': 0,
-            'vehiclesChargedToday': 0,
-            'utilizationPercent': 0,
-        }
+EMPTY_TODAY_METRICS = {
+    'totalSessionsToday': 0,
+    'energyDeliveredToday': 0,
+    'vehiclesChargedToday': 0,
+    'utilizationPercent': 0,
+}
 
-    now = datetime.utcnow()
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
 
-    station_filter = {'$in': [station_oid, str(station_oid)]}
-    sessions = list(db.sessions.find({
-        'station_id': station_filter,
+def _today_sessions_query(station_oid):
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        'station_id': {'$in': [station_oid, str(station_oid)]},
         '$or': [
             {'start_time': {'$gte': today_start}},
             {'created_at': {'$gte': today_start}},
             {'updated_at': {'$gte': today_start}},
         ]
-    }, {
-        'status': 1,
-        'energy_delivered': 1,
-        'energyDelivered': 1,
-        'user_id': 1,
-    }))
+    }
+
 
+TODAY_SESSIONS_PROJECTION = {
+    'status': 1,
+    'energy_delivered': 1,
+    'energyDelivered': 1,
+    'user_id': 1,
+}
+
+
+def _summarize_today_sessions(sessions, total_ports):
     relevant_sessions = [
         session for session in sessions
         if str(session.get('status') or '').lower() in {'active', 'completed'}
@@ -102,8 +116,6 @@ def _station_today_metrics(db, station_id):
     })
 
     utilization_percent = 0
-    station_doc = db.stations.find_one({'_id': station_oid}, {'ports': 1})
-    total_ports = len((station_doc or {}).get('ports', []))
     if total_ports > 0:
         utilization_percent = min(100, round((total_sessions_today / total_ports) * 100))
 
@@ -114,6 +126,17 @@ def _station_today_metrics(db, station_id):
         'utilizationPercent': utilization_percent,
     }
 
+
+def _station_today_metrics(db, station_id):
+    station_oid = to_object_id(station_id)
+    if not station_oid:
+        return dict(EMPTY_TODAY_METRICS)
+
+    sessions = list(db.sessions.find(_today_sessions_query(station_oid), TODAY_SESSIONS_PROJECTION))
+    station_doc = db.stations.find_one({'_id': station_oid}, {'ports': 1})
+    total_ports = len((station_doc or {}).get('ports', []))
+    return _summarize_today_sessions(sessions, total_ports)
+
 def calculate_distance(lat1, lon1, lat2, lon2):
     """Calculate distance between two coordinates in km using Haversine formula"""
     R = 6371  # Earth's radius in km
@@ -128,6 +151,102 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     
     return round(R * c, 1)
 
+def _station_list_query(args):
+    """MongoDB filter for the station list from request args."""
+    status = args.get('status')
+    city = args.get('city')
+
+    query = {}
+    if status and status != 'all':
+        query['status'] = status
+    if city:
+        query['city'] = {'$regex': re.escape(city), '$options': 'i'}
+    return query
+
+
+def _build_station_list(stations_data, operator_profile_map, args):
+    """Filter, enrich and sort station documents for the list response."""
+    charging_type = args.get('chargingType')
+    max_distance = args.get('maxDistance', type=float)
+    sort_by = args.get('sortBy', 'distance')
+    user_lat = args.get('lat', 37.7749, type=float)
+    user_lng = args.get('lng', -122.4194, type=float)
+
+    stations = []
+    for data in stations_data:
+        station = Station.from_dict(data)
+
+        station_lat = station.coordinates.get('lat') if isinstance(station.coordinates, dict) else None
+        station_lng = station.coordinates.get('lng') if isinstance(station.coordinates, dict) else None
+        has_valid_coords = (
+            isinstance(station_lat, (int, float)) and
+            isinstance(station_lng, (int, float)) and
+            not (station_lat == 0 and station_lng == 0)
+        )
+
+        distance = None
+        if has_valid_coords:
+            distance = calculate_distance(user_lat, user_lng, station_lat, station_lng)
+            if max_distance and distance > max_distance:
+                continue
+        
+        ports = station.ports if isinstance(station.ports, list) else []
+
+        # Filter by charging type
+        if charging_type and charging_type != 'all':
+            has_type = any(
+                charging_type.lower() in p.get('type', '').lower()
+                for p in ports
+            )
+            if not has_type:
+                continue
+        
+        station_response = station.to_response_dict(distance=distance)
+        operator_profile = operator_profile_map.get(station_response.get('operatorId'), {})
+        station_response['operatorName'] = operator_profile.get('name', 'Unknown Operator')
+        station_response['operatorEmail'] = operator_profile.get('email', 'Not provided')
+        station_response['operatorPhone'] = operator_profile.get('phone', 'Not provided')
+        stations.append(station_response)
+    
+    # Sort results
+    if sort_by == 'distance':
+        stations.sort(key=lambda x: x.get('distance') if x.get('distance') is not None else float('inf'))
+    elif sort_by == 'rating':
+        stations.sort(key=lambda x: x.get('rating', 0), reverse=True)
+    return stations
+
+
+def _station_operator_id(station_data):
+    return str(station_data.get('operator_id') or station_data.get('operatorId') or '')
+
+
+def _build_station_detail(station_data, operator_profile):
+    """Station detail response (without today's metrics) from the document and operator profile."""
+    station_response = Station.from_dict(station_data).to_response_dict()
+    station_response['operatorName'] = operator_profile.get('name', 'Unknown Operator')
+
+    station_email_fallback = (
+        station_data.get('operator_email')
+        or station_data.get('operatorEmail')
+        or station_data.get('contact_email')
+        or station_data.get('contactEmail')
+        or station_data.get('email')
+        or 'Not provided'
+    )
+    station_phone_fallback = (
+        station_data.get('operator_phone')
+        or station_data.get('operatorPhone')
+        or station_data.get('contact_phone')
+        or station_data.get('contactPhone')
+        or station_data.get('phone')
+        or 'Not provided'
+    )
+
+    station_response['operatorEmail'] = operator_profile.get('email') or station_email_fallback
+    station_response['operatorPhone'] = operator_profile.get('phone') or station_phone_fallback
+    return station_response
+
+
 @stations_bp.route('', methods=['GET'])
 def get_all_stations():
     """Get all stations with optional filters"""
@@ -136,73 +255,37 @@ def get_all_stations():
         if db is None:
             return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
         
-        # Get query parameters
-        status = request.args.get('status')
-        charging_type = request.args.get('chargingType')
-        max_distance = request.args.get('maxDistance', type=float)
-        sort_by = request.args.get('sortBy', 'distance')
-        user_lat = request.args.get('lat', 37.7749, type=float)
-        user_lng = request.args.get('lng', -122.4194, type=float)
-        city = request.args.get('city')
-        
-        # Build query
-        query = {}
-        if status and status != 'all':
-            query['status'] = status
-        if city:
-            query['city'] = {'$regex': re.escape(city), '$options': 'i'}
-        
         # Fetch from MongoDB database
-        stations_data = list(db.stations.find(query))
+        stations_data = list(db.stations.find(_station_list_query(request.args)))
         operator_profile_map = _build_user_profile_map(db, [data.get('operator_id') for data in stations_data])
-        stations = []
-        
-        for data in stations_data:
-            station = Station.from_dict(data)
-
-            station_lat = station.coordinates.get('lat') if isinstance(station.coordinates, dict) else None
-            station_lng = station.coordinates.get('lng') if isinstance(station.coordinates, dict) else None
-            has_valid_coords = (
-                isinstance(station_lat, (int, float)) and
-                isinstance(station_lng, (int, float)) and
-                not (station_lat == 0 and station_lng == 0)
-            )
-
-            distance = None
-            if has_valid_coords:
-                distance = calculate_distance(user_lat, user_lng, station_lat, station_lng)
-                if max_distance and distance > max_distance:
-                    continue
-            
-            ports = station.ports if isinstance(station.ports, list) else []
-
-            # Filter by charging type
-            if charging_type and charging_type != 'all':
-                has_type = any(
-                    charging_type.lower() in p.get('type', '').lower()
-                    for p in ports
-                )
-                if not has_type:
-                    continue
-            
-            station_response = station.to_response_dict(distance=distance)
-            operator_profile = operator_profile_map.get(station_response.get('operatorId'), {})
-            station_response['operatorName'] = operator_profile.get('name', 'Unknown Operator')
-            station_response['operatorEmail'] = operator_profile.get('email', 'Not provided')
-            station_response['operatorPhone'] = operator_profile.get('phone', 'Not provided')
-            stations.append(station_response)
-        
-        # Sort results
-        if sort_by == 'distance':
-            stations.sort(key=lambda x: x.get('distance') if x.get('distance') is not None else float('inf'))
-        elif sort_by == 'rating':
-            stations.sort(key=lambda x: x.get('rating', 0), reverse=True)
+        stations = _build_station_list(stations_data, operator_profile_map, request.args)
         
         return jsonify({'success': True, 'data': stations})
+    except PyMongoError as e:
+        return database_error_response(e)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@stations_bp.route('/suggest', methods=['GET'])
+@query_deadline('fast')
+def suggest_stations():
+    """Typeahead over station name, city, landmark and address (?q=&limit=)"""
+    try:
+        db = get_db()
+        if db is None:
+            return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
+
+        limit = min(max(request.args.get('limit', SUGGEST_LIMIT, type=int) or SUGGEST_LIMIT, 1), MAX_SUGGEST_LIMIT)
+        index = get_suggest_index()
+        index.ensure_fresh(db)
+        return jsonify({'success': True, 'data': index.suggest(request.args.get('q', ''), limit)})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @stations_bp.route('/<station_id>', methods=['GET'])
+@query_deadline('fast')
 def get_station_by_id(station_id):
     """Get a specific station by ID"""
     try:
@@ -210,39 +293,22 @@ def get_station_by_id(station_id):
         if db is None:
             return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
         
-        station_data = db.stations.find_one({'_id': ObjectId(station_id)})
+        station_oid = to_object_id(station_id)
+        if not station_oid:
+            return jsonify({'success': False, 'error': 'Invalid station id'}), 400
+
+        station_data = db.stations.find_one({'_id': station_oid})
         
         if not station_data:
             return jsonify({'success': False, 'error': 'Station not found'}), 404
         
-        station = Station.from_dict(station_data)
-        station_response = station.to_response_dict()
-        operator_id_for_profile = station_response.get('operatorId') or str(station_data.get('operator_id') or station_data.get('operatorId') or '')
+        operator_id_for_profile = _station_operator_id(station_data)
         operator_profile_map = _build_user_profile_map(db, [operator_id_for_profile])
-        operator_profile = operator_profile_map.get(operator_id_for_profile, {})
-        station_response['operatorName'] = operator_profile.get('name', 'Unknown Operator')
-
-        station_email_fallback = (
-            station_data.get('operator_email')
-            or station_data.get('operatorEmail')
-            or station_data.get('contact_email')
-            or station_data.get('contactEmail')
-            or station_data.get('email')
-            or 'Not provided'
-        )
-        station_phone_fallback = (
-            station_data.get('operator_phone')
-            or station_data.get('operatorPhone')
-            or station_data.get('contact_phone')
-            or station_data.get('contactPhone')
-            or station_data.get('phone')
-            or 'Not provided'
-        )
-
-        station_response['operatorEmail'] = operator_profile.get('email') or station_email_fallback
-        station_response['operatorPhone'] = operator_profile.get('phone') or station_phone_fallback
+        station_response = _build_station_detail(station_data, operator_profile_map.get(operator_id_for_profile, {}))
         station_response.update(_station_today_metrics(db, station_data.get('_id')))
         return jsonify({'success': True, 'data': station_response})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -270,10 +336,13 @@ def get_stations_by_operator(operator_id):
             stations.append(station_response)
         
         return jsonify({'success': True, 'data': stations})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @stations_bp.route('', methods=['POST'])
+@invalidates(ADMIN_STATS_CACHE, OPERATOR_STATS_CACHE)
 @role_required('operator', 'admin')
 def create_station():
     """Create a new station (operator/admin only)"""
@@ -310,18 +379,23 @@ def create_station():
         station.created_at = now_utc()
         station.updated_at = now_utc()
         
-        result = db.stations.insert_one(station.to_dict())
+        station_doc = station.to_dict()
+        result = db.stations.insert_one(station_doc)
         station.id = str(result.inserted_id)
+        get_suggest_index().upsert(station_doc)
         
         return jsonify({
             'success': True,
             'message': 'Station created successfully',
             'data': station.to_response_dict()
         }), 201
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @stations_bp.route('/<station_id>', methods=['PUT'])
+@invalidates(ADMIN_STATS_CACHE, OPERATOR_STATS_CACHE)
 @role_required('operator', 'admin')
 def update_station(station_id):
     """Update a station"""
@@ -335,13 +409,6 @@ def update_station(station_id):
         if not station_oid:
             return jsonify({'success': False, 'error': 'Invalid station id'}), 400
 
-        station_data = db.stations.find_one({'_id': station_oid})
-        if not station_data:
-            return jsonify({'success': False, 'error': 'Station not found'}), 404
-
-        if station_data.get('operator_id') != user.get('_id') and user.get('role') != 'admin':
-            return jsonify({'success': False, 'error': 'Unauthorized'}), 403
-        
         # Update allowed fields
         allowed_fields = ['name', 'address', 'city', 'status', 'amenities', 
                          'operating_hours', 'ports', 'pricing', 'peak_hours', 'image', 'nearby_landmark']
@@ -353,7 +420,17 @@ def update_station(station_id):
         if 'address' in data and 'nearby_landmark' not in update_data:
             update_data['nearby_landmark'] = str(data.get('address') or '').strip()
 
+        station_filter = owned_filter(station_oid, user)
+        station_data = None
         if any(key in data for key in ['city', 'address', 'nearbyLandmark', 'nearby_landmark']):
+            # The display address is derived from the stored city/landmark,
+            # so only these edits need the current document first.
+            station_data = db.stations.find_one(
+                station_filter, {'city': 1, 'nearby_landmark': 1, 'address': 1}
+            )
+            if not station_data:
+                return conditional_write_failure(db.stations, station_oid, 'Station')
+
             effective_city = str(update_data.get('city', station_data.get('city', '')) or '').strip()
             effective_landmark = str(
                 update_data.get(
@@ -368,19 +445,26 @@ def update_station(station_id):
 
         update_data['updated_at'] = now_utc()
         
-        db.stations.update_one(
-            {'_id': station_oid},
-            {'$set': update_data}
+        updated_station = db.stations.find_one_and_update(
+            station_filter,
+            {'$set': update_data},
+            return_document=ReturnDocument.AFTER
         )
-        
-        updated_station = db.stations.find_one({'_id': station_oid})
+        if not updated_station:
+            return conditional_write_failure(db.stations, station_oid, 'Station')
+        if station_data and station_data.get('city') != updated_station.get('city'):
+            propagate_station_scope(db, updated_station)
+        get_suggest_index().upsert(updated_station)
         station = Station.from_dict(updated_station)
         
         return jsonify({'success': True, 'data': station.to_response_dict()})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @stations_bp.route('/<station_id>/status', methods=['PUT'])
+@invalidates(ADMIN_STATS_CACHE, OPERATOR_STATS_CACHE)
 @role_required('operator', 'admin')
 def update_station_status(station_id):
     """Update station status"""
@@ -397,24 +481,22 @@ def update_station_status(station_id):
         if not station_oid:
             return jsonify({'success': False, 'error': 'Invalid station id'}), 400
 
-        if user.get('role') == 'operator':
-            station = db.stations.find_one({'_id': station_oid})
-            if not station or station.get('operator_id') != user.get('_id'):
-                return jsonify({'success': False, 'error': 'Unauthorized'}), 403
-
         result = db.stations.update_one(
-            {'_id': station_oid},
+            owned_filter(station_oid, user),
             {'$set': {'status': new_status, 'updated_at': now_utc()}}
         )
         
-        if result.modified_count == 0:
-            return jsonify({'success': False, 'error': 'Station not found'}), 404
+        if result.matched_count == 0:
+            return conditional_write_failure(db.stations, station_oid, 'Station')
         
         return jsonify({'success': True, 'message': 'Station status updated'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @stations_bp.route('/<station_id>/ports/<port_id>/status', methods=['PUT'])
+@invalidates(ADMIN_STATS_CACHE, OPERATOR_STATS_CACHE)
 @role_required('operator', 'admin')
 def update_port_status(station_id, port_id):
     """Update a specific port status"""
@@ -431,19 +513,20 @@ def update_port_status(station_id, port_id):
         if not station_oid:
             return jsonify({'success': False, 'error': 'Invalid station id'}), 400
 
-        if user.get('role') == 'operator':
-            station = db.stations.find_one({'_id': station_oid})
-            if not station or station.get('operator_id') != user.get('_id'):
-                return jsonify({'success': False, 'error': 'Unauthorized'}), 403
-
+        port_filter = owned_filter(station_oid, user)
+        port_filter['ports.id'] = int(port_id)
         result = db.stations.update_one(
-            {'_id': station_oid, 'ports.id': int(port_id)},
+            port_filter,
             {'$set': {'ports.$.status': new_status, 'updated_at': now_utc()}}
         )
         
-        if result.modified_count == 0:
-            return jsonify({'success': False, 'error': 'Station or port not found'}), 404
+        if result.matched_count == 0:
+            if db.stations.find_one(owned_filter(station_oid, user), {'_id': 1}):
+                return jsonify({'success': False, 'error': 'Station or port not found'}), 404
+            return conditional_write_failure(db.stations, station_oid, 'Station')
         
         return jsonify({'success': True, 'message': 'Port status updated'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -1,8 +1,16 @@
+from datetime import datetime
+
 from flask import Blueprint, request, jsonify, g
 from models.transaction import Transaction
 from models.notification import Notification
 
-from routes.common import role_required, to_object_id, now_utc
+from database import gather
+from pymongo.errors import PyMongoError
+from routes.common import role_required, to_object_id, now_utc, ADMIN_STATS_CACHE, database_error_response
+from utils.cache import invalidates
+from utils.spending import default_range, spending_groups, summarize, wallet_balance
+from utils.admission import admission_class, CRITICAL
+from utils.idempotency import idempotent
 
 transactions_bp = Blueprint('transactions', __name__)
 
@@ -33,57 +41,6 @@ def _build_user_match(user_id):
     return {'$in': candidates}
 
 
-def _wallet_payment_filter(user_id):
-    return {
-        'user_id': _build_user_match(user_id),
-        'payment_method': {'$regex': '^wallet$', '$options': 'i'},
-        'type': 'charging',
-        'status': 'completed'
-    }
-
-
-def _resolve_charging_amounts(db, transactions_data, persist=False):
-    charging_session_ids = []
-    normalized_session_ids = {}
-    for txn in transactions_data:
-        if txn.get('type') == 'charging' and _to_amount(txn.get('amount')) <= 0 and txn.get('session_id'):
-            session_id = txn.get('session_id')
-            session_oid = to_object_id(session_id)
-            if session_oid:
-                charging_session_ids.append(session_oid)
-                normalized_session_ids[session_id] = session_oid
-
-    if not charging_session_ids:
-        return transactions_data
-
-    session_cost_map = {}
-    sessions = db.sessions.find(
-        {'_id': {'$in': charging_session_ids}},
-        {'cost': 1, 'total_cost': 1}
-    )
-    for session in sessions:
-        session_cost_map[session['_id']] = _to_amount(session.get('cost') or session.get('total_cost'))
-
-    for txn in transactions_data:
-        if txn.get('type') != 'charging':
-            continue
-        if _to_amount(txn.get('amount')) > 0:
-            continue
-
-        session_id = txn.get('session_id')
-        normalized_session_id = normalized_session_ids.get(session_id) or to_object_id(session_id)
-        resolved_amount = session_cost_map.get(normalized_session_id, 0.0)
-        if resolved_amount > 0:
-            txn['amount'] = resolved_amount
-            if persist and txn.get('_id'):
-                db.transactions.update_one(
-                    {'_id': txn['_id']},
-                    {'$set': {'amount': resolved_amount, 'updated_at': now_utc()}}
-                )
-
-    return transactions_data
-
-
 def _notify_admins(db, notification_type, title, message, action_url=None):
     admin_users = list(db.users.find({'role': 'admin'}, {'_id': 1}))
     for admin in admin_users:
@@ -108,16 +65,14 @@ def get_transactions():
         if user.get('role') == 'user':
             query['user_id'] = _build_user_match(user.get('_id'))
         elif user.get('role') == 'operator':
-            station_ids = [s['_id'] for s in db.stations.find({'operator_id': user.get('_id')}, {'_id': 1})]
-            sessions = db.sessions.find({'station_id': {'$in': station_ids}}, {'_id': 1})
-            session_ids = [s['_id'] for s in sessions]
-            query['session_id'] = {'$in': session_ids}
+            query['operator_id'] = user.get('_id')
 
         transactions_data = list(db.transactions.find(query).sort('timestamp', -1))
-        transactions_data = _resolve_charging_amounts(db, transactions_data, persist=True)
         transactions = [Transaction.from_dict(data).to_response_dict() for data in transactions_data]
         
         return jsonify({'success': True, 'data': transactions})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -129,6 +84,9 @@ def get_user_transactions(user_id):
     return get_transactions()
 
 @transactions_bp.route('/process', methods=['POST'])
+@admission_class(CRITICAL)
+@idempotent
+@invalidates(ADMIN_STATS_CACHE)
 @role_required('user')
 def process_payment():
     """Process a payment"""
@@ -138,7 +96,7 @@ def process_payment():
         data = request.get_json() or {}
 
         amount = data.get('amount')
-        if amount is None or amount <= 0:
+        if not Transaction.has_valid_amount(amount):
             return jsonify({'success': False, 'error': 'amount must be greater than 0'}), 400
 
         session_oid = None
@@ -159,7 +117,14 @@ def process_payment():
         transaction.created_at = now_utc()
         transaction.timestamp = now_utc()
         
-        result = db.transactions.insert_one(transaction.to_dict())
+        transaction_payload = transaction.to_dict()
+        if session_oid:
+            session_scope = db.sessions.find_one(
+                {'_id': session_oid}, {'_id': 0, 'station_id': 1, 'operator_id': 1, 'city': 1}
+            )
+            transaction_payload.update(session_scope or {})
+
+        result = db.transactions.insert_one(transaction_payload)
         transaction.id = str(result.inserted_id)
 
         payment_amount = _to_amount(data.get('amount'))
@@ -185,6 +150,8 @@ def process_payment():
             'message': 'Transaction processed successfully',
             'data': transaction.to_response_dict()
         }), 201
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -201,27 +168,19 @@ def get_wallet_balance(user_id):
 
         if current.get('role') != 'admin' and current.get('_id') != target_user_id:
             return jsonify({'success': False, 'error': 'Unauthorized'}), 403
-        
-        # Calculate balance from transactions
-        topups = list(db.transactions.find({
-            'user_id': _build_user_match(target_user_id),
-            'type': 'wallet_topup',
-            'status': 'completed'
-        }))
-        
-        wallet_payments = list(db.transactions.find(_wallet_payment_filter(target_user_id)))
-        wallet_payments = _resolve_charging_amounts(db, wallet_payments, persist=True)
-        
-        total_topup = sum(_to_amount(t.get('amount', 0)) for t in topups)
-        total_spent = sum(_to_amount(t.get('amount', 0)) for t in wallet_payments)
-        
-        balance = round(total_topup - total_spent, 2)
-        
-        return jsonify({'success': True, 'data': {'balance': max(0, balance)}})
+
+        balance = wallet_balance(db, target_user_id)
+
+        return jsonify({'success': True, 'data': {'balance': balance}})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @transactions_bp.route('/wallet/topup', methods=['POST'])
+@admission_class(CRITICAL)
+@idempotent
+@invalidates(ADMIN_STATS_CACHE)
 @role_required('user')
 def topup_wallet():
     """Top up wallet balance"""
@@ -231,7 +190,7 @@ def topup_wallet():
         data = request.get_json() or {}
         
         amount = data.get('amount', 0)
-        if amount <= 0:
+        if not Transaction.has_valid_amount(amount):
             return jsonify({'success': False, 'error': 'Amount must be positive'}), 400
         
         transaction = Transaction(
@@ -265,27 +224,17 @@ def topup_wallet():
             '/admin/transactions'
         )
         
-        # Get new balance
-        topups = list(db.transactions.find({
-            'user_id': _build_user_match(user_id),
-            'type': 'wallet_topup',
-            'status': 'completed'
-        }))
-        
-        wallet_payments = list(db.transactions.find(_wallet_payment_filter(user_id)))
-        wallet_payments = _resolve_charging_amounts(db, wallet_payments, persist=True)
-        
-        total_topup = sum(_to_amount(t.get('amount', 0)) for t in topups)
-        total_spent = sum(_to_amount(t.get('amount', 0)) for t in wallet_payments)
-        new_balance = round(total_topup - total_spent, 2)
-        
+        new_balance = wallet_balance(db, user_id)
+
         return jsonify({
             'success': True, 
             'data': {
-                'newBalance': max(0, new_balance),
+                'newBalance': new_balance,
                 'transactionId': str(result.inserted_id)
             }
         }), 201
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -303,27 +252,76 @@ def get_transaction_summary(user_id):
         if current.get('role') != 'admin' and current.get('_id') != target_user_id:
             return jsonify({'success': False, 'error': 'Unauthorized'}), 403
 
-        transactions = list(db.transactions.find({'user_id': _build_user_match(target_user_id)}))
-        transactions = _resolve_charging_amounts(db, transactions, persist=True)
-        
-        charging_total = sum(_to_amount(t.get('amount', 0)) for t in transactions if t.get('type') == 'charging')
-        topup_total = sum(_to_amount(t.get('amount', 0)) for t in transactions if t.get('type') == 'wallet_topup')
-        
-        # Group by month
+        groups = spending_groups(db, target_user_id)
+        totals = {}
         monthly = {}
-        for t in transactions:
-            if t.get('type') == 'charging' and t.get('timestamp'):
-                month_key = t['timestamp'].strftime('%Y-%m')
-                monthly[month_key] = monthly.get(month_key, 0) + _to_amount(t.get('amount', 0))
-        
+        for row in groups:
+            key = row['_id']
+            totals[key.get('type')] = totals.get(key.get('type'), 0) + (row.get('amount') or 0)
+            if key.get('type') == 'charging' and key.get('month'):
+                monthly[key['month']] = round(monthly.get(key['month'], 0) + (row.get('amount') or 0), 2)
+
         return jsonify({
             'success': True,
             'data': {
-                'totalCharging': round(charging_total, 2),
-                'totalTopup': round(topup_total, 2),
-                'transactionCount': len(transactions),
+                'totalCharging': round(totals.get('charging', 0), 2),
+                'totalTopup': round(totals.get('wallet_topup', 0), 2),
+                'transactionCount': sum(row.get('count', 0) for row in groups),
                 'monthlySpending': monthly
             }
         })
+    except PyMongoError as e:
+        return database_error_response(e)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def _parse_date(value):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        raise ValueError(f'Invalid date: {value}')
+
+
+@transactions_bp.route('/analytics/<user_id>', methods=['GET'])
+@role_required('user', 'admin')
+def get_spending_analytics(user_id):
+    """Spending by type, payment method and month over a date range, plus the wallet balance"""
+    try:
+        db = g.db
+        current = g.current_user
+        target_user_id = to_object_id(user_id)
+        if not target_user_id:
+            return jsonify({'success': False, 'error': 'Invalid user id'}), 400
+
+        if current.get('role') != 'admin' and current.get('_id') != target_user_id:
+            return jsonify({'success': False, 'error': 'Unauthorized'}), 403
+
+        try:
+            start = _parse_date(request.args.get('from'))
+            end = _parse_date(request.args.get('to'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if start is None and end is None:
+            start, end = default_range(now_utc())
+        if start and end and start >= end:
+            return jsonify({'success': False, 'error': 'from must be before to'}), 400
+
+        groups, balance = gather(
+            lambda: spending_groups(db, target_user_id, start, end),
+            lambda: wallet_balance(db, target_user_id),
+        )
+
+        return jsonify({
+            'success': True,
+            'data': {
+                'from': start.isoformat() if start else None,
+                'to': end.isoformat() if end else None,
+                'balance': balance,
+                **summarize(groups),
+            }
+        })
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
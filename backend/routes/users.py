@@ -1,12 +1,21 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from database import get_db
+from routes.common import database_error_response
 from models.user import User
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
 from datetime import datetime
+import re
 
 users_bp = Blueprint('users', __name__)
 
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 50
+# Matches counted and ranked per query; short prefixes on large user bases stop here
+SEARCH_CANDIDATE_LIMIT = 500
+
 
 def _normalize_vehicle_payload(vehicle_data):
     if vehicle_data is None:
@@ -45,6 +54,8 @@ def get_user(user_id):
         
         user = User.from_dict(user_data)
         return jsonify({'success': True, 'data': user.to_safe_dict()})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -61,7 +72,7 @@ def update_user(user_id):
         
         # Check authorization
         if current_user_id != user_id:
-            current_user = db.users.find_one({'_id': ObjectId(current_user_id)})
+            current_user = db.users.find_one({'_id': ObjectId(current_user_id)}, {'role': 1})
             if current_user.get('role') != 'admin':
                 return jsonify({'success': False, 'error': 'Unauthorized'}), 403
         
@@ -76,21 +87,25 @@ def update_user(user_id):
         update_data = {k: v for k, v in data.items() if k in allowed_fields}
         if 'vehicle' in update_data:
             update_data['vehicle'] = vehicle_payload
+        if 'name' in update_data:
+            update_data.update(User.search_fields(name=update_data['name']))
         update_data['updated_at'] = datetime.utcnow()
         
-        result = db.users.update_one(
+        user_data = db.users.find_one_and_update(
             {'_id': ObjectId(user_id)},
-            {'$set': update_data}
+            {'$set': update_data},
+            projection=User.safe_projection,
+            return_document=ReturnDocument.AFTER
         )
         
-        if result.modified_count == 0:
-            return jsonify({'success': False, 'error': 'User not found or no changes made'}), 404
+        if not user_data:
+            return jsonify({'success': False, 'error': 'User not found'}), 404
         
-        # Get updated user
-        user_data = db.users.find_one({'_id': ObjectId(user_id)})
         user = User.from_dict(user_data)
         
         return jsonify({'success': True, 'data': user.to_safe_dict()})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -124,39 +139,104 @@ def update_user_status(user_id):
             return jsonify({'success': False, 'error': 'User not found'}), 404
         
         return jsonify({'success': True, 'message': 'User status updated'})
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @users_bp.route('/search', methods=['GET'])
 @jwt_required()
 def search_users():
-    """Search users (admin only)"""
+    """Ranked prefix search over user names and emails (admin only; ?q=&role=&page=&limit=)"""
     try:
         db = get_db()
         if db is None:
             return jsonify({'success': False, 'error': 'Database connection unavailable. Please try again later.'}), 503
         
         current_user_id = get_jwt_identity()
-        current_user = db.users.find_one({'_id': ObjectId(current_user_id)})
+        current_user = db.users.find_one({'_id': ObjectId(current_user_id)}, {'role': 1})
         
         if current_user.get('role') != 'admin':
             return jsonify({'success': False, 'error': 'Unauthorized'}), 403
         
-        query = request.args.get('q', '')
+        query = User.normalize_search_text(request.args.get('q', ''))
         role = request.args.get('role')
-        
-        search_query = {}
-        if query:
-            search_query['$or'] = [
-                {'name': {'$regex': query, '$options': 'i'}},
-                {'email': {'$regex': query, '$options': 'i'}}
-            ]
-        if role:
-            search_query['role'] = role
-        
-        users_data = list(db.users.find(search_query).limit(50))
-        users = [User.from_dict(data).to_safe_dict() for data in users_data]
-        
-        return jsonify({'success': True, 'data': users})
+        page = max(request.args.get('page', 1, type=int) or 1, 1)
+        limit = min(max(request.args.get('limit', SEARCH_PAGE_SIZE, type=int) or SEARCH_PAGE_SIZE, 1), MAX_SEARCH_PAGE_SIZE)
+
+        result = next(db.users.aggregate(_search_pipeline(query, role, page, limit)), {})
+        total = result['total'][0]['count'] if result.get('total') else 0
+        users = [User.from_dict(data).to_safe_dict() for data in result.get('users', [])]
+        
+        return jsonify({
+            'success': True,
+            'data': users,
+            'pagination': {
+                'page': page,
+                'limit': limit,
+                'total': total,
+                # Matches beyond the candidate window are not counted or ranked
+                'capped': total >= _candidate_window(page, limit),
+            }
+        })
+    except PyMongoError as e:
+        return database_error_response(e)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def _candidate_window(page, limit):
+    """Matches read, counted and ranked per query: SEARCH_CANDIDATE_LIMIT, or deeper for far pages."""
+    return max(SEARCH_CANDIDATE_LIMIT, page * limit)
+
+
+def _search_pipeline(query, role, page, limit):
+    """
+    Typeahead over the lowercase prefix keys (User.search_fields). The
+    anchored, escaped regex is an index range scan on ``name_keys`` /
+    ``email_keys``; candidates are ranked exact match, then full name or
+    email prefix, then word prefix, and alphabetically within a rank.
+
+    Only the first ``_candidate_window`` matches are read, so exact matches
+    are looked up on their own (``name_lower`` / ``email_keys`` equality)
+    and unioned in: a short prefix must not push them out of the window.
+    Without a query, users are listed in ``name_lower`` index order.
+    """
+    match = {}
+    if role:
+        match['role'] = role
+    window = _candidate_window(page, limit)
+    page_stages = [{'$skip': (page - 1) * limit}, {'$limit': limit}, {'$project': User.safe_projection}]
+    if not query:
+        # Indexed sort (name_lower_id / role_name_lower_id), read no further than the window
+        return [
+            {'$match': match},
+            {'$sort': {'name_lower': 1, '_id': 1}},
+            {'$limit': window},
+            {'$facet': {'total': [{'$count': 'count'}], 'users': page_stages}},
+        ]
+
+    prefix = {'$regex': f'^{re.escape(query)}'}
+    exact = {**match, '$or': [{'name_lower': query}, {'email_keys': query, 'email_lower': query}]}
+    match['$or'] = [{'name_keys': prefix}, {'email_keys': prefix}]
+
+    def starts_with(field):
+        return {'$eq': [{'$indexOfCP': [{'$ifNull': [f'${field}', '']}, query]}, 0]}
+
+    return [
+        {'$match': exact},
+        {'$limit': window},
+        {'$unionWith': {'coll': 'users', 'pipeline': [{'$match': match}, {'$limit': window}]}},
+        # An exact match is also a prefix match; keep one copy
+        {'$group': {'_id': '$_id', 'user': {'$first': '$$ROOT'}}},
+        {'$replaceRoot': {'newRoot': '$user'}},
+        {'$addFields': {'search_rank': {'$switch': {
+            'branches': [
+                {'case': {'$or': [{'$eq': ['$name_lower', query]}, {'$eq': ['$email_lower', query]}]}, 'then': 0},
+                {'case': {'$or': [starts_with('name_lower'), starts_with('email_lower')]}, 'then': 1},
+            ],
+            'default': 2,
+        }}}},
+        {'$sort': {'search_rank': 1, 'name_lower': 1, '_id': 1}},
+        {'$facet': {'total': [{'$count': 'count'}], 'users': page_stages}},
+    ]
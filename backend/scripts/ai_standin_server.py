@@ -0,0 +1,91 @@
+"""
+Offline stand-in for the Gemini generateContent API.
+
+Answers every POST with a generateContent-shaped response whose text is
+derived deterministically from the prompt (same prompt, same report), after
+an optional simulated model latency. ``GET /stats`` returns the number of
+generate calls served, to check how many requests the AI cache absorbed.
+
+Point the backend at it to load-test ``POST /api/ai/optimize`` offline:
+
+Usage:
+  python scripts/ai_standin_server.py --port 8099 --latency-ms 1500
+  AI_API_URL=http://127.0.0.1:8099/generate AI_API_KEY=offline python app.py
+  python scripts/load_test.py --path /api/ai/optimize --body '{"batteryCapacity": 60}'
+"""
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_calls = 0
+_calls_lock = threading.Lock()
+
+
+def report_for(prompt):
+    """Plain-text report echoing the prompt's deterministic projection lines."""
+    baseline = [line.lstrip('- ') for line in prompt.splitlines() if line.startswith('- ')]
+    digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+    return '\n'.join(['Charging Optimization Report (offline stand-in)', '', *baseline, '', f'Reference: {digest}'])
+
+
+class Handler(BaseHTTPRequestHandler):
+    latency = 0.0
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            with _calls_lock:
+                self._send(200, {'calls': _calls})
+        else:
+            self._send(404, {'error': 'not found'})
+
+    def do_POST(self):
+        global _calls
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+            prompt = body['contents'][0]['parts'][0]['text']
+        except (ValueError, KeyError, IndexError, TypeError):
+            self._send(400, {'error': {'code': 400, 'message': 'Invalid generateContent request'}})
+            return
+        with _calls_lock:
+            _calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        self._send(200, {'candidates': [{'content': {'parts': [{'text': report_for(prompt)}], 'role': 'model'}}]})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(host='127.0.0.1', port=8099, latency_ms=0):
+    Handler.latency = latency_ms / 1000.0
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f'🤖 AI stand-in listening on http://{host}:{port} (latency {latency_ms} ms)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Deterministic offline stand-in for the Gemini generateContent API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency-ms', type=float, default=0, help='Simulated model latency per call.')
+    args = parser.parse_args()
+    raise SystemExit(main(args.host, args.port, args.latency_ms))
@@ -0,0 +1,111 @@
+"""
+Backfill the station scope on existing sessions, bookings and transactions.
+
+New documents are stamped with ``station_id``, ``operator_id`` and ``city``
+when they are written (``Station.scope_fields``). This copies the same
+fields onto documents written before that, and creates the compound indexes
+operator listings and city revenue read through (``database/indexes.py``).
+
+Each collection is updated server-side by one aggregation ending in
+``$merge`` into the same collection (MongoDB 4.4+):
+- sessions, bookings: joined to stations on ``station_id``
+- transactions: joined to sessions on ``session_id`` (run after sessions)
+
+Only documents without ``operator_id`` are touched, so the script is
+idempotent and an interrupted run simply continues on the next invocation;
+``--all`` re-stamps everything (e.g. after bulk station edits).
+
+Usage:
+  python scripts/backfill_station_scope.py
+  python scripts/backfill_station_scope.py --dry-run
+  python scripts/backfill_station_scope.py --all
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add backend root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ensure_indexes, get_db
+
+
+def as_object_id(field):
+    """Older documents stored references as strings."""
+    return {'$convert': {'input': f'${field}', 'to': 'objectId', 'onError': None, 'onNull': None}}
+
+
+def scope_pipeline(match, reference_field, source_collection, source_fields):
+    """Join each document to its station (or session) and merge the scope fields back."""
+    return [
+        {'$match': match},
+        {'$lookup': {
+            'from': source_collection,
+            'let': {'ref': as_object_id(reference_field)},
+            'pipeline': [
+                {'$match': {'$expr': {'$eq': ['$_id', '$$ref']}}},
+                {'$project': source_fields},
+            ],
+            'as': 'scope',
+        }},
+        {'$unwind': '$scope'},
+        {'$project': {
+            '_id': 1,
+            'station_id': '$scope.station_id',
+            'operator_id': {'$ifNull': ['$scope.operator_id', None]},
+            'city': {'$ifNull': ['$scope.city', None]},
+            # Exports pick up re-stamped documents (updated_at watermark)
+            'updated_at': '$$NOW',
+        }},
+    ]
+
+
+def collection_pipelines(restamp_all):
+    unstamped = {} if restamp_all else {'operator_id': {'$exists': False}}
+    station_scope = {'_id': 0, 'station_id': '$_id', 'operator_id': 1, 'city': 1}
+    session_scope = {'_id': 0, 'station_id': as_object_id('station_id'), 'operator_id': 1, 'city': 1}
+    return [
+        ('sessions', scope_pipeline({**unstamped, 'station_id': {'$ne': None}}, 'station_id', 'stations', station_scope)),
+        ('bookings', scope_pipeline({**unstamped, 'station_id': {'$ne': None}}, 'station_id', 'stations', station_scope)),
+        ('transactions', scope_pipeline({**unstamped, 'session_id': {'$ne': None}}, 'session_id', 'sessions', session_scope)),
+    ]
+
+
+def main(dry_run=False, restamp_all=False):
+    db = get_db()
+    if db is None:
+        print('❌ Database unavailable. Aborting backfill.')
+        return 1
+
+    print('🏷️  Stamping station scope' + (' (DRY RUN)' if dry_run else ''))
+    for name, pipeline in collection_pipelines(restamp_all):
+        started = time.time()
+        if dry_run:
+            result = list(db[name].aggregate(pipeline + [{'$count': 'total'}]))
+            print(f'   {name}: {result[0]["total"] if result else 0} document(s) would be stamped')
+            continue
+
+        db[name].aggregate(pipeline + [{'$merge': {
+            'into': name,
+            'on': '_id',
+            'whenMatched': 'merge',
+            'whenNotMatched': 'discard',
+        }}])
+        remaining = db[name].count_documents({'operator_id': {'$exists': False}})
+        print(f'   {name}: done in {time.time() - started:.1f}s ({remaining} without a resolvable station)')
+
+    if not dry_run:
+        print(f"   indexes: {', '.join(ensure_indexes(db))}")
+
+    print('✅ Backfill complete')
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stamp station_id/operator_id/city on sessions, bookings and transactions.')
+    parser.add_argument('--dry-run', action='store_true', help='Count documents that would change without writing.')
+    parser.add_argument('--all', action='store_true', help='Re-stamp every document, not only unstamped ones.')
+    args = parser.parse_args()
+    raise SystemExit(main(dry_run=args.dry_run, restamp_all=args.all))
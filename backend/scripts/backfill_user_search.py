@@ -0,0 +1,73 @@
+"""
+Backfill the lowercase search keys on existing users.
+
+New and renamed users get ``name_lower`` / ``name_keys`` and
+``email_lower`` / ``email_keys`` when they are written
+(``User.search_fields``); ``/api/users/search`` matches only on those. This
+stamps users written before that, in ``_id`` order and in batches, and
+creates the indexes the search reads through (``database/indexes.py``).
+
+Only users without ``name_keys`` are touched, so an interrupted run simply
+continues on the next invocation; ``--all`` recomputes every user (e.g.
+after changing the key rules).
+
+Usage:
+  python scripts/backfill_user_search.py
+  python scripts/backfill_user_search.py --dry-run
+  python scripts/backfill_user_search.py --all --batch-size 2000
+"""
+
+import argparse
+import os
+import sys
+
+from pymongo import UpdateOne
+
+# Add backend root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ensure_indexes, get_db
+from models.user import User
+
+
+def main(dry_run=False, restamp_all=False, batch_size=1000):
+    db = get_db()
+    if db is None:
+        print('❌ Database unavailable. Aborting backfill.')
+        return 1
+
+    query = {} if restamp_all else {'name_keys': {'$exists': False}}
+    print('🔎 Stamping user search keys' + (' (DRY RUN)' if dry_run else ''))
+    if dry_run:
+        print(f'   {db.users.count_documents(query)} user(s) would be stamped')
+        return 0
+
+    stamped = 0
+    last_id = None
+    while True:
+        page_query = dict(query)
+        if last_id is not None:
+            page_query['_id'] = {'$gt': last_id}
+        users = list(db.users.find(page_query, {'name': 1, 'email': 1}).sort('_id', 1).limit(batch_size))
+        if not users:
+            break
+        db.users.bulk_write([
+            UpdateOne({'_id': user['_id']}, {'$set': User.search_fields(name=user.get('name') or '', email=user.get('email') or '')})
+            for user in users
+        ], ordered=False)
+        stamped += len(users)
+        last_id = users[-1]['_id']
+        print(f'   {stamped} user(s) stamped')
+
+    print(f"   indexes: {', '.join(ensure_indexes(db))}")
+    print('✅ Backfill complete')
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stamp lowercase name/email prefix keys used by the user search.')
+    parser.add_argument('--dry-run', action='store_true', help='Count users that would change without writing.')
+    parser.add_argument('--all', action='store_true', help='Recompute every user, not only unstamped ones.')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Users per bulk write (default 1000).')
+    args = parser.parse_args()
+    raise SystemExit(main(dry_run=args.dry_run, restamp_all=args.all, batch_size=max(args.batch_size, 1)))
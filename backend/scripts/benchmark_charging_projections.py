@@ -0,0 +1,123 @@
+"""
+Benchmark the vectorized charging projections against the scalar function.
+
+Projects a fleet grid (vehicles x chargers x durations, the shape of
+``POST /api/charging/projections/batch``) and the same number of
+independent rows, once with ``calculate_charging_projections`` and once by
+looping ``calculate_charging_projection`` (timed on a sample of rows).
+Checks that both agree and prints throughput; exits non-zero when the
+speedup is below ``--min-speedup``.
+
+Usage:
+  python scripts/benchmark_charging_projections.py
+  python scripts/benchmark_charging_projections.py --vehicles 500 --chargers 40 --durations 12 --min-speedup 100
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add backend root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from utils.charging import calculate_charging_projection
+from utils.charging_batch import calculate_charging_projections, grid_projections
+
+
+SCALAR_SAMPLE = 20000
+
+
+def best_of(repeat, *fns):
+    """Best time of each function, run interleaved so both see the same machine load."""
+    best = [None] * len(fns)
+    for _ in range(repeat):
+        for index, fn in enumerate(fns):
+            started = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - started
+            best[index] = elapsed if best[index] is None else min(best[index], elapsed)
+    return best
+
+
+def fleet(vehicles, chargers, durations, seed=7):
+    rng = np.random.default_rng(seed)
+    current = rng.integers(5, 60, vehicles).astype(float)
+    return (
+        {
+            'batteryCapacityKwh': rng.uniform(25, 100, vehicles).round(1).tolist(),
+            'currentPercentage': current.tolist(),
+            'targetPercentage': (current + rng.integers(10, 45, vehicles)).tolist(),
+        },
+        {
+            'chargerPowerKw': rng.choice([3.3, 7.4, 11, 22, 50, 60, 120, 150, 350], chargers).tolist(),
+            'ratePerKwh': rng.uniform(6, 24, chargers).round(2).tolist(),
+        },
+        np.linspace(15, 240, durations).round().tolist(),
+    )
+
+
+def report(label, rows, scalar_seconds, vector_seconds):
+    speedup = scalar_seconds / vector_seconds
+    print(f"   {label}: {rows} projections")
+    print(f"      scalar loop: {rows / scalar_seconds:,.0f}/s   vectorized: {rows / vector_seconds:,.0f}/s   "
+          f"speedup: {speedup:,.0f}x")
+    return speedup
+
+
+def main(vehicles=500, chargers=40, durations=12, repeat=7, min_speedup=100.0):
+    vehicle_columns, charger_columns, duration_values = fleet(vehicles, chargers, durations)
+    rows = vehicles * chargers * durations
+    print(f'⚡ Charging projection benchmark ({vehicles} vehicles x {chargers} chargers x {durations} durations)')
+
+    # Grid: one call vs a nested loop over the same combinations
+    scenarios = [
+        (vehicle_columns['batteryCapacityKwh'][v], vehicle_columns['currentPercentage'][v],
+         vehicle_columns['targetPercentage'][v], duration_values[d],
+         charger_columns['ratePerKwh'][c], charger_columns['chargerPowerKw'][c])
+        for v in range(vehicles) for c in range(chargers) for d in range(durations)
+    ]
+    grid = grid_projections(vehicle_columns, charger_columns, duration_values)
+    flat = {field: np.ravel(values).tolist() for field, values in grid.items()}
+    mismatches = sum(
+        1 for index, scenario in enumerate(scenarios)
+        for field, value in calculate_charging_projection(*scenario).items() if value != flat[field][index]
+    )
+
+    # Rows: every input a full column
+    columns = [np.array(column, dtype=float) for column in zip(*scenarios)]
+
+    # The scalar cost per row is flat, so a sample of the loop is timed and scaled up
+    sample = scenarios[:SCALAR_SAMPLE]
+    scalar_seconds, grid_seconds, rows_seconds = best_of(
+        repeat,
+        lambda: [calculate_charging_projection(*scenario) for scenario in sample],
+        lambda: grid_projections(vehicle_columns, charger_columns, duration_values),
+        lambda: calculate_charging_projections(*columns),
+    )
+    scalar_seconds *= rows / len(sample)
+    grid_speedup = report('grid', rows, scalar_seconds, grid_seconds)
+    rows_speedup = report('rows', rows, scalar_seconds, rows_seconds)
+
+    if mismatches:
+        print(f'❌ {mismatches} value(s) differ from the scalar function')
+        return 1
+    speedup = min(grid_speedup, rows_speedup)
+    if speedup < min_speedup:
+        print(f'❌ Speedup {speedup:,.0f}x is below {min_speedup:,.0f}x')
+        return 1
+    print(f'✅ Identical results, at least {speedup:,.0f}x faster')
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark vectorized vs scalar charging projections.')
+    parser.add_argument('--vehicles', type=int, default=500)
+    parser.add_argument('--chargers', type=int, default=40)
+    parser.add_argument('--durations', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--min-speedup', type=float, default=100.0)
+    args = parser.parse_args()
+    raise SystemExit(main(args.vehicles, args.chargers, args.durations, args.repeat, args.min_speedup))
@@ -0,0 +1,205 @@
+"""
+Incremental export of operational data to the local analytics store.
+
+Copies sessions, transactions, bookings and reviews that changed since the
+last run (watermarked on ``updated_at``, falling back to ``created_at`` for
+documents that never carried one) into month-partitioned Parquet files under
+``ANALYTICS_STORE_DIR``. Stations are re-exported in full as a small dimension
+table. Report queries over the store live in ``utils/analytics_store.py``.
+
+Deleted documents are not propagated; run with ``--full`` to rebuild the
+store from scratch.
+
+Requires pyarrow (``pip install pyarrow``).
+
+Usage:
+  python scripts/export_analytics.py
+  python scripts/export_analytics.py --full
+  python scripts/export_analytics.py --collections sessions transactions
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+
+# Add backend root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_db
+from utils.analytics_store import (
+    ANALYTICS_STORE_DIR,
+    DIMENSION_SPECS,
+    EXPORT_SPECS,
+    STATE_FILE,
+    partition_key,
+    to_row,
+)
+
+CURSOR_BATCH_SIZE = 5000
+FLUSH_ROWS = 200000
+
+
+def load_state(store_dir):
+    path = os.path.join(store_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def save_state(store_dir, state):
+    path = os.path.join(store_dir, STATE_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as handle:
+        json.dump(state, handle, indent=2)
+    os.replace(tmp_path, path)
+
+
+def build_schema(columns):
+    import pyarrow as pa
+
+    arrow_types = {
+        'string': pa.string(),
+        'float': pa.float64(),
+        'timestamp': pa.timestamp('us'),
+    }
+    return pa.schema([(name, arrow_types[column_type]) for name, (column_type, _) in columns.items()])
+
+
+def write_parquet(path, rows, schema):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pylist(rows, schema=schema)
+    pq.write_table(table, path, compression='zstd')
+
+
+def incremental_filter(spec, watermark):
+    if watermark is None:
+        return {}
+    primary, fallback = spec['watermark_fields'][0], spec['watermark_fields'][1]
+    return {'$or': [
+        {primary: {'$gte': watermark}},
+        {primary: {'$exists': False}, fallback: {'$gte': watermark}},
+    ]}
+
+
+def export_collection(db, name, spec, store_dir, watermark, run_id):
+    """Export one collection. Returns (rows_written, new_watermark)."""
+    schema = build_schema(spec['columns'])
+    projection = {
+        field: 1
+        for _, sources in spec['columns'].values()
+        for field in sources
+    }
+    for field in spec['partition_fields'] + spec['watermark_fields']:
+        projection[field] = 1
+
+    cursor = db[name].find(incremental_filter(spec, watermark), projection).batch_size(CURSOR_BATCH_SIZE)
+
+    buffers = {}
+    buffered = 0
+    written = 0
+    part = 0
+    new_watermark = watermark
+
+    def flush():
+        nonlocal buffered, part
+        for month, rows in buffers.items():
+            path = os.path.join(store_dir, name, f'month={month}', f'{run_id}-{part:05d}.parquet')
+            write_parquet(path, rows, schema)
+            part += 1
+        buffers.clear()
+        buffered = 0
+
+    for document in cursor:
+        changed_at = document.get(spec['watermark_fields'][0]) or document.get(spec['watermark_fields'][1])
+        if isinstance(changed_at, datetime):
+            changed_at = changed_at.replace(tzinfo=None)
+            if new_watermark is None or changed_at > new_watermark:
+                new_watermark = changed_at
+
+        buffers.setdefault(partition_key(document, spec['partition_fields']), []).append(to_row(document, spec['columns']))
+        buffered += 1
+        written += 1
+        if buffered >= FLUSH_ROWS:
+            flush()
+
+    if buffered:
+        flush()
+
+    return written, new_watermark
+
+
+def export_dimension(db, name, spec, store_dir):
+    schema = build_schema(spec['columns'])
+    projection = {field: 1 for _, sources in spec['columns'].values() for field in sources}
+    rows = [to_row(document, spec['columns']) for document in db[name].find({}, projection)]
+
+    directory = os.path.join(store_dir, name)
+    tmp_path = os.path.join(directory, 'snapshot.parquet.tmp')
+    write_parquet(tmp_path, rows, schema)
+    os.replace(tmp_path, os.path.join(directory, 'snapshot.parquet'))
+    return len(rows)
+
+
+def main(full=False, collections=None, store_dir=ANALYTICS_STORE_DIR):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print('❌ pyarrow is required for the analytics export: pip install pyarrow')
+        return 1
+
+    db = get_db()
+    if db is None:
+        print('❌ Database unavailable. Aborting export.')
+        return 1
+
+    selected = collections or list(EXPORT_SPECS.keys())
+    unknown = [name for name in selected if name not in EXPORT_SPECS]
+    if unknown:
+        print(f"❌ Unknown collections: {', '.join(unknown)}")
+        return 1
+
+    if full:
+        for name in selected:
+            shutil.rmtree(os.path.join(store_dir, name), ignore_errors=True)
+
+    os.makedirs(store_dir, exist_ok=True)
+    state = load_state(store_dir)
+    run_id = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+
+    print(f'📦 Exporting to {store_dir}')
+    for name in selected:
+        started = time.time()
+        raw_watermark = None if full else state.get(name)
+        watermark = datetime.fromisoformat(raw_watermark) if raw_watermark else None
+
+        written, new_watermark = export_collection(db, name, EXPORT_SPECS[name], store_dir, watermark, run_id)
+        if new_watermark is not None:
+            state[name] = new_watermark.isoformat()
+        # Checkpoint after every collection so an interrupted run resumes where it stopped.
+        save_state(store_dir, state)
+
+        print(f'   {name}: {written} row(s) in {time.time() - started:.1f}s (watermark: {state.get(name)})')
+
+    for name, spec in DIMENSION_SPECS.items():
+        count = export_dimension(db, name, spec, store_dir)
+        print(f'   {name}: {count} row(s) (full snapshot)')
+
+    print('✅ Export complete')
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Incrementally export operational data to the analytics store.')
+    parser.add_argument('--full', action='store_true', help='Discard existing files and watermarks and export everything.')
+    parser.add_argument('--collections', nargs='+', help=f"Subset of: {', '.join(EXPORT_SPECS)}")
+    parser.add_argument('--store-dir', default=ANALYTICS_STORE_DIR, help='Target directory (default: ANALYTICS_STORE_DIR).')
+    args = parser.parse_args()
+    raise SystemExit(main(full=args.full, collections=args.collections, store_dir=args.store_dir))
@@ -0,0 +1,91 @@
+"""
+Minimal HTTP load generator for comparing gunicorn worker models.
+
+Opens ``--concurrency`` keep-alive clients that request the given paths
+round-robin for ``--duration`` seconds, then prints throughput, latency
+percentiles and errors. With ``--body`` every request is a POST of that
+JSON document instead of a GET.
+
+Usage:
+  python scripts/load_test.py --url http://localhost:5000 --concurrency 32 --duration 30 \\
+      --path /api/stations/ --path /api/health/ready
+  python scripts/load_test.py --token <JWT> --path /api/sessions/active
+  python scripts/load_test.py --path /api/ai/optimize --body '{"batteryCapacity": 60}'
+"""
+
+import argparse
+import json
+import threading
+import time
+
+import requests
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * pct / 100.0), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def worker(base_url, paths, headers, deadline, latencies, errors, lock, body=None):
+    session = requests.Session()
+    session.headers.update(headers)
+    local_latencies = []
+    local_errors = 0
+    index = 0
+    while time.perf_counter() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            if body is None:
+                response = session.get(base_url + path, timeout=30)
+            else:
+                response = session.post(base_url + path, json=body, timeout=30)
+            if response.status_code >= 500:
+                local_errors += 1
+        except requests.RequestException:
+            local_errors += 1
+            continue
+        local_latencies.append((time.perf_counter() - started) * 1000)
+    with lock:
+        latencies.extend(local_latencies)
+        errors.append(local_errors)
+
+
+def main(url, paths, concurrency, duration, token=None, body=None):
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    latencies, errors, lock = [], [], threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    threads = [
+        threading.Thread(target=worker, args=(url.rstrip('/'), paths, headers, deadline, latencies, errors, lock, body))
+        for _ in range(concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"requests:   {len(latencies)} in {elapsed:.1f}s ({len(latencies) / elapsed:.1f} req/s)")
+    print(f"errors:     {sum(errors)}")
+    print(f"latency ms: p50={percentile(latencies, 50):.1f} p95={percentile(latencies, 95):.1f} "
+          f"p99={percentile(latencies, 99):.1f} max={latencies[-1] if latencies else 0:.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simple keep-alive HTTP load test.')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--path', action='append', dest='paths', help='Path to request (repeatable).')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--token', help='JWT for authenticated endpoints.')
+    parser.add_argument('--body', type=json.loads, help='JSON body; POST it instead of GET.')
+    args = parser.parse_args()
+    raise SystemExit(main(args.url, args.paths or ['/api/health/live'], args.concurrency, args.duration, args.token,
+                          args.body))
@@ -0,0 +1,44 @@
+"""
+Rebuild station rating aggregates from the reviews collection.
+
+Stations carry a per-star review histogram, the rating sum, the review count
+and the average (``utils/ratings.py``). They are adjusted incrementally
+whenever a review is created or deleted; this recomputes them from
+``reviews`` for stations created before that, or after manual edits to
+reviews, and rewrites only the stations whose stored values differ.
+
+Usage:
+  python scripts/rebuild_station_ratings.py
+  python scripts/rebuild_station_ratings.py --dry-run
+"""
+
+import argparse
+import os
+import sys
+
+# Add backend root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_db
+from utils.ratings import rebuild_station_ratings
+
+
+def main(dry_run=False):
+    db = get_db()
+    if db is None:
+        print('❌ Database unavailable. Aborting rebuild.')
+        return 1
+
+    print('⭐ Rebuilding station ratings' + (' (DRY RUN)' if dry_run else ''))
+    result = rebuild_station_ratings(db, dry_run=dry_run)
+    verb = 'would be rewritten' if dry_run else 'rewritten'
+    print(f"   {result['drifted']} of {result['stations']} station(s) {verb}")
+    print('✅ Rebuild complete')
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recompute station rating histograms, sums and averages from reviews.')
+    parser.add_argument('--dry-run', action='store_true', help='Report drifted stations without writing.')
+    args = parser.parse_args()
+    raise SystemExit(main(dry_run=args.dry_run))
@@ -1,17 +1,34 @@
 """
-One-time data repair utility for EVPulse charging costs.
+Batched, resumable data repair for EVPulse charging costs.
 
 What it fixes:
 1) Completed sessions with missing/zero/over-limit cost fields
 2) Charging transactions with zero/missing/incorrect amount
 3) Missing charging transaction records for completed sessions
+4) Charging transactions of other sessions that still lack an amount
+   (they take the session's stored cost)
+
+Completed sessions are streamed with a cursor in ``_id`` order. For each
+batch the stations and charging transactions involved are prefetched with
+one ``$in`` query each, and the changes are written with one ``bulk_write``
+per collection. The last ``_id`` of every finished batch is checkpointed to
+a state file, so an interrupted run resumes after it (``--restart`` starts
+over). Every write is idempotent: replaying a batch is harmless.
+
+Finally the script installs ``Transaction.amount_validator`` on the
+transactions collection, so MongoDB rejects charging transactions without a
+numeric, non-negative amount. The API read paths rely on that and sum
+amounts as stored.
 
 Usage:
   python scripts/repair_charging_amounts.py
   python scripts/repair_charging_amounts.py --dry-run
+  python scripts/repair_charging_amounts.py --batch-size 1000
+  python scripts/repair_charging_amounts.py --restart
 """
 
 import argparse
+import json
 import math
 import os
 import sys
@@ -20,11 +37,30 @@ from datetime import datetime, timezone
 # Add backend root to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import OperationFailure
+
 from app import create_app
 from database import get_db
+from models.station import Station
 from models.transaction import Transaction
+from routes.common import to_object_id
 from utils.charging import calculate_charging_projection
 
+BATCH_SIZE = 500
+STATE_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    '.repair_charging_amounts.json'
+)
+
+SESSION_FIELDS = {
+    'user_id': 1, 'station_id': 1, 'port_id': 1, 'status': 1, 'payment_method': 1,
+    'start_time': 1, 'end_time': 1, 'duration': 1, 'planned_duration_minutes': 1,
+    'progress': 1, 'battery_capacity_kwh': 1, 'battery_start': 1, 'battery_end': 1,
+    'energy_delivered': 1, 'cost': 1, 'total_cost': 1,
+}
+
 
 def to_float(value, default=0.0):
     try:
@@ -109,7 +145,150 @@ def needs_session_repair(session):
     )
 
 
-def main(dry_run=False):
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def save_state(path, state):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as handle:
+        json.dump(state, handle, indent=2)
+    os.replace(tmp_path, path)
+
+
+def iter_batches(cursor, size):
+    batch = []
+    for document in cursor:
+        batch.append(document)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_after(collection, query, checkpoint, projection, batch_size):
+    """Cursor over ``query`` in _id order, resuming after ``checkpoint``."""
+    if checkpoint:
+        query = {**query, '_id': {'$gt': ObjectId(checkpoint)}}
+    return collection.find(query, projection).sort('_id', 1).batch_size(batch_size)
+
+
+def id_variants(ids):
+    """ObjectIds plus their string form (older documents stored string references)."""
+    ids = list(ids)
+    return ids + [str(value) for value in ids]
+
+
+def plan_session_batch(db, sessions, station_cache, now):
+    """Operations that bring one batch of completed sessions and their charging transactions in line."""
+    missing_station_ids = {
+        to_object_id(s.get('station_id')) for s in sessions
+    } - set(station_cache) - {None}
+    if missing_station_ids:
+        stations = db.stations.find(
+            {'_id': {'$in': list(missing_station_ids)}}, {'ports': 1, **Station.scope_projection}
+        )
+        for station in stations:
+            station_cache[station['_id']] = station
+
+    transactions_by_session = {}
+    charging = db.transactions.find(
+        {'type': 'charging', 'session_id': {'$in': id_variants(s['_id'] for s in sessions)}},
+        {'session_id': 1, 'amount': 1, 'status': 1}
+    )
+    for txn in charging:
+        transactions_by_session.setdefault(to_object_id(txn.get('session_id')), []).append(txn)
+
+    session_ops, transaction_ops = [], []
+    counts = {'sessions_repaired': 0, 'transactions_repaired': 0, 'transactions_created': 0}
+
+    for session in sessions:
+        session_id = session['_id']
+        station = station_cache.get(to_object_id(session.get('station_id')))
+        billing = compute_billing(session, station)
+
+        if needs_session_repair(session):
+            session_ops.append(UpdateOne({'_id': session_id}, {'$set': {
+                'duration': billing['duration'],
+                'energy_delivered': billing['energy_delivered'],
+                'cost': billing['cost'],
+                'total_cost': billing['total_cost'],
+                'updated_at': now,
+            }}))
+            counts['sessions_repaired'] += 1
+
+        target_amount = billing['cost']
+        if not Transaction.has_valid_charge(target_amount):
+            continue
+
+        session_transactions = transactions_by_session.get(session_id, [])
+        if not session_transactions:
+            transaction = Transaction(
+                user_id=session.get('user_id'),
+                amount=target_amount,
+                transaction_type='charging',
+                payment_method=session.get('payment_method', 'Wallet'),
+                description='Charging session at station',
+                session_id=session_id,
+            )
+            transaction.created_at = now
+            transaction.timestamp = now
+            document = transaction.to_dict()
+            if station:
+                document.update(Station.scope_fields(station))
+            transaction_ops.append(InsertOne(document))
+            counts['transactions_created'] += 1
+            continue
+
+        for txn in session_transactions:
+            if abs(to_float(txn.get('amount'), 0.0) - target_amount) > 0.009:
+                transaction_ops.append(UpdateOne({'_id': txn['_id']}, {'$set': {
+                    'amount': target_amount,
+                    'status': txn.get('status', 'completed') or 'completed',
+                    'updated_at': now,
+                }}))
+                counts['transactions_repaired'] += 1
+
+    return session_ops, transaction_ops, counts
+
+
+def plan_orphan_batch(db, transactions, now):
+    """Amounts for charging transactions still missing one, from their session's stored cost."""
+    session_ids = {to_object_id(txn.get('session_id')) for txn in transactions} - {None}
+    session_costs = {}
+    if session_ids:
+        sessions = db.sessions.find({'_id': {'$in': list(session_ids)}}, {'status': 1, 'cost': 1, 'total_cost': 1})
+        for session in sessions:
+            # Completed sessions were settled by the first pass
+            if session.get('status') != 'completed':
+                session_costs[session['_id']] = round(to_float(session.get('cost') or session.get('total_cost')), 2)
+
+    operations, unresolved = [], 0
+    for txn in transactions:
+        amount = session_costs.get(to_object_id(txn.get('session_id')), 0.0)
+        if Transaction.has_valid_amount(amount):
+            operations.append(UpdateOne({'_id': txn['_id']}, {'$set': {'amount': amount, 'updated_at': now}}))
+        else:
+            unresolved += 1
+    return operations, unresolved
+
+
+def install_amount_validator(db):
+    # 'moderate' validates every insert and every update of a valid document;
+    # rows that could not be repaired stay readable and editable.
+    db.command({
+        'collMod': Transaction.collection_name,
+        'validator': Transaction.amount_validator,
+        'validationLevel': 'moderate',
+        'validationAction': 'error',
+    })
+
+
+def main(dry_run=False, batch_size=BATCH_SIZE, restart=False, state_file=STATE_FILE, install_validator=True):
     app = create_app()
 
     with app.app_context():
@@ -118,71 +297,69 @@ def main(dry_run=False):
             print('❌ Database unavailable. Aborting repair.')
             return 1
 
-        completed_sessions = list(db.sessions.find({'status': 'completed'}))
-
-        repaired_sessions = 0
-        repaired_transactions = 0
-        created_transactions = 0
-
-        for session in completed_sessions:
-            session_id = session['_id']
-            station = db.stations.find_one({'_id': session.get('station_id')})
-            billing = compute_billing(session, station)
-
-            session_update = {}
-            if needs_session_repair(session):
-                session_update = {
-                    'duration': billing['duration'],
-                    'energy_delivered': billing['energy_delivered'],
-                    'cost': billing['cost'],
-                    'total_cost': billing['total_cost'],
-                    'updated_at': datetime.now(timezone.utc),
-                }
-
-                if not dry_run:
-                    db.sessions.update_one({'_id': session_id}, {'$set': session_update})
-                repaired_sessions += 1
-
-            target_amount = billing['cost']
-            session_transactions = list(
-                db.transactions.find({'type': 'charging', 'session_id': session_id})
-            )
+        state = {} if restart else load_state(state_file)
+        if ('sessions' in state or 'transactions' in state) and not dry_run:
+            print(f"↪️  Resuming from checkpoint {state_file}")
 
-            if not session_transactions:
-                transaction = Transaction(
-                    user_id=session.get('user_id'),
-                    amount=target_amount,
-                    transaction_type='charging',
-                    payment_method=session.get('payment_method', 'Wallet'),
-                    description='Charging session at station',
-                    session_id=session_id,
-                )
-                transaction.created_at = datetime.now(timezone.utc)
-                transaction.timestamp = datetime.now(timezone.utc)
-
-                if not dry_run:
-                    db.transactions.insert_one(transaction.to_dict())
-                created_transactions += 1
-            else:
-                for txn in session_transactions:
-                    amount = to_float(txn.get('amount'), 0.0)
-                    if abs(amount - target_amount) > 0.009:
-                        if not dry_run:
-                            db.transactions.update_one(
-                                {'_id': txn['_id']},
-                                {'$set': {
-                                    'amount': target_amount,
-                                    'status': txn.get('status', 'completed') or 'completed',
-                                    'updated_at': datetime.now(timezone.utc),
-                                }}
-                            )
-                        repaired_transactions += 1
+        totals = {'sessions_repaired': 0, 'transactions_repaired': 0, 'transactions_created': 0}
+        station_cache = {}
+        processed = 0
+
+        # Pass 1: completed sessions and their charging transactions
+        cursor = stream_after(db.sessions, {'status': 'completed'}, state.get('sessions'), SESSION_FIELDS, batch_size)
+        for sessions in iter_batches(cursor, batch_size):
+            session_ops, transaction_ops, counts = plan_session_batch(
+                db, sessions, station_cache, datetime.now(timezone.utc)
+            )
+            if not dry_run:
+                if session_ops:
+                    db.sessions.bulk_write(session_ops, ordered=False)
+                if transaction_ops:
+                    db.transactions.bulk_write(transaction_ops, ordered=False)
+                state['sessions'] = str(sessions[-1]['_id'])
+                save_state(state_file, state)
+
+            for key, value in counts.items():
+                totals[key] += value
+            processed += len(sessions)
+            print(f'   sessions: {processed} processed', end='\r')
+        print()
+
+        # Pass 2: charging transactions of sessions that are not completed (or gone)
+        orphans_repaired = 0
+        unresolved = 0
+        orphan_query = {'type': 'charging', 'amount': {'$not': {'$gt': 0}}}
+        cursor = stream_after(db.transactions, orphan_query, state.get('transactions'), {'session_id': 1}, batch_size)
+        for transactions in iter_batches(cursor, batch_size):
+            operations, batch_unresolved = plan_orphan_batch(db, transactions, datetime.now(timezone.utc))
+            if not dry_run:
+                if operations:
+                    db.transactions.bulk_write(operations, ordered=False)
+                state['transactions'] = str(transactions[-1]['_id'])
+                save_state(state_file, state)
+            orphans_repaired += len(operations)
+            unresolved += batch_unresolved
+
+        validator = 'skipped'
+        if not dry_run and install_validator:
+            try:
+                install_amount_validator(db)
+                validator = 'installed'
+            except OperationFailure as e:
+                validator = f'not installed ({e})'
+
+        if not dry_run:
+            # Completed: the next run starts from the beginning again.
+            state = {'completed_at': datetime.now(timezone.utc).isoformat()}
+            save_state(state_file, state)
 
         mode = 'DRY RUN' if dry_run else 'APPLIED'
         print(f'✅ Repair complete ({mode})')
-        print(f'   Sessions repaired: {repaired_sessions}')
-        print(f'   Transactions repaired: {repaired_transactions}')
-        print(f'   Transactions created: {created_transactions}')
+        print(f'   Sessions repaired: {totals["sessions_repaired"]}')
+        print(f'   Transactions repaired: {totals["transactions_repaired"] + orphans_repaired}')
+        print(f'   Transactions created: {totals["transactions_created"]}')
+        print(f'   Transactions without a resolvable amount: {unresolved}')
+        print(f'   Amount validator: {validator}')
 
     return 0
 
@@ -190,5 +367,15 @@ def main(dry_run=False):
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Repair charging session and transaction amounts.')
     parser.add_argument('--dry-run', action='store_true', help='Show what would change without writing.')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help=f'Documents per batch (default: {BATCH_SIZE}).')
+    parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start from the first session.')
+    parser.add_argument('--state-file', default=STATE_FILE, help='Checkpoint file (default: backend/.repair_charging_amounts.json).')
+    parser.add_argument('--skip-validator', action='store_true', help='Do not install the transactions amount validator.')
     args = parser.parse_args()
-    raise SystemExit(main(dry_run=args.dry_run))
+    raise SystemExit(main(
+        dry_run=args.dry_run,
+        batch_size=max(1, args.batch_size),
+        restart=args.restart,
+        state_file=args.state_file,
+        install_validator=not args.skip_validator,
+    ))
@@ -20,6 +20,7 @@ from models.booking import Booking
 from models.transaction import Transaction
 from models.review import Review
 from models.notification import Notification
+from utils.ratings import rebuild_station_ratings
 
 def seed_database():
     """Seed the database with initial data"""
@@ -194,6 +195,7 @@ def seed_database():
         ]
         
         station_ids = []
+        station_scopes = {}
         for station_data in stations_data:
             station_doc = {
                 'name': station_data['name'],
@@ -215,6 +217,7 @@ def seed_database():
             }
             result = db.stations.insert_one(station_doc)
             station_ids.append(str(result.inserted_id))
+            station_scopes[str(result.inserted_id)] = Station.scope_fields({**station_doc, '_id': result.inserted_id})
             print(f"   ✓ Created station: {station_data['name']}")
         
         # Create sample sessions
@@ -271,7 +274,8 @@ def seed_database():
                 'payment_method': session_data['payment_method'],
                 'progress': 100,
                 'created_at': session_data['start_time'],
-                'updated_at': datetime.utcnow()
+                'updated_at': datetime.utcnow(),
+                **station_scopes[session_data['station_id']]
             }
             db.sessions.insert_one(session_doc)
         print(f"   ✓ Created {len(sessions_data)} charging sessions")
@@ -310,7 +314,8 @@ def seed_database():
                 'status': booking_data['status'],
                 'estimated_cost': booking_data['estimated_cost'],
                 'created_at': datetime.utcnow(),
-                'updated_at': datetime.utcnow()
+                'updated_at': datetime.utcnow(),
+                **station_scopes[booking_data['station_id']]
             }
             db.bookings.insert_one(booking_doc)
         print(f"   ✓ Created {len(bookings_data)} bookings")
@@ -361,6 +366,7 @@ def seed_database():
                 'created_at': datetime.utcnow()
             }
             db.reviews.insert_one(review_doc)
+        rebuild_station_ratings(db)
         print(f"   ✓ Created {len(reviews_data)} reviews")
         
         # Create sample notifications
@@ -1,5 +1,6 @@
 """
-Simple server startup script without auto-reload
+Simple server startup script without auto-reload (development only).
+For production use gunicorn: `gunicorn wsgi:app` (see gunicorn.conf.py).
 """
 from app import create_app
 
@@ -0,0 +1,131 @@
+"""
+EVPulse Batch Charging Projections
+==================================
+The vectorized projections (utils/charging_batch.py) must return exactly
+what calculate_charging_projection returns for the same inputs: the same
+clamping, defaults, float maths and Python rounding, row for row.
+
+Usage:
+    python -m pytest test_charging_batch.py
+"""
+
+import itertools
+import math
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+pytest.importorskip('numpy')
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+from routes import charging
+from utils import charging_batch
+from utils.charging import calculate_charging_projection
+from utils.charging_batch import FIELDS, calculate_charging_projections, grid_projections, to_columns
+
+# Defaults, clamp edges, rounding ties (2.675, 12.25, 11.125), junk and non-finite values
+EDGE_VALUES = {
+    'battery_capacity_kwh': [None, 'abc', 24.96, 72.45, 250, float('nan')],
+    'current_percentage': [None, -5, 12.25, '50', 99.95, float('inf')],
+    'target_percentage': [None, 10, 33.35, 140, float('nan')],
+    'duration_minutes': [None, 14.5, 22.5, 241, '90'],
+    'rate_per_kwh': [None, 0.05, 2.675, 11.125, 1e300, -float('inf')],
+    'charger_power_kw': [None, 1, 150.05, 500],
+    'progress_percentage': [None, -10, 37.5, 100.5],
+}
+
+
+def _same(expected, actual):
+    return expected == actual or (isinstance(expected, float) and math.isnan(expected) and math.isnan(actual))
+
+
+def _assert_rows_match(columns, projections):
+    flat = to_columns(projections)
+    for index, row in enumerate(zip(*columns.values())):
+        expected = calculate_charging_projection(**dict(zip(columns, row)))
+        mismatched = {field: (expected[field], flat[field][index]) for field in FIELDS
+                      if not _same(expected[field], flat[field][index])}
+        assert not mismatched, (dict(zip(columns, row)), mismatched)
+
+
+def test_batch_matches_the_scalar_projection_row_for_row():
+    rows = list(itertools.product(*EDGE_VALUES.values()))
+    columns = {name: [row[index] for row in rows] for index, name in enumerate(EDGE_VALUES)}
+    _assert_rows_match(columns, calculate_charging_projections(**columns))
+
+
+def test_chunked_batches_match_and_share_unchanging_columns(monkeypatch):
+    monkeypatch.setattr(charging_batch, 'CHUNK_ROWS', 7)
+    rows = list(itertools.product(*(values[:4] for values in EDGE_VALUES.values())))
+    columns = {name: [row[index] for row in rows] for index, name in enumerate(EDGE_VALUES) if name != 'progress_percentage'}
+    projections = calculate_charging_projections(**columns)
+    _assert_rows_match(columns, projections)
+    # Default progress: delivered figures are the projected ones, progress is a constant view
+    assert projections['deliveredCost'] is projections['estimatedTotalCost']
+    assert projections['progressPercentage'].strides == (0,)
+
+
+@pytest.mark.parametrize('chunk_rows', [10_000, 5])
+def test_grid_matches_the_scalar_projection_for_every_combination(monkeypatch, chunk_rows):
+    monkeypatch.setattr(charging_batch, 'CHUNK_ROWS', chunk_rows)
+    vehicles = {'batteryCapacityKwh': [40, 72.45, None], 'currentPercentage': [10, 55.5, 90],
+                'targetPercentage': [80, 50, 100]}
+    chargers = {'chargerPowerKw': [7.4, 350], 'ratePerKwh': [8, 2.675]}
+    durations = [15, 60, 240]
+    projections = grid_projections(vehicles, chargers, durations, progress_percentage=62.5)
+    assert projections['targetEnergyKwh'].shape == (3, 2, 3)
+    for v, c, d in itertools.product(range(3), range(2), range(3)):
+        expected = calculate_charging_projection(
+            vehicles['batteryCapacityKwh'][v], vehicles['currentPercentage'][v], vehicles['targetPercentage'][v],
+            durations[d], chargers['ratePerKwh'][c], chargers['chargerPowerKw'][c], 62.5,
+        )
+        assert {field: projections[field][v, c, d].item() for field in FIELDS} == expected
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.config.update(JWT_SECRET_KEY='charging-batch-tests-signing-key-0123456789', TESTING=True)
+    JWTManager(app)
+    app.register_blueprint(charging.charging_bp, url_prefix='/api/charging')
+    with app.app_context():
+        token = create_access_token(identity='fleet-user')
+    test_client = app.test_client()
+
+    def post(body):
+        response = test_client.post(
+            '/api/charging/projections/batch', json=body, headers={'Authorization': f'Bearer {token}'}
+        )
+        return response.status_code, response.get_json()
+
+    return post
+
+
+def test_batch_endpoint_returns_columns(client, monkeypatch):
+    status, body = client({'scenarios': {'batteryCapacityKwh': [60, 75], 'currentPercentage': 20,
+                                         'chargerPowerKw': [22, 150]}})
+    assert status == 200
+    assert body['data']['count'] == 2
+    assert body['data']['projections']['targetEnergyKwh'] == [
+        calculate_charging_projection(60, 20, charger_power_kw=22)['targetEnergyKwh'],
+        calculate_charging_projection(75, 20, charger_power_kw=150)['targetEnergyKwh'],
+    ]
+
+    status, body = client({'vehicles': {'batteryCapacityKwh': [60, 75]}, 'chargers': {'chargerPowerKw': [22, 50, 150]},
+                           'durationsMinutes': [30, 60]})
+    assert status == 200
+    assert body['data']['shape'] == [2, 3, 2]
+    assert len(body['data']['projections']['estimatedTotalCost']) == 12
+
+    status, body = client({'scenarios': {'batteryCapacityKwh': [60, 75], 'currentPercentage': [20]}})
+    assert status == 400
+
+    monkeypatch.setattr(charging, 'MAX_BATCH_PROJECTIONS', 10)
+    status, body = client({'vehicles': {'batteryCapacityKwh': [60, 75]}, 'chargers': {'chargerPowerKw': [22, 50, 150]},
+                           'durationsMinutes': [30, 60]})
+    assert status == 400
@@ -0,0 +1,754 @@
+"""
+EVPulse Mutating Endpoint Round Trips
+=====================================
+Counts the MongoDB operations each mutating endpoint issues, so a
+read-after-write (update_one followed by find_one of the same document)
+or an existence/ownership pre-read cannot creep back in unnoticed.
+
+The database is a recording stand-in: every collection method call is one
+round trip, and returns whatever the test registered for it.
+
+Usage:
+    python -m pytest test_round_trips.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from pymongo.errors import ExecutionTimeout
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from models.transaction import Transaction
+from utils import idempotency
+from routes import admin, auth, bookings, common, notifications, operator, reviews, sessions, stations, transactions, users
+from utils.ai_optimizer import AIServiceBusy, LocalBackend, Optimizer, build_prompt, normalized_inputs
+from utils.charging import calculate_charging_projection
+from utils.ratings import rebuild_station_ratings
+from utils.station_suggest import get_suggest_index
+
+
+class RecordingCollection:
+    def __init__(self, db, name):
+        self._db = db
+        self._name = name
+
+    def __getattr__(self, operation):
+        def call(*args, **kwargs):
+            self._db.calls.append((self._name, operation))
+            result = self._db.results.get((self._name, operation))
+            return result(*args, **kwargs) if callable(result) else result
+        return call
+
+
+class RecordingDb:
+    def __init__(self):
+        self.calls = []
+        self.results = {}
+
+    def __getattr__(self, name):
+        return RecordingCollection(self, name)
+
+    def __getitem__(self, name):
+        return RecordingCollection(self, name)
+
+    def on(self, collection, operation, result):
+        self.results[(collection, operation)] = result
+
+
+OPERATOR_ID = ObjectId()
+USER_ID = ObjectId()
+ADMIN_ID = ObjectId()
+STATION_ID = ObjectId()
+
+STATION = {
+    '_id': STATION_ID,
+    'name': 'Central Hub',
+    'city': 'Pune',
+    'nearby_landmark': 'Station Road',
+    'operator_id': OPERATOR_ID,
+    'ports': [{'id': 1, 'type': 'fast', 'power': 50, 'price': 18, 'status': 'busy'}],
+}
+
+PEOPLE = {
+    USER_ID: {'_id': USER_ID, 'role': 'user', 'name': 'Asha', 'email': 'asha@example.com'},
+    OPERATOR_ID: {'_id': OPERATOR_ID, 'role': 'operator', 'name': 'Ravi', 'email': 'ravi@example.com'},
+    ADMIN_ID: {'_id': ADMIN_ID, 'role': 'admin', 'name': 'Meera', 'email': 'meera@example.com'},
+}
+
+
+def _find_person(query, *args, **kwargs):
+    return PEOPLE.get(query.get('_id'))
+
+
+def _updated(document):
+    def apply(query, update, *args, **kwargs):
+        return {**document, **update.get('$set', {})}
+    return apply
+
+
+@pytest.fixture
+def db(monkeypatch):
+    recording = RecordingDb()
+    recording.on('users', 'find_one', _find_person)
+    recording.on('users', 'find', lambda *a, **kw: [PEOPLE[ADMIN_ID]])
+    recording.on('stations', 'find', lambda *a, **kw: [STATION])
+    for module in (admin, auth, bookings, common, notifications, operator, reviews, users, idempotency):
+        monkeypatch.setattr(module, 'get_db', lambda: recording)
+    idempotency.clear()
+    return recording
+
+
+@pytest.fixture
+def app(db):
+    app = Flask(__name__)
+    app.config.update(JWT_SECRET_KEY='round-trip-tests-signing-key-0123456789', TESTING=True)
+    JWTManager(app)
+    app.register_blueprint(auth.auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(stations.stations_bp, url_prefix='/api/stations')
+    app.register_blueprint(sessions.sessions_bp, url_prefix='/api/sessions')
+    app.register_blueprint(bookings.bookings_bp, url_prefix='/api/bookings')
+    app.register_blueprint(notifications.notifications_bp, url_prefix='/api/notifications')
+    app.register_blueprint(admin.admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(users.users_bp, url_prefix='/api/users')
+    app.register_blueprint(transactions.transactions_bp, url_prefix='/api/transactions')
+    app.register_blueprint(reviews.reviews_bp, url_prefix='/api/reviews')
+    app.register_blueprint(operator.operator_bp, url_prefix='/api/operator')
+    return app
+
+
+def _call(app, db, method, path, identity, json=None, headers=None):
+    with app.app_context():
+        token = create_access_token(identity=str(identity))
+    response = app.test_client().open(
+        path, method=method, json=json or {}, headers={'Authorization': f'Bearer {token}', **(headers or {})}
+    )
+    return SimpleNamespace(
+        status=response.status_code, body=response.get_json(), headers=response.headers, calls=list(db.calls)
+    )
+
+
+def test_update_profile_is_one_round_trip(app, db):
+    updates = []
+
+    def update_user(query, update, **kwargs):
+        updates.append(update)
+        return _updated(PEOPLE[USER_ID])(query, update)
+
+    db.on('users', 'find_one_and_update', update_user)
+    result = _call(app, db, 'PUT', '/api/auth/profile', USER_ID, {'name': 'Asha K'})
+    assert result.status == 200
+    assert result.body['user']['name'] == 'Asha K'
+    assert result.calls == [('users', 'find_one_and_update')]
+    # The search keys follow the new name in the same write
+    assert updates[0]['$set']['name_keys'] == ['asha k', 'asha', 'k']
+
+
+def test_update_user_is_one_round_trip(app, db):
+    db.on('users', 'find_one_and_update', _updated(PEOPLE[USER_ID]))
+    result = _call(app, db, 'PUT', f'/api/users/{USER_ID}', USER_ID, {'phone': '99999'})
+    assert result.status == 200
+    assert result.calls == [('users', 'find_one_and_update')]
+
+
+def test_update_station_checks_ownership_in_the_write(app, db):
+    db.on('stations', 'find_one_and_update', _updated(STATION))
+    result = _call(app, db, 'PUT', f'/api/stations/{STATION_ID}', OPERATOR_ID, {'name': 'North Hub'})
+    assert result.status == 200
+    assert result.body['data']['name'] == 'North Hub'
+    assert result.calls == [('users', 'find_one'), ('stations', 'find_one_and_update')]
+
+
+def test_update_station_address_reads_current_location_once(app, db):
+    restamped = []
+    db.on('stations', 'find_one', STATION)
+    db.on('stations', 'find_one_and_update', _updated(STATION))
+    for collection in ('sessions', 'bookings', 'transactions'):
+        db.on(collection, 'update_many', lambda query, update: restamped.append(query))
+    result = _call(app, db, 'PUT', f'/api/stations/{STATION_ID}', OPERATOR_ID, {'city': 'Mumbai'})
+    assert result.status == 200
+    # A new city is re-stamped on the station's sessions, bookings and transactions
+    assert result.calls == [
+        ('users', 'find_one'),
+        ('stations', 'find_one'),
+        ('stations', 'find_one_and_update'),
+        ('sessions', 'update_many'),
+        ('bookings', 'update_many'),
+        ('transactions', 'update_many'),
+    ]
+    # Including documents that store the station reference as a string
+    assert restamped == [{'station_id': {'$in': [STATION_ID, str(STATION_ID)]}}] * 3
+
+
+def test_update_station_by_another_operator_is_rejected(app, db):
+    other = ObjectId()
+    PEOPLE[other] = {'_id': other, 'role': 'operator'}
+    try:
+        db.on('stations', 'find_one_and_update', None)
+        db.on('stations', 'find_one', {'_id': STATION_ID})
+        result = _call(app, db, 'PUT', f'/api/stations/{STATION_ID}', other, {'name': 'Mine now'})
+    finally:
+        del PEOPLE[other]
+    assert result.status == 403
+
+
+def test_station_status_is_one_conditional_update(app, db):
+    db.on('stations', 'update_one', SimpleNamespace(matched_count=1))
+    result = _call(app, db, 'PUT', f'/api/stations/{STATION_ID}/status', OPERATOR_ID, {'status': 'offline'})
+    assert result.status == 200
+    assert result.calls == [('users', 'find_one'), ('stations', 'update_one')]
+
+    db.calls.clear()
+    result = _call(app, db, 'PUT', f'/api/stations/{STATION_ID}/ports/1/status', OPERATOR_ID, {'status': 'available'})
+    assert result.status == 200
+    assert result.calls == [('users', 'find_one'), ('stations', 'update_one')]
+
+
+def test_admin_update_station_is_one_write(app, db):
+    db.on('stations', 'find_one_and_update', _updated(STATION))
+    result = _call(app, db, 'PUT', f'/api/admin/stations/{STATION_ID}', ADMIN_ID, {'name': 'Renamed'})
+    assert result.status == 200
+    assert result.calls == [('users', 'find_one'), ('stations', 'find_one_and_update')]
+
+    db.calls.clear()
+    db.on('stations', 'find_one_and_update', None)
+    result = _call(app, db, 'PUT', f'/api/admin/stations/{STATION_ID}', ADMIN_ID, {'name': 'Renamed'})
+    assert result.status == 404
+
+
+def test_notification_writes_carry_ownership(app, db):
+    notification_id = ObjectId()
+    db.on('notifications', 'update_one', SimpleNamespace(matched_count=1))
+    result = _call(app, db, 'PUT', f'/api/notifications/{notification_id}/read', USER_ID)
+    assert result.status == 200
+    assert result.calls == [('notifications', 'update_one')]
+
+    db.calls.clear()
+    db.on('notifications', 'delete_one', SimpleNamespace(deleted_count=1))
+    result = _call(app, db, 'DELETE', f'/api/notifications/{notification_id}', USER_ID)
+    assert result.status == 200
+    assert result.calls == [('notifications', 'delete_one')]
+
+
+def test_mark_as_read_distinguishes_missing_from_foreign(app, db):
+    db.on('notifications', 'update_one', SimpleNamespace(matched_count=0))
+    db.on('notifications', 'find_one', None)
+    assert _call(app, db, 'PUT', f'/api/notifications/{ObjectId()}/read', USER_ID).status == 404
+
+    db.on('notifications', 'find_one', {'_id': ObjectId()})
+    assert _call(app, db, 'PUT', f'/api/notifications/{ObjectId()}/read', USER_ID).status == 403
+
+
+def test_cancel_booking_has_no_pre_read(app, db):
+    booking = {'_id': ObjectId(), 'user_id': USER_ID, 'station_id': STATION_ID, 'date': '2026-10-20', 'time_slot': '10:00-11:00'}
+    db.on('bookings', 'find_one_and_update', _updated(booking))
+    db.on('stations', 'find_one', STATION)
+    result = _call(app, db, 'POST', f"/api/bookings/{booking['_id']}/cancel", USER_ID)
+    assert result.status == 200
+    assert result.calls == [
+        ('users', 'find_one'),
+        ('bookings', 'find_one_and_update'),
+        ('stations', 'find_one'),
+        ('notifications', 'insert_many'),
+        ('notifications', 'insert_many'),
+        ('users', 'find'),
+        ('notifications', 'insert_many'),
+    ]
+
+
+def test_stop_session_writes_a_zero_cost_charging_row(app, db):
+    session = {'_id': ObjectId(), 'user_id': USER_ID, 'station_id': STATION_ID, 'port_id': 1, 'status': 'active',
+               'start_time': datetime.utcnow(), 'planned_duration_minutes': 60}
+    charges = []
+    db.on('sessions', 'find_one', session)
+    db.on('sessions', 'find_one_and_update', _updated(session))
+    db.on('stations', 'find_one', STATION)
+    db.on('transactions', 'update_one', lambda query, update, **kw: charges.append(update['$set']['amount']))
+    assert _call(app, db, 'POST', f"/api/sessions/stop/{session['_id']}", USER_ID, {'progress': 0}).status == 200
+    assert charges == [0]
+    assert Transaction.has_valid_charge(0) and not Transaction.has_valid_amount(0)
+
+
+def test_stop_session_does_not_reread_the_session(app, db):
+    session = {
+        '_id': ObjectId(),
+        'user_id': USER_ID,
+        'station_id': STATION_ID,
+        'port_id': 1,
+        'status': 'active',
+        'start_time': datetime.utcnow() - timedelta(minutes=30),
+        'planned_duration_minutes': 60,
+    }
+    db.on('sessions', 'find_one', session)
+    db.on('sessions', 'find_one_and_update', _updated(session))
+    db.on('stations', 'find_one', STATION)
+    result = _call(app, db, 'POST', f"/api/sessions/stop/{session['_id']}", USER_ID)
+    assert result.status == 200
+    assert result.body['data']['status'] == 'completed'
+    assert result.calls.count(('sessions', 'find_one')) == 1
+    assert ('transactions', 'find_one') not in result.calls
+    assert result.calls[:7] == [
+        ('users', 'find_one'),
+        ('sessions', 'find_one'),
+        ('stations', 'find_one'),
+        ('sessions', 'find_one_and_update'),
+        ('stations', 'update_one'),
+        ('transactions', 'update_one'),
+        ('notifications', 'insert_many'),
+    ]
+
+    db.calls.clear()
+    db.on('sessions', 'find_one_and_update', None)
+    result = _call(app, db, 'POST', f"/api/sessions/stop/{session['_id']}", USER_ID)
+    assert result.status == 400
+
+
+def test_writes_to_exported_collections_bump_updated_at(app, db):
+    from database.indexes import INDEXES
+    from utils.analytics_store import EXPORT_SPECS
+
+    # The incremental export filter is an index range on every exported collection
+    for name, spec in EXPORT_SPECS.items():
+        assert any(list(index.document['key']) == spec['watermark_fields'] for index in INDEXES[name]), name
+
+    writes = []
+
+    def recording(collection, operation, result=None):
+        def write(query, update, *args, **kwargs):
+            writes.append((collection, operation, update))
+            return result(query, update) if callable(result) else result
+        db.on(collection, operation, write)
+
+    session = {'_id': ObjectId(), 'user_id': USER_ID, 'station_id': STATION_ID, 'port_id': 1, 'status': 'active',
+               'start_time': datetime.utcnow() - timedelta(minutes=30), 'planned_duration_minutes': 60}
+    db.on('sessions', 'find_one', session)
+    db.on('stations', 'find_one', STATION)
+    recording('sessions', 'find_one_and_update', _updated(session))
+    recording('stations', 'find_one_and_update', _updated(STATION))
+    for collection in ('sessions', 'bookings', 'transactions', 'stations'):
+        recording(collection, 'update_many', SimpleNamespace(matched_count=1, modified_count=1))
+    for collection in ('transactions', 'stations', 'reviews'):
+        recording(collection, 'update_one', SimpleNamespace(matched_count=1, modified_count=1))
+
+    assert _call(app, db, 'POST', f"/api/sessions/stop/{session['_id']}", USER_ID).status == 200
+    assert _call(app, db, 'POST', f'/api/reviews/{ObjectId()}/helpful', USER_ID).status == 200
+    assert _call(app, db, 'PUT', f'/api/stations/{STATION_ID}', OPERATOR_ID, {'city': 'Mumbai'}).status == 200
+
+    assert {(collection, operation) for collection, operation, _ in writes} >= {
+        ('sessions', 'find_one_and_update'), ('stations', 'update_one'), ('transactions', 'update_one'),
+        ('reviews', 'update_one'), ('sessions', 'update_many'), ('bookings', 'update_many'),
+    }
+    for collection, operation, update in writes:
+        stages = update if isinstance(update, list) else [update]
+        assert any('updated_at' in stage.get('$set', {}) for stage in stages), (collection, operation, update)
+
+
+def test_wallet_topup_balance_is_one_aggregate(app, db):
+    db.on('transactions', 'insert_one', SimpleNamespace(inserted_id=ObjectId()))
+    pipelines = []
+    db.on('transactions', 'aggregate', lambda pipeline: pipelines.append(pipeline) or [
+        {'_id': {'type': 'wallet_topup', 'method': 'card', 'status': 'completed'}, 'amount': 500, 'count': 2},
+        {'_id': {'type': 'charging', 'method': 'wallet', 'status': 'completed'}, 'amount': 120.5, 'count': 1},
+    ])
+    result = _call(app, db, 'POST', '/api/transactions/wallet/topup', USER_ID, {'amount': 250})
+    assert result.status == 201
+    assert result.body['data']['newBalance'] == 379.5
+    assert ('transactions', 'find') not in result.calls
+    assert result.calls.count(('transactions', 'aggregate')) == 1
+    # The balance never needs a month, so legacy string timestamps cannot break it
+    group = pipelines[0][-1]['$group']
+    assert 'month' not in group['_id']
+    # String amounts count, as the old per-row float() did
+    assert group['amount'] == {'$sum': {'$round': [
+        {'$convert': {'input': '$amount', 'to': 'double', 'onError': 0, 'onNull': 0}}, 2
+    ]}}
+
+
+def test_idempotency_key_replays_the_first_response(app, db):
+    stored = {}
+
+    def complete(query, update, *args, **kwargs):
+        stored.update(_id=query['_id'], **update['$set'])
+        stored.update(fingerprint=claims[0]['fingerprint'], expires_at=claims[0]['expires_at'])
+        return dict(stored)
+
+    claims = []
+    db.on('idempotency_keys', 'find_one', None)
+    db.on('idempotency_keys', 'insert_one', lambda claim: claims.append(claim))
+    db.on('idempotency_keys', 'find_one_and_update', complete)
+    db.on('transactions', 'insert_one', SimpleNamespace(inserted_id=ObjectId()))
+    db.on('transactions', 'aggregate', lambda *a, **kw: [])
+    headers = {'Idempotency-Key': 'topup-7f3a'}
+
+    first = _call(app, db, 'POST', '/api/transactions/wallet/topup', USER_ID, {'amount': 250}, headers)
+    assert first.status == 201
+    assert first.calls.count(('transactions', 'insert_one')) == 1
+
+    # Retry from the same worker: served from the front cache, no database work
+    db.calls.clear()
+    retry = _call(app, db, 'POST', '/api/transactions/wallet/topup', USER_ID, {'amount': 250}, headers)
+    assert retry.status == 201
+    assert retry.body == first.body
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.calls == []
+
+    # Retry on another worker: one point read
+    idempotency.clear()
+    db.on('idempotency_keys', 'find_one', lambda *a, **kw: dict(stored))
+    retry = _call(app, db, 'POST', '/api/transactions/wallet/topup', USER_ID, {'amount': 250}, headers)
+    assert retry.body == first.body
+    assert retry.calls == [('idempotency_keys', 'find_one')]
+
+    # Same key, different body
+    conflict = _call(app, db, 'POST', '/api/transactions/wallet/topup', USER_ID, {'amount': 999}, headers)
+    assert conflict.status == 422
+
+
+def test_review_writes_adjust_station_rating_incrementally(app, db):
+    updates = []
+    db.on('reviews', 'find_one', None)
+    db.on('reviews', 'insert_one', SimpleNamespace(inserted_id=ObjectId()))
+    db.on('stations', 'update_one', lambda query, update: updates.append((query, update)) or SimpleNamespace(matched_count=1))
+    result = _call(app, db, 'POST', '/api/reviews', USER_ID, {'stationId': str(STATION_ID), 'rating': 4})
+    assert result.status == 201
+    assert ('reviews', 'find') not in result.calls
+    assert ('reviews', 'aggregate') not in result.calls
+    assert result.calls[-1] == ('stations', 'update_one')
+    query, pipeline = updates[-1]
+    assert query == {'_id': STATION_ID, 'rating_sum': {'$exists': True}}
+    assert pipeline[0]['$set']['rating_sum'] == {'$add': [{'$ifNull': ['$rating_sum', 0]}, 4]}
+    assert 'rating_counts.4' in pipeline[0]['$set']
+
+    review = {'_id': ObjectId(), 'station_id': STATION_ID, 'user_id': USER_ID, 'rating': 4}
+    db.calls.clear()
+    db.on('reviews', 'find_one', review)
+    db.on('reviews', 'delete_one', SimpleNamespace(deleted_count=1))
+    result = _call(app, db, 'DELETE', f"/api/reviews/{review['_id']}", USER_ID)
+    assert result.status == 200
+    assert updates[-1][1][0]['$set']['total_reviews'] == {'$add': [{'$ifNull': ['$total_reviews', 0]}, -1]}
+
+    # A concurrent delete that removed nothing leaves the station alone
+    db.on('reviews', 'delete_one', SimpleNamespace(deleted_count=0))
+    count = len(updates)
+    _call(app, db, 'DELETE', f"/api/reviews/{review['_id']}", USER_ID)
+    assert len(updates) == count
+
+
+def test_first_review_write_on_a_legacy_station_rebuilds_it_from_reviews(app, db):
+    # Written before rating_sum existed: 10 reviews averaging 4.5
+    updates = []
+    db.on('reviews', 'find_one', None)
+    db.on('reviews', 'insert_one', SimpleNamespace(inserted_id=ObjectId()))
+    db.on('reviews', 'aggregate', lambda *a, **kw: iter([
+        {'_id': {'station': STATION_ID, 'rating': 5}, 'count': 6},
+        {'_id': {'station': STATION_ID, 'rating': 4}, 'count': 5},
+    ]))
+    db.on('stations', 'update_one',
+          lambda query, update: updates.append((query, update)) or SimpleNamespace(matched_count=len(updates) > 1))
+    result = _call(app, db, 'POST', '/api/reviews', USER_ID, {'stationId': str(STATION_ID), 'rating': 5})
+    assert result.status == 201
+    query, update = updates[-1]
+    assert query == {'_id': STATION_ID, 'rating_sum': {'$exists': False}}
+    assert update['$set']['rating_counts'] == {'1': 0, '2': 0, '3': 0, '4': 5, '5': 6}
+    assert (update['$set']['rating_sum'], update['$set']['total_reviews'], update['$set']['rating']) == (50, 11, 4.5)
+
+
+def test_rebuild_station_ratings_rewrites_only_drifted_stations(db):
+    consistent = {'_id': ObjectId(), 'rating_counts': {'1': 0, '2': 0, '3': 0, '4': 0, '5': 1},
+                  'rating_sum': 5, 'total_reviews': 1, 'rating': 5.0}
+    drifted = {'_id': STATION_ID, 'rating': 4.8, 'total_reviews': 256}
+    written = []
+    db.on('reviews', 'aggregate', lambda *a, **kw: iter([
+        {'_id': {'station': consistent['_id'], 'rating': 5}, 'count': 1},
+        {'_id': {'station': STATION_ID, 'rating': 5}, 'count': 2},
+        {'_id': {'station': STATION_ID, 'rating': 4}, 'count': 1},
+    ]))
+    db.on('stations', 'find', lambda *a, **kw: [consistent, drifted])
+    db.on('stations', 'bulk_write', lambda operations, **kw: written.extend(operations))
+
+    assert rebuild_station_ratings(db) == {'stations': 2, 'drifted': 1}
+    assert len(written) == 1
+    fields = written[0]._doc['$set']
+    assert fields['rating_counts'] == {'1': 0, '2': 0, '3': 0, '4': 1, '5': 2}
+    assert (fields['rating_sum'], fields['total_reviews'], fields['rating']) == (14, 3, 4.7)
+
+
+def test_operator_feedback_is_one_aggregate_per_page(app, db):
+    pipelines = []
+
+    def feedback_page(pipeline):
+        pipelines.append(pipeline)
+        return iter([{
+            'summary': [{'stations': 41, 'reviews': 90, 'rating_sum': 387, 'star_5': 50, 'star_4': 30, 'star_3': 10}],
+            'stations': [{
+                **STATION,
+                'rating': 4.5,
+                'total_reviews': 2,
+                'rating_counts': {'4': 1, '5': 1},
+                'recent_reviews': [{'rating': 5, 'comment': 'Quick', 'timestamp': datetime(2026, 10, 1)}],
+            }],
+        }])
+
+    db.on('stations', 'aggregate', feedback_page)
+    result = _call(app, db, 'GET', '/api/operator/feedback?page=3&limit=20', OPERATOR_ID)
+    assert result.status == 200
+    assert result.calls == [('users', 'find_one'), ('stations', 'aggregate')]
+    assert result.body['pagination'] == {'page': 3, 'limit': 20, 'total': 41, 'pages': 3}
+    assert result.body['summary']['averageRating'] == 4.3
+    assert result.body['summary']['ratingBreakdown'] == {'5': 50, '4': 30, '3': 10, '2': 0, '1': 0}
+    station = result.body['data'][0]
+    assert station['ratingBreakdown'] == {'5': 1, '4': 1, '3': 0, '2': 0, '1': 0}
+    assert station['recentReviews'] == [{'rating': 5, 'comment': 'Quick', 'date': '2026-10-01'}]
+    assert pipelines[0][2]['$facet']['stations'][:2] == [{'$skip': 40}, {'$limit': 20}]
+
+
+def test_user_search_is_an_anchored_escaped_prefix(app, db):
+    pipelines = []
+    db.on('users', 'aggregate', lambda pipeline: pipelines.append(pipeline) or iter([
+        {'total': [{'count': 1}], 'users': [PEOPLE[USER_ID]]}
+    ]))
+    result = _call(app, db, 'GET', '/api/users/search?q=%20Asha.K%20&page=2&limit=5', ADMIN_ID)
+    assert result.status == 200
+    assert result.calls == [('users', 'find_one'), ('users', 'aggregate')]
+    assert result.body['pagination'] == {'page': 2, 'limit': 5, 'total': 1, 'capped': False}
+    # Exact matches are looked up first, so the prefix window cannot crowd them out
+    assert pipelines[0][0]['$match']['$or'][0] == {'name_lower': 'asha.k'}
+    union = next(stage['$unionWith'] for stage in pipelines[0] if '$unionWith' in stage)
+    match = union['pipeline'][0]['$match']
+    assert match['$or'] == [{'name_keys': {'$regex': r'^asha\.k'}}, {'email_keys': {'$regex': r'^asha\.k'}}]
+    assert {'$skip': 5} in pipelines[0][-1]['$facet']['users']
+
+    # No query: index order, and nothing past the window reaches the count
+    result = _call(app, db, 'GET', '/api/users/search?role=operator', ADMIN_ID)
+    assert pipelines[1][:3] == [
+        {'$match': {'role': 'operator'}}, {'$sort': {'name_lower': 1, '_id': 1}}, {'$limit': users.SEARCH_CANDIDATE_LIMIT}
+    ]
+
+
+def test_station_suggest_follows_station_writes(app, db, monkeypatch):
+    monkeypatch.setattr(stations, 'get_db', lambda: db)
+    db.on('stations', 'find', lambda *a, **kw: [STATION])
+    index = get_suggest_index()
+    index.rebuild([])
+    try:
+        result = _call(app, db, 'GET', '/api/stations/suggest?q=centr', USER_ID)
+        assert [s['name'] for s in result.body['data']] == []
+
+        index.rebuild([STATION])
+        result = _call(app, db, 'GET', '/api/stations/suggest?q=pune%20cen', USER_ID)
+        assert result.body['data'][0]['name'] == 'Central Hub'
+        assert result.body['data'][0]['matchedField'] == 'name'
+        assert ('stations', 'find') not in result.calls
+
+        # A rename through the API is searchable at once in this worker
+        db.on('stations', 'find_one_and_update', _updated(STATION))
+        _call(app, db, 'PUT', f'/api/stations/{STATION_ID}', OPERATOR_ID, {'name': 'Riverside Hub'})
+        result = _call(app, db, 'GET', '/api/stations/suggest?q=river', USER_ID)
+        assert [s['id'] for s in result.body['data']] == [str(STATION_ID)]
+        assert _call(app, db, 'GET', '/api/stations/suggest?q=central', USER_ID).body['data'] == []
+    finally:
+        index.rebuild([])
+
+
+def test_station_suggest_builds_in_background_and_keeps_same_timestamp_writes():
+    import threading
+    from utils.station_suggest import StationSuggestIndex
+
+    release, queries = threading.Event(), []
+    stamp = datetime(2026, 1, 1, 12, 0, 0)
+    first = {**STATION, 'updated_at': stamp}
+    second = {**STATION, '_id': ObjectId(), 'name': 'Harbour Point', 'updated_at': stamp}
+
+    def find(query, projection):
+        queries.append(query)
+        release.wait(5)
+        return [first] if not query else [first, second]
+
+    db = SimpleNamespace(stations=SimpleNamespace(find=find))
+    index = StationSuggestIndex()
+    index.ensure_fresh(db)
+    assert queries in ([], [{}]) and len(index) == 0
+    release.set()
+    for _ in range(100):
+        if len(index):
+            break
+        time.sleep(0.01)
+    assert [s['name'] for s in index.suggest('central')] == ['Central Hub']
+
+    upserted = []
+    index.upsert = lambda station: upserted.append(station['name'])
+    index._refresh(db, full=False)
+    assert queries[-1] == {'updated_at': {'$gte': stamp}}
+    assert upserted == ['Harbour Point']
+
+    index.rebuild([{k: v for k, v in STATION.items() if k != 'updated_at'}])
+    assert isinstance(index._watermark, datetime)
+
+
+def test_asgi_dispatcher_leaves_static_flask_routes_to_flask(app, monkeypatch):
+    pytest.importorskip('quart')
+    pytest.importorskip('asgiref')
+    from async_api import create_async_app
+    from async_api import stations as async_stations
+    from asgi import ReadPathDispatcher
+
+    async_app = create_async_app()
+    dispatcher = ReadPathDispatcher(async_app, app)
+    routed_async = lambda path: dispatcher._is_async_route({'method': 'GET', 'path': path})
+    assert not routed_async('/api/stations/suggest')
+    assert routed_async(f'/api/stations/{STATION_ID}')
+    assert routed_async('/api/stations')
+
+    async def no_lookup():
+        return SimpleNamespace(stations=None)
+
+    monkeypatch.setattr(async_stations, 'get_async_db', no_lookup)
+    response = asyncio.run(async_app.test_client().get('/api/stations/not-an-id'))
+    assert response.status_code == 400
+
+
+def test_view_deadline_errors_are_structured_504s(app, db):
+    def time_out(*args, **kwargs):
+        raise ExecutionTimeout('operation exceeded time limit', 50)
+
+    db.on('notifications', 'find', time_out)
+    result = _call(app, db, 'GET', f'/api/notifications/user/{USER_ID}', USER_ID)
+    assert result.status == 504
+    assert result.body['code'] == 'DB_QUERY_TIMEOUT'
+    assert result.headers['Retry-After'] == '5'
+
+
+def test_query_deadline_starts_after_admission(monkeypatch):
+    import app as app_module
+    from database.deadlines import current_deadline
+    from utils.admission import get_admission_controller
+
+    controller = get_admission_controller()
+    admit, during_admission = controller.admit, []
+    monkeypatch.setattr(controller, 'admit', lambda name: (during_admission.append(current_deadline()), admit(name))[1])
+
+    flask_app = Flask(__name__)
+    app_module._register_admission_control(flask_app)
+    app_module._register_query_deadlines(flask_app)
+    flask_app.add_url_rule('/probe', 'probe', lambda: {'deadline': current_deadline()})
+
+    response = flask_app.test_client().get('/probe')
+    assert during_admission == [None]
+    assert response.get_json()['deadline'] is not None
+
+
+def test_stale_refresh_runs_outside_the_request_context():
+    import threading
+    from flask import has_app_context, has_request_context
+    from database.deadlines import DEADLINE_CLASSES, current_deadline, deadline_scope
+    from utils.cache import ResponseCache, STALE
+
+    cache, refreshed, seen = ResponseCache(ttl=0), threading.Event(), []
+
+    def compute():
+        seen.append((has_request_context(), has_app_context(), current_deadline()))
+        if len(seen) > 1:
+            refreshed.set()
+        return len(seen)
+
+    flask_app = Flask(__name__)
+    cache.get_or_compute('dashboard', 'admin', 'range=7d', compute)
+    with flask_app.test_request_context('/'), deadline_scope('fast'):
+        assert cache.get_or_compute('dashboard', 'admin', 'range=7d', compute)[1] == STALE
+    assert refreshed.wait(5)
+    assert seen[1] == (False, True, ('fast', DEADLINE_CLASSES['fast']))
+
+
+def test_fork_resets_the_latency_sampler():
+    from database import get_database_manager
+
+    manager = get_database_manager()
+    sampler, pid = manager._latency_sampler, manager._pid
+    sampler._samples['ping'].append(3.0)
+    sampler._lock.acquire()  # held by the parent's sampling thread at fork time
+    sampler._thread, sampler._pid = object(), os.getpid() + 1
+    manager._pid = os.getpid() + 1
+    try:
+        manager._detect_fork()
+        assert manager._pid == os.getpid()
+        assert sampler._lock.acquire(timeout=1)
+        sampler._lock.release()
+        assert sampler._thread is None and not sampler.running
+        assert list(sampler._samples['ping']) == []
+    finally:
+        manager._pid = pid
+
+
+def test_health_reports_starting_as_200_and_readiness_as_503(monkeypatch):
+    import app as app_module
+    from database import get_health_monitor
+
+    monkeypatch.setattr(get_health_monitor(), 'snapshot', lambda: None)
+    flask_app = Flask(__name__)
+    app_module._register_routes(flask_app)
+    client = flask_app.test_client()
+
+    health = client.get('/api/health')
+    assert (health.status_code, health.get_json()['status']) == (200, 'starting')
+    ready = client.get('/api/health/ready')
+    assert (ready.status_code, ready.get_json()['status']) == (503, 'starting')
+
+
+def test_only_heavy_admin_endpoints_are_analytics(app):
+    from utils.admission import ANALYTICS, INTERACTIVE, get_admission_controller
+
+    controller = get_admission_controller()
+    classes = {
+        endpoint: controller.classify(app, endpoint, 'admin')
+        for endpoint in app.view_functions if endpoint.startswith('admin.')
+    }
+    assert {endpoint for endpoint, name in classes.items() if name == ANALYTICS} == {
+        'admin.get_admin_stats', 'admin.get_feedback_stats',
+        'admin.get_all_bookings', 'admin.get_all_sessions', 'admin.get_all_transactions',
+    }
+    assert classes['admin.update_user_status'] == classes['admin.refund_transaction'] == INTERACTIVE
+
+
+def test_metrics_listener_is_registered_once_per_process():
+    pytest.importorskip('prometheus_client')
+    from database import get_database_manager
+    from utils import metrics
+
+    manager = get_database_manager()
+    for _ in range(2):
+        metrics.init_metrics(Flask(__name__), manager)
+    assert sum(isinstance(listener, metrics.PoolMetricsListener) for listener in manager._event_listeners) == 1
+
+
+def test_ai_optimize_asks_the_backend_once_per_normalised_input():
+    class CountingBackend(LocalBackend):
+        calls = 0
+
+        def generate(self, inputs):
+            CountingBackend.calls += 1
+            return super().generate(inputs)
+
+    optimizer = Optimizer(backend=CountingBackend(), max_concurrency=1, queue_timeout=0)
+    first = {'vehicleType': 'Car', 'peakHours': '6 PM – 10 PM', 'currentPercentage': 20}
+    again = {'vehicleType': ' car ', 'peakHours': '6 pm –  10 pm', 'currentPercentage': '20.0'}
+    text, outcome, _ = optimizer.optimize(first, calculate_charging_projection(60, 20, 80, 60, 8, 50))
+    assert outcome == 'MISS'
+    assert optimizer.optimize(again, calculate_charging_projection(60, '20.0', 80, 60, 8, 50))[:2] == (text, 'HIT')
+    assert CountingBackend.calls == 1
+
+    # Inputs that clamp to the same projection share a report that quotes only the clamped values
+    prompt = build_prompt(normalized_inputs({'chargerPower': 500}, calculate_charging_projection(charger_power_kw=500)))
+    assert 'Charger Power Output (kW): 350.0' in prompt and '500' not in prompt
+
+    # With every upstream slot taken, a new input fails fast instead of queueing
+    optimizer._slots.acquire()
+    with pytest.raises(AIServiceBusy):
+        optimizer.optimize(first, calculate_charging_projection(60, 20, 90, 60, 8, 50))
@@ -0,0 +1,273 @@
+"""
+Admission control: per-route-class bulkheads.
+
+Every request is assigned a class, and each class has its own concurrency
+limit and a short wait queue in each worker process. A burst on one class
+(dashboards, exports, diagnostics) can then fill only its own slots, not the
+worker threads and MongoDB connections that charging traffic needs.
+
+Classes:
+- ``critical``: session start/stop, bookings, payments
+- ``interactive``: ordinary reads and writes (default)
+- ``analytics``: admin and operator dashboards, admin exports, diagnostics,
+  AI optimiser
+
+A request that finds its class full waits up to the class queue timeout.
+When the queue is also full, or the wait times out, it is rejected at once
+with 503 and ``Retry-After``. Health probes, ``/metrics`` and CORS
+preflights are never limited.
+
+Per class, in each worker:
+    ADMISSION_<CLASS>_CONCURRENCY    requests served at once
+    ADMISSION_<CLASS>_QUEUE          requests allowed to wait for a slot
+    ADMISSION_<CLASS>_QUEUE_TIMEOUT  seconds a queued request waits
+    ADMISSION_<CLASS>_RETRY_AFTER    Retry-After seconds on rejection
+Set ADMISSION_CONTROL=false to disable.
+
+A view opts into a class with ``@admission_class('critical')``; otherwise
+its blueprint default (BLUEPRINT_CLASSES) or ``interactive`` applies.
+"""
+
+import os
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import g, jsonify, request
+
+logger = logging.getLogger('evpulse.admission')
+
+ADMISSION_ENABLED = os.getenv('ADMISSION_CONTROL', 'true').strip().lower() in ('1', 'true', 'yes')
+
+CRITICAL = 'critical'
+INTERACTIVE = 'interactive'
+ANALYTICS = 'analytics'
+
+# (concurrency, queue, queue timeout seconds, Retry-After seconds)
+DEFAULT_LIMITS = {
+    CRITICAL: (32, 32, 2.0, 1),
+    INTERACTIVE: (16, 16, 0.5, 2),
+    ANALYTICS: (2, 2, 0.25, 10),
+}
+
+# Whole-blueprint defaults. Heavy endpoints opt in with @admission_class
+# instead, so light admin actions (user status, refunds) stay interactive.
+BLUEPRINT_CLASSES: Dict[str, str] = {}
+
+# Never limited: liveness/readiness must answer under load, scrapes must see it.
+EXEMPT_ENDPOINTS = {'liveness_check', 'readiness_check', 'health_check', 'metrics', 'static'}
+
+
+def admission_class(name: str):
+    """Assign a view to an admission class."""
+    if name not in DEFAULT_LIMITS:
+        raise ValueError(f"Unknown admission class {name!r}")
+
+    def decorator(fn):
+        fn.admission_class = name
+        return fn
+    return decorator
+
+
+def _env_number(name: str, default, cast):
+    value = os.getenv(name)
+    return cast(value) if value not in (None, '') else default
+
+
+class Bulkhead:
+    """Concurrency limit with a bounded FIFO-ish wait queue."""
+
+    def __init__(self, name: str, concurrency: int, queue: int, queue_timeout: float, retry_after: int,
+                 on_change: Optional[Callable[['Bulkhead'], None]] = None):
+        self.name = name
+        self.concurrency = max(concurrency, 1)
+        self.queue = max(queue, 0)
+        self.queue_timeout = max(queue_timeout, 0.0)
+        self.retry_after = max(retry_after, 1)
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self.admitted = 0
+        self.rejected = {'queue_full': 0, 'queue_timeout': 0}
+        self.on_change = on_change
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return self._waiting
+
+    def _changed(self) -> None:
+        # Called with the condition held so observers see states in order.
+        if self.on_change is not None:
+            try:
+                self.on_change(self)
+            except Exception as e:
+                logger.debug(f"Bulkhead observer failed: {e}")
+
+    @classmethod
+    def from_environment(cls, name: str) -> 'Bulkhead':
+        concurrency, queue, queue_timeout, retry_after = DEFAULT_LIMITS[name]
+        prefix = f"ADMISSION_{name.upper()}_"
+        return cls(
+            name,
+            _env_number(prefix + 'CONCURRENCY', concurrency, int),
+            _env_number(prefix + 'QUEUE', queue, int),
+            _env_number(prefix + 'QUEUE_TIMEOUT', queue_timeout, float),
+            _env_number(prefix + 'RETRY_AFTER', retry_after, int),
+        )
+
+    def acquire(self):
+        """
+        Take a slot. Returns ``(admitted, reason, waited_seconds)``; reason is
+        None, ``queue_full`` or ``queue_timeout``.
+        """
+        with self._condition:
+            if self._in_flight < self.concurrency and self._waiting == 0:
+                self._in_flight += 1
+                self.admitted += 1
+                self._changed()
+                return True, None, 0.0
+            if self._waiting >= self.queue:
+                self.rejected['queue_full'] += 1
+                return False, 'queue_full', 0.0
+
+            self._waiting += 1
+            self._changed()
+            started = time.monotonic()
+            deadline = started + self.queue_timeout
+            try:
+                while self._in_flight >= self.concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected['queue_timeout'] += 1
+                        return False, 'queue_timeout', time.monotonic() - started
+                    self._condition.wait(remaining)
+                self._in_flight += 1
+                self.admitted += 1
+                return True, None, time.monotonic() - started
+            finally:
+                self._waiting -= 1
+                self._changed()
+
+    def release(self) -> None:
+        with self._condition:
+            self._in_flight = max(self._in_flight - 1, 0)
+            self._changed()
+            self._condition.notify()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'concurrency': self.concurrency,
+                'queue': self.queue,
+                'queue_timeout_seconds': self.queue_timeout,
+                'in_flight': self._in_flight,
+                'queue_depth': self._waiting,
+                'admitted': self.admitted,
+                'rejected': dict(self.rejected),
+            }
+
+
+class AdmissionController:
+    """
+    One bulkhead per class. Observers are called as
+    ``observer(event, bulkhead, reason=None, waited=0.0)`` where event is
+    ``state`` (in-flight or queue depth changed), ``admitted`` or ``rejected``.
+    """
+
+    def __init__(self, bulkheads: Optional[Dict[str, Bulkhead]] = None):
+        self.bulkheads = bulkheads or {name: Bulkhead.from_environment(name) for name in DEFAULT_LIMITS}
+        self._observers: List[Callable[..., None]] = []
+        for bulkhead in self.bulkheads.values():
+            bulkhead.on_change = lambda b: self._notify('state', b)
+
+    def add_observer(self, observer: Callable[..., None]) -> None:
+        if observer not in self._observers:
+            self._observers.append(observer)
+
+    def _notify(self, event: str, bulkhead: Bulkhead, reason: Optional[str] = None, waited: float = 0.0) -> None:
+        for observer in self._observers:
+            observer(event, bulkhead, reason=reason, waited=waited)
+
+    def classify(self, app, endpoint: Optional[str], blueprint: Optional[str]) -> Optional[str]:
+        """Admission class for an endpoint, or None when it is exempt."""
+        if endpoint is None or endpoint in EXEMPT_ENDPOINTS:
+            return None
+        view = app.view_functions.get(endpoint)
+        name = getattr(view, 'admission_class', None)
+        if name is None:
+            name = BLUEPRINT_CLASSES.get(blueprint, INTERACTIVE)
+        return name
+
+    def admit(self, name: str):
+        bulkhead = self.bulkheads[name]
+        admitted, reason, waited = bulkhead.acquire()
+        try:
+            self._notify('admitted' if admitted else 'rejected', bulkhead, reason=reason, waited=waited)
+        except Exception as e:
+            logger.debug(f"Admission observer failed: {e}")
+        return admitted, bulkhead
+
+    def release(self, bulkhead: Bulkhead) -> None:
+        bulkhead.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'enabled': ADMISSION_ENABLED,
+            'classes': {name: bulkhead.snapshot() for name, bulkhead in self.bulkheads.items()},
+        }
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController()
+    return _controller
+
+
+def init_admission_control(app) -> None:
+    """Install the before/teardown hooks that take and return bulkhead slots."""
+    if not ADMISSION_ENABLED:
+        logger.info("Admission control disabled (ADMISSION_CONTROL=false)")
+        return
+
+    controller = get_admission_controller()
+
+    @app.before_request
+    def _admit_request():
+        if request.method == 'OPTIONS':
+            return None
+        name = controller.classify(app, request.endpoint, request.blueprint)
+        if name is None:
+            return None
+
+        admitted, bulkhead = controller.admit(name)
+        if admitted:
+            g.admission_bulkhead = bulkhead
+            return None
+
+        logger.warning(f"Rejected {request.method} {request.path}: {name} class saturated")
+        response = jsonify({
+            'success': False,
+            'error': 'Server is busy, please retry shortly.',
+            'retryAfter': bulkhead.retry_after,
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(bulkhead.retry_after)
+        return response
+
+    @app.teardown_request
+    def _release_request(exc):
+        bulkhead = g.pop('admission_bulkhead', None)
+        if bulkhead is not None:
+            controller.release(bulkhead)
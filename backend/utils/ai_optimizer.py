@@ -0,0 +1,278 @@
+"""
+Charging optimization reports for ``POST /api/ai/optimize``.
+
+The report text comes from a pluggable backend (AI_BACKEND):
+- ``gemini`` (default): the Gemini generateContent API with the server-side
+  AI_API_KEY, over one pooled ``requests.Session`` per process. AI_API_URL
+  overrides the endpoint, e.g. to point at ``scripts/ai_standin_server.py``
+- ``local``: a deterministic report built in-process from the projection,
+  for development and offline load tests
+
+Reports are cached per normalised input (the clamped projection values plus
+vehicle type, charger type and peak window) for AI_CACHE_TTL seconds, with
+single-flight so identical concurrent requests share one upstream call.
+Upstream calls are capped at AI_MAX_CONCURRENCY per process; a request
+that cannot get a slot within AI_QUEUE_TIMEOUT seconds fails fast with
+``AIServiceBusy`` instead of holding a worker.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.cache import LRUBackend, ResponseCache
+
+logger = logging.getLogger('evpulse.ai_optimizer')
+
+AI_BACKEND = os.getenv('AI_BACKEND', 'gemini').strip().lower()
+AI_API_URL = os.getenv(
+    'AI_API_URL',
+    'https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent'
+)
+AI_CONNECT_TIMEOUT = float(os.getenv('AI_CONNECT_TIMEOUT', '3'))
+AI_READ_TIMEOUT = float(os.getenv('AI_READ_TIMEOUT', '20'))
+AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', '4'))
+AI_QUEUE_TIMEOUT = float(os.getenv('AI_QUEUE_TIMEOUT', '2'))
+AI_CACHE_TTL = float(os.getenv('AI_CACHE_TTL', '3600'))
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', '1024'))
+
+CACHE_NAMESPACE = 'ai_optimize'
+
+
+class AIServiceError(Exception):
+    """The backend failed or returned no report; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message: str, status: int = 502):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+class AIServiceBusy(AIServiceError):
+    """No upstream slot within AI_QUEUE_TIMEOUT."""
+
+    def __init__(self, message: str = 'AI service is busy. Please retry shortly.'):
+        super().__init__(message, status=503)
+
+
+def normalized_inputs(params: Dict[str, Any], projection: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The inputs that determine a report, and all a backend is given. Numeric
+    values come from the clamped, rounded projection, so ``60`` and
+    ``"60.0"`` share a cache entry, and a cached report never quotes values
+    (such as an unclamped charger power) that another request sent.
+    """
+    return {
+        'vehicleType': ' '.join(str(params.get('vehicleType') or 'Car').split()).lower(),
+        'chargerType': ' '.join(str(params.get('chargerType') or 'Fast').split()).lower(),
+        'peakHours': ' '.join(str(params.get('peakHours') or '').split()).lower(),
+        'batteryCapacityKwh': projection['batteryCapacityKwh'],
+        'currentPercentage': projection['currentPercentage'],
+        'targetPercentage': projection['targetPercentage'],
+        'chargerPowerKw': projection['chargerPowerKw'],
+        'ratePerKwh': projection['ratePerKwh'],
+        'durationMinutes': projection['durationMinutes'],
+        # Derived from the values above
+        'targetEnergyKwh': projection['targetEnergyKwh'],
+        'estimatedTotalCost': projection['estimatedTotalCost'],
+    }
+
+
+def build_prompt(inputs: Dict[str, Any]) -> str:
+    """Prompt for ``normalized_inputs``."""
+    return f"""You are an advanced AI-powered EV Charging Optimization Engine.
+
+Vehicle Type: {inputs['vehicleType']}
+Battery Capacity (kWh): {inputs['batteryCapacityKwh']}
+Current Battery Level (%): {inputs['currentPercentage']}
+Target Battery Level (%): {inputs['targetPercentage']}
+Charger Type: {inputs['chargerType']}
+Charger Power Output (kW): {inputs['chargerPowerKw']}
+Electricity Cost per kWh (₹): {inputs['ratePerKwh']}
+Selected Charging Duration (minutes): {inputs['durationMinutes']}
+Peak Hours: {inputs['peakHours'] or 'not specified'}
+
+Deterministic projection (must be used as the baseline in your response):
+- Energy Required (kWh): {inputs['targetEnergyKwh']}
+- Estimated Charging Time (minutes): {inputs['durationMinutes']}
+- Estimated Cost (₹): {inputs['estimatedTotalCost']}
+
+Analyze the above and provide a clear, well-formatted charging optimization report. Include:
+1. Energy Required (kWh)
+2. Estimated Charging Time
+3. Estimated Cost (₹)
+4. Peak Hour Analysis
+5. Optimization Level (Low / Moderate / Highly Optimized)
+6. Smart Recommendation for battery health and cost savings
+
+Keep it concise, professional, and easy to read. Use plain text with clear headings. Do NOT use markdown code blocks or JSON format."""
+
+
+def local_report(inputs: Dict[str, Any]) -> str:
+    """Deterministic plain-text report for ``normalized_inputs``, with the headings the model is asked for."""
+    target = inputs['targetPercentage']
+    if target <= 80 and inputs['chargerPowerKw'] <= 60:
+        level, advice = 'Highly Optimized', 'Charging to 80% or less on a moderate charger is gentle on the battery.'
+    elif target <= 90:
+        level, advice = 'Moderate', 'Stopping at 80% shortens the session and reduces battery stress.'
+    else:
+        level, advice = 'Low', 'Charging above 90% is slow and wears the battery; stop at 80% unless you need the range.'
+    peak = inputs['peakHours'] or 'not specified'
+    return (
+        "Charging Optimization Report\n\n"
+        f"Energy Required: {inputs['targetEnergyKwh']} kWh\n"
+        f"Estimated Charging Time: {inputs['durationMinutes']} minutes\n"
+        f"Estimated Cost: ₹{inputs['estimatedTotalCost']}\n\n"
+        f"Peak Hour Analysis\nPeak window: {peak}. Charging outside it avoids peak tariffs and queues.\n\n"
+        f"Optimization Level: {level}\n\n"
+        f"Smart Recommendation\n{advice}"
+    )
+
+
+class LocalBackend:
+    name = 'local'
+
+    def generate(self, inputs: Dict[str, Any]) -> str:
+        return local_report(inputs)
+
+
+class GeminiBackend:
+    """generateContent over a pooled session (keep-alive, bounded pool)."""
+
+    name = 'gemini'
+
+    def __init__(self, api_key: Optional[str] = None, url: str = AI_API_URL, session: Optional[requests.Session] = None):
+        self._api_key = api_key if api_key is not None else os.getenv('AI_API_KEY')
+        self._url = url
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(AI_MAX_CONCURRENCY, 1))
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update({'Content-Type': 'application/json'})
+        self._session = session
+
+    @property
+    def configured(self) -> bool:
+        return bool(self._api_key)
+
+    def generate(self, inputs: Dict[str, Any]) -> str:
+        if not self._api_key:
+            raise AIServiceError('Server AI API key not configured.', status=500)
+
+        payload = {
+            'contents': [{'parts': [{'text': build_prompt(inputs)}]}],
+            'generationConfig': {
+                'temperature': 0.7,
+                'topK': 40,
+                'topP': 0.95,
+                'maxOutputTokens': 2048,
+            }
+        }
+        try:
+            resp = self._session.post(
+                self._url,
+                params={'key': self._api_key},
+                json=payload,
+                timeout=(AI_CONNECT_TIMEOUT, AI_READ_TIMEOUT),
+            )
+        except requests.Timeout:
+            raise AIServiceError('AI service timed out.', status=504)
+        except requests.RequestException as e:
+            raise AIServiceError(f'AI service unreachable: {type(e).__name__}')
+
+        if resp.status_code != 200:
+            try:
+                err = resp.json()
+            except Exception:
+                err = {'status': resp.status_code, 'text': resp.text}
+            raise AIServiceError(f'AI service error: {err}')
+
+        try:
+            text = resp.json().get('candidates', [])[0].get('content', {}).get('parts', [])[0].get('text')
+        except Exception:
+            text = None
+        if not text:
+            raise AIServiceError('No content returned from AI service.')
+        return text
+
+
+def _create_backend():
+    if AI_BACKEND == 'local':
+        return LocalBackend()
+    if AI_BACKEND != 'gemini':
+        logger.warning(f"Unknown AI_BACKEND {AI_BACKEND!r}; using gemini")
+    return GeminiBackend()
+
+
+class Optimizer:
+    """Cached, single-flight, concurrency-capped access to one backend."""
+
+    def __init__(self, backend=None, cache: Optional[ResponseCache] = None, max_concurrency: int = AI_MAX_CONCURRENCY,
+                 queue_timeout: float = AI_QUEUE_TIMEOUT):
+        self.backend = backend if backend is not None else _create_backend()
+        self._cache = cache if cache is not None else ResponseCache(
+            LRUBackend(AI_CACHE_MAX_ENTRIES), ttl=AI_CACHE_TTL, stale_ttl=0
+        )
+        self._slots = threading.BoundedSemaphore(max(max_concurrency, 1))
+        self._queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._counters = {'upstream_calls': 0, 'upstream_errors': 0, 'busy': 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _generate(self, inputs) -> str:
+        if not self._slots.acquire(timeout=self._queue_timeout):
+            self._count('busy')
+            raise AIServiceBusy()
+        try:
+            self._count('upstream_calls')
+            return self.backend.generate(inputs)
+        except Exception:
+            self._count('upstream_errors')
+            raise
+        finally:
+            self._slots.release()
+
+    def optimize(self, params: Dict[str, Any], projection: Dict[str, Any]) -> Tuple[str, str, float]:
+        """Report text for the inputs: ``(text, cache outcome, age_seconds)``."""
+        inputs = normalized_inputs(params, projection)
+        key = hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+        return self._cache.get_or_compute(
+            CACHE_NAMESPACE, self.backend.name, key, lambda: self._generate(inputs)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        return {'backend': self.backend.name, 'max_concurrency': AI_MAX_CONCURRENCY, **counters, 'cache': self._cache.stats()}
+
+
+_optimizer: Optional[Optimizer] = None
+_optimizer_lock = threading.Lock()
+
+
+def get_optimizer() -> Optimizer:
+    global _optimizer
+    if _optimizer is None:
+        with _optimizer_lock:
+            if _optimizer is None:
+                _optimizer = Optimizer()
+    return _optimizer
+
+
+def set_optimizer(optimizer: Optional[Optimizer]) -> None:
+    """Replace the process optimizer (tests, custom backends). None resets to the default."""
+    global _optimizer
+    with _optimizer_lock:
+        _optimizer = optimizer
@@ -0,0 +1,255 @@
+"""
+Local columnar analytics store.
+
+``scripts/export_analytics.py`` copies changed operational documents into
+Parquet files laid out as ``<ANALYTICS_STORE_DIR>/<collection>/month=YYYY-MM/*.parquet``.
+This module describes that layout and answers report queries over it with
+DuckDB, so heavy historical aggregations do not run against the MongoDB primary.
+
+Both ``pyarrow`` (export) and ``duckdb`` (queries) are optional dependencies;
+report endpoints only use the store when ``ANALYTICS_REPORTS`` is enabled and
+the store is readable.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from datetime import datetime
+
+logger = logging.getLogger('evpulse.analytics')
+
+ANALYTICS_STORE_DIR = os.getenv('ANALYTICS_STORE_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'analytics_store'))
+ANALYTICS_REPORTS = os.getenv('ANALYTICS_REPORTS', 'false').strip().lower() in ('1', 'true', 'yes')
+
+STATE_FILE = '_state.json'
+
+# column name -> (type, source fields in priority order)
+EXPORT_SPECS = {
+    'sessions': {
+        'watermark_fields': ['updated_at', 'created_at'],
+        'partition_fields': ['start_time', 'created_at'],
+        'columns': {
+            'id': ('string', ['_id']),
+            'user_id': ('string', ['user_id']),
+            'station_id': ('string', ['station_id']),
+            'status': ('string', ['status']),
+            'start_time': ('timestamp', ['start_time']),
+            'end_time': ('timestamp', ['end_time']),
+            'duration': ('float', ['duration']),
+            'energy_delivered': ('float', ['energy_delivered', 'energyDelivered']),
+            'cost': ('float', ['cost', 'total_cost']),
+            'created_at': ('timestamp', ['created_at']),
+            'updated_at': ('timestamp', ['updated_at', 'created_at']),
+        },
+    },
+    'transactions': {
+        'watermark_fields': ['updated_at', 'created_at'],
+        'partition_fields': ['timestamp', 'created_at'],
+        'columns': {
+            'id': ('string', ['_id']),
+            'user_id': ('string', ['user_id']),
+            'session_id': ('string', ['session_id']),
+            'type': ('string', ['type']),
+            'status': ('string', ['status']),
+            'payment_method': ('string', ['payment_method']),
+            'amount': ('float', ['amount']),
+            'timestamp': ('timestamp', ['timestamp', 'created_at', 'updated_at']),
+            'created_at': ('timestamp', ['created_at']),
+            'updated_at': ('timestamp', ['updated_at', 'created_at']),
+        },
+    },
+    'bookings': {
+        'watermark_fields': ['updated_at', 'created_at'],
+        'partition_fields': ['created_at'],
+        'columns': {
+            'id': ('string', ['_id']),
+            'user_id': ('string', ['user_id']),
+            'station_id': ('string', ['station_id']),
+            'port_id': ('string', ['port_id']),
+            'date': ('string', ['date']),
+            'time_slot': ('string', ['time_slot']),
+            'status': ('string', ['status']),
+            'estimated_cost': ('float', ['estimated_cost']),
+            'created_at': ('timestamp', ['created_at']),
+            'updated_at': ('timestamp', ['updated_at', 'created_at']),
+        },
+    },
+    'reviews': {
+        'watermark_fields': ['updated_at', 'created_at'],
+        'partition_fields': ['timestamp', 'created_at'],
+        'columns': {
+            'id': ('string', ['_id']),
+            'station_id': ('string', ['station_id']),
+            'user_id': ('string', ['user_id']),
+            'rating': ('float', ['rating']),
+            'timestamp': ('timestamp', ['timestamp', 'created_at']),
+            'created_at': ('timestamp', ['created_at']),
+            'updated_at': ('timestamp', ['updated_at', 'created_at']),
+        },
+    },
+}
+
+# Small dimension tables are re-exported in full on every run.
+DIMENSION_SPECS = {
+    'stations': {
+        'columns': {
+            'id': ('string', ['_id']),
+            'name': ('string', ['name']),
+            'city': ('string', ['city']),
+            'operator_id': ('string', ['operator_id']),
+        },
+    },
+}
+
+_SQL_TYPES = {'string': 'VARCHAR', 'float': 'DOUBLE', 'timestamp': 'TIMESTAMP'}
+
+
+def _first_present(document, fields):
+    for field in fields:
+        value = document.get(field)
+        if value is not None:
+            return value
+    return None
+
+
+def _convert(value, column_type):
+    if value is None:
+        return None
+    if column_type == 'string':
+        return str(value)
+    if column_type == 'float':
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+    if column_type == 'timestamp':
+        if isinstance(value, datetime):
+            return value.replace(tzinfo=None)
+        return None
+    return value
+
+
+def to_row(document, columns):
+    """Flatten a MongoDB document into a typed analytics row."""
+    return {
+        name: _convert(_first_present(document, sources), column_type)
+        for name, (column_type, sources) in columns.items()
+    }
+
+
+def partition_key(document, fields):
+    value = _first_present(document, fields)
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m')
+    return 'unknown'
+
+
+def is_enabled():
+    """True when report endpoints should read from the analytics store."""
+    if not ANALYTICS_REPORTS or not os.path.isdir(ANALYTICS_STORE_DIR):
+        return False
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        logger.warning("ANALYTICS_REPORTS is enabled but duckdb is not installed")
+        return False
+    return True
+
+
+def _has_files(name):
+    directory = os.path.join(ANALYTICS_STORE_DIR, name)
+    if not os.path.isdir(directory):
+        return False
+    for _, _, files in os.walk(directory):
+        if any(file_name.endswith('.parquet') for file_name in files):
+            return True
+    return False
+
+
+def _empty_table_sql(name, columns):
+    column_sql = ', '.join(f'{column} {_SQL_TYPES[column_type]}' for column, (column_type, _) in columns.items())
+    return f'CREATE TABLE {name} ({column_sql})'
+
+
+def connect():
+    """
+    Open an in-memory DuckDB connection with one view per exported collection.
+
+    Incremental runs can write several versions of the same document, so the
+    views keep only the most recently updated row per ``id``.
+    """
+    import duckdb
+
+    connection = duckdb.connect()
+    for name, spec in EXPORT_SPECS.items():
+        if not _has_files(name):
+            connection.execute(_empty_table_sql(name, spec['columns']))
+            continue
+        pattern = os.path.join(ANALYTICS_STORE_DIR, name, '*', '*.parquet').replace("'", "''")
+        connection.execute(
+            f"CREATE VIEW {name} AS SELECT * FROM read_parquet('{pattern}', hive_partitioning = true, union_by_name = true) "
+            "QUALIFY row_number() OVER (PARTITION BY id ORDER BY updated_at DESC NULLS LAST) = 1"
+        )
+    for name, spec in DIMENSION_SPECS.items():
+        if not _has_files(name):
+            connection.execute(_empty_table_sql(name, spec['columns']))
+            continue
+        pattern = os.path.join(ANALYTICS_STORE_DIR, name, '*.parquet').replace("'", "''")
+        connection.execute(f"CREATE VIEW {name} AS SELECT * FROM read_parquet('{pattern}')")
+    return connection
+
+
+def admin_revenue_report(month_ranges, current_period_start, previous_period_start, now):
+    """
+    Revenue, energy and city revenue figures used by the admin dashboard.
+
+    ``month_ranges`` is a list of ``(start, end)`` datetimes. Returns a dict
+    with ``totalRevenue``, ``totalEnergy``, ``monthly`` (revenue and energy per
+    range, in order) and ``cityRevenueCurrent`` / ``cityRevenuePrevious``.
+    """
+    connection = connect()
+    try:
+        total_revenue = connection.execute(
+            "SELECT coalesce(sum(round(amount, 2)), 0) FROM transactions WHERE type = 'charging' AND status = 'completed'"
+        ).fetchone()[0]
+        total_energy = connection.execute(
+            "SELECT coalesce(sum(energy_delivered), 0) FROM sessions WHERE status = 'completed'"
+        ).fetchone()[0]
+
+        monthly = []
+        for start, end in month_ranges:
+            revenue = connection.execute(
+                "SELECT coalesce(sum(round(amount, 2)), 0) FROM transactions "
+                "WHERE type = 'charging' AND status = 'completed' AND timestamp >= ? AND timestamp < ?",
+                [start, end],
+            ).fetchone()[0]
+            energy = connection.execute(
+                "SELECT coalesce(sum(energy_delivered), 0) FROM sessions "
+                "WHERE status = 'completed' AND coalesce(end_time, updated_at, start_time, created_at) >= ? "
+                "AND coalesce(end_time, updated_at, start_time, created_at) < ?",
+                [start, end],
+            ).fetchone()[0]
+            monthly.append({'revenue': round(revenue, 2), 'energy': round(energy, 1)})
+
+        city_rows = connection.execute(
+            "SELECT coalesce(st.city, 'Unknown') AS city, "
+            "sum(CASE WHEN t.timestamp >= ? AND t.timestamp <= ? THEN round(t.amount, 2) ELSE 0 END) AS current_revenue, "
+            "sum(CASE WHEN t.timestamp >= ? AND t.timestamp < ? THEN round(t.amount, 2) ELSE 0 END) AS previous_revenue "
+            "FROM transactions t "
+            "LEFT JOIN sessions s ON s.id = t.session_id "
+            "LEFT JOIN stations st ON st.id = s.station_id "
+            "WHERE t.type = 'charging' AND t.status = 'completed' "
+            "GROUP BY 1",
+            [current_period_start, now, previous_period_start, current_period_start],
+        ).fetchall()
+    finally:
+        connection.close()
+
+    return {
+        'totalRevenue': round(total_revenue, 2),
+        'totalEnergy': round(total_energy, 1),
+        'monthly': monthly,
+        'cityRevenueCurrent': {city: current for city, current, _ in city_rows if current},
+        'cityRevenuePrevious': {city: previous for city, _, previous in city_rows if previous},
+    }
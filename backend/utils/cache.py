@@ -0,0 +1,424 @@
+"""
+Response cache for expensive read endpoints (dashboards).
+
+Entries are keyed on (namespace, scope, params): the namespace names the
+endpoint (``admin_stats``), the scope the set of callers that share a result
+(``admin``, ``operator:<id>``) and the params the inputs such as ``range``.
+
+- Fresh for CACHE_TTL seconds, then served stale for up to
+  CACHE_STALE_TTL more while a single background refresh recomputes it
+- Single-flight: concurrent misses for one key share one computation
+  (per process; with the Redis backend also across processes via a lock)
+- Backends: in-process LRU (default) or a shared Redis-compatible server
+  (CACHE_BACKEND=redis, CACHE_REDIS_URL; needs the ``redis`` package)
+- ``invalidate(namespace, scope=None)`` bumps a version counter, so every
+  entry stored before the call is ignored. Mutating views call it through
+  the ``@invalidates(...)`` decorator.
+
+With the LRU backend every gunicorn worker keeps its own entries and
+invalidation reaches only the worker that served the write; use Redis when
+a write must be visible on the next dashboard load everywhere.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import current_app, has_app_context, make_response, request
+
+from database.deadlines import DEFAULT_DEADLINE_CLASS, current_deadline, deadline_scope
+
+logger = logging.getLogger('evpulse.cache')
+
+CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'true').strip().lower() in ('1', 'true', 'yes')
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory').strip().lower()
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_TTL = float(os.getenv('CACHE_TTL', '30'))
+CACHE_STALE_TTL = float(os.getenv('CACHE_STALE_TTL', '300'))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '512'))
+
+# How long a request waits for another process' computation before doing its own
+LOCK_WAIT_SECONDS = 5.0
+LOCK_POLL_SECONDS = 0.05
+
+HIT = 'HIT'
+STALE = 'STALE'
+MISS = 'MISS'
+COALESCED = 'COALESCED'
+
+
+class LRUBackend:
+    """Bounded in-process store with per-namespace/scope version counters."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self._entries: 'OrderedDict[Tuple[str, str, str], Tuple[Dict[str, Any], float]]' = OrderedDict()
+        self._versions: Dict[Tuple[str, Optional[str]], int] = {}
+        self._max_entries = max(max_entries, 1)
+        self._lock = threading.Lock()
+
+    def lookup(self, namespace: str, scope: str, key: str):
+        now = time.time()
+        with self._lock:
+            versions = (self._versions.get((namespace, None), 0), self._versions.get((namespace, scope), 0))
+            item = self._entries.get((namespace, scope, key))
+            if item is None:
+                return None, versions
+            entry, expires_at = item
+            if expires_at <= now:
+                del self._entries[(namespace, scope, key)]
+                return None, versions
+            self._entries.move_to_end((namespace, scope, key))
+            return entry, versions
+
+    def store(self, namespace: str, scope: str, key: str, entry: Dict[str, Any], ttl: float) -> None:
+        with self._lock:
+            self._entries[(namespace, scope, key)] = (entry, time.time() + ttl)
+            self._entries.move_to_end((namespace, scope, key))
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, namespace: str, scope: Optional[str] = None) -> None:
+        # Entries stay until they expire or are evicted: peek() may still
+        # serve them as an explicitly stale fallback.
+        with self._lock:
+            self._versions[(namespace, scope)] = self._versions.get((namespace, scope), 0) + 1
+
+    def acquire_lock(self, name: str, ttl: float) -> bool:
+        # Single-flight within the process is handled by ResponseCache itself.
+        return True
+
+    def release_lock(self, name: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'backend': 'memory', 'entries': len(self._entries), 'max_entries': self._max_entries}
+
+
+class RedisBackend:
+    """Shared store on a Redis-compatible server; entries are JSON."""
+
+    def __init__(self, url: str = CACHE_REDIS_URL, prefix: str = 'evpulse:cache:', client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError("redis is required for CACHE_BACKEND=redis: pip install redis") from e
+            client = redis.Redis.from_url(url, socket_timeout=1.0, socket_connect_timeout=1.0)
+        self._redis = client
+        self._prefix = prefix
+        self._url = url
+
+    def _data_key(self, namespace, scope, key):
+        return f"{self._prefix}{namespace}:{scope}:{key}"
+
+    def _version_keys(self, namespace, scope):
+        return f"{self._prefix}v:{namespace}", f"{self._prefix}v:{namespace}:{scope}"
+
+    def lookup(self, namespace: str, scope: str, key: str):
+        raw, namespace_version, scope_version = self._redis.mget(
+            self._data_key(namespace, scope, key), *self._version_keys(namespace, scope)
+        )
+        versions = (int(namespace_version or 0), int(scope_version or 0))
+        return (json.loads(raw) if raw is not None else None), versions
+
+    def store(self, namespace: str, scope: str, key: str, entry: Dict[str, Any], ttl: float) -> None:
+        self._redis.set(
+            self._data_key(namespace, scope, key),
+            json.dumps(entry, default=str, separators=(',', ':')),
+            ex=max(int(ttl), 1),
+        )
+
+    def invalidate(self, namespace: str, scope: Optional[str] = None) -> None:
+        namespace_key, scope_key = self._version_keys(namespace, scope)
+        self._redis.incr(namespace_key if scope is None else scope_key)
+
+    def acquire_lock(self, name: str, ttl: float) -> bool:
+        return bool(self._redis.set(f"{self._prefix}lock:{name}", str(os.getpid()), nx=True, ex=max(int(ttl), 1)))
+
+    def release_lock(self, name: str) -> None:
+        self._redis.delete(f"{self._prefix}lock:{name}")
+
+    def clear(self) -> None:
+        keys = list(self._redis.scan_iter(match=f"{self._prefix}*"))
+        if keys:
+            self._redis.delete(*keys)
+
+    def info(self) -> Dict[str, Any]:
+        return {'backend': 'redis', 'prefix': self._prefix}
+
+
+class ResponseCache:
+    """Single-flight, stale-while-revalidate cache over a pluggable backend."""
+
+    def __init__(self, backend=None, ttl: float = CACHE_TTL, stale_ttl: float = CACHE_STALE_TTL):
+        self._backend = backend if backend is not None else LRUBackend()
+        self._ttl = ttl
+        self._stale_ttl = stale_ttl
+        self._inflight: Dict[Tuple[str, str, str], threading.Event] = {}
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self._refresher: Optional[ThreadPoolExecutor] = None
+        self._refresher_pid: Optional[int] = None
+        self._counters = {HIT: 0, STALE: 0, MISS: 0, COALESCED: 0, 'errors': 0, 'invalidations': 0}
+
+    @property
+    def backend(self):
+        return self._backend
+
+    def _count(self, outcome: str) -> None:
+        with self._lock:
+            self._counters[outcome] += 1
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._refresher is None or self._refresher_pid != os.getpid():
+                self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='evpulse-cache-refresh')
+                self._refresher_pid = os.getpid()
+                self._refreshing = set()
+            return self._refresher
+
+    def _lookup(self, namespace, scope, key):
+        try:
+            entry, versions = self._backend.lookup(namespace, scope, key)
+        except Exception as e:
+            logger.warning(f"Cache lookup failed for {namespace}:{scope}:{key}: {e}")
+            self._count('errors')
+            return None, None
+        if entry is not None and tuple(entry.get('versions') or ()) != tuple(versions):
+            entry = None
+        return entry, versions
+
+    def _compute_and_store(self, namespace, scope, key, compute, versions):
+        value = compute()
+        if versions is not None:
+            entry = {'value': value, 'stored_at': time.time(), 'versions': list(versions)}
+            try:
+                self._backend.store(namespace, scope, key, entry, self._ttl + self._stale_ttl)
+            except Exception as e:
+                logger.warning(f"Cache store failed for {namespace}:{scope}:{key}: {e}")
+                self._count('errors')
+        return value
+
+    def _refresh(self, namespace, scope, key, compute, versions):
+        lock_name = f"{namespace}:{scope}:{key}"
+        try:
+            if not self._backend.acquire_lock(lock_name, LOCK_WAIT_SECONDS * 2):
+                return
+            try:
+                self._compute_and_store(namespace, scope, key, compute, versions)
+            finally:
+                self._backend.release_lock(lock_name)
+        except Exception as e:
+            logger.warning(f"Background refresh of {lock_name} failed: {e}")
+            self._count('errors')
+        finally:
+            with self._lock:
+                self._refreshing.discard((namespace, scope, key))
+
+    def _schedule_refresh(self, namespace, scope, key, compute, versions) -> None:
+        cache_key = (namespace, scope, key)
+        executor = self._executor()
+        with self._lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+        # A fresh context: the refresh must not inherit the request's (possibly
+        # nearly spent) query deadline or its request context, only the app.
+        app = current_app._get_current_object() if has_app_context() else None
+        active = current_deadline()
+        deadline = active[0] if active else DEFAULT_DEADLINE_CLASS
+        executor.submit(contextvars.Context().run, self._isolated_refresh, app, deadline,
+                        namespace, scope, key, compute, versions)
+
+    def _isolated_refresh(self, app, deadline, *args) -> None:
+        with app.app_context() if app is not None else nullcontext(), deadline_scope(deadline):
+            self._refresh(*args)
+
+    def get_or_compute(self, namespace: str, scope: str, key: str, compute: Callable[[], Any]):
+        """
+        Return ``(value, outcome, age_seconds)``.
+
+        ``compute`` must not depend on the request context: it may run on a
+        background thread to refresh a stale entry.
+        """
+        cache_key = (namespace, scope, key)
+
+        entry, versions = self._lookup(namespace, scope, key)
+        if entry is not None:
+            age = max(time.time() - entry['stored_at'], 0.0)
+            if age < self._ttl:
+                self._count(HIT)
+                return entry['value'], HIT, age
+            self._schedule_refresh(namespace, scope, key, compute, versions)
+            self._count(STALE)
+            return entry['value'], STALE, age
+
+        with self._lock:
+            waiter = self._inflight.get(cache_key)
+            leader = waiter is None
+            if leader:
+                waiter = threading.Event()
+                self._inflight[cache_key] = waiter
+
+        if not leader:
+            waiter.wait(LOCK_WAIT_SECONDS * 2)
+            entry, _ = self._lookup(namespace, scope, key)
+            if entry is not None:
+                self._count(COALESCED)
+                return entry['value'], COALESCED, max(time.time() - entry['stored_at'], 0.0)
+            # Leader failed or the entry was invalidated meanwhile: compute ourselves.
+            self._count(MISS)
+            return compute(), MISS, 0.0
+
+        try:
+            lock_name = f"{namespace}:{scope}:{key}"
+            if versions is not None and not self._backend.acquire_lock(lock_name, LOCK_WAIT_SECONDS * 2):
+                # Another process is computing it: poll briefly for its result.
+                deadline = time.monotonic() + LOCK_WAIT_SECONDS
+                while time.monotonic() < deadline:
+                    time.sleep(LOCK_POLL_SECONDS)
+                    entry, _ = self._lookup(namespace, scope, key)
+                    if entry is not None:
+                        self._count(COALESCED)
+                        return entry['value'], COALESCED, max(time.time() - entry['stored_at'], 0.0)
+                self._count(MISS)
+                return self._compute_and_store(namespace, scope, key, compute, versions), MISS, 0.0
+
+            try:
+                self._count(MISS)
+                return self._compute_and_store(namespace, scope, key, compute, versions), MISS, 0.0
+            finally:
+                if versions is not None:
+                    self._backend.release_lock(lock_name)
+        finally:
+            with self._lock:
+                self._inflight.pop(cache_key, None)
+            waiter.set()
+
+    def peek(self, namespace: str, scope: str, key: str):
+        """
+        Last stored ``(value, age_seconds)`` regardless of freshness or
+        invalidation, or None. Used to degrade when recomputing fails.
+        """
+        try:
+            entry, _ = self._backend.lookup(namespace, scope, key)
+        except Exception as e:
+            logger.warning(f"Cache lookup failed for {namespace}:{scope}:{key}: {e}")
+            return None
+        if entry is None:
+            return None
+        return entry['value'], max(time.time() - entry['stored_at'], 0.0)
+
+    def invalidate(self, namespace: str, scope: Optional[str] = None) -> None:
+        try:
+            self._backend.invalidate(namespace, scope)
+            self._count('invalidations')
+        except Exception as e:
+            logger.warning(f"Cache invalidation of {namespace}:{scope} failed: {e}")
+            self._count('errors')
+
+    def clear(self) -> None:
+        self._backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        try:
+            backend = self._backend.info()
+        except Exception as e:
+            backend = {'error': str(e)}
+        return {
+            'enabled': CACHE_ENABLED,
+            'ttl_seconds': self._ttl,
+            'stale_ttl_seconds': self._stale_ttl,
+            **backend,
+            **{name.lower(): value for name, value in counters.items()},
+        }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def _create_backend():
+    if CACHE_BACKEND == 'redis':
+        try:
+            return RedisBackend(CACHE_REDIS_URL)
+        except ImportError as e:
+            logger.warning(f"{e}; falling back to the in-process cache")
+    elif CACHE_BACKEND != 'memory':
+        logger.warning(f"Unknown CACHE_BACKEND {CACHE_BACKEND!r}; using the in-process cache")
+    return LRUBackend()
+
+
+def get_cache() -> ResponseCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(_create_backend())
+    return _cache
+
+
+def set_cache(cache: Optional[ResponseCache]) -> None:
+    """Replace the process cache (tests, custom backends). None resets to the default."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
+
+def cached(namespace: str, scope: str, key: str, compute: Callable[[], Any]):
+    """``get_or_compute`` on the process cache; bypassed when CACHE_ENABLED is false."""
+    if not CACHE_ENABLED:
+        return compute(), MISS, 0.0
+    return get_cache().get_or_compute(namespace, scope, key, compute)
+
+
+def peek(namespace: str, scope: str, key: str):
+    if not CACHE_ENABLED:
+        return None
+    return get_cache().peek(namespace, scope, key)
+
+
+def cache_headers(response, outcome: str, age: float):
+    response.headers['X-Cache'] = outcome
+    response.headers['Age'] = str(int(age))
+    return response
+
+
+def invalidate(namespace: str, scope: Optional[str] = None) -> None:
+    if CACHE_ENABLED:
+        get_cache().invalidate(namespace, scope)
+
+
+def invalidates(*namespaces: str):
+    """
+    Invalidate the given cache namespaces after the view returns a
+    successful (< 400) response to a non-OPTIONS request.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            response = make_response(fn(*args, **kwargs))
+            if response.status_code < 400 and request.method != 'OPTIONS':
+                for namespace in namespaces:
+                    invalidate(namespace)
+            return response
+        return wrapper
+    return decorator
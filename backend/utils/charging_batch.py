@@ -0,0 +1,261 @@
+"""
+Vectorized charging projections for fleet planning.
+
+``calculate_charging_projections`` is ``calculate_charging_projection``
+(utils/charging.py) over NumPy arrays: every input is a scalar or an array,
+they broadcast against each other, and the result is one array per output
+field. Clamping, defaults for missing or unparseable values, the order of
+the floating-point operations and Python's ``round`` are all reproduced, so
+each element equals the scalar result for the same inputs.
+
+Broadcasting gives grids for free: vehicle columns shaped ``(V, 1, 1)``,
+charger columns ``(1, C, 1)`` and durations ``(1, 1, D)`` project every
+combination at once (``POST /api/charging/projections/batch``).
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict
+
+import numpy as np
+
+from utils.charging import (
+    MAX_BATTERY_CAPACITY_KWH,
+    MAX_DURATION_MINUTES,
+    MIN_BATTERY_CAPACITY_KWH,
+    MIN_DURATION_MINUTES,
+    MIN_REALISTIC_ENERGY_KWH,
+    _to_float,
+)
+
+# Output fields, in the order calculate_charging_projection returns them
+FIELDS = (
+    'batteryCapacityKwh',
+    'currentPercentage',
+    'targetPercentage',
+    'durationMinutes',
+    'ratePerKwh',
+    'chargerPowerKw',
+    'targetEnergyKwh',
+    'estimatedTotalCost',
+    'deliveredEnergyKwh',
+    'deliveredCost',
+    'progressPercentage',
+)
+
+# Rows per pass for large batches (see calculate_charging_projections)
+CHUNK_ROWS = 12000
+
+
+def _column(values, default) -> np.ndarray:
+    """Float array for a scalar or sequence; None and unparseable entries become ``default``."""
+    if values is None:
+        return np.asarray(default, dtype=float)
+    if isinstance(values, np.ndarray) and values.dtype != object:
+        return values.astype(float, copy=False)
+    try:
+        column = np.asarray(values, dtype=float)
+        # NumPy reads None as NaN; only a NaN can hide one
+        if not np.isnan(column).any():
+            return column
+    except (TypeError, ValueError):
+        pass
+    return np.vectorize(lambda value: _to_float(value, default), otypes=[float])(np.asarray(values, dtype=object))
+
+
+def _clamp(values, minimum, maximum) -> np.ndarray:
+    # max(minimum, min(maximum, value)); fmin/fmax also map NaN to the bound like Python does
+    return np.fmax(minimum, np.fmin(maximum, values))
+
+
+# Veltkamp splitter for exact products (2**27 + 1)
+_SPLIT = 134217729.0
+
+
+def _round(values: np.ndarray, digits: int, bounded: bool = False) -> np.ndarray:
+    """
+    Python's ``round(value, digits)`` elementwise.
+
+    ``np.round`` rounds ``value * 10**digits`` half-to-even, but that product
+    is itself rounded: when it lands exactly on a half, the exact product may
+    lie on either side (``2.675 * 100`` is a hair below 267.5). Those elements
+    are resolved with the product's exact rounding error (Dekker's
+    two-product), which is what makes results match ``round`` bit for bit.
+    ``bounded`` skips the check for huge values, for columns whose values
+    are known to be small (or are clamped right after). Callers silence
+    NumPy's inf/NaN warnings.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 0:
+        return np.asarray(round(float(values), digits))
+    scale = 10.0 ** digits
+    scaled = values * scale
+    rounded = np.rint(scaled)
+    scratch = np.subtract(scaled, rounded)
+    half = np.abs(scratch, out=scratch) == 0.5
+    if half.any():
+        index = np.flatnonzero(half)
+        exact, product = values.take(index), scaled.take(index)
+        if digits == 1:
+            # 10x = 8x + 2x with both terms exact, so Fast2Sum gives the error
+            error = exact * 2.0 - (product - exact * 8.0)
+        else:
+            split = _SPLIT * exact
+            high = split - (split - exact)
+            error = (high * scale - product) + (exact - high) * scale
+        # product is k + 0.5; step to the side the exact value lies on, keep rint's even choice on a true tie
+        rounded.put(index, np.where(error == 0, rounded.take(index), product + np.copysign(0.5, error)))
+    rounded /= scale
+    if bounded:
+        return rounded
+    # Beyond 2**52 (and for inf/NaN) round() returns the value unchanged
+    magnitude = np.abs(scaled, out=scratch)
+    if not magnitude.max(initial=0) < 2.0 ** 52:
+        large = ~(magnitude < 2.0 ** 52)
+        rounded[large] = values[large]
+    return rounded
+
+
+def _project(battery_capacity, current, target, duration, rate, charger_power, progress) -> Dict[str, np.ndarray]:
+    """One pass of the projection maths over parsed float columns (not yet broadcast)."""
+    # inf inputs make inf - inf / inf * 0 NaNs and overflow when scaled for
+    # rounding, exactly as the scalar maths does; the results match it
+    with np.errstate(invalid='ignore', over='ignore'):
+        return _project_columns(battery_capacity, current, target, duration, rate, charger_power, progress)
+
+
+def _project_columns(battery_capacity, current, target, duration, rate, charger_power, progress):
+    # Huge or NaN capacities clamp to the maximum whether or not round() kept them as-is
+    battery_capacity = _clamp(
+        _round(battery_capacity, 1, bounded=True), MIN_BATTERY_CAPACITY_KWH, MAX_BATTERY_CAPACITY_KWH
+    )
+    current = _clamp(current, 0.0, 100.0)
+    target = _clamp(target, current, 100.0)
+    minutes = np.rint(_clamp(duration, MIN_DURATION_MINUTES, MAX_DURATION_MINUTES))
+    rate = np.fmax(0.1, _round(rate, 2))
+    charger_power = _clamp(charger_power, 3.0, 350.0)
+    progress = _clamp(progress, 0.0, 100.0)
+
+    gain = target - current
+    requested_energy = battery_capacity * np.fmax(0.0, gain) / 100.0
+    duration_limited_energy = charger_power * (minutes / 60.0) * 0.9
+    projected_energy = np.where(requested_energy > 0, requested_energy, duration_limited_energy)
+    projected_energy = np.fmin(projected_energy, duration_limited_energy)
+    projected_energy = np.fmax(MIN_REALISTIC_ENERGY_KWH, projected_energy)
+
+    projected_total_cost = projected_energy * rate
+
+    # Capacity and rate were rounded on the way in; rounding again changes nothing.
+    # Energies are clamped to a few hundred kWh, so costs are small unless the rate is absurd.
+    costs_bounded = bool(rate.max(initial=0) < 1e9)
+    target_energy = _round(projected_energy, 1, bounded=True)
+    total_cost = _round(projected_total_cost, 2, bounded=costs_bounded)
+
+    delivered_ratio = progress / 100.0
+    if delivered_ratio.ndim == 0 and delivered_ratio == 1.0:
+        # x * 1.0 is x: at 100% progress the delivered figures are the projected ones
+        delivered_energy, delivered_cost = target_energy, total_cost
+    else:
+        delivered_energy = projected_energy * delivered_ratio
+        delivered_cost = delivered_energy * rate
+        delivered_energy, delivered_cost = (
+            _round(delivered_energy, 1, bounded=True), _round(delivered_cost, 2, bounded=costs_bounded)
+        )
+
+    return {
+        'batteryCapacityKwh': battery_capacity,
+        'currentPercentage': _round(current, 1, bounded=True),
+        'targetPercentage': _round(target, 1, bounded=True),
+        'durationMinutes': minutes.astype(np.int64),
+        'ratePerKwh': rate,
+        'chargerPowerKw': _round(charger_power, 1, bounded=True),
+        'targetEnergyKwh': target_energy,
+        'estimatedTotalCost': total_cost,
+        'deliveredEnergyKwh': delivered_energy,
+        'deliveredCost': delivered_cost,
+        'progressPercentage': _round(progress, 1, bounded=True),
+    }
+
+
+def calculate_charging_projections(
+    battery_capacity_kwh=60,
+    current_percentage=20,
+    target_percentage=80,
+    duration_minutes=60,
+    rate_per_kwh=8,
+    charger_power_kw=22,
+    progress_percentage=100,
+) -> Dict[str, np.ndarray]:
+    """
+    Projections for every broadcast combination of the inputs, as
+    ``{field: array}`` with the fields of ``calculate_charging_projection``.
+    ``durationMinutes`` is an integer array; all others are floats. Fields
+    that do not vary with every input may be read-only broadcast views.
+    """
+    inputs = [
+        _column(battery_capacity_kwh, 60),
+        _column(current_percentage, 20),
+        _column(target_percentage, 80),
+        _column(duration_minutes, 60),
+        _column(rate_per_kwh, 8),
+        _column(charger_power_kw, 22),
+        _column(progress_percentage, 100),
+    ]
+    shape = np.broadcast_shapes(*(column.shape for column in inputs))
+    size = int(np.prod(shape))
+    if size <= CHUNK_ROWS:
+        return {field: np.broadcast_to(values, shape) for field, values in _project(*inputs).items()}
+
+    # Large batches run in cache-sized slices of the leading axis: the
+    # temporaries of each pass stay in cache, which is about twice as fast as
+    # whole-array passes. Inputs that broadcast along that axis stay small.
+    inputs = [column if column.ndim == 0 else column.reshape((1,) * (len(shape) - column.ndim) + column.shape)
+              for column in inputs]
+    rows = max(1, CHUNK_ROWS // max(1, size // shape[0]))
+    results: Dict[str, np.ndarray] = {}
+    written = []
+    for start in range(0, shape[0], rows):
+        stop = start + rows
+        chunk = _project(*(column[start:stop] if column.ndim and column.shape[0] > 1 else column for column in inputs))
+        if not results:
+            # Only fields that vary along the leading axis get a full array;
+            # the rest (and fields identical to another) stay broadcast views.
+            for field, values in chunk.items():
+                same = next((other for other in results if chunk[other] is values), None)
+                if same is not None:
+                    results[field] = results[same]
+                elif rows > 1 and (values.ndim == 0 or values.shape[0] == 1):
+                    results[field] = np.broadcast_to(values, shape)
+                else:
+                    results[field] = np.empty(shape, dtype=values.dtype)
+                    written.append(field)
+        for field in written:
+            results[field][start:stop] = chunk[field]
+    return results
+
+
+def grid_projections(vehicles: Dict[str, Any], chargers: Dict[str, Any], durations, progress_percentage=100):
+    """
+    Every vehicle against every charger and duration, shaped
+    ``(vehicles, chargers, durations)``. ``vehicles`` holds equal-length
+    ``batteryCapacityKwh`` / ``currentPercentage`` / ``targetPercentage``
+    columns, ``chargers`` holds ``chargerPowerKw`` / ``ratePerKwh``.
+    """
+    def axis(column, position, default):
+        values = _column(column, default)
+        return values.reshape([-1 if index == position else 1 for index in range(3)]) if values.ndim else values
+
+    return calculate_charging_projections(
+        battery_capacity_kwh=axis(vehicles.get('batteryCapacityKwh'), 0, 60),
+        current_percentage=axis(vehicles.get('currentPercentage'), 0, 20),
+        target_percentage=axis(vehicles.get('targetPercentage'), 0, 80),
+        duration_minutes=axis(durations, 2, 60),
+        rate_per_kwh=axis(chargers.get('ratePerKwh'), 1, 8),
+        charger_power_kw=axis(chargers.get('chargerPowerKw'), 1, 22),
+        progress_percentage=progress_percentage,
+    )
+
+
+def to_columns(projections: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """Flatten (C order) to JSON-ready lists."""
+    return {field: np.ravel(values).tolist() for field, values in projections.items()}
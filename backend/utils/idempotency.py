@@ -0,0 +1,240 @@
+"""
+Idempotency keys for retried mutating requests.
+
+A client sends ``Idempotency-Key: <opaque string>`` with a POST. The first
+request with a key runs the view and stores its response; any later request
+from the same user with the same key gets that response replayed (with
+``Idempotent-Replayed: true``) without running the view again.
+
+- Records live in the ``idempotency_keys`` collection, ``_id`` =
+  ``<user id>:<key>``, removed by a TTL index on ``expires_at`` after
+  IDEMPOTENCY_TTL seconds (default 24 h)
+- Completed records are also kept in a bounded in-process LRU
+  (IDEMPOTENCY_CACHE_SIZE), so most retries never reach MongoDB; a miss
+  costs one ``_id`` point read
+- A key is claimed with an insert before the view runs. A concurrent
+  duplicate gets 409 while the first is in flight; a claim left by a
+  crashed worker can be taken over after IDEMPOTENCY_LOCK_SECONDS
+- The same key with a different method, path or body is rejected with 422
+- 5xx responses and exceptions release the claim, so the retry runs again
+
+Requests without the header, and requests while the database is
+unavailable, run unchanged.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Any, Dict, Optional
+
+from flask import jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from database import get_db
+from utils.cache import LRUBackend
+
+logger = logging.getLogger('evpulse.idempotency')
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+IDEMPOTENCY_TTL = float(os.getenv('IDEMPOTENCY_TTL', str(24 * 3600)))
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv('IDEMPOTENCY_LOCK_SECONDS', '60'))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', '2048'))
+MAX_KEY_LENGTH = 255
+
+COLLECTION = 'idempotency_keys'
+IN_PROGRESS = 'in_progress'
+COMPLETED = 'completed'
+
+_front_cache = LRUBackend(IDEMPOTENCY_CACHE_SIZE)
+_counters = {'executed': 0, 'replayed_memory': 0, 'replayed_db': 0, 'conflicts': 0, 'mismatches': 0, 'errors': 0}
+_counters_lock = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def stats() -> Dict[str, Any]:
+    with _counters_lock:
+        counters = dict(_counters)
+    return {'ttl_seconds': IDEMPOTENCY_TTL, **_front_cache.info(), **counters}
+
+
+def clear() -> None:
+    """Drop the in-process front cache (tests)."""
+    _front_cache.clear()
+
+
+def _fingerprint() -> str:
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(b'\0')
+    digest.update(request.path.encode())
+    digest.update(b'\0')
+    digest.update(request.get_data() or b'')
+    return digest.hexdigest()
+
+
+def _remembered(record_id: str) -> Optional[Dict[str, Any]]:
+    entry, _ = _front_cache.lookup(COLLECTION, '', record_id)
+    return entry
+
+
+def _remember(record: Dict[str, Any]) -> None:
+    remaining = (record['expires_at'] - datetime.utcnow()).total_seconds()
+    if remaining > 0:
+        _front_cache.store(COLLECTION, '', record['_id'], record, remaining)
+
+
+def _replay(record: Dict[str, Any], fingerprint: str):
+    if record.get('fingerprint') != fingerprint:
+        _count('mismatches')
+        return jsonify({
+            'success': False,
+            'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'
+        }), 422
+    stored = record['response']
+    response = make_response(stored['body'], stored['status'])
+    response.mimetype = stored.get('mimetype') or 'application/json'
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _in_flight():
+    _count('conflicts')
+    response = jsonify({'success': False, 'error': 'A request with this Idempotency-Key is still in progress'})
+    response.status_code = 409
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+def _claim(db, record_id: str, user_id: str, key: str, fingerprint: str):
+    """
+    Insert the in-progress claim. Returns None when claimed, otherwise the
+    existing record (completed, or in progress elsewhere).
+    """
+    now = datetime.utcnow()
+    claim = {
+        '_id': record_id,
+        'user_id': user_id,
+        'key': key,
+        'endpoint': request.endpoint,
+        'fingerprint': fingerprint,
+        'status': IN_PROGRESS,
+        'created_at': now,
+        'locked_until': now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+        'expires_at': now + timedelta(seconds=IDEMPOTENCY_TTL),
+    }
+    try:
+        db[COLLECTION].insert_one(claim)
+        return None
+    except DuplicateKeyError:
+        pass
+
+    # Take over a claim whose worker died mid-request
+    takeover = db[COLLECTION].update_one(
+        {'_id': record_id, 'status': IN_PROGRESS, 'locked_until': {'$lt': now}, 'fingerprint': fingerprint},
+        {'$set': {'locked_until': claim['locked_until'], 'expires_at': claim['expires_at']}},
+    )
+    if takeover.matched_count:
+        return None
+    return db[COLLECTION].find_one({'_id': record_id}) or {'status': IN_PROGRESS}
+
+
+def _complete(db, record_id: str, response) -> None:
+    stored = {
+        'status': response.status_code,
+        'body': response.get_data(as_text=True),
+        'mimetype': response.mimetype,
+    }
+    record = db[COLLECTION].find_one_and_update(
+        {'_id': record_id},
+        {'$set': {'status': COMPLETED, 'response': stored}, '$unset': {'locked_until': ''}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if record is not None:
+        _remember(record)
+
+
+def _release(db, record_id: str) -> None:
+    try:
+        db[COLLECTION].delete_one({'_id': record_id, 'status': IN_PROGRESS})
+    except PyMongoError as e:
+        logger.warning(f"Could not release idempotency claim {record_id}: {e}")
+
+
+def idempotent(fn):
+    """
+    Replay the stored response for a repeated ``Idempotency-Key``. Place it
+    outside ``@invalidates`` and ``@role_required`` so a replay skips both;
+    keys are scoped to the JWT identity.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = (request.headers.get(IDEMPOTENCY_HEADER) or '').strip()
+        if not key:
+            return fn(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({
+                'success': False,
+                'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'
+            }), 400
+
+        verify_jwt_in_request()
+        record_id = f'{get_jwt_identity()}:{key}'
+        fingerprint = _fingerprint()
+
+        remembered = _remembered(record_id)
+        if remembered is not None:
+            _count('replayed_memory')
+            return _replay(remembered, fingerprint)
+
+        db = get_db()
+        if db is None:
+            return fn(*args, **kwargs)
+
+        try:
+            record = db[COLLECTION].find_one({'_id': record_id})
+            if record is None or record.get('status') != COMPLETED:
+                record = _claim(db, record_id, str(get_jwt_identity()), key, fingerprint)
+        except PyMongoError as e:
+            logger.warning(f"Idempotency lookup failed for {record_id}: {e}")
+            _count('errors')
+            return fn(*args, **kwargs)
+
+        if record is not None:
+            if record.get('status') == COMPLETED:
+                _remember(record)
+                _count('replayed_db')
+                return _replay(record, fingerprint)
+            if record.get('fingerprint', fingerprint) != fingerprint:
+                return _replay(record, fingerprint)
+            return _in_flight()
+
+        try:
+            response = make_response(fn(*args, **kwargs))
+        except Exception:
+            _release(db, record_id)
+            raise
+
+        _count('executed')
+        if response.status_code >= 500:
+            _release(db, record_id)
+            return response
+        try:
+            _complete(db, record_id, response)
+        except PyMongoError as e:
+            logger.warning(f"Could not store idempotent response for {record_id}: {e}")
+            _count('errors')
+        return response
+
+    return wrapper
@@ -0,0 +1,306 @@
+"""
+Prometheus metrics.
+
+Exposes ``/metrics`` in the Prometheus text format with:
+- request latency histograms and status counts per blueprint/route/method
+- in-flight request gauges per blueprint
+- MongoDB connection pool checkout wait, checked-out connections and
+  checkout failures (via a PyMongo ConnectionPoolListener)
+- MongoDB command latency per command/collection (fed by the connection
+  manager's command listener)
+- ping/read/write latency percentiles and pool utilisation from the
+  connection manager's background latency sampler
+- admission control per route class: in-flight requests, queue depth,
+  queue wait and rejections
+
+Under gunicorn set ``PROMETHEUS_MULTIPROC_DIR`` to an empty, writable
+directory before the workers start; every worker then writes its samples
+there and ``/metrics`` aggregates all of them, whichever worker serves the
+scrape. Call ``mark_process_dead(pid)`` from the ``child_exit`` hook.
+
+``prometheus_client`` is optional: without it the hooks are not installed
+and ``/metrics`` answers 503.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from time import perf_counter
+
+from flask import Response, g, request
+from pymongo import monitoring
+
+logger = logging.getLogger('evpulse.metrics')
+
+try:
+    import prometheus_client
+    from prometheus_client import Counter, Gauge, Histogram
+except ImportError:  # pragma: no cover - optional dependency
+    prometheus_client = None
+
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR') or os.getenv('prometheus_multiproc_dir')
+
+REQUEST_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+COMMAND_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+ADMISSION_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0)
+
+_UNMATCHED_ROUTE = '<unmatched>'
+
+if prometheus_client is not None:
+    REQUESTS = Counter(
+        'evpulse_http_requests_total',
+        'HTTP requests served',
+        ['blueprint', 'route', 'method', 'status'],
+    )
+    REQUEST_LATENCY = Histogram(
+        'evpulse_http_request_duration_seconds',
+        'HTTP request latency',
+        ['blueprint', 'route', 'method'],
+        buckets=REQUEST_LATENCY_BUCKETS,
+    )
+    IN_FLIGHT = Gauge(
+        'evpulse_http_requests_in_flight',
+        'HTTP requests currently being served',
+        ['blueprint'],
+        multiprocess_mode='livesum',
+    )
+    POOL_CHECKOUT_WAIT = Histogram(
+        'evpulse_mongodb_pool_checkout_wait_seconds',
+        'Time spent waiting to check a connection out of the MongoDB pool',
+        buckets=POOL_WAIT_BUCKETS,
+    )
+    POOL_CHECKED_OUT = Gauge(
+        'evpulse_mongodb_pool_checked_out_connections',
+        'MongoDB connections currently checked out of the pool',
+        multiprocess_mode='livesum',
+    )
+    POOL_CHECKOUT_FAILURES = Counter(
+        'evpulse_mongodb_pool_checkout_failures_total',
+        'Failed MongoDB connection checkouts',
+        ['reason'],
+    )
+    COMMAND_LATENCY = Histogram(
+        'evpulse_mongodb_command_duration_seconds',
+        'MongoDB command round-trip time',
+        ['command', 'collection'],
+        buckets=COMMAND_LATENCY_BUCKETS,
+    )
+    PROBE_LATENCY = Gauge(
+        'evpulse_mongodb_probe_latency_seconds',
+        'Background MongoDB probe latency percentiles over the recent sample window',
+        ['probe', 'quantile'],
+        multiprocess_mode='liveall',
+    )
+    POOL_UTILISATION = Gauge(
+        'evpulse_mongodb_pool_utilisation_ratio',
+        'Checked-out connections over maxPoolSize on the busiest server pool',
+        multiprocess_mode='liveall',
+    )
+    ADMISSION_IN_FLIGHT = Gauge(
+        'evpulse_admission_in_flight_requests',
+        'Requests holding an admission slot, per route class',
+        ['route_class'],
+        multiprocess_mode='livesum',
+    )
+    ADMISSION_QUEUE_DEPTH = Gauge(
+        'evpulse_admission_queue_depth',
+        'Requests waiting for an admission slot, per route class',
+        ['route_class'],
+        multiprocess_mode='livesum',
+    )
+    ADMISSION_QUEUE_WAIT = Histogram(
+        'evpulse_admission_queue_wait_seconds',
+        'Time admitted requests waited for a slot',
+        ['route_class'],
+        buckets=ADMISSION_WAIT_BUCKETS,
+    )
+    ADMISSION_REJECTIONS = Counter(
+        'evpulse_admission_rejections_total',
+        'Requests rejected by admission control',
+        ['route_class', 'reason'],
+    )
+
+# Labelled children are looked up once per label set; the dict hit is far
+# cheaper than prometheus_client's own label validation on every request.
+_children = {}
+_children_lock = threading.Lock()
+
+
+def _child(metric, *labels):
+    key = (metric, labels)
+    child = _children.get(key)
+    if child is None:
+        with _children_lock:
+            child = _children.get(key)
+            if child is None:
+                child = metric.labels(*labels)
+                _children[key] = child
+    return child
+
+
+def is_enabled():
+    return prometheus_client is not None
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Times connection checkouts and tracks checked-out connections."""
+
+    def __init__(self):
+        # Checkout started/finished events fire on the thread doing the checkout.
+        self._local = threading.local()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        self._local.started = perf_counter()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, 'started', None)
+        if started is not None:
+            POOL_CHECKOUT_WAIT.observe(perf_counter() - started)
+            self._local.started = None
+        POOL_CHECKED_OUT.inc()
+
+    def connection_check_out_failed(self, event):
+        started = getattr(self._local, 'started', None)
+        if started is not None:
+            POOL_CHECKOUT_WAIT.observe(perf_counter() - started)
+            self._local.started = None
+        _child(POOL_CHECKOUT_FAILURES, str(event.reason)).inc()
+
+    def connection_checked_in(self, event):
+        POOL_CHECKED_OUT.dec()
+
+
+# One listener per process: add_event_listener dedupes by identity, so a
+# second init_metrics (another create_app) does not double-count the pool.
+_pool_listener = PoolMetricsListener()
+
+
+def observe_command(command_name, collection, duration_ms, failed):
+    """Connection manager command observer: record MongoDB command latency."""
+    _child(COMMAND_LATENCY, command_name, collection or '<admin>').observe(duration_ms / 1000.0)
+
+
+def observe_latency_sample(summary):
+    """Connection manager latency observer: publish sampler percentiles."""
+    for probe, stats in summary['probes'].items():
+        for pct, quantile in ((50, '0.5'), (95, '0.95'), (99, '0.99')):
+            value = stats.get(f'p{pct}_ms')
+            if value is not None:
+                _child(PROBE_LATENCY, probe, quantile).set(value / 1000.0)
+    utilisation = summary['pool'].get('utilisation')
+    if utilisation is not None:
+        POOL_UTILISATION.set(utilisation)
+
+
+def observe_admission(event, bulkhead, reason=None, waited=0.0):
+    """Admission controller observer: bulkhead gauges, queue wait and rejections."""
+    if event == 'state':
+        _child(ADMISSION_IN_FLIGHT, bulkhead.name).set(bulkhead.in_flight)
+        _child(ADMISSION_QUEUE_DEPTH, bulkhead.name).set(bulkhead.queue_depth)
+    elif event == 'admitted':
+        _child(ADMISSION_QUEUE_WAIT, bulkhead.name).observe(waited)
+    elif event == 'rejected':
+        _child(ADMISSION_REJECTIONS, bulkhead.name, reason or 'unknown').inc()
+
+
+def _route_labels():
+    rule = request.url_rule
+    return request.blueprint or 'app', rule.rule if rule is not None else _UNMATCHED_ROUTE
+
+
+def _before_request():
+    blueprint, route = _route_labels()
+    g.metrics_labels = (blueprint, route, request.method)
+    g.metrics_started = perf_counter()
+    _child(IN_FLIGHT, blueprint).inc()
+
+
+def _after_request(response):
+    labels = g.get('metrics_labels')
+    if labels is not None:
+        _child(REQUEST_LATENCY, *labels).observe(perf_counter() - g.metrics_started)
+        _child(REQUESTS, *labels, str(response.status_code)).inc()
+    return response
+
+
+def _teardown_request(exc):
+    labels = g.pop('metrics_labels', None)
+    if labels is not None:
+        _child(IN_FLIGHT, labels[0]).dec()
+
+
+def _registry():
+    if MULTIPROC_DIR:
+        from prometheus_client import CollectorRegistry, multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return prometheus_client.REGISTRY
+
+
+def metrics_view():
+    if prometheus_client is None:
+        return Response('prometheus_client is not installed\n', status=503, mimetype='text/plain')
+    return Response(prometheus_client.generate_latest(_registry()), mimetype=prometheus_client.CONTENT_TYPE_LATEST)
+
+
+def mark_process_dead(pid):
+    """Drop a dead worker's live gauges from the multiprocess directory (gunicorn ``child_exit``)."""
+    if prometheus_client is not None and MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(pid)
+
+
+def init_metrics(app, manager=None):
+    """
+    Install request hooks, register ``/metrics`` and attach the MongoDB
+    listeners to the connection manager. Must run before the manager connects:
+    PyMongo only accepts event listeners when the client is created.
+    """
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+    if prometheus_client is None:
+        logger.warning("prometheus_client is not installed; /metrics is disabled")
+        return
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+    from utils.admission import get_admission_controller
+
+    get_admission_controller().add_observer(observe_admission)
+
+    if manager is not None:
+        manager.add_event_listener(_pool_listener)
+        manager.add_command_observer(observe_command)
+        manager.add_latency_observer(observe_latency_sample)
+
+    if MULTIPROC_DIR:
+        logger.info(f"Prometheus multiprocess mode ({MULTIPROC_DIR})")
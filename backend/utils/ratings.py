@@ -0,0 +1,125 @@
+"""
+Station rating aggregates.
+
+Each station carries ``rating_counts`` (reviews per star, keys ``"1"``..``"5"``),
+``rating_sum`` and ``total_reviews``, plus the derived ``rating`` average that
+listings sort on. Creating or deleting a review adjusts them with one atomic
+update (``apply_review``), so averages and breakdowns are read from the
+station document instead of from its reviews. A station written before
+these fields existed (``total_reviews`` and ``rating`` only) is recomputed
+from its reviews on its first review write instead.
+
+``rebuild_station_ratings`` recomputes everything from ``reviews`` for drift
+repair (``python scripts/rebuild_station_ratings.py``).
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+STARS = (1, 2, 3, 4, 5)
+
+
+def empty_counts() -> Dict[str, int]:
+    return {str(star): 0 for star in STARS}
+
+
+def rating_fields(counts: Dict[str, int], rating_sum) -> Dict[str, Any]:
+    """Station fields for a histogram and sum."""
+    total = sum(counts.values())
+    return {
+        'rating_counts': counts,
+        'rating_sum': rating_sum,
+        'total_reviews': total,
+        'rating': round(rating_sum / total, 1) if total else 0,
+    }
+
+
+def _adjusted(field: str, amount) -> Dict[str, Any]:
+    return {'$add': [{'$ifNull': [f'${field}', 0]}, amount]}
+
+
+def review_update(rating: int, delta: int) -> List[Dict[str, Any]]:
+    """
+    Update pipeline adding (``delta=1``) or removing (``delta=-1``) one
+    review of ``rating`` stars: bumps the star count, sum and total, then
+    re-derives the average in the same write.
+    """
+    return [
+        {'$set': {
+            f'rating_counts.{rating}': _adjusted(f'rating_counts.{rating}', delta),
+            'rating_sum': _adjusted('rating_sum', delta * rating),
+            'total_reviews': _adjusted('total_reviews', delta),
+            'updated_at': '$$NOW',
+        }},
+        {'$set': {
+            'rating': {'$cond': [
+                {'$gt': ['$total_reviews', 0]},
+                {'$round': [{'$divide': ['$rating_sum', '$total_reviews']}, 1]},
+                0,
+            ]},
+        }},
+    ]
+
+
+def apply_review(db, station_id, rating: int, delta: int) -> None:
+    """
+    Adjust the station for a review that was just inserted or deleted.
+
+    Only stations that already carry ``rating_sum`` are adjusted in place;
+    adding to an older station's ``total_reviews`` without its sum would
+    drag its average towards 0. Those are rebuilt from ``reviews``, which
+    already reflect this write.
+    """
+    result = db.stations.update_one({'_id': station_id, 'rating_sum': {'$exists': True}}, review_update(rating, delta))
+    if not result.matched_count:
+        entry = _computed_ratings(db, {'station_id': station_id}).get(station_id) or {'counts': empty_counts(), 'sum': 0}
+        db.stations.update_one(
+            {'_id': station_id, 'rating_sum': {'$exists': False}},
+            {'$set': {**rating_fields(entry['counts'], entry['sum']), 'updated_at': datetime.utcnow()}},
+        )
+
+
+def rating_breakdown(station: Dict[str, Any]) -> Dict[int, int]:
+    """Reviews per star, 5 down to 1, from the station document."""
+    counts = station.get('rating_counts') or {}
+    return {star: int(counts.get(str(star), 0)) for star in reversed(STARS)}
+
+
+def _computed_ratings(db, match: Optional[Dict[str, Any]] = None) -> Dict[Any, Dict[str, Any]]:
+    """``{station_id: {'counts': histogram, 'sum': n}}`` from ``reviews`` (one ``$group``)."""
+    computed: Dict[Any, Dict[str, Any]] = {}
+    for row in db.reviews.aggregate([
+        {'$match': {**(match or {}), 'rating': {'$in': list(STARS)}}},
+        {'$group': {'_id': {'station': '$station_id', 'rating': '$rating'}, 'count': {'$sum': 1}}},
+    ]):
+        entry = computed.setdefault(row['_id']['station'], {'counts': empty_counts(), 'sum': 0})
+        entry['counts'][str(int(row['_id']['rating']))] = row['count']
+        entry['sum'] += int(row['_id']['rating']) * row['count']
+    return computed
+
+
+def rebuild_station_ratings(db, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Recompute every station's rating fields from its reviews (one
+    ``$group``) and rewrite the stations that drifted. Returns
+    ``{'stations': n, 'drifted': m}``.
+    """
+    computed = _computed_ratings(db)
+
+    operations = []
+    stations = db.stations.find({}, {'rating_counts': 1, 'rating_sum': 1, 'total_reviews': 1, 'rating': 1})
+    total = 0
+    for station in stations:
+        total += 1
+        entry = computed.get(station['_id']) or {'counts': empty_counts(), 'sum': 0}
+        fields = rating_fields(entry['counts'], entry['sum'])
+        if any(station.get(name) != value for name, value in fields.items()):
+            operations.append(UpdateOne({'_id': station['_id']}, {'$set': {**fields, 'updated_at': datetime.utcnow()}}))
+
+    if operations and not dry_run:
+        db.stations.bulk_write(operations, ordered=False)
+    return {'stations': total, 'drifted': len(operations)}
@@ -0,0 +1,144 @@
+"""
+Per-user spending aggregates: wallet balance, all-time summary and ranged
+analytics, each folded from a single ``$group`` over ``transactions``.
+"""
+
+from datetime import datetime
+
+from bson import ObjectId
+
+
+# Wallet rows are the ones whose payment method is "wallet" in any casing
+WALLET_METHOD = 'wallet'
+
+
+def user_id_values(user_id):
+    """The user reference as ObjectId and as string (older rows stored either)."""
+    values = []
+    for value in (user_id, str(user_id) if user_id is not None else None):
+        if value is not None and value not in values:
+            values.append(value)
+    try:
+        oid = ObjectId(str(user_id))
+    except Exception:
+        oid = None
+    if oid is not None:
+        for value in (oid, str(oid)):
+            if value not in values:
+                values.append(value)
+    return values
+
+
+# Legacy rows may carry string amounts and ISO-string timestamps. Amounts
+# are read as the old per-row float(amount) rounded to cents (0 when not a
+# number); a timestamp that is neither a date nor a parseable string has no month.
+AMOUNT = {'$round': [{'$convert': {'input': '$amount', 'to': 'double', 'onError': 0, 'onNull': 0}}, 2]}
+TIMESTAMP_DATE = {'$switch': {
+    'branches': [
+        {'case': {'$eq': [{'$type': '$timestamp'}, 'date']}, 'then': '$timestamp'},
+        {'case': {'$eq': [{'$type': '$timestamp'}, 'string']},
+         'then': {'$dateFromString': {'dateString': '$timestamp', 'onError': None, 'onNull': None}}},
+    ],
+    'default': None,
+}}
+
+
+def spending_groups(db, user_id, start=None, end=None, match=None, by_month=True):
+    """
+    One ``$group`` over a user's transactions, optionally limited to
+    ``start <= timestamp < end``: a row per (type, payment method, month,
+    status) with its amount and count. Served by the ``user_timestamp``
+    index, so a bounded range costs the same however old the account is.
+    ``by_month=False`` leaves the month out of the key.
+    """
+    query = {'user_id': {'$in': user_id_values(user_id)}}
+    if match:
+        query.update(match)
+    if start is not None or end is not None:
+        query['timestamp'] = {}
+        if start is not None:
+            query['timestamp']['$gte'] = start
+        if end is not None:
+            query['timestamp']['$lt'] = end
+
+    key = {
+        'type': '$type',
+        'method': {'$toLower': {'$ifNull': ['$payment_method', 'unknown']}},
+        'status': '$status',
+    }
+    if by_month:
+        key['month'] = {'$dateToString': {'format': '%Y-%m', 'date': TIMESTAMP_DATE, 'onNull': None}}
+
+    return list(db.transactions.aggregate([
+        {'$match': query},
+        {'$group': {
+            '_id': key,
+            'amount': {'$sum': AMOUNT},
+            'count': {'$sum': 1},
+        }},
+    ]))
+
+
+def balance_from_groups(groups):
+    """Completed top-ups minus completed wallet-paid charging (never negative)."""
+    topups = 0.0
+    spent = 0.0
+    for row in groups:
+        key = row['_id']
+        if key.get('status') != 'completed':
+            continue
+        if key.get('type') == 'wallet_topup':
+            topups += row.get('amount') or 0
+        elif key.get('type') == 'charging' and key.get('method') == WALLET_METHOD:
+            spent += row.get('amount') or 0
+    return round(max(0.0, topups - spent), 2)
+
+
+def wallet_balance(db, user_id):
+    """A user's wallet balance from one ``$group`` over the rows that move it."""
+    return balance_from_groups(spending_groups(db, user_id, by_month=False, match={
+        'type': {'$in': ['wallet_topup', 'charging']},
+        'status': 'completed',
+    }))
+
+
+def summarize(groups, completed_only=True):
+    """Fold grouped rows into totals by type, by payment method (charging) and by month."""
+    by_type = {}
+    by_method = {}
+    by_month = {}
+    count = 0
+
+    for row in groups:
+        key = row['_id']
+        if completed_only and key.get('status') != 'completed':
+            continue
+        amount = row.get('amount') or 0
+        txn_type = key.get('type') or 'unknown'
+        count += row.get('count', 0)
+
+        by_type[txn_type] = by_type.get(txn_type, 0.0) + amount
+        if txn_type == 'charging':
+            by_method[key.get('method')] = by_method.get(key.get('method'), 0.0) + amount
+        month = key.get('month')
+        if month:
+            bucket = by_month.setdefault(month, {'month': month, 'count': 0})
+            bucket[txn_type] = round(bucket.get(txn_type, 0.0) + amount, 2)
+            bucket['count'] += row.get('count', 0)
+
+    return {
+        'totalsByType': {name: round(value, 2) for name, value in by_type.items()},
+        'chargingByPaymentMethod': {name: round(value, 2) for name, value in by_method.items()},
+        'monthly': [by_month[month] for month in sorted(by_month)],
+        'transactionCount': count,
+    }
+
+
+def default_range(now=None, months=12):
+    """``months`` calendar months ending with the current one: (start, end)."""
+    now = now or datetime.utcnow()
+    index = now.year * 12 + now.month - 1 - (months - 1)
+    start = datetime(index // 12, index % 12 + 1, 1)
+    end_index = now.year * 12 + now.month
+    end = datetime(end_index // 12, end_index % 12 + 1, 1)
+    return start, end
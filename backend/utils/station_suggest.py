@@ -0,0 +1,268 @@
+"""
+In-process prefix index for station typeahead (``/api/stations/suggest``).
+
+Every station contributes normalised tokens (lowercase, accents stripped,
+split on non-alphanumerics) from its ``name``, ``city``, ``nearby_landmark``
+and display ``address``. Every prefix of every token maps to a list of the
+stations it occurs in, kept sorted by rank: best matching field (name,
+city, landmark, address), then rating, then name. A one-word query is the
+head of one list; a multi-word query walks the narrowest word's list and
+keeps stations whose tokens also start with the other words.
+
+Keeping it current:
+- Station writes in this process call ``upsert`` / ``remove`` directly
+- The first build runs on a background thread, started at app startup (or
+  by the first suggest request); queries answer from the empty index until
+  it lands
+- Every SUGGEST_REFRESH_SECONDS (default 30) a background thread reads the
+  stations whose ``updated_at`` is at or after the watermark, which picks up
+  writes served by other workers. Stations already read at exactly the
+  watermark are skipped, so writes sharing its timestamp are not lost. With
+  no ``updated_at`` anywhere the watermark starts at the build time
+- Every SUGGEST_REBUILD_SECONDS (default 600) the index is rebuilt in full,
+  which also drops stations deleted elsewhere
+"""
+
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger('evpulse.station_suggest')
+
+SUGGEST_REFRESH_SECONDS = float(os.getenv('SUGGEST_REFRESH_SECONDS', '30'))
+SUGGEST_REBUILD_SECONDS = float(os.getenv('SUGGEST_REBUILD_SECONDS', '600'))
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+# Multi-word queries rank at most this many stations of their narrowest word
+MAX_SCAN = 500
+
+# Field weights for ranking: a match in the name beats one in the city, etc.
+FIELDS = ('name', 'city', 'nearby_landmark', 'address')
+FIELD_RANK = {field: rank for rank, field in enumerate(FIELDS)}
+
+PROJECTION = {'name': 1, 'city': 1, 'nearby_landmark': 1, 'address': 1, 'rating': 1, 'status': 1, 'updated_at': 1}
+
+_TOKEN_SPLIT = re.compile(r'[^0-9a-z]+')
+
+
+def normalize(text) -> str:
+    decomposed = unicodedata.normalize('NFKD', str(text or ''))
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(text) -> List[str]:
+    return [token for token in _TOKEN_SPLIT.split(normalize(text)) if token]
+
+
+class StationSuggestIndex:
+    """Prefix -> ranked stations map over station fields with incremental updates."""
+
+    def __init__(self):
+        # prefix -> sorted [(field rank, -rating, name, station id)]: the head is the top-k
+        self._prefixes: Dict[str, List[Tuple]] = {}
+        # station id -> {token: best (lowest) field rank it appears in}
+        self._station_tokens: Dict[str, Dict[str, int]] = {}
+        self._stations: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        self._built_at = 0.0
+        self._refreshed_at = 0.0
+        self._watermark: Optional[datetime] = None
+        # Stations already indexed at exactly the watermark (skipped by the $gte delta)
+        self._watermark_ids: set = set()
+        self._refreshing = False
+        self._refreshing_pid: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._stations)
+
+    # -- maintenance -------------------------------------------------
+
+    @staticmethod
+    def _tokens(station: Dict[str, Any]) -> Dict[str, int]:
+        tokens: Dict[str, int] = {}
+        for field in FIELDS:
+            for token in tokenize(station.get(field)):
+                tokens[token] = min(tokens.get(token, FIELD_RANK[field]), FIELD_RANK[field])
+        return tokens
+
+    @staticmethod
+    def _prefix_ranks(tokens: Dict[str, int]) -> Dict[str, int]:
+        ranks: Dict[str, int] = {}
+        for token, rank in tokens.items():
+            for end in range(1, len(token) + 1):
+                prefix = token[:end]
+                if rank < ranks.get(prefix, len(FIELDS)):
+                    ranks[prefix] = rank
+        return ranks
+
+    def _entries(self, station_id: str) -> Dict[str, Tuple]:
+        station = self._stations[station_id]
+        order = (-(station.get('rating') or 0), normalize(station.get('name')), station_id)
+        return {prefix: (rank, *order) for prefix, rank in self._prefix_ranks(self._station_tokens[station_id]).items()}
+
+    def _remove_locked(self, station_id: str) -> None:
+        if station_id not in self._stations:
+            return
+        for prefix, entry in self._entries(station_id).items():
+            entries = self._prefixes.get(prefix)
+            if entries is None:
+                continue
+            index = bisect_left(entries, entry)
+            if index < len(entries) and entries[index] == entry:
+                del entries[index]
+            if not entries:
+                del self._prefixes[prefix]
+        del self._station_tokens[station_id]
+        del self._stations[station_id]
+
+    def _add_locked(self, station: Dict[str, Any], sort_lists: bool = True) -> None:
+        station_id = str(station.get('_id') or station.get('id'))
+        self._station_tokens[station_id] = self._tokens(station)
+        self._stations[station_id] = {
+            'id': station_id,
+            'name': station.get('name'),
+            'city': station.get('city'),
+            'nearbyLandmark': station.get('nearby_landmark'),
+            'address': station.get('address'),
+            'status': station.get('status'),
+            'rating': station.get('rating', 0),
+        }
+        for prefix, entry in self._entries(station_id).items():
+            entries = self._prefixes.setdefault(prefix, [])
+            if sort_lists:
+                insort(entries, entry)
+            else:
+                entries.append(entry)
+
+    def upsert(self, station: Dict[str, Any]) -> None:
+        """Index (or re-index) one station document."""
+        with self._lock:
+            self._remove_locked(str(station.get('_id') or station.get('id')))
+            self._add_locked(station)
+
+    def remove(self, station_id) -> None:
+        with self._lock:
+            self._remove_locked(str(station_id))
+
+    def _advance_watermark(self, station: Dict[str, Any]) -> None:
+        updated_at = station.get('updated_at')
+        if not isinstance(updated_at, datetime):
+            return
+        station_id = str(station.get('_id') or station.get('id'))
+        if self._watermark is None or updated_at > self._watermark:
+            self._watermark, self._watermark_ids = updated_at, {station_id}
+        elif updated_at == self._watermark:
+            self._watermark_ids.add(station_id)
+
+    def rebuild(self, stations) -> None:
+        """Replace the whole index."""
+        # Taken before the read: a write racing the read is picked up by the next delta
+        started = datetime.utcnow()
+        fresh = StationSuggestIndex()
+        for station in stations:
+            fresh._remove_locked(str(station.get('_id') or station.get('id')))
+            fresh._add_locked(station, sort_lists=False)
+            fresh._advance_watermark(station)
+        for entries in fresh._prefixes.values():
+            entries.sort()
+        with self._lock:
+            self._prefixes = fresh._prefixes
+            self._station_tokens = fresh._station_tokens
+            self._stations = fresh._stations
+            self._watermark = fresh._watermark or started
+            self._watermark_ids = fresh._watermark_ids
+            self._built_at = self._refreshed_at = time.monotonic()
+
+    # -- queries -----------------------------------------------------
+
+    def _suggestion(self, entry: Tuple) -> Dict[str, Any]:
+        return {**self._stations[entry[-1]], 'matchedField': FIELDS[entry[0]]}
+
+    def suggest(self, query: str, limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        """
+        Top ``limit`` stations where every query word prefixes one of their
+        tokens, ranked by best matching field, then rating, then name.
+        """
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+        with self._lock:
+            lists = sorted((self._prefixes.get(word, []) for word in words), key=len)
+            if len(words) == 1:
+                return [self._suggestion(entry) for entry in lists[0][:limit]]
+
+            # Walk the narrowest word's stations; keep those every other word also prefixes
+            others = [word for word in words if self._prefixes.get(word) is not lists[0]]
+            matches = []
+            for entry in lists[0][:MAX_SCAN]:
+                tokens = self._station_tokens[entry[-1]]
+                ranks = [entry[0]]
+                for word in others:
+                    rank = min((r for token, r in tokens.items() if token.startswith(word)), default=None)
+                    if rank is None:
+                        break
+                    ranks.append(rank)
+                else:
+                    matches.append((min(ranks), *entry[1:]))
+            return [self._suggestion(entry) for entry in heapq.nsmallest(limit, matches)]
+
+    # -- freshness ---------------------------------------------------
+
+    def ensure_fresh(self, db) -> None:
+        """
+        Schedule the first build, a delta refresh or a full rebuild when due
+        on a background thread; never blocks the caller.
+        """
+        now = time.monotonic()
+        if self._refreshed_at and now - self._refreshed_at < SUGGEST_REFRESH_SECONDS:
+            return
+        with self._lock:
+            # A flag inherited across fork belongs to a thread that did not survive it
+            if self._refreshing and self._refreshing_pid == os.getpid():
+                return
+            self._refreshing, self._refreshing_pid = True, os.getpid()
+        full = not self._built_at or now - self._built_at >= SUGGEST_REBUILD_SECONDS
+        threading.Thread(target=self._refresh, args=(db, full), name='evpulse-suggest-refresh', daemon=True).start()
+
+    def _refresh(self, db, full: bool) -> None:
+        try:
+            if full:
+                self.rebuild(db.stations.find({}, PROJECTION))
+                return
+            for station in db.stations.find({'updated_at': {'$gte': self._watermark}}, PROJECTION):
+                station_id = str(station['_id'])
+                if station.get('updated_at') == self._watermark and station_id in self._watermark_ids:
+                    continue
+                self.upsert(station)
+                with self._lock:
+                    self._advance_watermark(station)
+        except Exception as e:
+            logger.warning(f"Station suggest refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshed_at = time.monotonic()
+                self._refreshing = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'stations': len(self._stations),
+                'prefixes': len(self._prefixes),
+                'age_seconds': round(time.monotonic() - self._built_at, 1) if self._built_at else None,
+            }
+
+
+_index = StationSuggestIndex()
+
+
+def get_suggest_index() -> StationSuggestIndex:
+    return _index
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import logging
+import os
+from itertools import islice
+
+from flask import Response, current_app, request, stream_with_context
+
+
+logger = logging.getLogger('evpulse.streaming')
+
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))
+STREAM_FORMATS = ('ndjson', 'stream')
+
+
+def requested_stream_format():
+    """Return the streaming format asked for via ``?format=``, or None for a regular response."""
+    value = str(request.args.get('format') or '').strip().lower()
+    return value if value in STREAM_FORMATS else None
+
+
+def iter_batches(cursor, batch_size=STREAM_BATCH_SIZE):
+    """Yield lists of at most ``batch_size`` documents from a cursor without materialising it."""
+    iterator = iter(cursor)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def stream_response(batches, stream_format):
+    """
+    Stream serialised rows from an iterable of row batches.
+
+    ``ndjson`` emits one JSON document per line. ``stream`` emits the usual
+    ``{"data": [...], "success": true}`` envelope as a chunked JSON array; the
+    ``success`` flag is written last so a failure mid-stream can still be
+    reported in a well-formed document.
+    """
+    dumps = current_app.json.dumps
+
+    def generate_ndjson():
+        try:
+            for batch in batches:
+                yield ''.join(dumps(item) + '\n' for item in batch)
+        except Exception as e:
+            logger.error(f"Streaming response aborted: {e}")
+            yield dumps({'success': False, 'error': str(e)}) + '\n'
+
+    def generate_array():
+        yield '{"data": ['
+        first = True
+        try:
+            for batch in batches:
+                chunk = ','.join(dumps(item) for item in batch)
+                if not chunk:
+                    continue
+                yield chunk if first else ',' + chunk
+                first = False
+        except Exception as e:
+            logger.error(f"Streaming response aborted: {e}")
+            yield '], "success": false, "error": ' + dumps(str(e)) + '}'
+            return
+        yield '], "success": true}'
+
+    if stream_format == 'ndjson':
+        return Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+    return Response(stream_with_context(generate_array()), mimetype='application/json')
@@ -0,0 +1,8 @@
+"""
+WSGI entry point for production servers.
+
+    gunicorn wsgi:app        # settings from gunicorn.conf.py
+"""
+from app import create_app
+
+app = create_app()
@@ -481,11 +481,19 @@ export const operatorAPI = {
     try {
       const response = await apiRequest('/operator/feedback');
       const stations = response.data || [];
-      const totalReviews = stations.reduce((sum, s) => sum + (s.totalReviews || 0), 0);
-      const weightedRating = stations.reduce((sum, s) => sum + ((s.averageRating || 0) * (s.totalReviews || 0)), 0);
-      const averageRating = totalReviews ? Number((weightedRating / totalReviews).toFixed(1)) : 0;
+      // Totals over all of the operator's stations, not just this page
+      const summary = response.summary || {};
+      const totalReviews = summary.totalReviews || 0;
+      const averageRating = summary.averageRating || 0;
+      const ratingDistribution = {
+        5: summary.ratingBreakdown?.[5] || 0,
+        4: summary.ratingBreakdown?.[4] || 0,
+        3: summary.ratingBreakdown?.[3] || 0,
+        2: summary.ratingBreakdown?.[2] || 0,
+        1: summary.ratingBreakdown?.[1] || 0,
+      };
       const positiveReviews = totalReviews
-        ? Math.round((stations.reduce((sum, s) => sum + ((s.ratingBreakdown?.[5] || 0) + (s.ratingBreakdown?.[4] || 0)), 0) / totalReviews) * 100)
+        ? Math.round(((ratingDistribution[5] + ratingDistribution[4]) / totalReviews) * 100)
         : 0;
 
       const reviews = stations.flatMap((station) =>
@@ -501,14 +509,6 @@ export const operatorAPI = {
         }))
       );
 
-      const ratingDistribution = {
-        5: stations.reduce((sum, s) => sum + (s.ratingBreakdown?.[5] || 0), 0),
-        4: stations.reduce((sum, s) => sum + (s.ratingBreakdown?.[4] || 0), 0),
-        3: stations.reduce((sum, s) => sum + (s.ratingBreakdown?.[3] || 0), 0),
-        2: stations.reduce((sum, s) => sum + (s.ratingBreakdown?.[2] || 0), 0),
-        1: stations.reduce((sum, s) => sum + (s.ratingBreakdown?.[1] || 0), 0),
-      };
-
       return {
         stats: {
           averageRating,